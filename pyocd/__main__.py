@@ -40,9 +40,11 @@ from .subcommands.json_cmd import JsonSubcommand
 from .subcommands.list_cmd import ListSubcommand
 from .subcommands.load_cmd import LoadSubcommand
 from .subcommands.pack_cmd import PackSubcommand
+from .subcommands.profile_cmd import ProfileSubcommand
 from .subcommands.reset_cmd import ResetSubcommand
 from .subcommands.server_cmd import ServerSubcommand
 from .subcommands.rtt_cmd import RTTSubcommand
+from .subcommands.swv_replay_cmd import SWVReplaySubcommand
 
 ## @brief Logger for this module.
 LOG = logging.getLogger("pyocd.tool")
@@ -62,9 +64,11 @@ class PyOCDTool(SubcommandBase):
         JsonSubcommand,
         ListSubcommand,
         PackSubcommand,
+        ProfileSubcommand,
         ResetSubcommand,
         ServerSubcommand,
         RTTSubcommand,
+        SWVReplaySubcommand,
         ]
 
     ## @brief Logging level names.
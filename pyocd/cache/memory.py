@@ -1,6 +1,6 @@
 # pyOCD debugger
 # Copyright (c) 2016-2020 Arm Limited
-# Copyright (c) 2021 Chris Reed
+# Copyright (c) 2021-2023 Chris Reed
 # SPDX-License-Identifier: Apache-2.0
 #
 # Licensed under the Apache License, Version 2.0 (the "License");
@@ -15,8 +15,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from intervaltree import (Interval, IntervalTree)
+import collections
 import logging
+from typing import (Callable, List, Optional, Sequence, Tuple)
 
 from ..utility import conversion
 from .metrics import CacheMetrics
@@ -24,6 +25,156 @@ from ..core.exceptions import TransferFaultError
 
 LOG = logging.getLogger(__name__)
 
+## A cached range of memory within a page: start address and data.
+_CachedRange = Tuple[int, bytearray]
+
+class _PageCache:
+    """@brief Store of cached memory ranges organised in pages with LRU eviction.
+
+    Cached data is organised in pages of PAGE_SIZE bytes. Each page holds a sorted list of disjoint
+    ranges of cached data, where contiguous or overlapping ranges are always merged. So the number of
+    ranges stays small no matter how fragmented the accesses are. The total amount of cached data is
+    limited to a byte budget, above which the least recently used pages are evicted.
+    """
+
+    ## Size in bytes of the pages used to organise cached data and for LRU eviction.
+    PAGE_SIZE = 4096
+
+    def __init__(self, size_limit: int) -> None:
+        self._size_limit = size_limit
+        self.clear()
+
+    def clear(self) -> None:
+        # Maps page address to the list of cached ranges in the page, in LRU order.
+        self._pages: "collections.OrderedDict[int, List[_CachedRange]]" = collections.OrderedDict()
+        self.size = 0
+        self.metrics = CacheMetrics()
+
+    def get_cached_ranges(self, addr: int, end: int) -> List[Tuple[int, int]]:
+        """@brief Returns the cached subranges of an address range.
+        @return List of (start, end) tuples sorted by address. Ranges are clipped to the requested
+            address range, and ranges in consecutive pages are not merged.
+        """
+        result = []
+        page_mask = ~(self.PAGE_SIZE - 1)
+        for page_addr in range(addr & page_mask, end, self.PAGE_SIZE):
+            for begin, data in self._pages.get(page_addr, ()):
+                range_end = begin + len(data)
+                if range_end > addr and begin < end:
+                    result.append((max(begin, addr), min(range_end, end)))
+        return result
+
+    def read(self, addr: int, size: int, fill: Callable[[int, int], Sequence[int]]) -> bytearray:
+        """@brief Performs a cached read operation of an address range.
+
+        Cached data is copied into the result, then the uncached subranges are read with _fill_
+        and added to the cache. Uncached subranges that are contiguous across page boundaries are
+        read in a single call.
+
+        @param self
+        @param addr Start address.
+        @param size Number of bytes to read.
+        @param fill Callable taking address and size arguments that reads uncached memory.
+        @return Bytearray of the data.
+        """
+        end = addr + size
+        result = bytearray(size)
+        uncached: List[List[int]] = []
+        hits = 0
+
+        def add_uncached(begin: int, end: int) -> None:
+            if uncached and uncached[-1][1] == begin:
+                uncached[-1][1] = end
+            else:
+                uncached.append([begin, end])
+
+        page_mask = ~(self.PAGE_SIZE - 1)
+        for page_addr in range(addr & page_mask, end, self.PAGE_SIZE):
+            pos = max(addr, page_addr)
+            page_end = min(end, page_addr + self.PAGE_SIZE)
+            page = self._pages.get(page_addr)
+            if page is not None:
+                self._pages.move_to_end(page_addr)
+                for begin, data in page:
+                    range_end = begin + len(data)
+                    if range_end <= pos:
+                        continue
+                    if begin >= page_end:
+                        break
+                    if begin > pos:
+                        add_uncached(pos, begin)
+                        pos = begin
+                    copy_end = min(range_end, page_end)
+                    result[pos - addr:copy_end - addr] = data[pos - begin:copy_end - begin]
+                    hits += copy_end - pos
+                    pos = copy_end
+            if pos < page_end:
+                add_uncached(pos, page_end)
+
+        self.metrics.reads += 1
+        self.metrics.hits += hits
+        self.metrics.misses += size - hits
+
+        # Read uncached ranges and add them to the cache.
+        for begin, range_end in uncached:
+            data = bytearray(fill(begin, range_end - begin))
+            result[begin - addr:range_end - addr] = data
+            self.update(begin, data)
+        return result
+
+    def update(self, addr: int, data: Sequence[int]) -> None:
+        """@brief Add data to the cache, replacing any data already cached for the range."""
+        page_mask = ~(self.PAGE_SIZE - 1)
+        end = addr + len(data)
+        pos = addr
+        while pos < end:
+            page_addr = pos & page_mask
+            chunk_end = min(end, page_addr + self.PAGE_SIZE)
+            self._update_page(page_addr, pos, data[pos - addr:chunk_end - addr])
+            pos = chunk_end
+        self._evict()
+
+    def _update_page(self, page_addr: int, addr: int, data: Sequence[int]) -> None:
+        """@brief Merge data into one page.
+
+        The new range is merged with all cached ranges that it overlaps or is adjacent to.
+        """
+        end = addr + len(data)
+        page = self._pages.get(page_addr)
+        if page is None:
+            page = self._pages[page_addr] = []
+        else:
+            self._pages.move_to_end(page_addr)
+
+        # Find the ranges that overlap or touch the new data.
+        first = 0
+        while first < len(page) and page[first][0] + len(page[first][1]) < addr:
+            first += 1
+        last = first
+        while last < len(page) and page[last][0] <= end:
+            last += 1
+
+        merged = bytearray(data)
+        begin = addr
+        if first < last:
+            first_begin, first_data = page[first]
+            if first_begin < addr:
+                merged[0:0] = first_data[:addr - first_begin]
+                begin = first_begin
+            last_begin, last_data = page[last - 1]
+            if last_begin + len(last_data) > end:
+                merged += last_data[end - last_begin:]
+            self.size -= sum(len(d) for _, d in page[first:last])
+        page[first:last] = [(begin, merged)]
+        self.size += len(merged)
+
+    def _evict(self) -> None:
+        """@brief Evict least recently used pages until the cache is within its size limit."""
+        while self.size > self._size_limit and self._pages:
+            _, page = self._pages.popitem(last=False)
+            self.size -= sum(len(d) for _, d in page)
+            self.metrics.evictions += 1
+
 class MemoryCache(object):
     """@brief Memory cache.
 
@@ -33,21 +184,58 @@ class MemoryCache(object):
     The cache is invalidated whenever the target has run since the last cache operation (based on run
     tokens). If the target is currently running, all accesses cause the cache to be invalidated.
 
+    Data from regions whose `invalidate_cache_on_run` attribute is false, by default those that are not
+    writable such as flash and ROM, is kept in a separate read-only tier. The target does not change
+    these regions by running, so this tier survives run token changes and is only cleared by
+    invalidate(). The owner of the cache must call invalidate() after flash is
+    programmed or erased.
+
     The target's memory map is referenced. All memory accesses must be fully contained within a single
     memory region, or a TransferFaultError will be raised. However, if an access is outside of all regions,
     the access is passed to the underlying context unmodified. When an access is within a region, that
     region's cacheability flag is honoured.
+
+    Each tier is a page based cache of merged ranges, limited in size with LRU eviction.
     """
 
-    def __init__(self, context, core):
+    ## Size in bytes of the pages used to organise cached data and for LRU eviction.
+    PAGE_SIZE = _PageCache.PAGE_SIZE
+
+    ## Default limit in bytes on the amount of cached data in each tier.
+    DEFAULT_SIZE_LIMIT = 1024 * 1024
+
+    def __init__(self, context, core, size_limit: Optional[int] = None):
+        """@brief Constructor.
+        @param self
+        @param context The backing DebugContext.
+        @param core The core whose memory is being cached.
+        @param size_limit Maximum number of bytes of data to cache in each of the volatile and
+            read-only tiers. If not provided, DEFAULT_SIZE_LIMIT is used.
+        """
         self._context = context
         self._core = core
+        size_limit = size_limit if (size_limit is not None) else self.DEFAULT_SIZE_LIMIT
+        self._cache = _PageCache(size_limit)
+        self._read_only_cache = _PageCache(size_limit)
         self._run_token = -1
-        self._reset_cache()
+
+    @property
+    def metrics(self) -> CacheMetrics:
+        """@brief Metrics for the volatile tier since it was last invalidated."""
+        return self._cache.metrics
+
+    @property
+    def read_only_metrics(self) -> CacheMetrics:
+        """@brief Metrics for the read-only tier since it was last invalidated."""
+        return self._read_only_cache.metrics
+
+    @property
+    def size(self) -> int:
+        """@brief Number of bytes of data currently cached in both tiers."""
+        return self._cache.size + self._read_only_cache.size
 
     def _reset_cache(self):
-        self._cache = IntervalTree()
-        self._metrics = CacheMetrics()
+        self._cache.clear()
 
     def _check_cache(self):
         """@brief Invalidates the cache if appropriate."""
@@ -60,169 +248,40 @@ class MemoryCache(object):
             self._reset_cache()
             self._run_token = self._core.run_token
 
-    def _get_ranges(self, addr, count):
-        """@brief Splits a memory address range into cached and uncached subranges.
-        @return Returns a 2-tuple with the first element being a set of Interval objects for each
-          of the cached subranges. The second element is a set of Interval objects for each of the
-          non-cached subranges.
-        """
-        cached = self._cache.overlap(addr, addr + count)
-        uncached = {Interval(addr, addr + count)}
-        for cachedIv in cached:
-            newUncachedSet = set()
-            for uncachedIv in uncached:
-
-                # No overlap.
-                if cachedIv.end < uncachedIv.begin or cachedIv.begin > uncachedIv.end:
-                    newUncachedSet.add(uncachedIv)
-                    continue
-
-                # Begin segment.
-                if cachedIv.begin - uncachedIv.begin > 0:
-                    newUncachedSet.add(Interval(uncachedIv.begin, cachedIv.begin))
-
-                # End segment.
-                if uncachedIv.end - cachedIv.end > 0:
-                    newUncachedSet.add(Interval(cachedIv.end, uncachedIv.end))
-            uncached = newUncachedSet
-        return cached, uncached
-
-    def _read_uncached(self, uncached):
-        """"@brief Reads uncached memory ranges and updates the cache.
-        @return A list of Interval objects is returned. Each Interval has its @a data attribute set
-          to a bytearray of the data read from target memory.
-        """
-        uncachedData = []
-        for uncachedIv in uncached:
-            data = self._context.read_memory_block8(uncachedIv.begin, uncachedIv.end - uncachedIv.begin)
-            iv = Interval(uncachedIv.begin, uncachedIv.end, bytearray(data))
-            self._cache.add(iv) # TODO merge contiguous cached intervals
-            uncachedData.append(iv)
-        return uncachedData
-
-    def _update_metrics(self, cached, uncached, addr, size):
-        cachedSize = 0
-        for iv in cached:
-            begin = iv.begin
-            end = iv.end
-            if iv.begin < addr:
-                begin = addr
-            if iv.end > addr + size:
-                end = addr + size
-            cachedSize += end - begin
-
-        uncachedSize = sum((iv.end - iv.begin) for iv in uncached)
-
-        self._metrics.reads += 1
-        self._metrics.hits += cachedSize
-        self._metrics.misses += uncachedSize
+    def _get_cached_ranges(self, addr: int, end: int) -> List[Tuple[int, int]]:
+        """@brief Returns the cached subranges of an address range from both tiers."""
+        return sorted(self._cache.get_cached_ranges(addr, end)
+                + self._read_only_cache.get_cached_ranges(addr, end))
 
     def _dump_metrics(self):
-        if self._metrics.total > 0:
-            LOG.debug("%d reads, %d bytes [%d%% hits, %d bytes]; %d bytes written",
-                self._metrics.reads, self._metrics.total, self._metrics.percent_hit,
-                self._metrics.hits, self._metrics.writes)
-        else:
-            LOG.debug("no reads")
-
-    def _read(self, addr, size):
-        """@brief Performs a cached read operation of an address range.
-        @return A list of Interval objects sorted by address.
-        """
-        # Get the cached and uncached subranges of the requested read.
-        cached, uncached = self._get_ranges(addr, size)
-        self._update_metrics(cached, uncached, addr, size)
-
-        # Read any uncached ranges.
-        uncachedData = self._read_uncached(uncached)
-
-        # Merged cached with data we just read
-        combined = list(cached) + uncachedData
-        combined.sort(key=lambda x: x.begin)
-        return combined
-
-    def _merge_data(self, combined, addr, size):
-        """@brief Extracts data from the intersection of an address range across a list of interval objects.
-
-        The range represented by @a addr and @a size are assumed to overlap the intervals. The first
-        and last interval in the list may have ragged edges not fully contained in the address range, in
-        which case the correct slice of those intervals is extracted.
-
-        @param self
-        @param combined List of Interval objects forming a contiguous range. The @a data attribute of
-          each interval must be a bytearray.
-        @param addr Start address. Must be within the range of the first interval.
-        @param size Number of bytes. (@a addr + @a size) must be within the range of the last interval.
-        @return A single bytearray object with all data from the intervals that intersects the address
-          range.
-        """
-        result = bytearray()
-        resultAppend = bytearray()
-
-        # Check for fully contained subrange.
-        if len(combined) and combined[0].begin < addr and combined[0].end > addr + size:
-            offset = addr - combined[0].begin
-            endOffset = offset + size
-            result = combined[0].data[offset:endOffset]
-            return result
-
-        # Take slice of leading ragged edge.
-        if len(combined) and combined[0].begin < addr:
-            offset = addr - combined[0].begin
-            result += combined[0].data[offset:]
-            combined = combined[1:]
-        # Take slice of trailing ragged edge.
-        if len(combined) and combined[-1].end > addr + size:
-            offset = addr + size - combined[-1].begin
-            resultAppend = combined[-1].data[:offset]
-            combined = combined[:-1]
-
-        # Merge.
-        for iv in combined:
-            result += iv.data
-        result += resultAppend
-
-        return result
+        for name, metrics in (("volatile", self.metrics), ("read-only", self.read_only_metrics)):
+            if metrics.total > 0:
+                LOG.debug("%s: %d reads, %d bytes [%d%% hits, %d bytes]; %d bytes written; %d pages evicted",
+                    name, metrics.reads, metrics.total, metrics.percent_hit,
+                    metrics.hits, metrics.writes, metrics.evictions)
+            else:
+                LOG.debug("%s: no reads", name)
 
-    def _update_contiguous(self, cached, addr, value):
-        size = len(value)
-        end = addr + size
-        leadBegin = addr
-        leadData = bytearray()
-        trailData = bytearray()
-        trailEnd = end
-
-        if cached[0].begin < addr and cached[0].end > addr:
-            offset = addr - cached[0].begin
-            leadData = cached[0].data[:offset]
-            leadBegin = cached[0].begin
-        if cached[-1].begin < end and cached[-1].end > end:
-            offset = end - cached[-1].begin
-            trailData = cached[-1].data[offset:]
-            trailEnd = cached[-1].end
-
-        self._cache.remove_overlap(addr, end)
-
-        data = leadData + value + trailData
-        self._cache.addi(leadBegin, trailEnd, data)
-
-    def _check_regions(self, addr, count):
-        """@return A bool indicating whether the given address range is fully contained within
-              one known memory region, and that region is cacheable.
+    def _check_regions(self, addr, count) -> Optional[_PageCache]:
+        """@return The cache tier for the given address range if it is fully contained within
+              one known memory region and that region is cacheable, otherwise None.
         @exception TransferFaultError Raised if the access is not entirely contained within a single region.
         """
         regions = self._core.memory_map.get_intersecting_regions(addr, length=count)
 
         # If no regions matched, then allow an uncached operation.
         if len(regions) == 0:
-            return False
+            return None
 
         # Raise if not fully contained within one region.
         if len(regions) > 1 or not regions[0].contains_range(addr, length=count):
             raise TransferFaultError("individual memory accesses must not cross memory region boundaries")
 
-        # Otherwise return whether the region is cacheable.
-        return regions[0].is_cacheable
+        # Otherwise return the tier if the region is cacheable.
+        region = regions[0]
+        if not region.is_cacheable:
+            return None
+        return self._cache if region.invalidate_cache_on_run else self._read_only_cache
 
     def read_memory(self, addr, transfer_size=32, now=True):
         # TODO use more optimal underlying read_memory calls
@@ -239,6 +298,32 @@ class MemoryCache(object):
                 return data
             return read_cb
 
+    def read_memory_scatter(self, requests):
+        self._check_cache()
+
+        # Return cached values directly and read the others from the target as one batch.
+        requests = list(requests)
+        results = [0] * len(requests)
+        misses = []
+        for i, (addr, transfer_size) in enumerate(requests):
+            count = transfer_size // 8
+            cache = self._check_regions(addr, count)
+            if (cache is not None) and (cache.get_cached_ranges(addr, addr + count) == [(addr, addr + count)]):
+                results[i] = int.from_bytes(cache.read(addr, count, self._context.read_memory_block8), 'little')
+            else:
+                misses.append((i, cache))
+
+        if misses:
+            values = self._context.read_memory_scatter([requests[i] for i, _ in misses])
+            for (i, cache), value in zip(misses, values):
+                results[i] = value
+                if cache is not None:
+                    addr, transfer_size = requests[i]
+                    cache.metrics.reads += 1
+                    cache.metrics.misses += transfer_size // 8
+                    cache.update(addr, value.to_bytes(transfer_size // 8, 'little'))
+        return results
+
     def read_memory_block8(self, addr, size):
         if size <= 0:
             return []
@@ -246,15 +331,13 @@ class MemoryCache(object):
         self._check_cache()
 
         # Validate memory regions.
-        if not self._check_regions(addr, size):
+        cache = self._check_regions(addr, size)
+        if cache is None:
             LOG.debug("range [%x:%x] is not cacheable", addr, addr+size)
             return self._context.read_memory_block8(addr, size)
 
-        # Get the cached and uncached subranges of the requested read.
-        combined = self._read(addr, size)
-
-        # Extract data out of combined intervals.
-        result = list(self._merge_data(combined, addr, size))
+        # Get the cached data and read uncached subranges.
+        result = list(cache.read(addr, size, self._context.read_memory_block8))
         assert len(result) == size, "result size ({}) != requested size ({})".format(len(result), size)
         return result
 
@@ -274,29 +357,14 @@ class MemoryCache(object):
         self._check_cache()
 
         # Validate memory regions.
-        cacheable = self._check_regions(addr, len(value))
+        cache = self._check_regions(addr, len(value))
 
         # Write to the target first, so if it fails we don't update the cache.
         result = self._context.write_memory_block8(addr, value)
 
-        if cacheable:
-            size = len(value)
-            end = addr + size
-            cached = sorted(self._cache.overlap(addr, end), key=lambda x:x.begin)
-            self._metrics.writes += size
-
-            if len(cached):
-                # Write data is entirely within a single cached interval.
-                if addr >= cached[0].begin and end <= cached[0].end:
-                    beginOffset = addr - cached[0].begin
-                    endOffset = beginOffset + size
-                    cached[0].data[beginOffset:endOffset] = value
-
-                else:
-                    self._update_contiguous(cached, addr, bytearray(value))
-            else:
-                # No cached data in this range, so just add the entire interval.
-                self._cache.addi(addr, end, bytearray(value))
+        if cache is not None:
+            cache.metrics.writes += len(value)
+            cache.update(addr, value)
 
         return result
 
@@ -304,5 +372,8 @@ class MemoryCache(object):
         return self.write_memory_block8(addr, conversion.u32le_list_to_byte_list(data))
 
     def invalidate(self):
-        self._reset_cache()
+        """@brief Invalidate both the volatile and read-only tiers."""
+        self._dump_metrics()
+        self._cache.clear()
+        self._read_only_cache.clear()
 
@@ -21,6 +21,7 @@ class CacheMetrics(object):
         self.misses = 0
         self.reads = 0
         self.writes = 0
+        self.evictions = 0
 
     @property
     def total(self):
@@ -33,8 +33,15 @@ class RegisterCache(object):
     invalidate all five.
 
     Same logic applies for XPSR submasks.
+
+    If snapshots are enabled, the first read after the core halts (or after the cache is invalidated)
+    also reads all general, system, and floating point registers in the same batch. Debuggers such as
+    gdb read most of these registers at every halt anyway, so reading them together saves round trips.
     """
 
+    ## Register groups read in a snapshot.
+    SNAPSHOT_GROUPS = ('general', 'system', 'float')
+
     CFBP_INDEX = index_for_reg('cfbp')
     XPSR_INDEX = index_for_reg('xpsr')
 
@@ -56,9 +63,17 @@ class RegisterCache(object):
                     'iepsr',
                     ]]
 
-    def __init__(self, context, core):
+    def __init__(self, context, core, snapshot=False):
+        """@brief Constructor.
+        @param self
+        @param context The backing DebugContext.
+        @param core The core whose registers are being cached.
+        @param snapshot Whether to read a snapshot of all registers on the first read after a halt.
+        """
         self._context = context
         self._core = core
+        self._snapshot = snapshot
+        self._snapshot_list = None
         self._run_token = -1
         self._reset_cache()
 
@@ -85,6 +100,20 @@ class RegisterCache(object):
             self._run_token = self._core.run_token
         return False
 
+    def _get_snapshot_list(self):
+        """@brief Returns the indices of the registers read in a snapshot.
+
+        Subregisters and double precision registers are excluded, since they are read through the
+        registers that contain them.
+        """
+        if self._snapshot_list is None:
+            self._snapshot_list = [info.index for info in self._core.core_registers.iter_matching(
+                    lambda info: (info.group in self.SNAPSHOT_GROUPS
+                            and not info.is_double_float_register
+                            and not info.is_cfbp_subregister
+                            and not info.is_psr_subregister))]
+        return self._snapshot_list
+
     def _convert_and_check_registers(self, reg_list):
         # convert to index only
         reg_list = [index_for_reg(reg) for reg in reg_list]
@@ -105,6 +134,10 @@ class RegisterCache(object):
 
         # Read uncached registers from the target.
         read_list = list(reg_set.difference(cached_set))
+
+        # Add the snapshot registers to the first read after a halt.
+        if self._snapshot and not self._cache:
+            read_list += [r for r in self._get_snapshot_list() if r not in reg_set]
         reading_cfbp = any(r for r in read_list if r in self.CFBP_REGS)
         reading_xpsr = any(r for r in read_list if r in self.XPSR_REGS)
         if reading_cfbp:
@@ -146,18 +179,11 @@ class RegisterCache(object):
                     continue
                 self._cache[r] = v & CortexMCoreRegisterInfo.get(r).psr_mask
 
-        # Build the results list in the same order as requested registers.
-        results = []
-        for r in reg_list:
-            if r in cached_set:
-                results.append(self._cache[r])
-            else:
-                i = read_list.index(r)
-                v = values[i]
-                results.append(v)
-                self._cache[r] = v
-
-        return results
+        # Update the cache with all read values, then build the results list in the same order as
+        # requested registers.
+        for r, v in zip(read_list, values):
+            self._cache.setdefault(r, v)
+        return [self._cache[r] for r in reg_list]
 
     # TODO only write dirty registers to target right before running.
     def write_core_registers_raw(self, reg_list, data_list):
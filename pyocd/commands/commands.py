@@ -33,6 +33,8 @@ from ..core.helpers import ConnectHelper
 from ..core import exceptions
 from ..probe.tcp_probe_server import DebugProbeServer
 from ..core.target import Target
+from ..debug.cache import CachingDebugContext
+from ..debug.context import DebugContext
 from ..flash.loader import FlashLoader
 from ..flash.eraser import FlashEraser
 from ..flash.file_programmer import FileProgrammer
@@ -155,10 +157,11 @@ class RegisterCommandBase(CommandBase):
             self.context.writei("%s registers:", group)
             self.dump_register_group(group)
 
-    def _dump_peripheral_register(self, periph, reg, show_fields):
+    def _dump_peripheral_register(self, periph, reg, show_fields, value=None):
         size = reg.size or 32
         addr = periph.base_address + reg.address_offset
-        value = self.context.selected_ap.read_memory(addr, size)
+        if value is None:
+            value = self.context.selected_ap.read_memory(addr, size)
         value_str = format_hex_width(value, size)
         self.context.writei("%s.%s @ %08x = %s", periph.name, reg.name, addr, value_str)
 
@@ -270,8 +273,11 @@ class RegCommand(RegisterCommandBase):
                     else:
                         raise exceptions.CommandError("invalid register '%s' for %s" % (subargs[1], p.name))
                 else:
-                    for r in p.registers:
-                        self._dump_peripheral_register(p, r, self.show_fields)
+                    # Read all the registers before printing any.
+                    values = self.context.selected_ap.read_memory_scatter(
+                            (p.base_address + r.address_offset, r.size or 32) for r in p.registers)
+                    for r, value in zip(p.registers, values):
+                        self._dump_peripheral_register(p, r, self.show_fields, value)
             else:
                 raise exceptions.CommandError("invalid peripheral '%s'" % (subargs[0]))
 
@@ -674,7 +680,7 @@ class LoadCommand(CommandBase):
             'category': 'memory',
             'nargs': [1, 2],
             'usage': "FILENAME [ADDR]",
-            'help': "Load a binary, hex, or elf file with optional base address.",
+            'help': "Load a binary, hex, S-record, or elf file with optional base address.",
             }
 
     def parse(self, args):
@@ -842,6 +848,28 @@ class FillCommand(CommandBase):
             self.context.selected_ap.write_memory_block8(addr, data)
             addr += chunk_size
 
+class FlushCacheCommand(CommandBase):
+    INFO = {
+            'names': ['flushcache'],
+            'group': 'standard',
+            'category': 'memory',
+            'nargs': 0,
+            'usage': "",
+            'help': "Invalidate cached memory and register contents.",
+            'extra_help': "Both the volatile and the read-only tiers of the memory cache are "
+                          "invalidated for all cores. Cached flash and ROM contents are otherwise only "
+                          "invalidated when flash is programmed or erased.",
+            }
+
+    def execute(self):
+        for core in self.context.target.cores.values():
+            # Walk up the context chain. The topmost parent is the core itself.
+            context = core.get_target_context()
+            while isinstance(context, DebugContext):
+                if isinstance(context, CachingDebugContext):
+                    context.invalidate()
+                context = context.parent
+
 class FindCommand(CommandBase):
     INFO = {
             'names': ['find'],
@@ -1302,6 +1330,7 @@ class ReadApCommand(CommandBase):
 
     def execute(self):
         result = self.context.target.dp.read_ap(self.addr)
+        self.context.target.dp.invalidate_ap_caches()
         self.context.writei("AP register 0x%x = 0x%08x", self.addr, result)
 
 class WriteApCommand(CommandBase):
@@ -1325,6 +1354,7 @@ class WriteApCommand(CommandBase):
 
     def execute(self):
         self.context.target.dp.write_ap(self.addr, self.data)
+        self.context.target.dp.invalidate_ap_caches()
         self.context.target.flush()
 
 class InitDpCommand(CommandBase):
@@ -263,14 +263,11 @@ class FaultValue(ValueBase):
             self.context.write("No core is selected")
             return
 
-        cfsr = self.context.selected_core.read32(CFSR)
+        cfsr, hfsr, dfsr, mmfar, bfar = self.context.selected_core.read_memory_scatter(
+                (addr, 32) for addr in (CFSR, HFSR, DFSR, MMFAR, BFAR))
         mmfsr = cfsr & 0xff
         bfsr = (cfsr >> 8) & 0xff
         ufsr = (cfsr >> 16) & 0xffff
-        hfsr = self.context.selected_core.read32(HFSR)
-        dfsr = self.context.selected_core.read32(DFSR)
-        mmfar = self.context.selected_core.read32(MMFAR)
-        bfar = self.context.selected_core.read32(BFAR)
 
         print_fields('MMFSR', mmfsr, MMFSR_fields, showAll)
         if showAll or mmfsr & (1 << 7): # MMFARVALID
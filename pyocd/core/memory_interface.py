@@ -15,7 +15,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import (Callable, Sequence, Union, cast, overload)
+from typing import (Callable, Iterable, List, Sequence, Tuple, Union, cast, overload)
 from typing_extensions import Literal
 
 from ..utility import conversion
@@ -51,6 +51,44 @@ class MemoryInterface:
         By default, a word will be read."""
         raise NotImplementedError()
 
+    def read_memory_scatter(self, requests: Iterable[Tuple[int, int]]) -> List[int]:
+        """@brief Read a list of independent memory locations.
+
+        All reads are queued with read_memory() before waiting for any result, so they are performed
+        in as few probe round trips as possible instead of one round trip per read. Use this when
+        the addresses of the reads don't depend on each other's results.
+
+        @param self
+        @param requests Iterable of (address, transfer size in bits) tuples.
+        @return List of the values read, in the same order as _requests_.
+        @exception TransferError Raised for the first read that failed, after all reads complete.
+        """
+        result_cbs = []
+        try:
+            for addr, transfer_size in requests:
+                result_cbs.append(self.read_memory(addr, transfer_size, now=False))
+        except Exception:
+            # Complete the reads already queued so they release the resources they hold.
+            for result_cb in result_cbs:
+                try:
+                    result_cb()
+                except Exception:
+                    pass
+            raise
+
+        results = []
+        error = None
+        for result_cb in result_cbs:
+            try:
+                results.append(result_cb())
+            except Exception as err:
+                # Report the first error, but keep completing the remaining reads.
+                if error is None:
+                    error = err
+        if error is not None:
+            raise error
+        return results
+
     def write_memory_block32(self, addr: int, data: Sequence[int]) -> None:
         """@brief Write an aligned block of 32-bit words."""
         raise NotImplementedError()
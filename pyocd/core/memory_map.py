@@ -218,8 +218,9 @@ class MemoryRegion(MemoryRangeBase):
     - `is_cacheable`: Determines whether data should be cached from this region. True for most
         memory types, except DEVICE.
     - `invalidate_cache_on_run`: Whether to invalidate any cached data from the region whenever the
-        target resumes execution or steps. Usually true, though this can be false for regions such
-        as memory-mapped OTP or configuration flash.
+        target resumes execution or steps. Defaults to true for writable regions and false for
+        regions that are not writable, such as flash and ROM. Set it to true for flash that the
+        target firmware itself modifies.
     - `is_testable`: Whether pyOCD should consider the region in its functional tests.
     - `is_external`: If true, the region is backed by an external memory device such as SDRAM or QSPI.
     - `has_subregions`: True if the region has nested subregions, accessible through the `.map` property.
@@ -250,7 +251,7 @@ class MemoryRegion(MemoryRangeBase):
         'is_default': True,
         'is_powered_on_boot': True,
         'is_cacheable': True,
-        'invalidate_cache_on_run': True,
+        'invalidate_cache_on_run': lambda r: r.is_writable,
         'is_testable': True,
         'is_external': False,
         'is_ram': lambda r: r.type is MemoryType.RAM,
@@ -557,11 +558,13 @@ class FlashRegion(MemoryRegion):
     def is_data_erased(self, d: Iterable[int]) -> bool:
         """@brief Helper method to check if a block of data is erased.
         @param self
-        @param d List of data or bytearray.
+        @param d List of data, or a bytes-like object.
         @retval True The contents of d all match the erased byte value for this flash region.
         @retval False At least one byte in d did not match the erased byte value.
         """
         erased_byte = self.erased_byte_value
+        if isinstance(d, (bytes, bytearray, memoryview)):
+            return d == bytes((erased_byte,)) * len(d)
         for b in d:
             if b != erased_byte:
                 return False
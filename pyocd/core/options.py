@@ -39,9 +39,15 @@ BUILTIN_OPTIONS = [
         "Enable the memory read cache. Default is enabled."),
     OptionInfo('cache.enable_register', bool, True,
         "Enable the core register cache. Default is enabled."),
+    OptionInfo('cache.memory_size_limit', int, 1024 * 1024,
+        "Maximum number of bytes of target memory held in each tier of the memory read cache. The least recently used "
+        "data is evicted once the limit is reached. Default is 1 MB."),
     OptionInfo('cache.read_code_from_elf', bool, True,
         "Controls whether reads of code sections will be taken from an attached ELF file instead of the "
         "target memory."),
+    OptionInfo('cache.register_snapshot', bool, False,
+        "Read all general, system, and floating point core registers in one batch on the first register "
+        "read after the core halts. Default is disabled."),
     OptionInfo('chip_erase', str, "sector",
         "Whether to perform a chip erase or sector erases when programming flash. The value must be"
         " one of \"auto\", \"sector\", or \"chip\"."),
@@ -62,6 +68,11 @@ BUILTIN_OPTIONS = [
         "Send SWJ transition sequence to switch between SWD and JTAG."),
     OptionInfo('dap_swj_use_dormant', bool, False,
         "When switching between SWD and JTAG, use the SWJ sequence from ADIv5.2 that utilizes a new dormant state."),
+    OptionInfo('debug.halt_poll_interval.max', float, 0.05,
+        "Longest interval in seconds between checks of whether a running core has halted. The interval "
+        "grows from debug.halt_poll_interval.min to this value while the core keeps running."),
+    OptionInfo('debug.halt_poll_interval.min', float, 0.001,
+        "Interval in seconds between checks of whether a core has halted, immediately after it is resumed."),
     OptionInfo('debug.log_flm_info', bool, False,
         "Log details of loaded .FLM flash algos."),
     OptionInfo('debug.traceback', bool, False,
@@ -72,6 +83,12 @@ BUILTIN_OPTIONS = [
     OptionInfo('fast_program', bool, False,
         "Setting this option to True will use CRC checks of existing flash sector contents to "
         "determine whether pages need to be programmed."),
+    OptionInfo('flash.fingerprint_file', str, None,
+        "Path to a file recording the CRC of each flash page last programmed into each board, keyed by "
+        "probe unique ID, target type, and flash region. If set, and the CRC of the whole flash region "
+        "computed on the target matches the recorded value, pages are programmed or skipped according to "
+        "the recorded CRCs instead of being analyzed. Requires the flash algorithm to support the CRC "
+        "analyzer."),
     OptionInfo('flash.timeout.init', float, 5.0,
         "Flash algorithm init and uninit timeout in seconds."),
     OptionInfo('flash.timeout.analyzer', float, 30.0,
@@ -108,6 +125,9 @@ BUILTIN_OPTIONS = [
     OptionInfo('primary_core', int, 0,
         "Core number for the primary/boot core of an asymmetric multicore target. This is the core that "
         "will control system reset when 'enable_multicore' is set."),
+    OptionInfo('probeserver.hotplug_interval', float, 5.0,
+        "Seconds between scans for connected and disconnected probes when the debug probe server "
+        "serves all probes. Set to 0 to disable hot-plug detection."),
     OptionInfo('probeserver.port', int, 5555,
         "TCP port for the debug probe server."),
     OptionInfo('project_dir', str, None,
@@ -160,6 +180,9 @@ BUILTIN_OPTIONS = [
         "Duration in seconds that a failed target status check will be retried before an error is raised. "
         "Only applies while the target is running after a resume operation in the debugger and pyOCD is waiting "
         "for it to halt again."),
+    OptionInfo('gdbserver_packet_size', int, None,
+        "Maximum RSP packet size advertised to gdb. If not set, the size is chosen from the measured debug "
+        "probe latency and throughput, between 2 kB and 64 kB."),
     OptionInfo('gdbserver_port', int, 3333,
         "Base TCP port for the gdbserver."),
     OptionInfo('persist', bool, False,
@@ -180,6 +203,13 @@ BUILTIN_OPTIONS = [
         "Program command line string, used for the SYS_GET_CMDLINE semihosting request."),
     OptionInfo('step_into_interrupt', bool, False,
         "Enable interrupts when performing step operations."),
+    OptionInfo('swv_buffer_size', int, 1024 * 1024,
+        "Size in bytes of the ring buffer between the SWO reader and parser threads. Default is 1 MiB."),
+    OptionInfo('swv_capture_compress', bool, False,
+        "Whether to compress the SWO capture file set with the swv_capture_file option."),
+    OptionInfo('swv_capture_file', str, None,
+        "Path of a binary file to which raw SWO data and decoded trace events are recorded while "
+        "SWV is enabled. Captures can be decoded later with the 'pyocd swv-replay' subcommand."),
     OptionInfo('swv_clock', int, 1000000,
         "Frequency in Hertz of the SWO baud rate. Default is 1 MHz."),
     OptionInfo('swv_system_clock', int, None,
@@ -40,6 +40,7 @@ if TYPE_CHECKING:
     from ..probe.debug_probe import DebugProbe
     from ..probe.tcp_probe_server import DebugProbeServer
     from ..gdbserver.gdbserver import GDBServer
+    from ..debug.state_monitor import TargetStateMonitor
     from ..board.board import Board
 
 # Check whether the eval_str parameter for inspect.signature is available.
@@ -174,6 +175,7 @@ class Session(Notifier):
         self._options = OptionsManager()
         self._gdbservers: Dict[int, GDBServer] = {}
         self._probeserver: Optional[DebugProbeServer] = None
+        self._state_monitor: Optional[TargetStateMonitor] = None
         self._context_state = SimpleNamespace()
 
         # Set this session on the probe, if we were given a probe.
@@ -394,6 +396,17 @@ class Session(Notifier):
         """@brief Setter for the `probeserver` property."""
         self._probeserver = server
 
+    @property
+    def state_monitor(self) -> TargetStateMonitor:
+        """@brief The monitor that detects when running cores halt.
+
+        The monitor is created on first use and stopped when the session is closed.
+        """
+        if self._state_monitor is None:
+            from ..debug.state_monitor import TargetStateMonitor
+            self._state_monitor = TargetStateMonitor(self)
+        return self._state_monitor
+
     @property
     def log_tracebacks(self) -> bool:
         """@brief Quick access to debug.traceback option since it is widely used."""
@@ -566,6 +579,9 @@ class Session(Notifier):
         assert (self._probe is not None) and (self._board is not None)
 
         LOG.debug("uninit session %s", self)
+        if self._state_monitor is not None:
+            self._state_monitor.stop()
+            self._state_monitor = None
         if self._inited:
             try:
                 self._board.uninit()
@@ -147,7 +147,8 @@ class Target(MemoryInterface, DelegateHavingMixIn):
         PRE_HALT = 5
         ## Sent after the target halts.
         #
-        # Associated data is a HaltReason enum.
+        # Sent for a halt requested by the debugger, and by the session's target state monitor when
+        # it sees a watched core halt on its own. Associated data is a HaltReason enum.
         POST_HALT = 6
         ## Sent before executing a reset operation.
         PRE_RESET = 7
@@ -19,9 +19,11 @@ from __future__ import annotations
 
 import logging
 from contextlib import contextmanager
+from dataclasses import (dataclass, replace)
 from functools import total_ordering
 from enum import Enum
-from typing import (Any, Callable, Dict, Generator, Optional, TYPE_CHECKING, Sequence, Set, Tuple, Type, Union, overload)
+from typing import (Any, Callable, Dict, Generator, Iterable, List, Optional, TYPE_CHECKING, Sequence, Set, Tuple, Type,
+        Union, overload)
 from typing_extensions import Literal
 
 from ..core import (exceptions, memory_interface)
@@ -93,6 +95,7 @@ MEM_APv2_CONTROL_REG_OFFSET = 0xD00
 MEM_AP_CSW = 0x00
 MEM_AP_TAR = 0x04
 MEM_AP_DRW = 0x0C
+MEM_AP_BD0 = 0x10
 MEM_AP_TRR = 0x24 # Only APv2 with ERRv1
 MEM_AP_BASE_HI = 0xF0
 MEM_AP_CFG = 0xF4
@@ -518,6 +521,18 @@ class AccessPort:
         return "<{}@{:x} {} idr={:08x} rom={:08x}>".format(
             self.__class__.__name__, id(self), self.short_description, self.idr, self.rom_addr)
 
+@dataclass
+class MemAPStatistics:
+    """@brief Counters of the MEM-AP register writes performed and avoided by register shadowing."""
+    ## Number of CSW writes sent to the probe.
+    csw_writes: int = 0
+    ## Number of CSW writes skipped because CSW already held the value.
+    csw_writes_skipped: int = 0
+    ## Number of TAR writes sent to the probe.
+    tar_writes: int = 0
+    ## Number of TAR writes skipped because TAR already held, or had auto-incremented to, the address.
+    tar_writes_skipped: int = 0
+
 class MEM_AP(AccessPort, memory_interface.MemoryInterface):
     """@brief MEM-AP component.
 
@@ -580,6 +595,16 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         ## Cached current CSW value.
         self._cached_csw: int = -1
 
+        ## Shadow of the current TAR value, or -1 if unknown.
+        #
+        # Memory transfers advance the shadow the same way the AP auto-increments TAR, so sequential
+        # accesses don't need to write TAR again. It is invalidated when the auto-increment page
+        # boundary is reached, since the AP's behaviour past that point is implementation defined.
+        self._cached_tar: int = -1
+
+        ## Counters of CSW and TAR writes.
+        self._stats = MemAPStatistics()
+
         ## Supported transfer sizes.
         self._transfer_sizes: Set[int] = {32}
 
@@ -625,6 +650,21 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         """@brief Tuple of transfer sizes supported by this AP."""
         return self._transfer_sizes
 
+    @property
+    def supports_banked_access(self) -> bool:
+        """@brief Whether set_banked_base() and the banked data register accessors may be used.
+
+        This is False when memory is accessed through a probe's accelerated memory interface. Such
+        probes move TAR and CSW without this object's knowledge, and may not support raw AP
+        register accesses at all.
+        """
+        return self._accelerated_memory_interface is None
+
+    @property
+    def statistics(self) -> MemAPStatistics:
+        """@brief Snapshot of the counters of CSW and TAR writes performed and skipped."""
+        return replace(self._stats)
+
     @property
     def is_enabled(self) -> bool:
         """@brief Whether any memory transfers are allowed by this AP.
@@ -964,36 +1004,117 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         ap_regaddr = addr & APREG_MASK
         if ap_regaddr == self._reg_offset + MEM_AP_CSW and self._cached_csw != -1 and now:
             return self._cached_csw
+        # A DRW access auto-increments TAR. Memory transfers update the shadow themselves.
+        if ap_regaddr == self._reg_offset + MEM_AP_DRW:
+            self._cached_tar = -1
         return self.dp.read_ap(self.address.address + addr, now)
 
     @locked
     def write_reg(self, addr: int, data: int) -> None:
         ap_regaddr = addr & APREG_MASK
 
-        # Don't need to write CSW if it's not changing value.
+        # Don't need to write CSW or TAR if it's not changing value.
         if ap_regaddr == self._reg_offset + MEM_AP_CSW:
             if data == self._cached_csw:
-                if TRACE.isEnabledFor(logging.INFO):
-                    num = self.dp.next_access_number
-                    TRACE.debug("write_ap:%06d cached (ap=0x%x; addr=0x%08x) = 0x%08x",
-                        num, self.address.nominal_address, addr, data)
+                self._stats.csw_writes_skipped += 1
+                self._trace_cached_write(addr, data)
                 return
             self._cached_csw = data
+            self._stats.csw_writes += 1
+        elif ap_regaddr == self._reg_offset + MEM_AP_TAR:
+            if data == self._cached_tar:
+                self._stats.tar_writes_skipped += 1
+                self._trace_cached_write(addr, data)
+                return
+            self._cached_tar = data
+            self._stats.tar_writes += 1
+        elif ap_regaddr == self._reg_offset + MEM_AP_DRW:
+            self._cached_tar = -1
 
         try:
             self.dp.write_ap(self.address.address + addr, data)
         except exceptions.ProbeError:
-            # Invalidate cached CSW on exception.
-            if ap_regaddr == self._reg_offset + MEM_AP_CSW:
+            # Invalidate cached CSW and TAR on exception.
+            if ap_regaddr in (self._reg_offset + MEM_AP_CSW, self._reg_offset + MEM_AP_TAR):
                 self._invalidate_cache()
             raise
 
+    def _trace_cached_write(self, addr: int, data: int) -> None:
+        if TRACE.isEnabledFor(logging.INFO):
+            num = self.dp.next_access_number
+            TRACE.debug("write_ap:%06d cached (ap=0x%x; addr=0x%08x) = 0x%08x",
+                num, self.address.nominal_address, addr, data)
+
+    def _advance_tar(self, addr: int, size: int) -> None:
+        """@brief Update the TAR shadow after a memory transfer.
+
+        @param self
+        @param addr Address of the transfer.
+        @param size Number of bytes transferred through DRW, by which the AP auto-increments TAR.
+        """
+        next_addr = addr + size
+        page_mask = ~(self.auto_increment_page_size - 1)
+        if ((self._csw & CSW_ADDRINC) != CSW_SADDRINC) or ((addr & page_mask) != (next_addr & page_mask)):
+            self._cached_tar = -1
+        else:
+            self._cached_tar = next_addr
+
+    @locked
+    def set_banked_base(self, addr: int) -> None:
+        """@brief Set the address of the 16-byte block accessed through the banked data registers.
+
+        The TAR is written with _addr_ and the transfer size set to 32 bits. Afterwards,
+        read_banked() and write_banked() access the four words of the block without further TAR
+        writes. Any other memory access through this AP changes TAR, so the caller must hold the AP
+        lock across this call and the banked accesses.
+
+        @param self
+        @param addr 16-byte aligned address.
+        """
+        assert (addr & 0xf) == 0
+        self.write_reg(self._reg_offset + MEM_AP_CSW, self._csw | CSW_SIZE32)
+        self.write_reg(self._reg_offset + MEM_AP_TAR, addr & self._address_mask)
+
+    @overload
+    def read_banked(self, offset: int) -> int:
+        ...
+
+    @overload
+    def read_banked(self, offset: int, now: Literal[True] = True) -> int:
+        ...
+
+    @overload
+    def read_banked(self, offset: int, now: Literal[False]) -> Callable[[], int]:
+        ...
+
+    @overload
+    def read_banked(self, offset: int, now: bool) -> Union[int, Callable[[], int]]:
+        ...
+
+    @locked
+    def read_banked(self, offset: int, now: bool = True) -> Union[int, Callable[[], int]]:
+        """@brief Read a word of the block selected with set_banked_base().
+        @param self
+        @param offset Byte offset of the word within the block, one of 0, 4, 8, or 12.
+        """
+        return self.read_reg(self._reg_offset + MEM_AP_BD0 + offset, now)
+
+    @locked
+    def write_banked(self, offset: int, data: int) -> None:
+        """@brief Write a word of the block selected with set_banked_base().
+        @param self
+        @param offset Byte offset of the word within the block, one of 0, 4, 8, or 12.
+        @param data 32-bit value to write.
+        """
+        self.write_reg(self._reg_offset + MEM_AP_BD0 + offset, data)
+
     def _invalidate_cache(self) -> None:
         """@brief Invalidate cached registers associated with this AP."""
         self._cached_csw = -1
+        self._cached_tar = -1
 
     def _reset_did_occur(self, notification: Notification) -> None:
-        """@brief Handles reset notifications to invalidate CSW cache."""
+        """@brief Handles reset notifications to invalidate CSW and TAR caches."""
         # We clear the cache on all resets just to be safe.
         self._invalidate_cache()
 
@@ -1025,11 +1146,14 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
                     data = data << ((addr & 0x02) << 3)
 
                 self.write_reg(self._reg_offset + MEM_AP_DRW, data)
+                self._advance_tar(addr, transfer_size // 8)
             else:
                 # Split the value into a tuple of 32-bit words, least-significant first.
                 data_words = list(((data >> (32 * i)) & 0xffffffff) for i in range(transfer_size // 32))
 
-                # Multi-word transfer.
+                # Multi-word transfer. TAR is only incremented after the final word, so don't
+                # model it.
+                self._cached_tar = -1
                 self.dp.write_ap_multiple(self.address.address + self._reg_offset + MEM_AP_DRW, data_words)
         except exceptions.TransferFaultError as error:
             # Annotate error with target address.
@@ -1080,8 +1204,11 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
 
             if transfer_size <= 32:
                 result_cb = self.read_reg(self._reg_offset + MEM_AP_DRW, now=False)
+                self._advance_tar(addr, transfer_size // 8)
             else:
-                # Multi-word transfer.
+                # Multi-word transfer. TAR is only incremented after the final word, so don't
+                # model it.
+                self._cached_tar = -1
                 result_cb_mw = self.dp.read_ap_multiple(self.address.address + self._reg_offset + MEM_AP_DRW,
                         transfer_size // 32, now=False)
         except exceptions.TransferFaultError as error:
@@ -1124,6 +1251,15 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         else:
             return read_mem_cb
 
+    @locked
+    def read_memory_scatter(self, requests: Iterable[Tuple[int, int]]) -> List[int]:
+        """@brief Read a list of independent memory locations.
+
+        The AP lock is held while the reads are queued, so the batch isn't interleaved with accesses
+        from other threads, and reads of consecutive addresses skip their TAR writes.
+        """
+        return super().read_memory_scatter(requests)
+
     def _write_block32_page(self, addr: int, data: Sequence[int]) -> None:
         """@brief Write a single transaction's worth of aligned words.
 
@@ -1135,11 +1271,12 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         num = self.dp.next_access_number
         TRACE.debug("_write_block32:%06d (ap=0x%x; addr=0x%08x, size=%d) {",
             num, self.address.nominal_address, addr, len(data))
-        # put address in TAR
+        # Put address in TAR. The write is skipped if the previous transfer left TAR at this address.
         self.write_reg(self._reg_offset + MEM_AP_CSW, self._csw | CSW_SIZE32)
         self.write_reg(self._reg_offset + MEM_AP_TAR, addr)
         try:
             self.dp.write_ap_multiple(self.address.address + self._reg_offset + MEM_AP_DRW, data)
+            self._advance_tar(addr, len(data) * 4)
         except exceptions.TransferFaultError as error:
             # Annotate error with target address.
             self._handle_error(error, num)
@@ -1151,33 +1288,52 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
             raise
         TRACE.debug("_write_block32:%06d }", num)
 
-    def _read_block32_page(self, addr: int, size: int) -> Sequence[int]:
+    def _read_block32_page(self, addr: int, size: int) -> Callable[[], Sequence[int]]:
         """@brief Read a single transaction's worth of aligned words.
 
         The transaction must not cross the MEM-AP's auto-increment boundary.
 
+        The read is only queued, so the reads for following pages can be queued before waiting
+        for this one to complete.
+
         This method is not locked because it is only called by _read_memory_block32(), which is locked.
+
+        @return Callable that returns the words read. It must always be called, as it also releases
+            resources held by the queued read.
         """
         assert (addr & 0x3) == 0
         num = self.dp.next_access_number
         TRACE.debug("_read_block32:%06d (ap=0x%x; addr=0x%08x, size=%d) {",
             num, self.address.nominal_address, addr, size)
-        # put address in TAR
+
+        def handle_error(error: Exception) -> None:
+            self._handle_error(error, num)
+            if isinstance(error, exceptions.TransferFaultError):
+                # Annotate error with target address.
+                error.fault_address = addr
+                error.fault_length = size * 4
+
+        # Put address in TAR. The write is skipped if the previous transfer left TAR at this address.
         self.write_reg(self._reg_offset + MEM_AP_CSW, self._csw | CSW_SIZE32)
         self.write_reg(self._reg_offset + MEM_AP_TAR, addr)
         try:
-            resp = self.dp.read_ap_multiple(self.address.address + self._reg_offset + MEM_AP_DRW, size)
-        except exceptions.TransferFaultError as error:
-            # Annotate error with target address.
-            self._handle_error(error, num)
-            error.fault_address = addr
-            error.fault_length = size * 4
-            raise
+            result_cb = self.dp.read_ap_multiple(self.address.address + self._reg_offset + MEM_AP_DRW, size,
+                    now=False)
+            self._advance_tar(addr, size * 4)
         except exceptions.Error as error:
-            self._handle_error(error, num)
+            handle_error(error)
             raise
-        TRACE.debug("_read_block32:%06d }", num)
-        return resp
+
+        def read_block32_page_cb() -> Sequence[int]:
+            try:
+                resp = result_cb()
+            except exceptions.Error as error:
+                handle_error(error)
+                raise
+            TRACE.debug("_read_block32:%06d }", num)
+            return resp
+
+        return read_block32_page_cb
 
     @locked
     def _write_memory_block32(self, addr: int, data: Sequence[int]) -> None:
@@ -1203,16 +1359,43 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         """
         assert (addr & 0x3) == 0
         addr &= self._address_mask
+
+        # Queue reads for all pages before waiting for any results, so the probe isn't left idle
+        # at page boundaries.
+        page_cbs = []
+        try:
+            while size > 0:
+                n = self.auto_increment_page_size - (addr & (self.auto_increment_page_size - 1))
+                if size*4 < n:
+                    n = (size*4) & 0xfffffffc
+                page_cbs.append(self._read_block32_page(addr, n//4))
+                size -= n//4
+                addr += n
+        except exceptions.Error:
+            # Complete the reads already queued so they release the resources they hold.
+            for page_cb in page_cbs:
+                try:
+                    page_cb()
+                except exceptions.Error:
+                    pass
+            raise
+
         resp = []
-        while size > 0:
-            n = self.auto_increment_page_size - (addr & (self.auto_increment_page_size - 1))
-            if size*4 < n:
-                n = (size*4) & 0xfffffffc
-            resp += self._read_block32_page(addr, n//4)
-            size -= n//4
-            addr += n
+        error = None
+        for page_cb in page_cbs:
+            try:
+                resp += page_cb()
+            except exceptions.Error as err:
+                # Report the first error, but keep completing the remaining pages.
+                if error is None:
+                    error = err
+        if error is not None:
+            raise error
         return resp
 
+    # The accelerated memory interface moves TAR and CSW behind our back, so each of the methods
+    # below invalidates the shadows of those registers.
+    #
     # Note: the "type: ignore"s below are ok because the accelerated memory interface accepts
     # attribute keyword args. The MemoryInterface class should be extended to accept attribute args
     # too, but that changes a lot of places. So for now just ignore the type error. This will be
@@ -1224,6 +1407,7 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         The current CSW value is passed to the accelerted interface, primarily for STLink.
         """
         assert self._accelerated_memory_interface is not None
+        self._invalidate_cache()
         self._accelerated_memory_interface.write_memory(addr, data, transfer_size,
                 csw=self._csw) # type: ignore
 
@@ -1235,6 +1419,7 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         The current CSW value is passed to the accelerted interface, primarily for STLink.
         """
         assert self._accelerated_memory_interface is not None
+        self._invalidate_cache()
         return self._accelerated_memory_interface.read_memory(addr, transfer_size, now,
                 csw=self._csw) # type: ignore
 
@@ -1245,6 +1430,7 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         The current CSW value is passed to the accelerted interface, primarily for STLink.
         """
         assert self._accelerated_memory_interface is not None
+        self._invalidate_cache()
         self._accelerated_memory_interface.write_memory_block32(addr, data,
                 csw=self._csw) # type: ignore
 
@@ -1255,6 +1441,7 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         The current CSW value is passed to the accelerted interface, primarily for STLink.
         """
         assert self._accelerated_memory_interface is not None
+        self._invalidate_cache()
         return self._accelerated_memory_interface.read_memory_block32(addr, size,
                 csw=self._csw) # type: ignore
 
@@ -1265,6 +1452,7 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         The current CSW value is passed to the accelerted interface, primarily for STLink.
         """
         assert self._accelerated_memory_interface is not None
+        self._invalidate_cache()
         self._accelerated_memory_interface.write_memory_block8(addr, data,
                 csw=self._csw) # type: ignore
 
@@ -1275,6 +1463,7 @@ class MEM_AP(AccessPort, memory_interface.MemoryInterface):
         The current CSW value is passed to the accelerted interface, primarily for STLink.
         """
         assert self._accelerated_memory_interface is not None
+        self._invalidate_cache()
         return self._accelerated_memory_interface.read_memory_block8(addr, size,
                 csw=self._csw) # type: ignore
 
@@ -34,6 +34,7 @@ from .core_ids import (CORE_TYPE_NAME, CoreArchitecture, CortexMExtension)
 from .cortex_m_core_registers import (
     CortexMCoreRegisterInfo,
     CoreRegisterGroups,
+    index_for_reg,
     )
 from ..debug.breakpoints.manager import BreakpointManager
 from ..debug.breakpoints.software import SoftwareBreakpointProvider
@@ -141,6 +142,16 @@ class CortexM(CoreTarget, CoreSightCoreComponent): # lgtm[py/multiple-calls-to-i
     # Debug Core Register Data Register
     DCRDR = 0xE000EDF8
 
+    # Offsets of the core debug registers within the 16-byte block starting at DHCSR, for access
+    # through the MEM-AP banked data registers.
+    _BD_DHCSR = DHCSR - DHCSR
+    _BD_DCRSR = DCRSR - DHCSR
+    _BD_DCRDR = DCRDR - DHCSR
+
+    # DCRSR selectors of the registers combining the CFBP and XPSR subregisters.
+    _CFBP_SELECTOR = index_for_reg('cfbp')
+    _XPSR_SELECTOR = index_for_reg('xpsr')
+
     # Coprocessor Access Control Register
     CPACR = 0xE000ED88
     CPACR_CP10_CP11_MASK = (3 << 20) | (3 << 22)
@@ -1280,41 +1291,45 @@ class CortexM(CoreTarget, CoreSightCoreComponent): # lgtm[py/multiple-calls-to-i
                 singleRegList += (-reg, -reg + 1)
             singleValues = self._base_read_core_registers_raw(singleRegList)
 
-        # Begin all reads and writes
+        # Look up register info once, and map subregisters to the DCRSR selector that holds them.
+        info_list = [CortexMCoreRegisterInfo.get(reg) for reg in reg_list]
+        selector_list = [self._dcrsr_selector(info) for info in info_list]
+
+        # Begin all reads and writes. If possible, TAR is pointed at DHCSR once, then DHCSR, DCRSR,
+        # and DCRDR are accessed through the MEM-AP banked data registers with a single transfer each.
         dhcsr_cb_list = []
         reg_cb_list = []
-        for reg in reg_list:
-            if CortexMCoreRegisterInfo.get(reg).is_cfbp_subregister:
-                reg = CortexMCoreRegisterInfo.get('cfbp').index
-            elif CortexMCoreRegisterInfo.get(reg).is_psr_subregister:
-                reg = CortexMCoreRegisterInfo.get('xpsr').index
-
-            # write id in DCRSR
-            self.write_memory(CortexM.DCRSR, reg)
-
-            # Technically, we need to poll S_REGRDY in DHCSR here before reading DCRDR. But
-            # we're running so slow compared to the target that it's not necessary.
-            # Read it and check that S_REGRDY is set.
-
-            dhcsr_cb = self.read32(CortexM.DHCSR, now=False)
-            reg_cb = self.read32(CortexM.DCRDR, now=False)
-            dhcsr_cb_list.append(dhcsr_cb)
-            reg_cb_list.append(reg_cb)
+        banked = self.ap.supports_banked_access
+        self.ap.lock()
+        try:
+            if banked:
+                self.ap.set_banked_base(CortexM.DHCSR)
+            for selector in selector_list:
+                # write id in DCRSR
+                self._write_debug_register(self._BD_DCRSR, selector, banked)
+
+                # Technically, we need to poll S_REGRDY in DHCSR here before reading DCRDR. But
+                # we're running so slow compared to the target that it's not necessary.
+                # Read it and check that S_REGRDY is set.
+                dhcsr_cb_list.append(self._read_debug_register(self._BD_DHCSR, banked))
+                reg_cb_list.append(self._read_debug_register(self._BD_DCRDR, banked))
+        finally:
+            self.ap.unlock()
 
         # Read all results
         reg_vals = []
         fail_list = []
-        for reg, reg_cb, dhcsr_cb in zip(reg_list, reg_cb_list, dhcsr_cb_list):
+        for reg, info, reg_cb, dhcsr_cb in zip(reg_list, info_list, reg_cb_list, dhcsr_cb_list):
             dhcsr_val = dhcsr_cb()
             if (dhcsr_val & CortexM.S_REGRDY) == 0:
                 fail_list.append(reg)
             val = reg_cb()
 
             # Special handling for registers that are combined into a single DCRSR number.
-            if CortexMCoreRegisterInfo.get(reg).is_cfbp_subregister:
+            if info.is_cfbp_subregister:
                 val = (val >> ((-reg - 1) * 8)) & 0xff
-            elif CortexMCoreRegisterInfo.get(reg).is_psr_subregister:
-                val &= CortexMCoreRegisterInfo.get(reg).psr_mask
+            elif info.is_psr_subregister:
+                val &= info.psr_mask
 
             reg_vals.append(val)
 
@@ -1341,6 +1356,39 @@ class CortexM(CoreTarget, CoreSightCoreComponent): # lgtm[py/multiple-calls-to-i
 
         return reg_vals
 
+    def _write_debug_register(self, offset: int, data: int, banked: bool) -> None:
+        """@brief Write one of the core debug registers in the block starting at DHCSR.
+
+        If _banked_ is True, the caller must have pointed TAR at DHCSR with set_banked_base().
+        """
+        if banked:
+            self.ap.write_banked(offset, data)
+        else:
+            self.write_memory(CortexM.DHCSR + offset, data)
+
+    def _read_debug_register(self, offset: int, banked: bool) -> Callable[[], int]:
+        """@brief Start a read of one of the core debug registers in the block starting at DHCSR.
+
+        If _banked_ is True, the caller must have pointed TAR at DHCSR with set_banked_base().
+        @return Callable returning the register value.
+        """
+        if banked:
+            return self.ap.read_banked(offset, now=False)
+        else:
+            return self.read32(CortexM.DHCSR + offset, now=False)
+
+    @staticmethod
+    def _dcrsr_selector(info: CortexMCoreRegisterInfo) -> int:
+        """@brief Returns the DCRSR register selector used to access a register.
+
+        The CFBP and XPSR subregisters are accessed through the selector of the combined register.
+        """
+        if info.is_cfbp_subregister:
+            return CortexM._CFBP_SELECTOR
+        elif info.is_psr_subregister:
+            return CortexM._XPSR_SELECTOR
+        return info.index
+
     def write_core_register(self, reg: CoreRegisterNameOrNumberType, data: CoreRegisterValueType) -> None:
         """@brief Write a CPU register.
 
@@ -1418,51 +1466,59 @@ class CortexM(CoreTarget, CoreSightCoreComponent): # lgtm[py/multiple-calls-to-i
         xpsrValue = None
         reg_data_list = []
         for reg, data in zip(reg_list, data_list):
-            if CortexMCoreRegisterInfo.get(reg).is_double_float_register:
+            info = CortexMCoreRegisterInfo.get(reg)
+            if info.is_double_float_register:
                 # Replace double with two single float register writes. For instance,
                 # a write of D2 gets converted to writes to S4 and S5.
                 singleLow = data & 0xffffffff
                 singleHigh = (data >> 32) & 0xffffffff
                 reg_data_list += [(-reg, singleLow), (-reg + 1, singleHigh)]
-            elif CortexMCoreRegisterInfo.get(reg).is_cfbp_subregister and cfbpValue is None:
-                cfbpValue = self._base_read_core_registers_raw([CortexMCoreRegisterInfo.get('cfbp').index])[0]
+            elif info.is_cfbp_subregister and cfbpValue is None:
+                cfbpValue = self._base_read_core_registers_raw([self._CFBP_SELECTOR])[0]
                 reg_data_list.append((reg, data))
-            elif CortexMCoreRegisterInfo.get(reg).is_psr_subregister and xpsrValue is None:
-                xpsrValue = self._base_read_core_registers_raw([CortexMCoreRegisterInfo.get('xpsr').index])[0]
+            elif info.is_psr_subregister and xpsrValue is None:
+                xpsrValue = self._base_read_core_registers_raw([self._XPSR_SELECTOR])[0]
                 reg_data_list.append((reg, data))
             else:
                 # Other register, just copy directly.
                 reg_data_list.append((reg, data))
 
-        # Write out registers
+        # Write out registers. As for reads, the core debug registers are accessed through the
+        # MEM-AP banked data registers if possible.
         dhcsr_cb_list = []
-        for reg, data in reg_data_list:
-            if CortexMCoreRegisterInfo.get(reg).is_cfbp_subregister:
-                # Mask in the new special register value so we don't modify the other register
-                # values that share the same DCRSR number.
-                shift = (-reg - 1) * 8
-                mask = 0xffffffff ^ (0xff << shift)
-                data = (cfbpValue & mask) | ((data & 0xff) << shift)
-                cfbpValue = data # update special register for other writes that might be in the list
-                reg = CortexMCoreRegisterInfo.get('cfbp').index
-            elif CortexMCoreRegisterInfo.get(reg).is_psr_subregister:
-                mask = CortexMCoreRegisterInfo.get(reg).psr_mask
-                assert xpsrValue is not None
-                data = (xpsrValue & (0xffffffff ^ mask)) | (data & mask)
-                xpsrValue = data
-                reg = CortexMCoreRegisterInfo.get('xpsr').index
-
-            # write DCRDR
-            self.write_memory(CortexM.DCRDR, data)
-
-            # write id in DCRSR and flag to start write transfer
-            self.write_memory(CortexM.DCRSR, reg | CortexM.DCRSR_REGWnR)
-
-            # Technically, we need to poll S_REGRDY in DHCSR here to ensure the
-            # register write has completed.
-            # Read it and assert that S_REGRDY is set
-            dhcsr_cb = self.read32(CortexM.DHCSR, now=False)
-            dhcsr_cb_list.append(dhcsr_cb)
+        banked = self.ap.supports_banked_access
+        self.ap.lock()
+        try:
+            if banked:
+                self.ap.set_banked_base(CortexM.DHCSR)
+            for reg, data in reg_data_list:
+                info = CortexMCoreRegisterInfo.get(reg)
+                if info.is_cfbp_subregister:
+                    # Mask in the new special register value so we don't modify the other register
+                    # values that share the same DCRSR number.
+                    shift = (-reg - 1) * 8
+                    mask = 0xffffffff ^ (0xff << shift)
+                    data = (cfbpValue & mask) | ((data & 0xff) << shift)
+                    cfbpValue = data # update special register for other writes that might be in the list
+                elif info.is_psr_subregister:
+                    mask = info.psr_mask
+                    assert xpsrValue is not None
+                    data = (xpsrValue & (0xffffffff ^ mask)) | (data & mask)
+                    xpsrValue = data
+
+                # write DCRDR
+                self._write_debug_register(self._BD_DCRDR, data, banked)
+
+                # write id in DCRSR and flag to start write transfer
+                self._write_debug_register(self._BD_DCRSR, self._dcrsr_selector(info) | CortexM.DCRSR_REGWnR,
+                        banked)
+
+                # Technically, we need to poll S_REGRDY in DHCSR here to ensure the
+                # register write has completed.
+                # Read it and assert that S_REGRDY is set
+                dhcsr_cb_list.append(self._read_debug_register(self._BD_DHCSR, banked))
+        finally:
+            self.ap.unlock()
 
         # Make sure S_REGRDY was set for all register writes.
         fail_list = []
@@ -29,7 +29,7 @@ from ..core.target import Target
 from ..core.target_delegate import DelegateHavingMixIn
 from ..probe.debug_probe import DebugProbe
 from ..probe.swj import SWJSequenceSender
-from .ap import APSEL_APBANKSEL
+from .ap import (APSEL_APBANKSEL, MEM_AP)
 from ..utility.sequencer import CallSequence
 from ..utility.timeout import Timeout
 
@@ -397,6 +397,14 @@ class DebugPort(DelegateHavingMixIn):
         """
         self.power_down_debug()
 
+        # AP registers may lose their contents while debug is powered down.
+        for ap in self.aps.values():
+            if isinstance(ap, MEM_AP):
+                stats = ap.statistics
+                LOG.debug("%s: %d CSW writes (%d skipped), %d TAR writes (%d skipped)", ap.short_description,
+                        stats.csw_writes, stats.csw_writes_skipped, stats.tar_writes, stats.tar_writes_skipped)
+                ap._invalidate_cache()
+
     def create_connect_sequence(self) -> CallSequence:
         """@brief Returns call sequence to connect to the target.
 
@@ -603,6 +611,16 @@ class DebugPort(DelegateHavingMixIn):
         """@brief Invalidate cached DP registers."""
         self._cached_dp_select = None
 
+    def invalidate_ap_caches(self) -> None:
+        """@brief Invalidate the cached CSW and TAR registers of all MEM-APs.
+
+        Must be called after AP registers are accessed directly with write_ap() or read_ap() rather
+        than through the AP object, since the access may change CSW or TAR behind the AP's back.
+        """
+        for ap in self.aps.values():
+            if isinstance(ap, MEM_AP):
+                ap._invalidate_cache()
+
     def _reset_did_occur(self, notification: Notification) -> None:
         """@brief Handles reset notifications to invalidate register cache.
 
@@ -1008,6 +1026,9 @@ class DebugPort(DelegateHavingMixIn):
 
     def _handle_error(self, error: Exception, num: int) -> None:
         TRACE.debug("error:%06d %s", num, error)
+        # A faulted transfer may have been queued with other transfers that the MEM-APs expected to
+        # advance TAR, so their TAR shadows can no longer be trusted.
+        self.invalidate_ap_caches()
         # Clear sticky error for fault errors.
         if isinstance(error, exceptions.TransferFaultError):
             self.clear_sticky_err()
@@ -192,6 +192,61 @@ class DWT(CoreSightComponent):
     def cycle_count(self, value):
         self.ap.write32(self.address + self.DWT_CYCCNT, value)
 
+    @property
+    def pc_sample(self):
+        """@brief Read the sampled PC from the PCSR register.
+
+        A value of 0xffffffff means the core is halted or the PC could not be sampled.
+        """
+        return self.ap.read32(self.address + self.DWT_PCSR)
+
+    @classmethod
+    def pc_sampling_divider(cls, interval):
+        """@brief Compute the CYCTAP and POSTRESET values for a PC sampling interval.
+
+        Periodic PC sample packets are generated every (POSTRESET + 1) taps of the cycle counter, where
+        a tap is 64 cycles if CYCTAP is 0 or 1024 cycles if CYCTAP is 1. The supported interval with the
+        closest period is selected.
+
+        @param interval Requested number of cycles between PC samples.
+        @return Tuple of CYCTAP, POSTRESET, and the actual interval in cycles.
+        """
+        cyctap = 1 if interval > 16 * 64 else 0
+        tap = 1024 if cyctap else 64
+        postreset = min(max(round(interval / tap) - 1, 0), 15)
+        return cyctap, postreset, (postreset + 1) * tap
+
+    def enable_pc_sampling(self, interval):
+        """@brief Enable periodic PC sample packets.
+
+        The ITM must be enabled with DWT packet forwarding for the samples to be traced.
+
+        @param self
+        @param interval Requested number of cycles between PC samples.
+        @return The actual number of cycles between PC samples.
+        """
+        if self.dwt_configured is False:
+            self.init()
+
+        cyctap, postreset, actual = self.pc_sampling_divider(interval)
+        ctrl = self.ap.read32(self.address + self.DWT_CTRL)
+        ctrl &= ~(self.DWT_CTRL_CYCCNTENA_MASK | self.DWT_CTRL_PCSAMPLENA_MASK | self.DWT_CTRL_CYCTAP_MASK
+                | self.DWT_CTRL_POSTINIT_MASK | self.DWT_CTRL_POSTRESET_MASK)
+        # The POSTCNT counter settings must only be changed while the cycle counter is disabled.
+        self.ap.write32(self.address + self.DWT_CTRL, ctrl)
+        ctrl |= ((cyctap * self.DWT_CTRL_CYCTAP_MASK)
+                | (postreset << self.DWT_CTRL_POSTINIT_SHIFT)
+                | (postreset << self.DWT_CTRL_POSTRESET_SHIFT))
+        self.ap.write32(self.address + self.DWT_CTRL, ctrl)
+        self.ap.write32(self.address + self.DWT_CTRL,
+                ctrl | self.DWT_CTRL_CYCCNTENA_MASK | self.DWT_CTRL_PCSAMPLENA_MASK)
+        return actual
+
+    def disable_pc_sampling(self):
+        """@brief Stop generating periodic PC sample packets."""
+        ctrl = self.ap.read32(self.address + self.DWT_CTRL)
+        self.ap.write32(self.address + self.DWT_CTRL, ctrl & ~self.DWT_CTRL_PCSAMPLENA_MASK)
+
 class DWTv2(DWT):
     """@brief Data Watchpoint and Trace version 2.x
 
@@ -16,6 +16,7 @@
 # limitations under the License.
 
 from .context import DebugContext
+from ..core.target import Target
 from ..cache.memory import MemoryCache
 from ..cache.register import RegisterCache
 
@@ -26,8 +27,18 @@ class CachingDebugContext(DebugContext):
         super().__init__(parent)
         self._enable_memory = enable_memory
         self._enable_register = enable_register
-        self._regcache = RegisterCache(parent, self.core) if enable_register else parent
-        self._memcache = MemoryCache(parent, self.core) if enable_memory else parent
+        self._regcache = RegisterCache(parent, self.core,
+                self.session.options.get('cache.register_snapshot')) if enable_register else parent
+        self._memcache = MemoryCache(parent, self.core,
+                self.session.options.get('cache.memory_size_limit')) if enable_memory else parent
+
+        # The memory cache keeps flash contents across runs, so it must be invalidated when flash changes.
+        if enable_memory:
+            self.session.subscribe(self._flash_program_handler,
+                    [Target.Event.PRE_FLASH_PROGRAM, Target.Event.POST_FLASH_PROGRAM])
+
+    def _flash_program_handler(self, notification):
+        self._memcache.invalidate()
 
     def write_memory(self, addr, value, transfer_size=32):
         return self._memcache.write_memory(addr, value, transfer_size)
@@ -35,6 +46,9 @@ class CachingDebugContext(DebugContext):
     def read_memory(self, addr, transfer_size=32, now=True):
         return self._memcache.read_memory(addr, transfer_size, now)
 
+    def read_memory_scatter(self, requests):
+        return self._memcache.read_memory_scatter(requests)
+
     def write_memory_block8(self, addr, value):
         return self._memcache.write_memory_block8(addr, value)
 
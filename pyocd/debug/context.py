@@ -68,6 +68,9 @@ class DebugContext(MemoryInterface):
     def read_memory(self, addr, transfer_size=32, now=True):
         return self._parent.read_memory(addr, transfer_size, now)
 
+    def read_memory_scatter(self, requests):
+        return self._parent.read_memory_scatter(requests)
+
     def write_memory_block8(self, addr, value):
         return self._parent.write_memory_block8(addr, value)
 
@@ -66,6 +66,22 @@ class ElfReaderContext(DebugContext):
         else:
             return read_memory_cb
 
+    def read_memory_scatter(self, requests):
+        # Read locations within ELF sections directly and pass the rest to the parent as one batch.
+        requests = list(requests)
+        results = [None] * len(requests)
+        parent_indices = []
+        for i, (addr, transfer_size) in enumerate(requests):
+            if len(self._tree.overlap(addr, addr + transfer_size // 8)) == 1:
+                results[i] = self.read_memory(addr, transfer_size)
+            else:
+                parent_indices.append(i)
+        if parent_indices:
+            values = self._parent.read_memory_scatter([requests[i] for i in parent_indices])
+            for i, value in zip(parent_indices, values):
+                results[i] = value
+        return results
+
     def read_memory_block8(self, addr, size):
         matches = self._tree.overlap(addr, addr + size)
         # Must match only one interval (ELF section).
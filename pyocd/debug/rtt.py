@@ -20,14 +20,33 @@
 # limitations under the License.
 
 from abc import ABC, abstractmethod
+from binascii import crc32
 from ctypes import Structure, c_char, c_int32, c_uint32, sizeof
+import logging
 import struct
-from typing import Optional, Sequence
+import threading
+from typing import Dict, Iterator, Optional, Sequence, Tuple
 
 from ..core.memory_map import MemoryMap, MemoryRegion, MemoryType
 from ..core.soc_target import SoCTarget
 from ..core import exceptions
 
+LOG = logging.getLogger(__name__)
+
+## Maximum size of each memory read while searching for the control block. Reads are aligned
+# to this size.
+CONTROL_BLOCK_SEARCH_CHUNK_SIZE = 16 * 1024
+
+## Name of the control block variable in SEGGER's RTT implementation.
+CONTROL_BLOCK_SYMBOL = "_SEGGER_RTT"
+
+## Number of bytes at the start of boot memory used to identify the firmware image.
+FIRMWARE_ID_SIZE = 256
+
+## Control block addresses found by previous searches, keyed by firmware image and search parameters.
+_FOUND_ADDRESSES: Dict[Tuple, int] = {}
+_FOUND_ADDRESSES_LOCK = threading.Lock()
+
 
 class SEGGER_RTT_BUFFER_UP(Structure):
     """@brief `SEGGER RTT Ring Buffer` target to host."""
@@ -425,36 +444,113 @@ class GenericRTTControlBlock(RTTControlBlock):
         self._control_block_id = control_block_id
 
     def _find_control_block(self) -> Optional[int]:
-        addr: int = self._cb_search_address & ~0x3
-        search_size: int  = self._cb_search_size_bytes
-        if search_size < len(self._control_block_id):
-            search_size = len(self._control_block_id)
-
-        id_len = len(self._control_block_id)
-        offset: int = 0
+        """@brief Locate the control block within the search range.
 
-        while search_size:
-            read_size = min(search_size, 32)
-            data = self.target.read_memory_block8(addr, read_size)
+        Before searching memory, the address of the `_SEGGER_RTT` symbol from the target's ELF file,
+        if one is set, and the address found by an earlier search for the same firmware image are
+        checked.
 
-            if not data:
+        @return The control block's address, or None if it was not found.
+        """
+        # The search range starts at the word aligned search address, and is always large enough to
+        # hold a control block at the search address itself.
+        start = self._cb_search_address & ~0x3
+        min_size = self._cb_search_address - start + len(self._control_block_id)
+        end = start + max(self._cb_search_size_bytes, min_size)
+        firmware_key = self._get_firmware_key(start, end)
+
+        for candidate in self._get_candidate_addresses(firmware_key, start, end):
+            if self._is_control_block_at(candidate):
+                LOG.debug("RTT control block found at candidate address %#010x", candidate)
+                addr: Optional[int] = candidate
                 break
+        else:
+            addr = self._search_memory(start, end)
 
-            for byte in data:
-                if byte == self._control_block_id[offset]:
-                    offset += 1
-                    if offset == id_len:
-                        break
-                else:
-                    num_skip_words = (offset + 1)
-                    addr += (num_skip_words * 1)
-                    search_size -= num_skip_words
-                    offset = 0
-
-            if offset == id_len:
-                break
+        if (addr is not None) and (firmware_key is not None):
+            with _FOUND_ADDRESSES_LOCK:
+                _FOUND_ADDRESSES[firmware_key] = addr
+        return addr
+
+    def _get_firmware_key(self, start: int, end: int) -> Optional[Tuple]:
+        """@brief Identify the firmware image and search parameters for the found address cache.
 
-        return addr if offset == id_len else None
+        The image is identified by a CRC of the start of boot memory, which normally holds the
+        vector table.
+        """
+        boot_memory = self.target.get_memory_map().get_boot_memory()
+        if boot_memory is None:
+            return None
+        try:
+            words = self.target.read_memory_block32(boot_memory.start, FIRMWARE_ID_SIZE // 4)
+        except exceptions.TransferError:
+            return None
+        image_crc = crc32(struct.pack('<%dI' % len(words), *words))
+        return (self.target.part_number, boot_memory.start, image_crc, start, end,
+                bytes(self._control_block_id))
+
+    def _get_candidate_addresses(self, firmware_key: Optional[Tuple], start: int, end: int) -> Iterator[int]:
+        id_len = len(self._control_block_id)
+        candidates = []
+
+        elf = self.target.elf
+        if elf is not None:
+            try:
+                symbol = elf.symbol_decoder.get_symbol_for_name(CONTROL_BLOCK_SYMBOL)
+            except Exception as err:
+                LOG.debug("Unable to look up %s symbol: %s", CONTROL_BLOCK_SYMBOL, err)
+                symbol = None
+            if symbol is not None:
+                candidates.append(symbol.address)
+
+        if firmware_key is not None:
+            with _FOUND_ADDRESSES_LOCK:
+                cached = _FOUND_ADDRESSES.get(firmware_key)
+            if cached is not None:
+                candidates.append(cached)
+
+        for addr in candidates:
+            if start <= addr <= end - id_len:
+                yield addr
+
+    def _is_control_block_at(self, addr: int) -> bool:
+        try:
+            data = self.target.read_memory_block8(addr, len(self._control_block_id))
+        except exceptions.TransferError:
+            return False
+        return bytes(data) == bytes(self._control_block_id)
+
+    def _read_search_block(self, addr: int, size: int) -> bytes:
+        """@brief Read a block of the search range, using word transfers for all whole words."""
+        word_count = size // 4
+        data = b''
+        if word_count:
+            words = self.target.read_memory_block32(addr, word_count)
+            data = struct.pack('<%dI' % word_count, *words)
+        if size % 4:
+            data += bytes(self.target.read_memory_block8(addr + word_count * 4, size % 4))
+        return data
+
+    def _search_memory(self, start: int, end: int) -> Optional[int]:
+        """@brief Search memory for the control block ID.
+
+        Memory is read in large aligned blocks. The end of each block is retained so an ID that
+        crosses a block boundary is found.
+        """
+        control_block_id = bytes(self._control_block_id)
+        overlap = len(control_block_id) - 1
+        carry = b''
+        addr = start
+        while addr < end:
+            read_size = min(CONTROL_BLOCK_SEARCH_CHUNK_SIZE - (addr % CONTROL_BLOCK_SEARCH_CHUNK_SIZE),
+                    end - addr)
+            data = carry + self._read_search_block(addr, read_size)
+            offset = data.find(control_block_id)
+            if offset != -1:
+                return addr - len(carry) + offset
+            carry = data[len(data) - overlap:] if overlap else b''
+            addr += read_size
+        return None
 
     def start(self):
         """@brief Find the RTT control block on the target.
@@ -211,7 +211,11 @@ class DebugSequenceCommonFunctions(DebugSequenceFunctionsDelegate):
         try:
             ap_addr = self._get_ap_addr()
             reg_addr = ap_addr.address | addr
-            return self._get_dp().read_ap(reg_addr)
+            dp = self._get_dp()
+            try:
+                return dp.read_ap(reg_addr)
+            finally:
+                dp.invalidate_ap_caches()
         except exceptions.TransferError as err:
             if self._get_ignore_errors():
                 LOG.debug("ReadAP(%#010x) ignored %r because __errorcontrol is set", addr, err)
@@ -223,7 +227,10 @@ class DebugSequenceCommonFunctions(DebugSequenceFunctionsDelegate):
         try:
             dp = self._get_dp(True)
             apacc = dp.apacc_memory_interface
-            return apacc.read32(addr)
+            try:
+                return apacc.read32(addr)
+            finally:
+                dp.invalidate_ap_caches()
         except exceptions.TransferError as err:
             if self._get_ignore_errors():
                 LOG.debug("ReadAccessAP(%#010x) ignored %r because __errorcontrol is set", addr, err)
@@ -285,7 +292,9 @@ class DebugSequenceCommonFunctions(DebugSequenceFunctionsDelegate):
         try:
             ap_addr = self._get_ap_addr()
             reg_addr = ap_addr.address | addr
-            self._get_dp().write_ap(reg_addr, val)
+            dp = self._get_dp()
+            dp.write_ap(reg_addr, val)
+            dp.invalidate_ap_caches()
             self.target.flush()
         except exceptions.TransferError as err:
             if self._get_ignore_errors():
@@ -298,6 +307,7 @@ class DebugSequenceCommonFunctions(DebugSequenceFunctionsDelegate):
             dp = self._get_dp(True)
             apacc = dp.apacc_memory_interface
             apacc.write32(addr, val)
+            dp.invalidate_ap_caches()
             self.target.flush()
         except exceptions.TransferError as err:
             if self._get_ignore_errors():
@@ -23,12 +23,13 @@ import lark.exceptions
 import lark.visitors
 import logging
 import threading
+import weakref
 from dataclasses import dataclass
 from enum import Enum
 from inspect import signature
 from lark.lexer import Token as LarkToken
 from lark.tree import Tree as LarkTree
-from typing import (Any, Iterator, cast, List, Optional, Union, TYPE_CHECKING)
+from typing import (Any, Callable, Iterator, cast, List, Optional, Set, Union, TYPE_CHECKING)
 from typing_extensions import Self
 
 from ...core import exceptions
@@ -50,6 +51,9 @@ TRACE.setLevel(logging.CRITICAL)
 
 NodeType = Union[LarkTree, LarkToken, int]
 
+## Compiled debug sequence code, called with the scope and the sequence functions delegate.
+_CompiledNode = Callable[[Scope, Any], Any]
+
 class DebugSequenceError(exceptions.Error):
     pass
 
@@ -449,16 +453,16 @@ class Control(DebugSequenceNode):
         self._timeout = (timeout_µs / 1000000) if timeout_µs else None
         self._predicate = predicate
         self._ast = Parser.parse(predicate)
+        self._code = CompiledCode(self._ast)
 
     def execute(self, context: DebugSequenceExecutionContext) -> Optional[Scope]:
         """@brief Run the sequence."""
-        # Get our scope and interpreter objects.
+        # Create our scope.
         parent_scope = context.current_scope
         scope = Scope(
             parent_scope,
             name=f"{parent_scope.name}.{self._type.name}"
             )
-        interp = Interpreter(self._ast, scope, context)
 
         # Push our new scope.
         with context.push(self, scope):
@@ -467,7 +471,7 @@ class Control(DebugSequenceNode):
             timeout.start()
 
             # Execute the predicate a first time.
-            result = interp.execute()
+            result = self._code.execute(scope, context)
             TRACE.debug("%s(%s): pred=%s", self._type.name, self._predicate, result)
 
             while result and timeout.check():
@@ -479,7 +483,7 @@ class Control(DebugSequenceNode):
                     break
                 # For a while control, re-evaluate the predicate.
                 elif self._type == self.ControlType.WHILE:
-                    result = interp.execute()
+                    result = self._code.execute(scope, context)
                     TRACE.debug("%s(%s): pred=%d", self._type.name, self._predicate, result)
 
         return scope
@@ -508,6 +512,7 @@ class Block(DebugSequenceNode):
     def __init__(self, code: str, is_atomic: bool = False, info: str = "") -> None:
         super().__init__(info)
         self._ast = Parser.parse(code)
+        self._code = CompiledCode(self._ast)
         self._is_atomic = is_atomic
 
     def execute(self, context: DebugSequenceExecutionContext) -> Optional[Scope]:
@@ -519,8 +524,7 @@ class Block(DebugSequenceNode):
             if self._is_atomic:
                 context.session.probe.lock()
 
-            interp = Interpreter(self._ast, context.current_scope, context)
-            interp.execute()
+            self._code.execute(context.current_scope, context)
         finally:
             if self._is_atomic:
                 context.session.probe.unlock()
@@ -783,212 +787,217 @@ class SemanticChecker:
         visitor = self._SemanticsVisitor(self._scope, self._context)
         visitor.visit(self._tree)
 
-class Interpreter:
-    """@brief Interpreting for debug sequence ASTs.
-
-    This class interprets the AST from only a single block or control node. The user of this class
-    is required to handle crossing block/control boundaries.
-
-    An Interpreter instance can be used to execute the AST more than once.
-    """
-
-    class _InterpreterVisitor(lark.visitors.Interpreter):
-        """@brief Visitor for interpreting sequence trees."""
-
-        def __init__(self, scope: Scope, context: DebugSequenceExecutionContext) -> None:
-            super().__init__()
-            self._scope = scope
-            self._context = context
-            self._fns = self._context.delegate.get_sequence_functions()
+class _Compiler:
+    """@brief Lowers a constant folded debug sequence AST to a tree of Python closures.
 
-        def start(self, tree: LarkTree) -> Optional[int]:
-            # Interpret the tree.
-            values = self.visit_children(tree)
-            return values.pop() if len(values) else None
+    Each node of the AST becomes a closure that takes the scope in which to execute and the
+    sequence functions delegate, so executing the code is only a series of calls between closures
+    rather than a visitor dispatching on node types for every node.
 
-        def _log_children(self, name: str, children: List) -> None: # pragma: no cover
-            LOG.info('%s: %s', name, [(("Node: %s" % c.data) if hasattr(c, 'data') else ("%s=%s" % (c.type, c.value))) for c in children])
+    The semantics are the same as those of the tree-walking interpreter this replaced. All operands
+    are evaluated, including both operands of && and || and both branches of a ternary expression,
+    and only unary minus and bitwise invert mask their results to 64 bits.
 
-        def decl_stmt(self, tree: LarkTree) -> None:
-            values = self.visit_children(tree)
+    Statements and function calls are logged to the trace logger only if it was enabled when the
+    code was compiled.
+    """
 
-            assert _is_token(values[0], 'IDENT')
-            name = values[0].value
-            # Handle __var declarations with no initialiser expression. Even though this is disallowed
-            # by the specification, it appears in some DFPs, including some of NXP's.
-            if values[1] is None:
-                value = 0
+    def __init__(self) -> None:
+        self._trace = TRACE.isEnabledFor(logging.DEBUG)
 
-                TRACE.debug("(line %d): decl %s = 0", getattr(tree.meta, 'line', 0), name)
+    def compile(self, tree: LarkTree) -> _CompiledNode:
+        """@brief Compile the tree for a complete block or predicate.
+        @return Closure that returns the value of the last statement.
+        """
+        assert tree.data == 'start'
+        stmts = [self._compile_node(node) for node in tree.children]
+
+        if not stmts:
+            return lambda scope, fns: None
+        elif len(stmts) == 1:
+            return stmts[0]
+
+        def start(scope: Scope, fns: Any) -> Optional[int]:
+            result = None
+            for stmt in stmts:
+                result = stmt(scope, fns)
+            return result
+        return start
+
+    def _compile_node(self, node: NodeType) -> _CompiledNode:
+        if isinstance(node, int):
+            return lambda scope, fns: node
+        elif isinstance(node, LarkToken):
+            if node.type == 'IDENT':
+                return self._compile_variable(node.value)
+            elif node.type == 'STRLIT':
+                value = node.value
+                return lambda scope, fns: value
             else:
-                value = self._get_atom(values[1])
-
-                TRACE.debug("(line %d): decl %s = %s", getattr(tree.meta, 'line', 0), name, self._format_atom(values[1]))
-
-            self._scope.set(name, value)
-
-        def assign_expr(self, tree: LarkTree) -> int:
-            values = self.visit_children(tree)
-
-            name = values[0].value
-            op = values[1].value
-            value = self._get_atom(values[2])
-
-            TRACE.debug("(line %d): %s %s %s", getattr(tree.meta, 'line', 0), name, op, self._format_atom(values[2]))
-
-            # Handle compound assignment operators.
-            if op != '=':
-                left = self._scope.get(name)
-                op = op.rstrip('=')
-                value = _BINARY_OPS[op](left, value)
-
-            self._scope.set(name, value)
-
-            # Return the variable's value as the assignment expression's value.
-            return value
-
-        def expr_stmt(self, tree: LarkTree) -> int:
-            values = self.visit_children(tree)
-            expr_value = values.pop()
-            TRACE.debug("(line %d): expr stmt = %s", getattr(tree.meta, 'line', 0), self._format_atom(expr_value))
-            return self._get_atom(expr_value)
-
-        def ternary_expr(self, tree: LarkTree) -> int:
-            values = self.visit_children(tree)
-
-            predicate = self._get_atom(values[0])
+                raise DebugSequenceSemanticError(f"unexpected literal type {node.type}")
+        elif isinstance(node, LarkTree):
+            try:
+                compiler = getattr(self, "_compile_" + node.data)
+            except AttributeError:
+                raise DebugSequenceSemanticError(f"unexpected expression tree of type {node.data}") from None
+            return compiler(node)
+        else:
+            raise DebugSequenceSemanticError("unexpected node type when expecting atom")
+
+    def _traced(self, fn: _CompiledNode, tree: LarkTree, description: str) -> _CompiledNode:
+        """@brief Wrap a closure to log its result, if tracing is enabled."""
+        if not self._trace:
+            return fn
+        line = getattr(tree.meta, 'line', 0)
+
+        def traced(scope: Scope, fns: Any) -> Any:
+            result = fn(scope, fns)
+            TRACE.debug("(line %d): %s -> %s", line, description,
+                    hex(result) if isinstance(result, int) else result)
+            return result
+        return traced
 
+    def _compile_variable(self, name: str) -> _CompiledNode:
+        def get_variable(scope: Scope, fns: Any) -> int:
+            try:
+                return scope.get(name)
+            except KeyError as err:
+                LOG.debug("debug sequence reference to undefined variable %s... %s", name, scope.dump())
+                raise DebugSequenceSemanticError(f"reference to undefined variable {name}") from err
+        return get_variable
+
+    def _compile_decl_stmt(self, tree: LarkTree) -> _CompiledNode:
+        name_token, expr = tree.children
+        assert isinstance(name_token, LarkToken)
+        name = name_token.value
+
+        # Handle __var declarations with no initialiser expression. Even though this is disallowed
+        # by the specification, it appears in some DFPs, including some of NXP's.
+        if expr is None:
+            value_fn = self._compile_node(0)
+        else:
+            value_fn = self._compile_node(expr)
+
+        def decl_stmt(scope: Scope, fns: Any) -> None:
+            scope.set(name, value_fn(scope, fns))
+        return self._traced(decl_stmt, tree, f"decl {name}")
+
+    def _compile_assign_expr(self, tree: LarkTree) -> _CompiledNode:
+        name_token, op_token, expr = tree.children
+        assert isinstance(name_token, LarkToken) and isinstance(op_token, LarkToken)
+        name = name_token.value
+        op = op_token.value
+        value_fn = self._compile_node(expr)
+
+        # The assignment expression's value is the variable's new value.
+        if op == '=':
+            def assign_expr(scope: Scope, fns: Any) -> int:
+                value = value_fn(scope, fns)
+                scope.set(name, value)
+                return value
+        else:
+            # Handle compound assignment operators. The right hand side is evaluated first.
+            op_fn = _BINARY_OPS[op.rstrip('=')]
+
+            def assign_expr(scope: Scope, fns: Any) -> int:
+                value = value_fn(scope, fns)
+                value = op_fn(scope.get(name), value)
+                scope.set(name, value)
+                return value
+        return assign_expr
+
+    def _compile_expr_stmt(self, tree: LarkTree) -> _CompiledNode:
+        return self._traced(self._compile_node(tree.children[0]), tree, "expr stmt")
+
+    def _compile_ternary_expr(self, tree: LarkTree) -> _CompiledNode:
+        predicate_fn, true_fn, false_fn = (self._compile_node(node) for node in tree.children)
+
+        def ternary_expr(scope: Scope, fns: Any) -> int:
+            predicate = predicate_fn(scope, fns)
+            true_value = true_fn(scope, fns)
+            false_value = false_fn(scope, fns)
             if not isinstance(predicate, int):
                 raise DebugSequenceSemanticError("ternary expression predicate is not an integer")
+            return true_value if (predicate != 0) else false_value
+        return ternary_expr
+
+    def _compile_binary_expr(self, tree: LarkTree) -> _CompiledNode:
+        left, op_token, right = tree.children
+        assert isinstance(op_token, LarkToken)
+        op_fn = _BINARY_OPS[op_token.value]
+        left_fn = self._compile_node(left)
+
+        # Comparisons and masks against a constant are common enough in loop predicates to be worth
+        # avoiding the call for the constant operand.
+        if isinstance(right, int):
+            def binary_expr_const(scope: Scope, fns: Any) -> int:
+                return op_fn(left_fn(scope, fns), right)
+            return binary_expr_const
+
+        right_fn = self._compile_node(right)
+
+        def binary_expr(scope: Scope, fns: Any) -> int:
+            return op_fn(left_fn(scope, fns), right_fn(scope, fns))
+        return binary_expr
+
+    def _compile_unary_expr(self, tree: LarkTree) -> _CompiledNode:
+        op_token, arg = tree.children
+        assert isinstance(op_token, LarkToken)
+        op_fn = _UNARY_OPS[op_token.value]
+        arg_fn = self._compile_node(arg)
+
+        def unary_expr(scope: Scope, fns: Any) -> int:
+            return op_fn(arg_fn(scope, fns))
+        return unary_expr
+
+    def _compile_fncall(self, tree: LarkTree) -> _CompiledNode:
+        # Case-insensitive match. The semantic checker has already verified the function name.
+        fn_name = str(tree.children[0]).lower()
+        arg_fns = [self._compile_node(node) for node in tree.children[1:]]
+
+        def fncall(scope: Scope, fns: Any) -> int:
+            result = getattr(fns, fn_name)(*[arg_fn(scope, fns) for arg_fn in arg_fns])
+            return 0 if (result is None) else result
+        return self._traced(fncall, tree, f"fn {fn_name}()")
+
+class CompiledCode:
+    """@brief Debug sequence statements compiled for repeated execution.
+
+    The AST of a block or control node predicate is semantically checked against the delegate of
+    each execution context in which it is run. The first execution also constant folds the AST and
+    compiles it to Python closures. Both results are cached, so later executions, such as each
+    iteration of a while loop or the next connect or reset, only call the compiled closures.
+    """
 
-            if predicate != 0:
-                result = self._get_atom(values[1])
-            else:
-                result = self._get_atom(values[2])
-
-            TRACE.debug("(line %s): %s ? %s : %s -> %s",
-                    getattr(tree.meta, 'line', 0),
-                    self._format_atom(values[0]),
-                    self._format_atom(values[1]),
-                    self._format_atom(values[2]),
-                    hex(result))
-
-            return result
-
-        def binary_expr(self, tree: LarkTree) -> int:
-            values = self.visit_children(tree)
-
-            left = self._get_atom(values[0])
-            op = values[1].value
-            right = self._get_atom(values[2])
-
-            result = _BINARY_OPS[op](left, right)
-
-            TRACE.debug("(line %s): %s %s %s -> %s", getattr(tree.meta, 'line', 0),
-                    self._format_atom(values[0]), op, self._format_atom(values[2]), hex(result))
-            return result
-
-        def unary_expr(self, tree: LarkTree) -> int:
-            values = self.visit_children(tree)
-
-            op = values[0].value
-            value = self._get_atom(values[1])
-
-            result = _UNARY_OPS[op](value)
-
-            TRACE.debug("(line %s): %s %s -> %s", getattr(tree.meta, 'line', 0), op, self._format_atom(values[1]),
-                hex(result))
-
-            return result
-
-        def fncall(self, tree: LarkTree) -> int:
-            values = self.visit_children(tree)
-            fn_name = values[0]
-            fn_args = [self._get_atom(a) for a in values[1:]]
-
-            # Case-insensitive match.
-            fn_name = fn_name.lower()
-
-            TRACE.debug("(line %d): fn %s (%s) ...", getattr(tree.meta, 'line', 0), fn_name,
-                ", ".join(self._format_atom(a) for a in values[1:]))
-
-            # Should have already verified the function name.
-            impl = getattr(self._fns, fn_name)
-            result = impl(*fn_args)
-            if result is None:
-                result = 0
-
-            TRACE.debug("(line %d): fn %s () returned %s", getattr(tree.meta, 'line', 0), fn_name, hex(result))
-            return result
-
-        def _get_atom(self, node: NodeType) -> int:
-            if isinstance(node, LarkTree):
-                raise DebugSequenceSemanticError(f"expected atom but found an expression tree of type {node.data}")
-            elif isinstance(node, LarkToken):
-                if node.type == 'IDENT':
-                    try:
-                        return self._scope.get(node.value)
-                    except KeyError as err:
-                        LOG.debug("debug sequence reference to undefined variable %s... %s",
-                                node.value, self._scope.dump())
-                        raise DebugSequenceSemanticError(f"reference to undefined variable {node.value}") from err
-                elif node.type in ('INTLIT', 'STRLIT'):
-                    return node.value
-                else:
-                    raise DebugSequenceSemanticError(f"unexpected literal type {node.type}")
-            elif isinstance(node, int):
-                return node
-            else:
-                raise DebugSequenceSemanticError("unexpected node type when expecting atom")
-
-        def _format_atom(self, node: NodeType) -> str:
-            """@brief Format an atom for trace logging."""
-            if isinstance(node, LarkToken):
-                if node.type == 'IDENT':
-                    try:
-                        return node.value + "{" + hex(self._scope.get(node.value)) + "}"
-                    except KeyError:
-                        TRACE.debug("reference to undefined variable %s... %s", node.value, self._scope.dump())
-                        return node.value + "{undefined}"
-                elif node.type == 'INTLIT':
-                    return hex(node.value)
-                elif node.type == 'STRLIT':
-                    return f"'{node.value}'"
-                else:
-                    raise DebugSequenceSemanticError(f"unexpected literal type {node.type}")
-            elif isinstance(node, int):
-                return hex(node)
-            else:
-                return f"?<{type(node).__class__}>?"
-
-    def __init__(self, tree: LarkTree, scope: Scope, context: DebugSequenceExecutionContext) -> None:
+    def __init__(self, tree: LarkTree) -> None:
         """@brief Constructor.
-
-        The provided AST is semantically checked and optimized.
-
-        @param self This interpreter.
-        @param tree The abstract syntax tree to interpret.
-        @param scope Scope within which the AST will execute.
-        @param delegate Delegate providing debug sequence function implementations.
-
-        @exception DebugSequenceSemanticError A semantic error was discovered in the provided code.
+        @param self This object.
+        @param tree The abstract syntax tree that will be executed.
         """
-        super().__init__()
-        self._scope = scope
-        self._context = context
-
-        # First run the semantic checker, so semantic errors are raised prior to actually
-        # performing any actions.
-        checker = SemanticChecker(tree, self._scope, context)
-        checker.check()
+        self._tree = tree
+        self._code: Optional[_CompiledNode] = None
 
-        # Do some optimization.
-        self._tree = _ConstantFolder().transform(tree)
+        ## Pnames for which the code has passed semantic checks, by delegate.
+        self._checked: weakref.WeakKeyDictionary[DebugSequenceDelegate, Set[Optional[str]]] = \
+                weakref.WeakKeyDictionary()
 
-    def execute(self) -> int:
+    def execute(self, scope: Scope, context: DebugSequenceExecutionContext) -> Optional[int]:
         """@brief Runs the statements in the AST passed to the constructor.
+
+        @param self This object.
+        @param scope Scope within which the code will execute.
+        @param context The execution context.
         @return The value of the last statement is returned to the caller.
-        """
-        visitor = self._InterpreterVisitor(self._scope, self._context)
-        return visitor.visit(self._tree)
 
+        @exception DebugSequenceSemanticError A semantic error was discovered in the code. Semantic
+            errors are raised prior to performing any actions.
+        """
+        checked_pnames = self._checked.setdefault(context.delegate, set())
+        if context.pname not in checked_pnames:
+            SemanticChecker(self._tree, scope, context).check()
+            checked_pnames.add(context.pname)
+
+        code = self._code
+        if code is None:
+            code = self._code = _Compiler().compile(_ConstantFolder().transform(self._tree))
+        return code(scope, context.delegate.get_sequence_functions())
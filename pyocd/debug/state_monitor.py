@@ -0,0 +1,276 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+from dataclasses import (dataclass, replace)
+from time import perf_counter
+from typing import (Any, Dict, List, Optional, Tuple, TYPE_CHECKING)
+
+from ..core import exceptions
+from ..core.target import Target
+
+if TYPE_CHECKING:
+    from ..core.core_target import CoreTarget
+    from ..core.session import Session
+
+LOG = logging.getLogger(__name__)
+
+@dataclass
+class StateMonitorStatistics:
+    """@brief Counters describing the target state monitor's use of the debug probe."""
+    ## Number of target state reads.
+    polls: int = 0
+    ## Total seconds spent reading target state, i.e. the time the monitor kept the probe busy.
+    poll_time: float = 0.0
+    ## Total seconds during which at least one core was being watched.
+    watch_time: float = 0.0
+    ## Number of halts detected.
+    halts: int = 0
+    ## Number of failed target state reads.
+    errors: int = 0
+    ## Longest time in seconds between a halt being detected and the previous poll of that core.
+    #
+    # This is an upper bound on the delay between the core halting and the halt notification.
+    max_detection_latency: float = 0.0
+
+    @property
+    def probe_utilization(self) -> float:
+        """@brief Fraction of the watched time that the probe was busy reading target state."""
+        return (self.poll_time / self.watch_time) if self.watch_time else 0.0
+
+class _WatchInfo:
+    """@brief Polling state for one watched core."""
+
+    def __init__(self, generation: int, now: float, interval: float, wake_event: threading.Event,
+            lock: Optional[threading.Lock]) -> None:
+        self.generation = generation
+        self.wake_event = wake_event
+        self.lock = lock
+        self.interval = interval
+        self.last_poll = now
+        self.next_poll = now + interval
+        self.did_fail = False
+
+class TargetStateMonitor:
+    """@brief Central thread that detects when running cores halt.
+
+    Rather than each client polling the target state of a running core, a client calls watch()
+    after resuming the core. The monitor thread then reads the state of all watched cores from a
+    single place, with an adaptive interval: polling starts at the minimum interval, since a core
+    commonly halts again soon after being resumed or stepped over a function, and backs off
+    geometrically to the maximum interval while the core keeps running. This limits both the
+    latency of detecting a breakpoint hit and the load placed on a probe shared with other users.
+
+    Each poll is made while holding the lock passed to watch(), if any, so the monitor's probe
+    accesses are serialized with those of the client, such as SWO reads.
+
+    When a watched core is seen halted, the monitor stops watching it and queues a
+    Target.Event.POST_HALT notification with the core as the source and the halt reason as data,
+    exactly as is sent for a halt requested by the debugger. If reading the state fails, a
+    STATE_ERROR_EVENT notification is queued with the exception as data, once per run of consecutive
+    failures, and the core stays watched at the maximum interval. In both cases the wake event passed
+    to watch() is set. The client then calls dispatch_notifications() from its own thread to send the
+    queued notifications through the session, so subscribers never run on the monitor thread.
+    """
+
+    ## Notification event for a failure to read the state of a watched core.
+    STATE_ERROR_EVENT = 'target-state-monitor-error'
+
+    ## Factor by which the poll interval grows after each poll that finds the core still running.
+    BACKOFF_FACTOR = 1.25
+
+    def __init__(self, session: "Session") -> None:
+        self._session = session
+        self._min_interval = session.options.get('debug.halt_poll_interval.min')
+        self._max_interval = max(self._min_interval, session.options.get('debug.halt_poll_interval.max'))
+        self._cond = threading.Condition()
+        self._watched: Dict["CoreTarget", _WatchInfo] = {}
+        # Queued notifications for each core, as (event, data, detection time) tuples.
+        self._pending: Dict["CoreTarget", List[Tuple[Any, Any, float]]] = {}
+        self._generation = 0
+        self._watch_start: Optional[float] = None
+        self._stats = StateMonitorStatistics()
+        self._thread: Optional[threading.Thread] = None
+        self._shutdown = False
+
+    @property
+    def statistics(self) -> StateMonitorStatistics:
+        """@brief Snapshot of the monitor's counters."""
+        with self._cond:
+            stats = replace(self._stats)
+            if self._watch_start is not None:
+                stats.watch_time += perf_counter() - self._watch_start
+        return stats
+
+    def watch(self, core: "CoreTarget", wake_event: threading.Event, lock: Optional[threading.Lock] = None) -> None:
+        """@brief Start watching a core that was just resumed.
+
+        If the core is already being watched, the poll interval is reset to the minimum. A state read
+        that was in progress when this method is called is discarded, since it may have been made
+        before the core was resumed. So are notifications not yet dispatched.
+
+        @param self
+        @param core The core to watch.
+        @param wake_event Event that is set when a notification for the core is queued.
+        @param lock Optional lock held by the monitor while it reads the core's state.
+        """
+        with self._cond:
+            if self._shutdown:
+                return
+            now = perf_counter()
+            self._generation += 1
+            self._watched[core] = _WatchInfo(self._generation, now, self._min_interval, wake_event, lock)
+            self._pending.pop(core, None)
+            if self._watch_start is None:
+                self._watch_start = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="target-state-monitor", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def unwatch(self, core: "CoreTarget") -> None:
+        """@brief Stop watching a core without waiting for it to halt.
+
+        Notifications for the core that were not yet dispatched are discarded.
+        """
+        with self._cond:
+            self._pending.pop(core, None)
+            if self._watched.pop(core, None) is not None:
+                self._update_watch_time()
+
+    def dispatch_notifications(self, core: "CoreTarget") -> Optional[float]:
+        """@brief Send the queued notifications for a core through the session.
+
+        The notifications are sent from the calling thread.
+
+        @return The perf_counter() time at which the first of the notifications was queued, or None
+            if there were no notifications.
+        """
+        with self._cond:
+            pending = self._pending.pop(core, None)
+        if not pending:
+            return None
+        for event, data, _ in pending:
+            self._session.notify(event, core, data)
+        return pending[0][2]
+
+    def is_watching(self, core: "CoreTarget") -> bool:
+        with self._cond:
+            return core in self._watched
+
+    def stop(self) -> None:
+        """@brief Stop the monitor thread and log its statistics."""
+        with self._cond:
+            self._shutdown = True
+            self._watched.clear()
+            self._update_watch_time()
+            thread = self._thread
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+            stats = self.statistics
+            LOG.debug("Target state monitor: %d polls, %d halts, %d errors; probe utilization %.1f%% of %.1f s; "
+                    "max detection latency %.1f ms", stats.polls, stats.halts, stats.errors,
+                    stats.probe_utilization * 100, stats.watch_time, stats.max_detection_latency * 1000)
+
+    def _update_watch_time(self) -> None:
+        # Must be called with the lock held.
+        if not self._watched and self._watch_start is not None:
+            self._stats.watch_time += perf_counter() - self._watch_start
+            self._watch_start = None
+
+    def _run(self) -> None:
+        while True:
+            # Wait until a watched core is due to be polled.
+            with self._cond:
+                while not self._shutdown:
+                    if self._watched:
+                        core, info = min(self._watched.items(), key=lambda item: item[1].next_poll)
+                        delay = info.next_poll - perf_counter()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+                if self._shutdown:
+                    return
+                generation = info.generation
+                lock = info.lock
+
+            # Read the state without holding our own lock so watch() is never blocked by the probe,
+            # but with the client's lock so the read doesn't interleave with its probe accesses.
+            if lock is not None:
+                # Give up waiting for the lock if the monitor is stopped, in case the client holds it.
+                while not lock.acquire(timeout=self._max_interval):
+                    with self._cond:
+                        if self._shutdown:
+                            return
+            try:
+                with self._cond:
+                    # Skip the read if the core was unwatched or resumed again while waiting for the lock.
+                    current = self._watched.get(core)
+                    if current is None or current.generation != generation:
+                        continue
+                start = perf_counter()
+                error: Optional[Exception] = None
+                reason: Optional[Target.HaltReason] = None
+                try:
+                    state = core.get_state()
+                    if state == Target.State.HALTED:
+                        reason = core.get_halt_reason()
+                except exceptions.Error as err:
+                    error = err
+                end = perf_counter()
+            finally:
+                if lock is not None:
+                    lock.release()
+
+            with self._cond:
+                self._stats.polls += 1
+                self._stats.poll_time += end - start
+                # Drop the result if the core was unwatched or resumed again during the read.
+                current = self._watched.get(core)
+                if current is None or current.generation != generation:
+                    continue
+                info = current
+
+                if error is not None:
+                    self._stats.errors += 1
+                    if not info.did_fail:
+                        LOG.debug("Error reading state of core %d: %s", core.core_number, error)
+                        self._queue_notification(core, info, self.STATE_ERROR_EVENT, error, end)
+                    info.did_fail = True
+                    info.interval = self._max_interval
+                elif reason is not None:
+                    LOG.debug("Core %d halted (%s)", core.core_number, reason.name)
+                    self._stats.halts += 1
+                    self._stats.max_detection_latency = max(self._stats.max_detection_latency,
+                            end - info.last_poll)
+                    del self._watched[core]
+                    self._update_watch_time()
+                    self._queue_notification(core, info, Target.Event.POST_HALT, reason, end)
+                else:
+                    info.did_fail = False
+                    info.interval = min(info.interval * self.BACKOFF_FACTOR, self._max_interval)
+                info.last_poll = end
+                info.next_poll = end + info.interval
+
+    def _queue_notification(self, core: "CoreTarget", info: _WatchInfo, event: Any, data: Any,
+            now: float) -> None:
+        # Must be called with the lock held.
+        self._pending.setdefault(core, []).append((event, data, now))
+        info.wake_event.set()
@@ -19,13 +19,15 @@
 import logging
 import abc
 from dataclasses import dataclass
-from time import time
+from time import (process_time, time)
 from binascii import crc32
 from typing import (Any, List, Optional, Union)
 
 from ..core.target import Target
 from ..core.exceptions import (FlashFailure, FlashProgramFailure)
 from ..core.memory_map import MemoryRegion
+from ..utility.conversion import as_byte_view
+from .fingerprint import (FlashFingerprintDatabase, RegionFingerprint, fingerprint_key, region_crc_blocks)
 from ..utility.mask import same
 
 # Number of bytes in a page to read to quickly determine if the page has the same data
@@ -52,6 +54,7 @@ def get_sector_count(count: int) -> str:
 class ProgrammingInfo:
     program_type: Any = None                # Type of programming performed - FLASH_SECTOR_ERASE or FLASH_CHIP_ERASE
     program_time: float = 0.0               # Total programming time
+    host_cpu_time: float = 0.0              # Host CPU time used by the process while programming
     analyze_type: Any = None                # Type of flash analysis performed - FLASH_ANALYSIS_CRC32 or FLASH_ANALYSIS_PARTIAL_PAGE_READ
     analyze_time: float = 0.0               # Time to analyze flash contents
     total_byte_count: int = 0
@@ -141,12 +144,14 @@ class _FlashPage:
     def __init__(self, page_info):
         self.addr: int = page_info.base_addr
         self.size: int = page_info.size
-        self.data: List[int] = []
+        # Either a slice of the data passed to add_data(), if it covers the whole page, or a
+        # bytearray assembled from several pieces.
+        self.data: Union[bytearray, memoryview] = bytearray()
         self.program_weight: float = page_info.program_weight
         self.erased: Optional[bool] = None # Whether the data all matches the erased value.
         self.same: Optional[bool] = None
         self.crc: int = 0
-        self.cached_estimate_data: Optional[List[int]] = None
+        self.cached_estimate_data: Optional[bytes] = None
 
     def get_program_weight(self):
         """@brief Get time to program a page including the data transfer."""
@@ -227,7 +232,9 @@ class FlashBuilder(MemoryBuilder):
         @param self
         @param addr Base address of the block of data passed to this method. The entire block of
             data must be contained within the flash memory region associated with this instance.
-        @param data Data to be programmed. Should be a list of byte values.
+        @param data Data to be programmed, as a bytes-like object or a list of byte values. Lists
+            and bytearrays are copied once; bytes and memoryview objects are referenced until the
+            data has been programmed.
 
         @exception ValueError Attempt to add overlapping data, or address range of added data is
             outside the address range of the flash region associated with the builder.
@@ -235,6 +242,7 @@ class FlashBuilder(MemoryBuilder):
         # Ignore empty data.
         if len(data) == 0:
             return
+        data = as_byte_view(data)
 
         # Sanity check
         if not self.flash.region.contains_range(start=addr, length=len(data)):
@@ -323,7 +331,7 @@ class FlashBuilder(MemoryBuilder):
                     self._enable_read_access()
                     old_data = self.flash.target.read_memory_block8(page_data_end, old_data_len)
                 else:
-                    old_data = [self.flash.region.erased_byte_value] * old_data_len
+                    old_data = bytes((self.flash.region.erased_byte_value,)) * old_data_len
                 current_page.data.extend(old_data)
                 self.program_byte_count += old_data_len
 
@@ -361,7 +369,7 @@ class FlashBuilder(MemoryBuilder):
                         self._enable_read_access()
                         old_data = self.flash.target.read_memory_block8(page_data_end, old_data_len)
                     else:
-                        old_data = [self.flash.region.erased_byte_value] * old_data_len
+                        old_data = bytes((self.flash.region.erased_byte_value,)) * old_data_len
                     current_page.data.extend(old_data)
                     self.program_byte_count += old_data_len
 
@@ -369,7 +377,11 @@ class FlashBuilder(MemoryBuilder):
                 space_left_in_page = page_info.size - len(current_page.data)
                 space_left_in_data = len(flash_operation.data) - pos
                 amount = min(space_left_in_page, space_left_in_data)
-                current_page.data.extend(flash_operation.data[pos:pos + amount])
+                if amount == page_info.size:
+                    # The operation covers the whole page, so reference its data without copying.
+                    current_page.data = flash_operation.data[pos:pos + amount]
+                else:
+                    current_page.data.extend(flash_operation.data[pos:pos + amount])
                 self.program_byte_count += amount
 
                 #increment position
@@ -394,7 +406,7 @@ class FlashBuilder(MemoryBuilder):
                     raise FlashFailure("attempt to program invalid flash address", address=sector_page_addr)
                 new_page = _FlashPage(page_info)
                 self._enable_read_access()
-                new_page.data = self.flash.target.read_memory_block8(new_page.addr, new_page.size)
+                new_page.data = bytearray(self.flash.target.read_memory_block8(new_page.addr, new_page.size))
                 new_page.same = True
                 sector.add_page(new_page)
                 self.page_list.append(new_page)
@@ -460,6 +472,7 @@ class FlashBuilder(MemoryBuilder):
         # - nRF51       -UICR location far from flash (address 0x10001000)
         # - LPC1768     -Different sized pages
         program_start = time()
+        cpu_start = process_time()
 
         if progress_cb is None:
             progress_cb = _stub_progress
@@ -489,6 +502,12 @@ class FlashBuilder(MemoryBuilder):
         if not smart_flash:
             self._mark_all_pages_for_programming()
 
+        # Use the fingerprints recorded when this region was last programmed, if still valid.
+        fingerprint_db = self._get_fingerprint_database()
+        fingerprint = None
+        if smart_flash and (fingerprint_db is not None):
+            fingerprint = self._apply_fingerprint(fingerprint_db)
+
         # If the flash algo doesn't support erase all, disable chip erase.
         if not self.flash.is_erase_all_supported:
             chip_erase = False
@@ -535,6 +554,9 @@ class FlashBuilder(MemoryBuilder):
             else:
                 flash_operation = self._sector_erase_program(progress_cb)
 
+        if fingerprint_db is not None:
+            self._record_fingerprint(fingerprint_db, None if chip_erase else fingerprint)
+
         # Cleanup flash algo and reset target after programming.
         self.flash.cleanup()
 
@@ -543,6 +565,7 @@ class FlashBuilder(MemoryBuilder):
 
         program_finish = time()
         self.perf.program_time = program_finish - program_start
+        self.perf.host_cpu_time = process_time() - cpu_start
         self.perf.program_type = flash_operation
 
         erase_byte_count = 0
@@ -620,6 +643,79 @@ class FlashBuilder(MemoryBuilder):
     def _compute_sector_erase_pages_weight_min(self):
         return sum(page.get_verify_weight() for page in self.page_list)
 
+    def _get_fingerprint_database(self) -> Optional[FlashFingerprintDatabase]:
+        """@brief Return the flash fingerprint database if enabled and usable for this region."""
+        path = self.flash.target.session.options.get('flash.fingerprint_file')
+        if not path or not self.flash.get_flash_info().crc_supported:
+            return None
+        return FlashFingerprintDatabase(path)
+
+    def _compute_region_crcs(self) -> List[int]:
+        """@brief Compute the CRCs of the entire flash region on the target with one analyzer call."""
+        self._enable_read_access()
+        region = self.flash.region
+        return list(self.flash.compute_crcs(list(region_crc_blocks(region.start, region.length))))
+
+    def _apply_fingerprint(self, fingerprint_db: FlashFingerprintDatabase) -> Optional[RegionFingerprint]:
+        """@brief Decide which pages are unchanged from the recorded fingerprint for this region.
+
+        The fingerprint is only used if the CRC of the entire region computed on the target still
+        matches the recorded value, meaning flash has not been modified since. Pages with a
+        recorded CRC are then marked as the same or not without further analysis. Pages without a
+        recorded CRC are left to the normal analysis.
+
+        @return The recorded fingerprint if it is valid, otherwise None.
+        """
+        key = fingerprint_key(self.flash.target.session, self.flash.region)
+        fingerprint = fingerprint_db.get(key)
+        if fingerprint is None:
+            return None
+        if self._compute_region_crcs() != fingerprint.region_crcs:
+            LOG.debug("Flash fingerprint for %s is out of date", key)
+            return None
+
+        known_count = 0
+        for page in self.page_list:
+            recorded_crc = fingerprint.page_crcs.get(page.addr)
+            if page.same is None and recorded_crc is not None:
+                page.crc = self._compute_page_crc(page)
+                page.same = (page.crc == recorded_crc)
+                known_count += 1
+        LOG.debug("Flash fingerprint matched %d of %d pages", known_count, len(self.page_list))
+        return fingerprint
+
+    def _record_fingerprint(self, fingerprint_db: FlashFingerprintDatabase,
+            previous: Optional[RegionFingerprint]) -> None:
+        """@brief Save the CRCs of the pages now in flash to the fingerprint database.
+
+        @param self
+        @param fingerprint_db The fingerprint database.
+        @param previous The validated fingerprint from before programming, or None. Its page CRCs
+            are kept for pages that were neither programmed nor erased.
+        """
+        key = fingerprint_key(self.flash.target.session, self.flash.region)
+        page_crcs = {} if (previous is None) else previous.page_crcs
+        for sector in self.sector_list:
+            if sector.are_any_pages_not_same():
+                for addr in list(page_crcs):
+                    if sector.addr <= addr < sector.addr + sector.size:
+                        del page_crcs[addr]
+        for page in self.page_list:
+            page_crcs[page.addr] = self._compute_page_crc(page)
+
+        # The algo was inited for programming, so it has to be inited for reading again.
+        self.algo_inited_for_read = False
+        fingerprint_db.put(key, RegionFingerprint(self._compute_region_crcs(), page_crcs))
+
+    @staticmethod
+    def _compute_page_crc(page: _FlashPage) -> int:
+        """@brief CRC of a page's data, padded with 0xFF to the page size."""
+        crc = crc32(page.data)
+        pad_size = page.size - len(page.data)
+        if pad_size > 0:
+            crc = crc32(b'\xff' * pad_size, crc)
+        return crc & 0xFFFFFFFF
+
     def _analyze_pages_with_partial_read(self):
         """@brief Estimate how many pages are the same by reading data.
 
@@ -633,7 +729,7 @@ class FlashBuilder(MemoryBuilder):
             # Analyze pages that haven't been analyzed yet
             if page.same is None:
                 size = min(PAGE_ESTIMATE_SIZE, len(page.data))
-                data = self.flash.target.read_memory_block8(page.addr, size)
+                data = bytes(self.flash.target.read_memory_block8(page.addr, size))
                 page_same = same(data, page.data[0:size])
                 if page_same is False:
                     page.same = False
@@ -661,11 +757,7 @@ class FlashBuilder(MemoryBuilder):
                 sector_list.append((page.addr, page.size))
                 page_list.append(page)
                 # Compute CRC of data (Padded with 0xFF)
-                data = list(page.data)
-                pad_size = page.size - len(page.data)
-                if pad_size > 0:
-                    data.extend([0xFF] * pad_size)
-                page.crc = crc32(bytearray(data)) & 0xFFFFFFFF
+                page.crc = self._compute_page_crc(page)
 
         # Analyze pages
         if len(page_list) > 0:
@@ -883,10 +975,10 @@ class FlashBuilder(MemoryBuilder):
 
             for page in unknown_pages:
                 if page.cached_estimate_data is not None:
-                    data = page.cached_estimate_data
+                    data = bytearray(page.cached_estimate_data)
                     offset = len(data)
                 else:
-                    data = []
+                    data = bytearray()
                     offset = 0
                 assert len(page.data) == page.size, "page data size (%d) != page size (%d)" % (len(page.data), page.size)
                 data.extend(self.flash.target.read_memory_block8(page.addr + offset,
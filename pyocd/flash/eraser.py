@@ -19,6 +19,7 @@ import logging
 from enum import Enum
 
 from ..core.memory_map import MemoryType
+from ..core.target import Target
 
 LOG = logging.getLogger(__name__)
 
@@ -70,17 +71,26 @@ class FlashEraser(object):
         - "0x1000-0x4fff" - erase sectors from 0x1000 up to but not including 0x5000
         - "0x8000+0x800" - erase sectors starting at 0x8000 through 0x87ff
 
+        The PRE_FLASH_PROGRAM and POST_FLASH_PROGRAM target events are sent around the erase so that
+        any cached copies of flash contents are discarded.
+
         @param self
         @param addresses List of addresses or address ranges of the sectors to erase.
         """
-        if self._mode == self.Mode.MASS:
-            self._mass_erase()
-        elif self._mode == self.Mode.CHIP:
-            self._chip_erase()
-        elif self._mode == self.Mode.SECTOR and addresses:
-            self._sector_erase(addresses)
-        else:
+        if self._mode == self.Mode.SECTOR and not addresses:
             LOG.warning("No operation performed")
+            return
+
+        self._session.notify(Target.Event.PRE_FLASH_PROGRAM, self)
+        try:
+            if self._mode == self.Mode.MASS:
+                self._mass_erase()
+            elif self._mode == self.Mode.CHIP:
+                self._chip_erase()
+            else:
+                self._sector_erase(addresses)
+        finally:
+            self._session.notify(Target.Event.POST_FLASH_PROGRAM, self)
 
     def _mass_erase(self):
         LOG.info("Mass erasing device...")
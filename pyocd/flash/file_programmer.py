@@ -16,32 +16,152 @@
 # limitations under the License.
 
 import errno
-import itertools
 import logging
 import os
 from typing import (IO, TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union)
 
 from elftools.elf.elffile import ELFFile
-from intelhex import IntelHex
 
 from ..core import exceptions
 from .loader import (FlashLoader, ProgressCallback)
+from ..utility.conversion import as_byte_view
+from .record_file import (iter_ihex_segments, iter_srec_segments)
 
 if TYPE_CHECKING:
     from ..core.session import Session
 
 LOG = logging.getLogger(__name__)
 
-def ranges(i: List[int]) -> Iterator[Tuple[int, int]]:
-    """Accepts a sorted list of byte addresses. Breaks the addresses into contiguous ranges.
-    Yields 2-tuples of the start and end address for each contiguous range.
-
-    For instance, the input [0, 1, 2, 3, 32, 33, 34, 35] will yield the following 2-tuples:
-    (0, 3) and (32, 35).
+## A segment of image data. An address of None means the start of the target's boot memory.
+ImageSegment = Tuple[Optional[int], memoryview]
+
+def _read_bin(file_obj: IO[bytes], base_address: Optional[int] = None, skip: int = 0,
+        **kwargs: Any) -> Iterator[ImageSegment]:
+    """@brief Binary file format reader."""
+    if not isinstance(skip, int):
+        raise TypeError("skip argument must be an integer")
+    file_obj.seek(skip, os.SEEK_SET)
+    yield base_address, as_byte_view(file_obj.read())
+
+def _read_hex(file_obj: IO[bytes], **kwargs: Any) -> Iterator[ImageSegment]:
+    """@brief Intel hex file format reader."""
+    for addr, data in iter_ihex_segments(file_obj):
+        yield addr, as_byte_view(data)
+
+def _read_srec(file_obj: IO[bytes], **kwargs: Any) -> Iterator[ImageSegment]:
+    """@brief Motorola S-record file format reader."""
+    for addr, data in iter_srec_segments(file_obj):
+        yield addr, as_byte_view(data)
+
+def _read_elf(file_obj: IO[bytes], **kwargs: Any) -> Iterator[ImageSegment]:
+    """@brief ELF file format reader."""
+    elf = ELFFile(file_obj)
+    for segment in elf.iter_segments():
+        addr = segment['p_paddr']
+        if segment.header.p_type == 'PT_LOAD' and segment.header.p_filesz != 0:
+            LOG.debug("Writing segment LMA:0x%08x, VMA:0x%08x, size %d", addr,
+                      segment['p_vaddr'], segment.header.p_filesz)
+            yield addr, as_byte_view(segment.data())
+        else:
+            LOG.debug("Skipping segment LMA:0x%08x, VMA:0x%08x, size %d", addr,
+                      segment['p_vaddr'], segment.header.p_filesz)
+
+## Readers for each supported file format, by file extension.
+_FORMAT_READERS: Dict[str, Callable[..., Iterator[ImageSegment]]] = {
+    'axf': _read_elf,
+    'bin': _read_bin,
+    'elf': _read_elf,
+    'hex': _read_hex,
+    'mot': _read_srec,
+    's19': _read_srec,
+    's28': _read_srec,
+    's37': _read_srec,
+    'srec': _read_srec,
+    }
+
+class ImageFile:
+    """@brief The data from an image file in any supported format.
+
+    The file is read and parsed once when the object is created, so the same image can be
+    programmed into any number of targets with FileProgrammer.program() without reading it again.
+    The image's data is held in read-only buffers that are shared by all targets it is programmed
+    into.
     """
-    for a, b in itertools.groupby(enumerate(i), lambda x: x[1] - x[0]):
-        b = list(b)
-        yield b[0][1], b[-1][1]
+
+    def __init__(self, file_or_path: Union[str, IO[bytes]], file_format: Optional[str] = None,
+            **kwargs: Any) -> None:
+        """@brief Constructor.
+
+        @param self
+        @param file_or_path Either a string that is a path to a file, or a file-like object.
+        @param file_format Optional file format name, one of "bin", "hex", "srec", "elf", "axf". The
+            S-record extensions "s19", "s28", "s37", and "mot" are also accepted. If not provided,
+            the file's extension will be used. If a file object is passed for _file_or_path_ then
+            this parameter must be used to set the format.
+        @param kwargs Optional keyword arguments for format-specific parameters.
+
+        The only current format-specific keyword parameters are for the binary format:
+        - `base_address`: Memory address at which to program the binary data. If not set, the base
+            of the boot memory will be used.
+        - `skip`: Number of bytes to skip at the start of the binary file. Does not affect the
+            base address.
+
+        @exception FileNotFoundError Provided file_or_path string does not reference a file.
+        @exception ValueError Invalid argument value, for instance providing a file object but
+            not setting file_format.
+        """
+        is_path = isinstance(file_or_path, str)
+
+        # Check for valid path first.
+        if is_path and not os.path.isfile(file_or_path): # type: ignore # (type checker doesn't use is_path)
+            raise FileNotFoundError(errno.ENOENT, "No such file: '{}'".format(file_or_path))
+
+        # If no format provided, use the file's extension.
+        if not file_format:
+            if is_path:
+                # Extract the extension from the path.
+                file_format = os.path.splitext(file_or_path)[1][1:] # type: ignore # (type checker doesn't use is_path)
+
+                # Explicitly check for no extension.
+                if file_format == '':
+                    raise ValueError("file path '{}' does not have an extension and "
+                                        "no format is set".format(file_or_path))
+            else:
+                raise ValueError("file object provided but no format is set")
+
+        # Check the format is one we understand.
+        if file_format is None or file_format not in _FORMAT_READERS:
+            raise ValueError("unknown file format '%s'" % file_format)
+
+        self._format = file_format
+
+        # Open the file if a path was provided.
+        if is_path:
+            assert isinstance(file_or_path, str)
+            with open(file_or_path, 'rb') as file_obj:
+                self._segments = list(_FORMAT_READERS[file_format](file_obj, **kwargs))
+        else:
+            assert not isinstance(file_or_path, str)
+            self._segments = list(_FORMAT_READERS[file_format](file_or_path, **kwargs))
+
+    @property
+    def format(self) -> str:
+        """@brief Name of the image's file format."""
+        return self._format
+
+    @property
+    def segments(self) -> List[ImageSegment]:
+        """@brief List of (address, data) tuples for the contiguous segments of the image.
+
+        The address of a binary image is None if no base address was provided, meaning the start
+        of the boot memory of the target it is programmed into.
+        """
+        return self._segments
+
+    @property
+    def size(self) -> int:
+        """@brief Total number of bytes of data in the image."""
+        return sum(len(data) for _, data in self._segments)
 
 class FileProgrammer(object):
     """@brief Class to manage programming a file in any supported format with many options.
@@ -51,9 +171,13 @@ class FileProgrammer(object):
     respecting format-specific options such as the base address for binary files. Then the heavy
     lifting of flash programming is handled by FlashLoader, and beneath that, FlashBuilder.
 
+    Files can also be read once into an ImageFile, which can then be programmed into several
+    targets.
+
     Support file formats are:
     - Binary (.bin)
     - Intel Hex (.hex)
+    - Motorola S-record (.srec, .s19, .s28, .s37, or .mot)
     - ELF (.elf or .axf)
     """
     def __init__(self,
@@ -94,24 +218,21 @@ class FileProgrammer(object):
         self._keep_unwritten = keep_unwritten
         self._no_reset = no_reset
         self._progress = progress
-        self._loader = None
-
-        self._format_handlers: Dict[str, Callable[..., None]] = {
-            'axf': self._program_elf,
-            'bin': self._program_bin,
-            'elf': self._program_elf,
-            'hex': self._program_hex,
-            }
+        self._loader: Optional[FlashLoader] = None
 
-    def program(self, file_or_path: Union[str, IO[bytes]], file_format: Optional[str] = None, **kwargs: Any):
+    def program(self, file_or_path: Union[str, IO[bytes], ImageFile], file_format: Optional[str] = None,
+            **kwargs: Any):
         """@brief Program a file into flash.
 
         @param self
-        @param file_or_path Either a string that is a path to a file, or a file-like object.
-        @param file_format Optional file format name, one of "bin", "hex", "elf", "axf". If not provided,
+        @param file_or_path Either a string that is a path to a file, a file-like object, or an
+            ImageFile.
+        @param file_format Optional file format name, one of "bin", "hex", "srec", "elf", "axf". The
+            S-record extensions "s19", "s28", "s37", and "mot" are also accepted. If not provided,
             the file's extension will be used. If a file object is passed for _file_or_path_ then
-            this parameter must be used to set the format.
-        @param kwargs Optional keyword arguments for format-specific parameters.
+            this parameter must be used to set the format. Ignored for an ImageFile.
+        @param kwargs Optional keyword arguments for format-specific parameters. Ignored for an
+            ImageFile.
 
         The only current format-specific keyword parameters are for the binary format:
         - `base_address`: Memory address at which to program the binary data. If not set, the base
@@ -123,28 +244,10 @@ class FileProgrammer(object):
         @exception ValueError Invalid argument value, for instance providing a file object but
             not setting file_format.
         """
-        is_path = isinstance(file_or_path, str)
-
-        # Check for valid path first.
-        if is_path and not os.path.isfile(file_or_path): # type: ignore # (type checker doesn't use is_path)
-            raise FileNotFoundError(errno.ENOENT, "No such file: '{}'".format(file_or_path))
-
-        # If no format provided, use the file's extension.
-        if not file_format:
-            if is_path:
-                # Extract the extension from the path.
-                file_format = os.path.splitext(file_or_path)[1][1:] # type: ignore # (type checker doesn't use is_path)
-
-                # Explicitly check for no extension.
-                if file_format == '':
-                    raise ValueError("file path '{}' does not have an extension and "
-                                        "no format is set".format(file_or_path))
-            else:
-                raise ValueError("file object provided but no format is set")
-
-        # Check the format is one we understand.
-        if file_format is None or file_format not in self._format_handlers:
-            raise ValueError("unknown file format '%s'" % file_format)
+        if isinstance(file_or_path, ImageFile):
+            image = file_or_path
+        else:
+            image = ImageFile(file_or_path, file_format, **kwargs)
 
         self._loader = FlashLoader(self._session,
                                     progress=self._progress,
@@ -154,84 +257,25 @@ class FileProgrammer(object):
                                     keep_unwritten=self._keep_unwritten,
                                     no_reset=self._no_reset)
 
-        # file_obj = None
-        # Open the file if a path was provided.
-        if is_path:
-            mode = 'rb'
-            if file_format == 'hex':
-                # hex file must be read as plain text file
-                mode = 'r'
-            assert isinstance(file_or_path, str)
-            file_obj = open(file_or_path, mode)
-        else:
-            assert not isinstance(file_or_path, str)
-            file_obj = file_or_path
-        try:
-
-            # Pass to the format-specific programmer.
-            self._format_handlers[file_format](file_obj, **kwargs)
-            self._loader.commit()
-        finally:
-            if is_path and file_obj is not None:
-                file_obj.close()
-
-    def _program_bin(self, file_obj: IO[bytes], **kwargs: Any) -> None:
-        """@brief Binary file format loader"""
-        assert self._loader
-
-        # If no base address is specified use the start of the boot memory.
-        address = kwargs.get('base_address', None)
-        if address is None:
-            assert self._session.target
-            boot_memory = self._session.target.memory_map.get_boot_memory()
-            if boot_memory is None:
-                raise exceptions.TargetSupportError("No boot memory is defined for this device")
-            address = boot_memory.start
-        assert isinstance(address, int)
-
-        skip_offset = kwargs.get('skip', 0)
-        if not isinstance(skip_offset, int):
-            raise TypeError("skip argument must be an integer")
-        file_obj.seek(skip_offset, os.SEEK_SET)
-        data = list(bytearray(file_obj.read()))
-
-        self._loader.add_data(address, data)
-
-    def _program_hex(self, file_obj: IO[bytes], **kwargs: Any) -> None:
-        """Intel hex file format loader"""
-        assert self._loader
-
-        hexfile = IntelHex(file_obj)
-        addresses = hexfile.addresses()
-        addresses.sort()
-
-        data_list = list(ranges(addresses))
-        for start, end in data_list:
-            size = end - start + 1
-            data = list(hexfile.tobinarray(start=start, size=size))
+        for address, data in image.segments:
+            # If no base address is specified use the start of the boot memory.
+            if address is None:
+                assert self._session.target
+                boot_memory = self._session.target.memory_map.get_boot_memory()
+                if boot_memory is None:
+                    raise exceptions.TargetSupportError("No boot memory is defined for this device")
+                address = boot_memory.start
+
             # Ignore invalid addresses for HEX files only
             # Binary files (obviously) don't contain addresses
             # For ELF files, any metadata that's not part of the application code
             # will be held in a section that doesn't have the SHF_WRITE flag set
-            try:
-                self._loader.add_data(start, data)
-            except ValueError as e:
-                LOG.warning("Failed to add data chunk: %s", e)
-
-    def _program_elf(self, file_obj: IO[bytes], **kwargs: Any) -> None:
-        assert self._loader
-
-        elf = ELFFile(file_obj)
-        for segment in elf.iter_segments():
-            addr = segment['p_paddr']
-            if segment.header.p_type == 'PT_LOAD' and segment.header.p_filesz != 0:
-                data = bytearray(segment.data())
-                LOG.debug("Writing segment LMA:0x%08x, VMA:0x%08x, size %d", addr,
-                          segment['p_vaddr'], segment.header.p_filesz)
+            if image.format == 'bin':
+                self._loader.add_data(address, data)
+            else:
                 try:
-                    self._loader.add_data(addr, data)
+                    self._loader.add_data(address, data)
                 except ValueError as e:
                     LOG.warning("Failed to add data chunk: %s", e)
-            else:
-                LOG.debug("Skipping segment LMA:0x%08x, VMA:0x%08x, size %d", addr,
-                          segment['p_vaddr'], segment.header.p_filesz)
+
+        self._loader.commit()
@@ -0,0 +1,136 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import threading
+from dataclasses import (dataclass, field)
+from typing import (Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING)
+
+if TYPE_CHECKING:
+    from ..core.memory_map import MemoryRegion
+    from ..core.session import Session
+
+LOG = logging.getLogger(__name__)
+
+## Serialises read-modify-write cycles on fingerprint files within this process.
+_FILE_LOCK = threading.Lock()
+
+@dataclass
+class RegionFingerprint:
+    """@brief Flash contents recorded for one region after it was programmed."""
+    ## CRCs of the whole region, as computed on the target for the blocks from region_crc_blocks().
+    region_crcs: List[int]
+    ## Dict of CRC of page data by page address.
+    page_crcs: Dict[int, int] = field(default_factory=dict)
+
+def region_crc_blocks(start: int, length: int) -> Iterator[Tuple[int, int]]:
+    """@brief Split an address range into blocks the CRC analyzer can process.
+
+    The analyzer requires each block to have a power of two size and be aligned to its size. The
+    largest possible blocks are used, so a typical flash region is covered by only a few blocks.
+
+    @return Iterator of (address, size) tuples.
+    """
+    addr = start
+    end = start + length
+    while addr < end:
+        size = (addr & -addr) if addr else (1 << (end - addr).bit_length())
+        while addr + size > end:
+            size >>= 1
+        yield addr, size
+        addr += size
+
+def fingerprint_key(session: "Session", region: "MemoryRegion") -> str:
+    """@brief Build the key identifying a flash region of one connected board."""
+    assert session.probe and session.target
+    return "{}/{}/{}@{:#010x}".format(session.probe.unique_id, session.target.part_number,
+            region.name, region.start)
+
+class FlashFingerprintDatabase:
+    """@brief On-disk record of the flash page CRCs last programmed into each board.
+
+    The database is a JSON file containing a RegionFingerprint for each flash region that has been
+    programmed, keyed by the debug probe's unique ID, the target type, and the region. Together with
+    a CRC of the entire region computed on the target, which confirms that flash has not been
+    changed by other means since it was recorded, this lets FlashBuilder decide which pages need to
+    be programmed without analyzing each page.
+
+    The file is rewritten atomically, and updates from multiple threads are serialised. Concurrent
+    updates from separate processes can lose an entry, which only means that the affected region
+    is analyzed normally the next time it is programmed.
+    """
+
+    ## Version number of the file format.
+    VERSION = 1
+
+    def __init__(self, path: str) -> None:
+        self._path = os.path.expanduser(path)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self._path, 'r') as f:
+                contents = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as err:
+            LOG.warning("Ignoring unreadable flash fingerprint file %s: %s", self._path, err)
+            return {}
+        if not isinstance(contents, dict) or contents.get('version') != self.VERSION:
+            LOG.debug("Ignoring flash fingerprint file %s with unsupported version", self._path)
+            return {}
+        return contents.get('regions', {})
+
+    def get(self, key: str) -> Optional[RegionFingerprint]:
+        """@brief Return the fingerprint recorded for a region, or None."""
+        with _FILE_LOCK:
+            entry = self._load().get(key)
+        if entry is None:
+            return None
+        try:
+            return RegionFingerprint(
+                    region_crcs=[int(crc) for crc in entry['region_crcs']],
+                    page_crcs={int(addr, 0): int(crc) for addr, crc in entry['pages'].items()},
+                    )
+        except (KeyError, TypeError, ValueError, AttributeError):
+            LOG.debug("Ignoring malformed flash fingerprint for %s", key)
+            return None
+
+    def put(self, key: str, fingerprint: Optional[RegionFingerprint]) -> None:
+        """@brief Record the fingerprint for a region, or remove it if _fingerprint_ is None."""
+        with _FILE_LOCK:
+            regions = self._load()
+            if fingerprint is None:
+                if regions.pop(key, None) is None:
+                    return
+            else:
+                regions[key] = {
+                    'region_crcs': fingerprint.region_crcs,
+                    'pages': {"%#010x" % addr: crc for addr, crc in sorted(fingerprint.page_crcs.items())},
+                    }
+
+            temp_path = "%s.%d.tmp" % (self._path, os.getpid())
+            try:
+                with open(temp_path, 'w') as f:
+                    json.dump({'version': self.VERSION, 'regions': regions}, f)
+                os.replace(temp_path, self._path)
+            except OSError as err:
+                LOG.warning("Unable to write flash fingerprint file %s: %s", self._path, err)
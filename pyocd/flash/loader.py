@@ -25,6 +25,7 @@ from typing import (TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union, c
 from ..core import exceptions
 from ..core.memory_map import RamRegion
 from ..core.target import Target
+from ..utility.conversion import as_byte_view
 from ..utility.progress import print_progress
 from .builder import (FlashBuilder, MemoryBuilder, ProgrammingInfo, get_page_count, get_sector_count)
 
@@ -39,7 +40,7 @@ ProgressCallback = Callable[[Union[int, float]], None]
 @dataclass
 class DataChunk:
     addr: int
-    data: Union[bytes, bytearray]
+    data: memoryview
 
 class RamBuilder(MemoryBuilder):
     """@brief Memory builder for writing potentially discontiguous data to RAM."""
@@ -55,13 +56,13 @@ class RamBuilder(MemoryBuilder):
         self._region = region
         self._chunks: List[DataChunk] = []
 
-    def add_data(self, addr: int, data: Union[bytes, bytearray]) -> None:
+    def add_data(self, addr: int, data: Union[bytes, bytearray, memoryview, List[int]]) -> None:
         # Make sure this address range is contained by our region.
         if not self._region.contains_range(start=addr, length=len(data)):
             raise ValueError(f"Attempt to add data ({addr:#010x}-{addr + len(data) - 1:#010x}) outside "
                               "of RAM builder region {self._region}")
 
-        self._chunks.append(DataChunk(addr, bytearray(data)))
+        self._chunks.append(DataChunk(addr, as_byte_view(data)))
         self._chunks.sort(key=lambda c: c.addr)
         self._buffered_data_size += len(data)
 
@@ -217,7 +218,8 @@ class MemoryLoader:
 
         @param self
         @param address Integer address for where the first byte of _data_ should be written.
-        @param data A list of byte values to be programmed at the given address.
+        @param data Data to be programmed at the given address, as a bytes-like object or a list
+            of byte values. The data is split between regions as slices of a single buffer.
 
         @return The MemoryLoader instance is returned, to allow chaining further add_data()
             calls or a call to commit().
@@ -227,6 +229,7 @@ class MemoryLoader:
             instance associated with it, which indicates that the target connect sequence did
             not run successfully.
         """
+        data = as_byte_view(data)
         while len(data):
             # Look up the memory region for this address.
             region = self._map.get_region_for_address(address)
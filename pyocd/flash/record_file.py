@@ -0,0 +1,180 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""@brief Streaming readers for Intel HEX and Motorola S-record files.
+
+Both readers process a file one record at a time and merge the data of consecutive records into
+contiguous segments. Each segment is yielded as soon as a record that does not continue it is
+seen, so memory use is bounded by the size of the largest contiguous segment rather than by the
+number of bytes in the file times the size of a Python int.
+"""
+
+from typing import (Iterable, Iterator, Optional, Tuple, Union)
+
+from ..core import exceptions
+
+## A contiguous run of data from a record file, as a tuple of start address and data.
+Segment = Tuple[int, bytearray]
+
+class RecordFileError(exceptions.Error):
+    """@brief Malformed record in an Intel HEX or S-record file."""
+
+    def __init__(self, message: str, line_number: Optional[int] = None) -> None:
+        if line_number is not None:
+            message = "line %d: %s" % (line_number, message)
+        super().__init__(message)
+        self.line_number = line_number
+
+# Intel HEX record types.
+IHEX_DATA = 0
+IHEX_EOF = 1
+IHEX_EXTENDED_SEGMENT_ADDRESS = 2
+IHEX_START_SEGMENT_ADDRESS = 3
+IHEX_EXTENDED_LINEAR_ADDRESS = 4
+IHEX_START_LINEAR_ADDRESS = 5
+
+## Address field length in bytes for each S-record type that carries data.
+SREC_DATA_ADDRESS_SIZES = {
+    '1': 2,
+    '2': 3,
+    '3': 4,
+    }
+
+## S-record types that carry no data: header, record counts, and start addresses.
+SREC_OTHER_TYPES = ('0', '5', '6', '7', '8', '9')
+
+def _decode_lines(file_obj: Iterable[Union[str, bytes]]) -> Iterator[Tuple[int, str]]:
+    """@brief Yield stripped, non-empty lines as str with their 1-based line numbers."""
+    for line_number, line in enumerate(file_obj, 1):
+        if isinstance(line, bytes):
+            line = line.decode('ascii', errors='replace')
+        line = line.strip()
+        if line:
+            yield line_number, line
+
+def _hex_to_bytes(text: str, line_number: int) -> bytes:
+    try:
+        return bytes.fromhex(text)
+    except ValueError:
+        raise RecordFileError("invalid hex digits", line_number) from None
+
+class _SegmentMerger:
+    """@brief Accumulates record data into contiguous segments."""
+
+    def __init__(self) -> None:
+        self._start = 0
+        self._end = 0
+        self._data = bytearray()
+
+    def add(self, addr: int, data: bytes) -> Optional[Segment]:
+        """@brief Add the data of one record.
+        @return The previous segment if _addr_ does not continue it, otherwise None.
+        """
+        if self._data and addr == self._end:
+            self._data += data
+            self._end += len(data)
+            return None
+        result = self.flush()
+        self._start = addr
+        self._end = addr + len(data)
+        self._data = bytearray(data)
+        return result
+
+    def flush(self) -> Optional[Segment]:
+        """@brief Return the current segment, if any, and start a new one."""
+        if not self._data:
+            return None
+        # The buffer is handed over rather than copied, since a new one is started.
+        result = (self._start, self._data)
+        self._data = bytearray()
+        return result
+
+def iter_ihex_segments(file_obj: Iterable[Union[str, bytes]]) -> Iterator[Segment]:
+    """@brief Read contiguous data segments from an Intel HEX file.
+
+    @param file_obj File object opened in either text or binary mode, or any other iterable of
+        lines.
+    @return Iterator of (address, data) tuples in file order. Records that are not contiguous with
+        the previous record start a new segment, so out of order files produce more segments.
+
+    @exception RecordFileError A record is malformed or has an invalid checksum.
+    """
+    merger = _SegmentMerger()
+    base = 0
+    for line_number, line in _decode_lines(file_obj):
+        if line[0] != ':':
+            raise RecordFileError("record does not start with ':'", line_number)
+        record = _hex_to_bytes(line[1:], line_number)
+        if len(record) < 5 or len(record) != record[0] + 5:
+            raise RecordFileError("invalid record length", line_number)
+        if sum(record) & 0xff:
+            raise RecordFileError("checksum mismatch", line_number)
+
+        record_type = record[3]
+        if record_type == IHEX_DATA:
+            segment = merger.add(base + ((record[1] << 8) | record[2]), record[4:-1])
+            if segment is not None:
+                yield segment
+        elif record_type == IHEX_EOF:
+            break
+        elif record_type in (IHEX_EXTENDED_SEGMENT_ADDRESS, IHEX_EXTENDED_LINEAR_ADDRESS):
+            if record[0] != 2:
+                raise RecordFileError("invalid extended address record", line_number)
+            shift = 4 if (record_type == IHEX_EXTENDED_SEGMENT_ADDRESS) else 16
+            base = ((record[4] << 8) | record[5]) << shift
+        elif record_type not in (IHEX_START_SEGMENT_ADDRESS, IHEX_START_LINEAR_ADDRESS):
+            raise RecordFileError("unknown record type %d" % record_type, line_number)
+
+    segment = merger.flush()
+    if segment is not None:
+        yield segment
+
+def iter_srec_segments(file_obj: Iterable[Union[str, bytes]]) -> Iterator[Segment]:
+    """@brief Read contiguous data segments from a Motorola S-record file.
+
+    S1, S2, and S3 data records are supported. All other valid record types are ignored.
+
+    @param file_obj File object opened in either text or binary mode, or any other iterable of
+        lines.
+    @return Iterator of (address, data) tuples in file order.
+
+    @exception RecordFileError A record is malformed or has an invalid checksum.
+    """
+    merger = _SegmentMerger()
+    for line_number, line in _decode_lines(file_obj):
+        if line[0] not in 'Ss' or len(line) < 2:
+            raise RecordFileError("record does not start with 'S'", line_number)
+        record_type = line[1]
+        record = _hex_to_bytes(line[2:], line_number)
+        if len(record) < 2 or len(record) != record[0] + 1:
+            raise RecordFileError("invalid record length", line_number)
+        if (sum(record) & 0xff) != 0xff:
+            raise RecordFileError("checksum mismatch", line_number)
+
+        addr_size = SREC_DATA_ADDRESS_SIZES.get(record_type)
+        if addr_size is not None:
+            if len(record) < addr_size + 2:
+                raise RecordFileError("invalid record length", line_number)
+            addr = int.from_bytes(record[1:addr_size + 1], 'big')
+            segment = merger.add(addr, record[addr_size + 1:-1])
+            if segment is not None:
+                yield segment
+        elif record_type not in SREC_OTHER_TYPES:
+            raise RecordFileError("unknown record type S%s" % record_type, line_number)
+
+    segment = merger.flush()
+    if segment is not None:
+        yield segment
@@ -18,13 +18,15 @@
 
 import logging
 import threading
-from time import sleep
+from time import (perf_counter, sleep)
 import sys
 import io
 from xml.etree.ElementTree import (Element, SubElement, tostring)
 from typing import (Dict, List, Optional, Tuple)
 
 from ..core import exceptions
+from ..core.memory_map import MemoryType
+from ..core.soc_target import SoCTarget
 from ..core.target import Target
 from ..flash.loader import FlashLoader
 from ..utility.cmdline import convert_vector_catch
@@ -60,40 +62,64 @@ TRACE_MEM.setLevel(logging.CRITICAL)
 def unescape(data: bytes) -> List[int]:
     """@brief De-escapes binary data from Gdb.
 
+    The data is split on the '}' escape character, so each escaped byte is the first byte of one of
+    the resulting parts. The one exception is an escaped '}' character produced by an escape of 0x5d,
+    which appears as an empty part.
+
     @param data Bytes-like object with possibly escaped values.
     @return List of integers in the range 0-255, with all escaped bytes de-escaped.
     """
-    data_idx = 0
-
-    # unpack the data into binary array
-    result = list(data)
-
-    # check for escaped characters
-    while data_idx < len(result):
-        if result[data_idx] == 0x7d:
-            result.pop(data_idx)
-            result[data_idx] = result[data_idx] ^ 0x20
-        data_idx += 1
-
-    return result
-
-## Tuple of int values of characters that must be escaped.
-_GDB_ESCAPED_CHARS = tuple(b'#$}*')
+    parts = bytes(data).split(b'}')
+    result = bytearray(parts[0])
+    is_escaped = True
+    for part in parts[1:]:
+        if not is_escaped:
+            result += part
+            is_escaped = True
+        elif part:
+            result.append(part[0] ^ 0x20)
+            result += part[1:]
+        else:
+            # The escaped byte is the '}' that ends this empty part.
+            result.append(0x7d ^ 0x20)
+            is_escaped = False
+    return list(result)
 
-def escape(data):
+def escape(data: bytes) -> bytes:
     """@brief Escape binary data to be sent to Gdb.
 
     @param data Bytes-like object containing raw binary.
     @return Bytes object with the characters in '#$}*' escaped as required by Gdb.
     """
-    result: List[int] = []
-    for c in data:
-        if c in _GDB_ESCAPED_CHARS:
-            # Escape by prefixing with '}' and xor'ing the char with 0x20.
-            result += [0x7d, c ^ 0x20]
-        else:
-            result.append(c)
-    return bytes(result)
+    # Escape by prefixing with '}' and xor'ing the char with 0x20. '}' must be escaped first, since
+    # the other replacements insert it. None of them insert another character that needs escaping.
+    return (bytes(data)
+            .replace(b'}', b'}]')
+            .replace(b'#', b'}\x03')
+            .replace(b'$', b'}\x04')
+            .replace(b'*', b'}\x0a'))
+
+## Smallest and largest packet sizes advertised to gdb.
+MIN_PACKET_SIZE = 2048
+MAX_PACKET_SIZE = 64 * 1024
+
+## Ratio of the time to transfer a packet's data to the fixed cost per packet.
+#
+# Each memory read or write packet costs at least one probe round trip in addition to the transfer
+# itself, so packets should be large enough that this overhead is a small part of the total.
+PACKET_TRANSFER_TO_OVERHEAD_RATIO = 32
+
+def choose_packet_size(latency: float, throughput: float) -> int:
+    """@brief Choose the packet size to advertise to gdb for a probe's performance.
+
+    @param latency Seconds for a single probe round trip.
+    @param throughput Bytes per second for a large block read.
+    @return A power of two between MIN_PACKET_SIZE and MAX_PACKET_SIZE. The size is twice the data
+        size, since memory read replies are hex encoded.
+    """
+    data_size = throughput * latency * PACKET_TRANSFER_TO_OVERHEAD_RATIO
+    size = 1 << max(0, int(2 * data_size) - 1).bit_length()
+    return min(max(size, MIN_PACKET_SIZE), MAX_PACKET_SIZE)
 
 class GDBServer(threading.Thread):
     """@brief GDB remote server thread.
@@ -108,6 +134,15 @@ class GDBServer(threading.Thread):
     ## Timer delay for sending the notification that the server is listening.
     START_LISTENING_NOTIFY_DELAY = 0.03 # 30 ms
 
+    ## Interval for polling RTT and retrying failed status checks while the target is running.
+    RUN_POLL_INTERVAL = 0.01 # 10 ms
+
+    ## Longest wait for the target to halt before checking for shutdown.
+    RUN_WAKE_TIMEOUT = 0.1 # 100 ms
+
+    ## Size of the RAM read used to measure probe throughput.
+    THROUGHPUT_SAMPLE_SIZE = 16 * 1024
+
     def __init__(self, session, core=None):
         super().__init__()
         self.session = session
@@ -148,7 +183,8 @@ class GDBServer(threading.Thread):
                 'soft_bkpt_as_hard',
                 ])
 
-        self.packet_size = 2048
+        self.packet_size = session.options.get('gdbserver_packet_size') or MIN_PACKET_SIZE
+        self._did_choose_packet_size = session.options.is_set('gdbserver_packet_size')
         self.packet_io = None
         self.gdb_features = []
         self.non_stop = False
@@ -180,6 +216,13 @@ class GDBServer(threading.Thread):
 
         self.session.subscribe(self.event_handler, Target.Event.POST_RESET)
 
+        # While the target is running after a resume, this event is set when the session's target
+        # state monitor queues a notification that the running core halted or failed a state check,
+        # or when ctrl-c is received.
+        self._run_wake_event = threading.Event()
+        self._run_core = None
+        self._run_halt_time = 0.0
+
         # Init semihosting and telnet console.
         if self.semihost_use_syscalls:
             semihost_io_handler = GDBSyscallIOHandler(self)
@@ -281,6 +324,7 @@ class GDBServer(threading.Thread):
     def stop(self, wait=True):
         if self.is_alive():
             self.shutdown_event.set()
+            self._run_wake_event.set()
             if wait:
                 LOG.debug("gdbserver shutdown event set; waiting for exit")
                 self.join()
@@ -329,7 +373,7 @@ class GDBServer(threading.Thread):
                 while not self.shutdown_event.is_set():
                     connected = self.abstract_socket.connect()
                     if connected != None:
-                        self.packet_io = GDBServerPacketIOThread(self.abstract_socket)
+                        self.packet_io = GDBServerPacketIOThread(self.abstract_socket, self._run_wake_event)
                         break
 
                 if self.shutdown_event.is_set():
@@ -358,17 +402,18 @@ class GDBServer(threading.Thread):
                 if self.packet_io.interrupt_event.is_set():
                     if self.non_stop:
                         self.target.halt()
-                        self.is_target_running = False
+                        self._stop_non_stop_run()
                         self.send_stop_notification()
                     else:
                         LOG.warning("Got unexpected ctrl-c, ignoring")
                     self.packet_io.interrupt_event.clear()
 
-                if self.non_stop and self.is_target_running:
+                # The target state monitor tells us when the running core may have halted.
+                if self.non_stop and self.is_target_running and self._dispatch_run_state():
                     try:
                         if self.target.get_state() == Target.State.HALTED:
                             LOG.debug("state halted")
-                            self.is_target_running = False
+                            self._stop_non_stop_run()
                             self.send_stop_notification()
                     except Exception as e:
                         LOG.error("Unexpected exception: %s", e, exc_info=self.session.log_tracebacks)
@@ -583,7 +628,13 @@ class GDBServer(threading.Thread):
 
     def resume(self, data):
 #         addr = self._get_resume_step_addr(data)
+        monitor = self.session.state_monitor
+        core = self._get_run_core()
+        self._run_core = core
+        self._run_wake_event.clear()
+
         self.target.resume()
+        monitor.watch(core, self._run_wake_event, self.lock)
         LOG.debug("target resumed")
 
         if self.first_run_after_reset_or_flash:
@@ -597,76 +648,97 @@ class GDBServer(threading.Thread):
         # also serves as a flag that a fault occurred and we're attempting to retry.
         fault_retry_timeout = Timeout(self.session.options.get('debug.status_fault_retry_timeout'))
 
-        while fault_retry_timeout.check():
-            if self.shutdown_event.is_set():
-                self.packet_io.interrupt_event.clear()
-                return self.create_rsp_packet(val)
+        try:
+            while fault_retry_timeout.check():
+                if self.shutdown_event.is_set():
+                    self.packet_io.interrupt_event.clear()
+                    return self.create_rsp_packet(val)
 
-            self.lock.release()
+                self.lock.release()
+
+                # Wait for the state monitor to report a halt or error, or for a ctrl-c. Wake
+                # periodically while RTT is enabled or we're retrying after a fault.
+                if fault_retry_timeout.is_running or self.rtt_server:
+                    wait_time = self.RUN_POLL_INTERVAL
+                else:
+                    wait_time = self.RUN_WAKE_TIMEOUT
+                self._run_wake_event.wait(wait_time)
+                self._run_wake_event.clear()
+
+                # Check for a ctrl-c.
+                if self.packet_io.interrupt_event.is_set():
+                    self.lock.acquire()
+                    LOG.debug("receive CTRL-C")
+                    self.packet_io.interrupt_event.clear()
+
+                    # Be careful about reading the target state. If we previously got a fault (the timeout
+                    # is running) then ignore the error. In all cases we still return SIGINT.
+                    try:
+                        self.target.halt()
+                        val = self.get_t_response(forceSignal=signals.SIGINT)
+                    except exceptions.TransferError as e:
+                        # Note: if the target is not actually halted, gdb can get confused from this point on.
+                        # But there's not much we can do if we're getting faults attempting to control it.
+                        if not fault_retry_timeout.is_running:
+                            LOG.error('Error reading target status: %s', e, exc_info=self.session.log_tracebacks)
+                        val = ('S%02x' % signals.SIGINT).encode()
+                    break
 
-            # Wait for a ctrl-c to be received.
-            if self.packet_io.interrupt_event.wait(0.01):
                 self.lock.acquire()
-                LOG.debug("receive CTRL-C")
-                self.packet_io.interrupt_event.clear()
 
-                # Be careful about reading the target state. If we previously got a fault (the timeout
-                # is running) then ignore the error. In all cases we still return SIGINT.
                 try:
-                    self.target.halt()
-                    val = self.get_t_response(forceSignal=signals.SIGINT)
+                    if self.rtt_server:
+                        self.rtt_server.poll()
+
+                    # The target state only needs to be read after the monitor reports a change, or
+                    # while retrying after a fault.
+                    if not (self._dispatch_run_state() or fault_retry_timeout.is_running):
+                        continue
+
+                    state = self.target.get_state()
+
+                    # If we were able to successfully read the target state after previously receiving a fault,
+                    # then clear the timeout.
+                    if fault_retry_timeout.is_running:
+                        LOG.info("Target control reestablished.")
+                        fault_retry_timeout.clear()
+
+                    if state == Target.State.HALTED:
+                        # Handle semihosting
+                        if self.enable_semihosting:
+                            was_semihost = self.semihost.check_and_handle_semihost_request()
+
+                            if was_semihost:
+                                self.target.resume()
+                                monitor.watch(core, self._run_wake_event, self.lock)
+                                continue
+
+                        pc = self.target_context.read_core_register('pc')
+                        LOG.debug("state halted; pc=0x%08x", pc)
+                        val = self.get_t_response()
+                        LOG.debug("stop reply ready %.2f ms after halt was detected",
+                                (perf_counter() - self._run_halt_time) * 1000)
+                        break
                 except exceptions.TransferError as e:
-                    # Note: if the target is not actually halted, gdb can get confused from this point on.
-                    # But there's not much we can do if we're getting faults attempting to control it.
+                    # If we get any sort of transfer error or fault while checking target status, then start
+                    # a timeout running. Upon a later successful status check, the timeout is cleared. In the event
+                    # that the timeout expires, this loop is exited and an error raised to gdb.
                     if not fault_retry_timeout.is_running:
-                        LOG.error('Error reading target status: %s', e, exc_info=self.session.log_tracebacks)
-                    val = ('S%02x' % signals.SIGINT).encode()
-                break
-
-            self.lock.acquire()
-
-            try:
-                state = self.target.get_state()
-
-                if self.rtt_server:
-                    self.rtt_server.poll()
-
-                # If we were able to successfully read the target state after previously receiving a fault,
-                # then clear the timeout.
-                if fault_retry_timeout.is_running:
-                    LOG.info("Target control reestablished.")
-                    fault_retry_timeout.clear()
-
-                if state == Target.State.HALTED:
-                    # Handle semihosting
-                    if self.enable_semihosting:
-                        was_semihost = self.semihost.check_and_handle_semihost_request()
-
-                        if was_semihost:
-                            self.target.resume()
-                            continue
-
-                    pc = self.target_context.read_core_register('pc')
-                    LOG.debug("state halted; pc=0x%08x", pc)
-                    val = self.get_t_response()
+                        LOG.warning("Transfer error while checking target status; retrying: %s", e,
+                                exc_info=self.session.log_tracebacks)
+                    fault_retry_timeout.start()
+                except exceptions.Error as e:
+                    try:
+                        self.target.halt()
+                    except exceptions.Error:
+                        pass
+                    LOG.warning('Error while target was running: %s', e, exc_info=self.session.log_tracebacks)
+                    # This exception was not a transfer error, so reading the target state should be ok.
+                    val = ('S%02x' % self.target_facade.get_signal_value()).encode()
                     break
-            except exceptions.TransferError as e:
-                # If we get any sort of transfer error or fault while checking target status, then start
-                # a timeout running. Upon a later successful status check, the timeout is cleared. In the event
-                # that the timeout expires, this loop is exited and an error raised to gdb.
-                if not fault_retry_timeout.is_running:
-                    LOG.warning("Transfer error while checking target status; retrying: %s", e,
-                            exc_info=self.session.log_tracebacks)
-                fault_retry_timeout.start()
-            except exceptions.Error as e:
-                try:
-                    self.target.halt()
-                except exceptions.Error:
-                    pass
-                LOG.warning('Error while target was running: %s', e, exc_info=self.session.log_tracebacks)
-                # This exception was not a transfer error, so reading the target state should be ok.
-                val = ('S%02x' % self.target_facade.get_signal_value()).encode()
-                break
+        finally:
+            monitor.unwatch(core)
+            self._run_core = None
 
         # Check if we exited the above loop due to a timeout after a fault.
         if fault_retry_timeout.did_time_out:
@@ -766,7 +838,9 @@ class GDBServer(threading.Thread):
 
         if thread_actions[currentThread][0:1] in (b'c', b'C'):
             if self.non_stop:
+                self._run_core = self._get_run_core()
                 self.target.resume()
+                self.session.state_monitor.watch(self._run_core, self._run_wake_event, self.lock)
                 self.is_target_running = True
                 return self.create_rsp_packet(b"OK")
             else:
@@ -790,7 +864,7 @@ class GDBServer(threading.Thread):
                 return self.create_rsp_packet(b"")
             self.packet_io.send(self.create_rsp_packet(b"OK"))
             self.target.halt()
-            self.is_target_running = False
+            self._stop_non_stop_run()
             self.send_stop_notification(forceSignal=0)
         else:
             LOG.error("Unsupported v_cont action '%s'" % thread_actions[1])
@@ -935,6 +1009,9 @@ class GDBServer(threading.Thread):
             # Save features sent by gdb.
             self.gdb_features = query[1].split(b';')
 
+            if not self._did_choose_packet_size:
+                self._choose_packet_size()
+
             # Build our list of features.
             features = [b'qXfer:features:read+', b'QStartNoAckMode+', b'qXfer:threads:read+', b'QNonStop+']
             features.append(b'PacketSize=' + (hex(self.packet_size).encode())[2:])
@@ -1245,6 +1322,62 @@ class GDBServer(threading.Thread):
         except exceptions.Error:
             return None
 
+    def _choose_packet_size(self):
+        """@brief Set the packet size from the measured probe throughput.
+
+        The latency of a single word read and the time for a larger block read from the default RAM
+        region give the probe's round trip time and throughput. If RAM can't be read, the packet
+        size is left unchanged.
+        """
+        self._did_choose_packet_size = True
+        region = self.target.get_memory_map().get_default_region_of_type(MemoryType.RAM)
+        if region is None:
+            return
+        words = min(region.length, self.THROUGHPUT_SAMPLE_SIZE) // 4
+
+        def timed_read(count):
+            start = perf_counter()
+            self.target.read_memory_block32(region.start, count)
+            return perf_counter() - start
+
+        try:
+            latency = min(timed_read(1) for _ in range(3))
+            block_time = min(timed_read(words) for _ in range(2))
+        except exceptions.Error as e:
+            LOG.debug("Unable to measure probe throughput: %s", e)
+            return
+
+        throughput = (words - 1) * 4 / max(block_time - latency, 1e-6)
+        self.packet_size = choose_packet_size(latency, throughput)
+        self.abstract_socket.packet_size = self.packet_size
+        LOG.info("Probe latency %.2f ms, throughput %.1f kB/s; using packet size %d",
+                latency * 1000, throughput / 1024, self.packet_size)
+
+    def _get_run_core(self):
+        """@brief Return the core that a resume operation runs."""
+        return self.target.selected_core if isinstance(self.target, SoCTarget) else self.target
+
+    def _stop_non_stop_run(self):
+        """@brief Note that the target is no longer running in non-stop mode."""
+        self.is_target_running = False
+        if self._run_core is not None:
+            self.session.state_monitor.unwatch(self._run_core)
+            self._run_core = None
+
+    def _dispatch_run_state(self):
+        """@brief Send notifications queued by the target state monitor for the running core.
+
+        The POST_HALT or state error notifications are sent from this thread rather than from the
+        monitor's thread.
+
+        @return Boolean indicating whether the running core may have changed state.
+        """
+        detect_time = self.session.state_monitor.dispatch_notifications(self._run_core)
+        if detect_time is None:
+            return False
+        self._run_halt_time = detect_time
+        return True
+
     def event_handler(self, notification):
         if notification.event == Target.Event.POST_RESET:
             # Invalidate threads list if flash is reprogrammed.
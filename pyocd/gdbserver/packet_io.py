@@ -22,6 +22,11 @@ import socket
 
 CTRL_C = b'\x03'
 
+# Int values of RSP framing characters.
+PACKET_START = ord('$')
+ACK = ord('+')
+NACK = ord('-')
+
 LOG = logging.getLogger(__name__)
 
 TRACE_ACK = LOG.getChild("trace.ack")
@@ -49,16 +54,20 @@ class GDBServerPacketIOThread(threading.Thread):
     ## 100 ms timeout for socket and receive queue reads.
     RECEIVE_TIMEOUT = 0.1
 
-    def __init__(self, abstract_socket):
+    def __init__(self, abstract_socket, wake_event=None):
         super().__init__()
         self.name = "gdb-packet-thread-port%d" % abstract_socket.port
         self._abstract_socket = abstract_socket
         self._receive_queue = queue.Queue()
         self._shutdown_event = threading.Event()
         self.interrupt_event = threading.Event()
+        # Optional event that is also set on Ctrl-C, for a waiter that watches several sources.
+        self._wake_event = wake_event
         self.send_acks = True
         self._clear_send_acks = False
-        self._buffer = b''
+        self._buffer = bytearray()
+        # Offset in the buffer from which to continue looking for the end of a partial packet.
+        self._scan_offset = 0
         self._expecting_ack = False
         self.drop_reply = False
         self._last_packet = b''
@@ -154,61 +163,77 @@ class GDBServerPacketIOThread(threading.Thread):
         if self.send_acks:
             self._expecting_ack = True
 
-    def _check_expected_ack(self):
+    def _check_expected_ack(self, c):
         # Handle expected ack.
-        c = self._buffer[0:1]
-        if c in (b'+', b'-'):
-            self._buffer = self._buffer[1:]
-            TRACE_ACK.debug('got ack: %s', c)
-            if c == b'-':
+        if c in (ACK, NACK):
+            TRACE_ACK.debug('got ack: %s', bytes((c,)))
+            if c == NACK:
                 # Handle nack from gdb
                 self._write_packet(self._last_packet)
-                return
+                return True
 
             # Handle disabling of acks.
             if self._clear_send_acks:
                 self.send_acks = False
                 self._clear_send_acks = False
+            return True
         else:
-            LOG.debug("GDB: expected n/ack but got '%s'", c)
+            LOG.debug("GDB: expected n/ack but got '%s'", bytes((c,)))
+            return False
 
     def _process_data(self):
-        """@brief Process all incoming data until there are no more complete packets."""
-        while len(self._buffer):
+        """@brief Process all incoming data until there are no more complete packets.
+
+        The buffer is scanned from a read offset, and consumed data is removed from the buffer once
+        at the end. The search for the end of a partial packet resumes where the previous call left
+        off, so a large packet arriving over many socket reads is only scanned once.
+        """
+        buf = self._buffer
+        length = len(buf)
+        offset = 0
+        while offset < length:
+            c = buf[offset]
+
             if self._expecting_ack:
                 self._expecting_ack = False
-                self._check_expected_ack()
-
-            # Check for a ctrl-c.
-            if len(self._buffer) and self._buffer[0:1] == CTRL_C:
+                if self._check_expected_ack(c):
+                    offset += 1
+                    continue
+
+            if c == PACKET_START:
+                # Look for the end of a complete packet, including the two checksum digits.
+                pkt_hash = buf.find(b'#', max(offset + 1, self._scan_offset))
+                if pkt_hash < 0 or pkt_hash + 3 > length:
+                    # Save the scan position relative to the packet start, which will be moved to
+                    # the start of the buffer.
+                    self._scan_offset = (pkt_hash if pkt_hash >= 0 else length) - offset
+                    break
+                self._scan_offset = 0
+                self._handle_incoming_packet(bytes(buf[offset:pkt_hash + 3]))
+                offset = pkt_hash + 3
+            elif c == CTRL_C[0]:
                 self.interrupt_event.set()
-                self._buffer = self._buffer[1:]
+                if self._wake_event is not None:
+                    self._wake_event.set()
+                offset += 1
+            else:
+                # Skip anything else up to the next packet or ctrl-c.
+                next_offsets = [i for i in (buf.find(b'$', offset), buf.find(CTRL_C, offset)) if i >= 0]
+                offset = min(next_offsets) if next_offsets else length
 
-            try:
-                # Look for complete packet and extract from buffer.
-                pkt_begin = self._buffer.index(b"$")
-                pkt_end = self._buffer.index(b"#") + 2
-                if pkt_begin >= 0 and pkt_end < len(self._buffer):
-                    pkt = self._buffer[pkt_begin:pkt_end + 1]
-                    self._buffer = self._buffer[pkt_end + 1:]
-                    self._handling_incoming_packet(pkt)
-                else:
-                    break
-            except ValueError:
-                # No complete packet received yet.
-                break
+        del buf[:offset]
 
-    def _handling_incoming_packet(self, packet):
+    def _handle_incoming_packet(self, packet):
         # Compute checksum
-        data, cksum = packet[1:].split(b'#')
-        computedCksum = checksum(data)
-        goodPacket = (computedCksum.lower() == cksum.lower())
+        try:
+            good_packet = ((sum(packet[1:-3]) & 0xff) == int(packet[-2:], 16))
+        except ValueError:
+            good_packet = False
 
         if self.send_acks:
-            ack = b'+' if goodPacket else b'-'
+            ack = b'+' if good_packet else b'-'
             self._abstract_socket.write(ack)
             TRACE_ACK.debug(ack)
 
-        if goodPacket:
+        if good_packet:
             self._receive_queue.put(packet)
-
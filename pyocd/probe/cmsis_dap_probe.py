@@ -17,6 +17,7 @@
 
 from __future__ import annotations
 
+from concurrent.futures import Future
 from time import sleep
 import logging
 from typing import (Callable, Collection, Dict, List, Optional, overload, Sequence, Set, TYPE_CHECKING, Tuple, Union)
@@ -277,6 +278,8 @@ class CMSISDAPProbe(DebugProbe):
             self._link.open()
             self._is_open = True
             self._link.set_deferred_transfer(self.session.options.get('cmsis_dap.deferred_transfers'))
+            if self.session.options.get('cmsis_dap.pipelined_reads'):
+                self._link.set_pipelined_reads(True)
 
             if self._link.supports_board_and_target_names:
                 board_names = self._link.board_names
@@ -670,6 +673,33 @@ class CMSISDAPProbe(DebugProbe):
         else:
             return read_ap_repeat_callback
 
+    def read_ap_multiple_async(self, addr: int, count: int = 1) -> Future[Sequence[int]]:
+        assert isinstance(addr, int)
+        ap_reg = self.REG_ADDR_TO_ID_MAP[self.AP, (addr & self.A32)]
+
+        TRACE.debug("trace: read_ap_multi_async(addr=%#010x, count=%i) -> ...", addr, count)
+        try:
+            link_future = self._link.reg_read_repeat_async(count, ap_reg, dap_index=0)
+        except DAPAccess.Error as exc:
+            raise self._convert_exception(exc) from exc
+
+        # Chain to a new future in order to convert exceptions.
+        future: Future[Sequence[int]] = Future()
+
+        def read_ap_repeat_done(done: Future) -> None:
+            exc = done.exception()
+            if exc is None:
+                future.set_result(done.result())
+            elif isinstance(exc, DAPAccess.Error):
+                TRACE.debug("trace: ... read_ap_multi_async(addr=%#010x, count=%i) -> error(%s)",
+                    addr, count, exc)
+                future.set_exception(self._convert_exception(exc))
+            else:
+                future.set_exception(exc)
+
+        link_future.add_done_callback(read_ap_repeat_done)
+        return future
+
     def write_ap_multiple(self, addr: int, values) -> None:
         assert isinstance(addr, int)
         ap_reg = self.REG_ADDR_TO_ID_MAP[self.AP, (addr & self.A32)]
@@ -749,4 +779,6 @@ class CMSISDAPProbePlugin(Plugin):
                 "Whether the CMSIS-DAP probe backend will use deferred transfers for improved performance."),
             OptionInfo('cmsis_dap.limit_packets', bool, False,
                 "Restrict CMSIS-DAP backend to using a single in-flight command at a time."),
+            OptionInfo('cmsis_dap.pipelined_reads', bool, False,
+                "Receive CMSIS-DAP responses on a dedicated thread to keep all packets in flight during reads."),
             ]
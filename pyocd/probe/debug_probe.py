@@ -17,11 +17,14 @@
 
 from __future__ import annotations
 
+from concurrent.futures import Future
 from enum import (Enum, IntFlag)
 import threading
 from typing import (Callable, Collection, Optional, overload, Sequence, Set, TYPE_CHECKING, Tuple, Union)
 from typing_extensions import Literal
 
+from ..core import exceptions
+
 if TYPE_CHECKING:
     from ..core.session import Session
     from ..core.memory_interface import MemoryInterface
@@ -501,6 +504,28 @@ class DebugProbe:
         """@brief Read one AP register multiple times."""
         raise NotImplementedError()
 
+    def read_ap_multiple_async(self, addr: int, count: int = 1) -> Future[Sequence[int]]:
+        """@brief Read one AP register multiple times without waiting for the result.
+
+        Probes that support it keep several reads in flight at once, completing each returned
+        future as its data arrives. A caller can therefore issue a series of reads before waiting
+        on any of them, overlapping host processing with the link latency.
+
+        The default implementation performs the read synchronously and returns a completed future.
+
+        @param self
+        @param addr AP register address.
+        @param count Number of times to read the register.
+        @return A concurrent.futures.Future for the list of words read. Errors are raised from
+            the future's result() method.
+        """
+        future: Future[Sequence[int]] = Future()
+        try:
+            future.set_result(self.read_ap_multiple(addr, count))
+        except exceptions.Error as exc:
+            future.set_exception(exc)
+        return future
+
     def write_ap_multiple(self, addr: int, values) -> None:
         """@brief Write one AP register multiple times."""
         raise NotImplementedError()
@@ -0,0 +1,448 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import logging
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import (dataclass, asdict, replace)
+from time import perf_counter
+from typing import (Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, TYPE_CHECKING, cast)
+
+from ..core import exceptions
+from . import remote_probe_protocol as rpp
+from .shared_probe_proxy import SharedDebugProbeProxy
+from .tcp_probe_server import (DebugProbeRequestProcessor, probe_matches_unique_id)
+
+if TYPE_CHECKING:
+    from ..core.session import Session
+    from .debug_probe import DebugProbe
+
+LOG = logging.getLogger(__name__)
+
+## Maximum length of a JSON request line. Older clients send block data as JSON arrays.
+MAX_REQUEST_LINE_LENGTH = 16 * 1024 * 1024
+
+@dataclass
+class ProbeQueueStatistics:
+    """@brief Request queue metrics for one probe served by a MultiProbeServer.
+
+    A request is either a JSON request or a binary protocol frame.
+    """
+    ## Number of requests performed.
+    requests: int = 0
+    ## Total time spent performing requests, in seconds.
+    busy_time: float = 0.0
+    ## Total time requests waited for the probe to be free, in seconds.
+    wait_time: float = 0.0
+    ## Longest time a request waited for the probe, in seconds.
+    max_wait_time: float = 0.0
+    ## Number of requests currently waiting or being performed.
+    queue_depth: int = 0
+    ## Largest value of queue_depth seen.
+    max_queue_depth: int = 0
+
+    @property
+    def average_wait_time(self) -> float:
+        """@brief Average time requests waited for the probe, in seconds."""
+        return (self.wait_time / self.requests) if self.requests else 0.0
+
+class _ServedProbe:
+    """@brief State for one probe served by a MultiProbeServer.
+
+    All attributes other than the executor's work are only accessed from the event loop.
+    """
+
+    def __init__(self, probe: "DebugProbe") -> None:
+        ## Shared proxy for the probe. It stands in for the DebugProbe wherever one is expected.
+        self.proxy = cast("DebugProbe", SharedDebugProbeProxy(probe))
+        self.unique_id = probe.unique_id
+        ## Single thread on which all of the probe's I/O is performed.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="probe %s" % probe.unique_id)
+        ## Serialises requests and is used to wait for the probe lock to be released.
+        self.condition = asyncio.Condition()
+        ## Processor of the connection that holds the probe lock.
+        self.lock_owner: Optional[DebugProbeRequestProcessor] = None
+        self.connections: Set[DebugProbeRequestProcessor] = set()
+        self.is_present = True
+        self.statistics = ProbeQueueStatistics()
+
+class MultiProbeServer(threading.Thread):
+    """@brief Serves many debug probes on a single TCP port.
+
+    Clients select a probe by sending a 'select_probe' request with a full or partial unique ID
+    before the 'hello' request. For compatibility with clients of
+    @ref pyocd.probe.tcp_probe_server.DebugProbeServer "DebugProbeServer", a client that doesn't
+    select a probe is given the only served probe if there is exactly one. A 'list_probes' request
+    returns the served probes along with their queue statistics.
+
+    Connections are handled by an asyncio event loop on the server thread. Each probe has its own
+    executor thread on which all of its requests are performed, so slow USB transfers for one probe
+    don't delay others. Requests for a probe are performed one at a time, and while a client holds
+    the probe lock, requests from other clients wait.
+
+    If the 'probeserver.hotplug_interval' option is non-zero, connected probes are rescanned at that
+    interval. New probes are served, and probes that disappear are removed once no clients are
+    connected to them.
+    """
+
+    def __init__(
+                self,
+                session: "Session",
+                port: Optional[int] = None,
+                serve_local_only: Optional[bool] = None,
+                probes: Optional[Iterable["DebugProbe"]] = None,
+                scanner: Optional[Callable[[], List["DebugProbe"]]] = None,
+            ) -> None:
+        """@brief Constructor.
+
+        @param self The object.
+        @param session A @ref pyocd.core.session.Session "Session" object without a probe. It
+            provides options and is assigned to the served probes.
+        @param port The TCP port number. Defaults to the 'probeserver.port' option if not provided.
+        @param serve_local_only Optional Boolean. Whether to restrict the server to be accessible only
+            from localhost. If not specified (set to None), then the 'serve_local_only' session
+            option is used.
+        @param probes Probes to serve initially. If not provided, the probes returned by _scanner_
+            are served.
+        @param scanner Callable returning the connected probes, used for the initial probes and
+            hot-plug detection. Defaults to returning all probes found by the probe plugins.
+        """
+        super().__init__()
+        self.name = "multi-probe server"
+        self.daemon = True
+
+        self._session = session
+        self._scanner = scanner or self._scan_probes
+        self._initial_probes = list(probes) if (probes is not None) else None
+        self._port = port if (port is not None) else session.options.get('probeserver.port')
+        if serve_local_only is None:
+            serve_local_only = session.options.get('serve_local_only')
+        self._host = 'localhost' if serve_local_only else None
+        self._hotplug_interval = session.options.get('probeserver.hotplug_interval')
+
+        self._probes: Dict[str, _ServedProbe] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._did_start = threading.Event()
+        self._start_error: Optional[BaseException] = None
+        self._is_running = False
+
+    @staticmethod
+    def _scan_probes() -> List["DebugProbe"]:
+        # Imported here to avoid an import cycle.
+        from ..core.helpers import ConnectHelper
+        return ConnectHelper.get_all_connected_probes(blocking=False)
+
+    def start(self) -> None:
+        """@brief Start the server thread and begin listening.
+
+        Returns once the server is listening.
+
+        @exception OSError The listening socket could not be created.
+        """
+        super().start()
+        self._did_start.wait()
+        if self._start_error is not None:
+            raise self._start_error
+
+    def stop(self) -> None:
+        """@brief Shut down the server.
+
+        Open connections are closed. This function does not return until the server thread has
+        exited.
+        """
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+        self.join()
+
+    @property
+    def is_running(self) -> bool:
+        """@brief Whether the server thread is running."""
+        return self._is_running
+
+    @property
+    def port(self) -> int:
+        """@brief The server's port.
+
+        If port 0 was specified in the constructor, then, after start() is called, this will reflect
+        the actual port on which the server is listening.
+        """
+        return self._port
+
+    @property
+    def unique_ids(self) -> List[str]:
+        """@brief Unique IDs of the served probes."""
+        return sorted(self._probes)
+
+    @property
+    def statistics(self) -> Dict[str, ProbeQueueStatistics]:
+        """@brief Copies of the queue statistics for each served probe, keyed by unique ID."""
+        return {uid: replace(served.statistics) for uid, served in list(self._probes.items())}
+
+    def run(self) -> None:
+        """@brief The server thread implementation."""
+        self._loop = asyncio.new_event_loop()
+        self._is_running = True
+        try:
+            self._loop.run_until_complete(self._serve())
+        except Exception as err:
+            if not self._did_start.is_set():
+                self._start_error = err
+            else:
+                LOG.error("Multi-probe server error: %s", err, exc_info=self._session.log_tracebacks)
+        finally:
+            self._is_running = False
+            self._did_start.set()
+            self._loop.close()
+
+    async def _serve(self) -> None:
+        self._stop_event = asyncio.Event()
+        connection_tasks: Set[asyncio.Future] = set()
+
+        async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            # Track connections so they can be closed when the server stops.
+            task = asyncio.current_task()
+            assert task
+            connection_tasks.add(task)
+            try:
+                await self._handle_connection(reader, writer)
+            finally:
+                connection_tasks.discard(task)
+
+        server = await asyncio.start_server(handle_connection, self._host, self._port,
+                limit=MAX_REQUEST_LINE_LENGTH, reuse_address=True)
+
+        # Read back the actual port if 0 was specified.
+        if self._port == 0:
+            self._port = server.sockets[0].getsockname()[1]
+
+        probes = self._initial_probes
+        if probes is None:
+            probes = await asyncio.get_event_loop().run_in_executor(None, self._scanner)
+        for probe in probes:
+            self._add_probe(probe)
+        LOG.info("Serving %i debug probes on port %i", len(self._probes), self._port)
+        self._did_start.set()
+
+        hotplug_task = None
+        if self._hotplug_interval:
+            hotplug_task = asyncio.ensure_future(self._hotplug_loop())
+
+        try:
+            await self._stop_event.wait()
+        finally:
+            if hotplug_task is not None:
+                hotplug_task.cancel()
+            server.close()
+            await server.wait_closed()
+            for task in list(connection_tasks):
+                task.cancel()
+            if connection_tasks:
+                await asyncio.gather(*connection_tasks, return_exceptions=True)
+            for served in list(self._probes.values()):
+                self._log_statistics(served)
+                served.executor.shutdown(wait=True)
+            self._probes.clear()
+
+    def _add_probe(self, probe: "DebugProbe") -> None:
+        if probe.unique_id in self._probes:
+            LOG.warning("Ignoring probe %s with duplicate unique ID", probe.unique_id)
+            return
+        probe.session = self._session
+        served = _ServedProbe(probe)
+        self._probes[served.unique_id] = served
+        LOG.info("Serving debug probe %s (%s)", probe.description, probe.unique_id)
+
+    def _remove_probe(self, served: _ServedProbe) -> None:
+        LOG.info("Debug probe %s removed", served.unique_id)
+        self._log_statistics(served)
+        del self._probes[served.unique_id]
+        served.executor.shutdown(wait=False)
+
+    def _log_statistics(self, served: _ServedProbe) -> None:
+        stats = served.statistics
+        LOG.debug("Probe %s: %i requests, %.3f s busy, average wait %.1f ms (max %.1f ms), "
+                "max queue depth %i", served.unique_id, stats.requests, stats.busy_time,
+                stats.average_wait_time * 1000, stats.max_wait_time * 1000, stats.max_queue_depth)
+
+    async def _hotplug_loop(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self._hotplug_interval)
+            try:
+                probes = await loop.run_in_executor(None, self._scanner)
+            except Exception as err:
+                LOG.debug("Probe scan failed: %s", err)
+                continue
+
+            present = {probe.unique_id: probe for probe in probes}
+            for uid, probe in present.items():
+                if uid not in self._probes:
+                    self._add_probe(probe)
+            for served in list(self._probes.values()):
+                served.is_present = served.unique_id in present
+                if not served.is_present and not served.connections:
+                    self._remove_probe(served)
+
+    def _list_probes(self) -> List[Dict[str, Any]]:
+        result = []
+        for uid in sorted(self._probes):
+            served = self._probes[uid]
+            try:
+                description = served.proxy.description
+            except Exception:
+                description = uid
+            result.append({
+                    'unique_id': uid,
+                    'description': description,
+                    'statistics': asdict(served.statistics),
+                })
+        return result
+
+    def _select_probe(self, unique_id: Optional[str]) -> _ServedProbe:
+        """@brief Find the probe for a client.
+
+        @exception exceptions.ProbeError No probe, or more than one probe, matches.
+        """
+        if unique_id is None:
+            matches = list(self._probes.values())
+            if len(matches) != 1:
+                raise exceptions.ProbeError("no probe selected and %i probes are served" % len(matches))
+        else:
+            matches = [served for served in self._probes.values()
+                    if probe_matches_unique_id(served.proxy, unique_id)]
+            if len(matches) != 1:
+                raise exceptions.ProbeError("%s probes match unique ID '%s'"
+                        % ("no" if not matches else "multiple", unique_id))
+        return matches[0]
+
+    def _handle_unselected_request(self, request: bytes) \
+            -> Tuple[Optional[bytes], Optional[_ServedProbe]]:
+        """@brief Handle a JSON request received before the client's probe is known.
+
+        @return Tuple of the response line and the probe selected for the client. A None response
+            means the request must be passed on to the selected probe's request processor.
+        """
+        request_id = -1
+        try:
+            request_dict = json.loads(request)
+            request_id = request_dict['id']
+            request_type = request_dict['request']
+            args = request_dict.get('arguments', [])
+            if request_type == 'select_probe':
+                served = self._select_probe(*args)
+                return DebugProbeRequestProcessor.format_response(request_id), served
+            elif request_type == 'list_probes':
+                return DebugProbeRequestProcessor.format_response(request_id, self._list_probes()), None
+            else:
+                return None, self._select_probe(None)
+        except (ValueError, KeyError, TypeError) as err:
+            return DebugProbeRequestProcessor.format_response(request_id, status=rpp.StatusCode.GENERAL_ERROR,
+                    message="invalid request (%s)" % err), None
+        except exceptions.Error as err:
+            return DebugProbeRequestProcessor.format_response(request_id,
+                    status=rpp.get_exception_status_code(err), message=str(err)), None
+
+    async def _perform(self, served: _ServedProbe, processor: DebugProbeRequestProcessor,
+            fn: Callable, *args: Any) -> Any:
+        """@brief Call _fn_ on the probe's executor thread once the probe is free."""
+        stats = served.statistics
+        stats.queue_depth += 1
+        stats.max_queue_depth = max(stats.max_queue_depth, stats.queue_depth)
+        enqueue_time = perf_counter()
+        try:
+            async with served.condition:
+                await served.condition.wait_for(lambda: served.lock_owner in (None, processor))
+                start_time = perf_counter()
+                wait_time = start_time - enqueue_time
+                stats.wait_time += wait_time
+                stats.max_wait_time = max(stats.max_wait_time, wait_time)
+                try:
+                    return await asyncio.get_event_loop().run_in_executor(served.executor, fn, *args)
+                finally:
+                    stats.requests += 1
+                    stats.busy_time += perf_counter() - start_time
+                    served.lock_owner = processor if processor.lock_depth else None
+                    served.condition.notify_all()
+        finally:
+            stats.queue_depth -= 1
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info('peername')
+        client_name = "%s (port %i)" % (peer[0], peer[1]) if peer else "<unknown>"
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        LOG.info("Client %s connected", client_name)
+
+        served: Optional[_ServedProbe] = None
+        processor: Optional[DebugProbeRequestProcessor] = None
+        header_size = rpp.FRAME_HEADER.size
+        try:
+            while True:
+                error = None
+                if (processor is None) or not processor.is_binary:
+                    request = await reader.readline()
+                    if not request:
+                        break
+                    if processor is None:
+                        response, served = self._handle_unselected_request(request)
+                        if served is not None:
+                            processor = DebugProbeRequestProcessor(self._session, served.proxy, client_name)
+                            served.connections.add(processor)
+                            LOG.info("Client %s using probe %s", client_name, served.unique_id)
+                    else:
+                        response = None
+                    if response is None:
+                        assert served and processor
+                        response, error = await self._perform(served, processor,
+                                processor.process_request_line, request)
+                else:
+                    assert served
+                    header = await reader.readexactly(header_size)
+                    length, = rpp.FRAME_HEADER.unpack(header)
+                    payload = await reader.readexactly(length)
+                    frame, error = await self._perform(served, processor, processor.process_frame, payload)
+                    if frame is None:
+                        break
+                    response = rpp.FRAME_HEADER.pack(len(frame)) + frame
+
+                writer.write(response)
+                await writer.drain()
+
+                if error is not None:
+                    LOG.error("Closing connection from client %s after error: %s", client_name, error,
+                            exc_info=self._session.log_tracebacks)
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as err:
+            # Raised by readline() for overlong lines.
+            LOG.error("Invalid request from client %s: %s", client_name, err)
+        finally:
+            LOG.info("Client %s disconnected", client_name)
+            if served is not None and processor is not None:
+                try:
+                    await asyncio.shield(self._perform(served, processor, processor.close))
+                except Exception as err:
+                    LOG.debug("exception while closing connection: %s", err)
+                served.connections.discard(processor)
+                if not served.is_present and not served.connections and (served.unique_id in self._probes):
+                    self._remove_probe(served)
+            writer.close()
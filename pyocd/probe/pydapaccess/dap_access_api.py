@@ -295,6 +295,10 @@ class DAPAccessIntf(object):
         """@brief Allow reads and writes to be buffered for increased speed"""
         raise NotImplementedError()
 
+    def set_pipelined_reads(self, enable):
+        """@brief Receive responses on a separate thread to keep more reads in flight"""
+        raise NotImplementedError()
+
     def flush(self):
         """@brief Write out all unsent commands"""
         raise NotImplementedError()
@@ -349,3 +353,7 @@ class DAPAccessIntf(object):
     def reg_read_repeat(self, num_repeats, reg_id, dap_index=0, now=True):
         """@brief Read one or more words from the same DP or AP register"""
         raise NotImplementedError()
+
+    def reg_read_repeat_async(self, num_repeats, reg_id, dap_index=0):
+        """@brief Read one or more words from the same DP or AP register, returning a future"""
+        raise NotImplementedError()
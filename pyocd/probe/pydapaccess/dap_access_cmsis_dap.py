@@ -19,8 +19,12 @@
 import re
 import logging
 import collections
+import struct
+import sys
 import threading
-from typing import (Any, Dict, Optional, Tuple, Union)
+from array import array
+from concurrent.futures import Future
+from typing import (Any, Dict, Optional, Sequence, Tuple, Union)
 
 from .dap_settings import DAPSettings
 from .dap_access_api import DAPAccessIntf
@@ -69,6 +73,26 @@ LOG = logging.getLogger(__name__)
 TRACE = LOG.getChild("trace")
 TRACE.setLevel(logging.CRITICAL)
 
+## Array typecode for unsigned 32-bit words. 'I' is 32-bit on all supported platforms, but check.
+_WORD_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+
+## Transfer data is little endian, so the decoded words must be swapped on big endian hosts.
+_WORD_BYTESWAP = (sys.byteorder == 'big')
+
+## DAP_Transfer request byte plus write data word.
+_TRANSFER_WRITE_STRUCT = struct.Struct('<BI')
+
+## DAP_TransferBlock header: command, DAP index, transfer count, transfer request.
+_TRANSFER_BLOCK_HEADER_STRUCT = struct.Struct('<BBHB')
+
+def _pack_words(buf: bytearray, offset: int, words: Sequence[int]) -> None:
+    """@brief Pack a sequence of 32-bit words into _buf_ as little endian."""
+    try:
+        struct.pack_into(f'<{len(words)}I', buf, offset, *words)
+    except struct.error:
+        # Values out of range are truncated to 32 bits.
+        struct.pack_into(f'<{len(words)}I', buf, offset, *(w & 0xffffffff for w in words))
+
 def _get_interfaces():
     """@brief Get the connected USB devices"""
     # Get CMSIS-DAPv1 interfaces.
@@ -122,8 +146,10 @@ class _Transfer(object):
         self._size_bytes = 0
         if transfer_request & READ:
             self._size_bytes = transfer_count * 4
+        self._words = array(_WORD_TYPECODE)
         self._result = None
         self._error = None
+        self.future: Optional[Future] = None
 
     def get_data_size(self):
         """@brief Get the size in bytes of the return value of this transfer
@@ -133,27 +159,54 @@ class _Transfer(object):
     def add_response(self, data):
         """@brief Add data read from the remote device to this object.
 
-        The size of data added must match exactly the size
-        that get_data_size returns.
+        The response data for a transfer may be split across multiple command packets, so _data_
+        can hold only part of the transfer's data, or also data belonging to following transfers.
+        Only as many bytes as are still needed by this transfer are consumed.
+
+        @param self
+        @param data Bytes-like object, usually a memoryview into a response packet.
+        @return The number of bytes of _data_ consumed.
         """
-        assert len(data) == self._size_bytes
-        result = []
-        for i in range(0, self._size_bytes, 4):
-            word = ((data[0 + i] << 0) | (data[1 + i] << 8) |
-                    (data[2 + i] << 16) | (data[3 + i] << 24))
-            result.append(word)
+        received = len(self._words) * 4
+        size = min(len(data), self._size_bytes - received)
+        assert size % 4 == 0
+
+        # Fast path for the very common single word read.
+        if size == self._size_bytes == 4:
+            self._set_result([int.from_bytes(data[:4], 'little')])
+            return size
+
+        self._words.frombytes(data[:size])
+        if received + size == self._size_bytes:
+            if _WORD_BYTESWAP:
+                self._words.byteswap()
+            self._set_result(self._words.tolist())
+        return size
+
+    def _set_result(self, result):
         self._result = result
+        if self.future is not None:
+            self.future.set_result(result)
+
+    @property
+    def is_complete(self) -> bool:
+        """@brief Whether all response data for this transfer has been received."""
+        return self._result is not None
 
     def add_error(self, error):
         """@brief Attach an exception to this transfer rather than data.
         """
         assert isinstance(error, Exception)
         self._error = error
+        if self.future is not None:
+            self.future.set_exception(error)
 
     def get_result(self):
         """@brief Get the result of this transfer.
         """
-        while self._result is None:
+        if self.daplink._reader_thread is not None:
+            self.daplink._wait_for_transfer(self)
+        while self._result is None and self._error is None:
             if len(self.daplink._commands_to_read) > 0:
                 self.daplink._read_packet()
             else:
@@ -161,6 +214,10 @@ class _Transfer(object):
                 self.daplink.flush()
 
         if self._error is not None:
+            # The error has reached this transfer's owner, so the reader thread must not raise it
+            # again from a later call.
+            if self.daplink._reader_error is self._error:
+                self.daplink._reader_error = None
             # Pylint is confused and thinks self._error is None
             # since that is what it is initialized to.
             # Suppress warnings for this.
@@ -311,39 +368,33 @@ class _Command(object):
                 self.uid, count, request, 'r' if (request & READ) else 'w', self._write_count, self._read_count,
                 self._block_allowed)
 
-    def _encode_transfer_data(self):
+    def _encode_transfer_data(self, buf):
         """@brief Encode this command into a byte array that can be sent
 
-        The data returned by this function is a bytearray in
-        the format that of a DAP_Transfer CMSIS-DAP command.
+        The command is encoded into _buf_ in the format of a DAP_Transfer
+        CMSIS-DAP command.
+
+        @return Length of the encoded command in bytes.
         """
         assert self.get_empty() is False
-        buf = bytearray(self._size)
         transfer_count = self._read_count + self._write_count
-        pos = 0
-        buf[pos] = Command.DAP_TRANSFER
-        pos += 1
-        buf[pos] = self._dap_index
-        pos += 1
-        buf[pos] = transfer_count
-        pos += 1
+        buf[0] = Command.DAP_TRANSFER
+        buf[1] = self._dap_index
+        buf[2] = transfer_count
+        pos = 3
         for count, request, write_list in self._data:
-            assert write_list is None or len(write_list) <= count
-            write_pos = 0
-            for _ in range(count):
-                buf[pos] = request
-                pos += 1
-                if not request & READ:
-                    buf[pos] = (write_list[write_pos] >> (8 * 0)) & 0xff
-                    pos += 1
-                    buf[pos] = (write_list[write_pos] >> (8 * 1)) & 0xff
-                    pos += 1
-                    buf[pos] = (write_list[write_pos] >> (8 * 2)) & 0xff
-                    pos += 1
-                    buf[pos] = (write_list[write_pos] >> (8 * 3)) & 0xff
-                    pos += 1
-                    write_pos += 1
-        return buf[:pos]
+            if request & READ:
+                buf[pos:pos + count] = bytes((request,)) * count
+                pos += count
+            else:
+                assert len(write_list) == count
+                for value in write_list:
+                    try:
+                        _TRANSFER_WRITE_STRUCT.pack_into(buf, pos, request, value)
+                    except struct.error:
+                        _TRANSFER_WRITE_STRUCT.pack_into(buf, pos, request, value & 0xffffffff)
+                    pos += 5
+        return pos
 
     def _check_response(self, response):
         """@brief Check the response status byte from CMSIS-DAP transfer commands.
@@ -397,44 +448,28 @@ class _Command(object):
 
         return data[3:3 + 4 * self._read_count]
 
-    def _encode_transfer_block_data(self):
+    def _encode_transfer_block_data(self, buf):
         """@brief Encode this command into a byte array that can be sent
 
-        The data returned by this function is a bytearray in
-        the format that of a DAP_TransferBlock CMSIS-DAP command.
+        The command is encoded into _buf_ in the format of a DAP_TransferBlock
+        CMSIS-DAP command.
+
+        @return Length of the encoded command in bytes.
         """
         assert self.get_empty() is False
-        buf = bytearray(self._size)
         transfer_count = self._read_count + self._write_count
         assert not (self._read_count != 0 and self._write_count != 0)
         assert self._block_request is not None
-        pos = 0
-        buf[pos] = Command.DAP_TRANSFER_BLOCK
-        pos += 1
-        buf[pos] = self._dap_index
-        pos += 1
-        buf[pos] = transfer_count & 0xff
-        pos += 1
-        buf[pos] = (transfer_count >> 8) & 0xff
-        pos += 1
-        buf[pos] = self._block_request
-        pos += 1
-        for count, request, write_list in self._data:
-            assert write_list is None or len(write_list) <= count
-            assert request == self._block_request
-            write_pos = 0
-            if not request & READ:
-                for _ in range(count):
-                    buf[pos] = (write_list[write_pos] >> (8 * 0)) & 0xff
-                    pos += 1
-                    buf[pos] = (write_list[write_pos] >> (8 * 1)) & 0xff
-                    pos += 1
-                    buf[pos] = (write_list[write_pos] >> (8 * 2)) & 0xff
-                    pos += 1
-                    buf[pos] = (write_list[write_pos] >> (8 * 3)) & 0xff
-                    pos += 1
-                    write_pos += 1
-        return buf[:pos]
+        _TRANSFER_BLOCK_HEADER_STRUCT.pack_into(buf, 0, Command.DAP_TRANSFER_BLOCK, self._dap_index,
+                transfer_count, self._block_request)
+        pos = _TRANSFER_BLOCK_HEADER_STRUCT.size
+        if not self._block_request & READ:
+            for count, request, write_list in self._data:
+                assert len(write_list) == count
+                assert request == self._block_request
+                _pack_words(buf, pos, write_list)
+                pos += 4 * count
+        return pos
 
     def _decode_transfer_block_data(self, data):
         """@brief Take a byte array and extract the data from it
@@ -459,22 +494,36 @@ class _Command(object):
 
         return data[4:4 + 4 * self._read_count]
 
-    def encode_data(self):
+    def encode_data(self, buf=None):
         """@brief Encode this command into a byte array that can be sent
 
         The actual command this is encoded into depends on the data
         that was added.
+
+        @param self
+        @param buf Optional preallocated bytearray of at least the command's packet size. The
+            command is encoded in place so no per-packet buffer needs to be allocated. If not
+            provided, a new buffer is allocated.
+        @return A memoryview of the encoded command within the buffer. It is only valid until the
+            buffer is reused for the next command.
         """
         assert self.get_empty() is False
         self._data_encoded = True
+        if buf is None:
+            buf = bytearray(self._size)
         if self._block_allowed:
-            data = self._encode_transfer_block_data()
+            length = self._encode_transfer_block_data(buf)
         else:
-            data = self._encode_transfer_data()
-        return data
+            length = self._encode_transfer_data(buf)
+        return memoryview(buf)[:length]
 
     def decode_data(self, data):
         """@brief Decode the response data
+
+        @param self
+        @param data The response packet. Should be a memoryview so the returned transfer data can
+            be sliced from it without copying.
+        @return Bytes-like object containing the transfer data of the response.
         """
         assert self.get_empty() is False
         assert self._data_encoded is True
@@ -590,7 +639,7 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         self._crnt_cmd = _Command(0)
         self._packet_size = None
         self._commands_to_read = collections.deque()
-        self._command_response_buf = bytearray()
+        self._packet_buf = bytearray()
         self._swo_status = None
         self._cmsis_dap_version: VersionTuple = CMSISDAPVersion.V1_0_0
         self._fw_version: Optional[str] = None
@@ -598,6 +647,16 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         self._is_open: bool = False
         self._cached_info: Dict[DAPAccessIntf.ID, Any] = {}
 
+        # Pipelined read state.
+        self._reader_cond = threading.Condition(self._lock)
+        self._reader_thread: Optional[threading.Thread] = None
+        self._reader_stop = False
+        self._reader_error: Optional[Exception] = None
+        # Whether the reader thread was started by reg_read_repeat_async() and should exit once the
+        # async reads are complete.
+        self._reader_is_temporary = False
+        self._async_reads_pending = 0
+
     @property
     def protocol_version(self) -> VersionTuple:
         """@brief Tuple of CMSIS-DAP protocol version.
@@ -816,7 +875,10 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         assert self._interface is not None
         if not self._is_open:
             return
-        self.flush()
+        try:
+            self.flush()
+        finally:
+            self._stop_reader()
         self._interface.close()
         self._is_open = False
         self._crnt_cmd = _Command(0)
@@ -881,8 +943,35 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         # Send current packet
         self._send_packet()
         # Read all backlogged
-        for _ in range(len(self._commands_to_read)):
-            self._read_packet()
+        if self._reader_thread is not None:
+            self._reader_cond.wait_for(lambda: not self._commands_to_read)
+            self._raise_reader_error()
+        else:
+            for _ in range(len(self._commands_to_read)):
+                self._read_packet()
+
+    def set_pipelined_reads(self, enable: bool) -> None:
+        """@brief Enable or disable pipelined reads.
+
+        When enabled, a reader thread receives command responses and attaches the data to transfers
+        as soon as each response arrives, while the calling thread continues to encode and send
+        commands. This keeps the probe's full packet count in flight during large reads, so the
+        host's processing time overlaps with USB latency instead of adding to it.
+
+        Errors for commands that contain only writes are raised from the next call that has to wait
+        for the reader thread, as for deferred transfers.
+        """
+        if enable:
+            with self._lock:
+                self._start_reader()
+                self._reader_stop = False
+                self._reader_is_temporary = False
+        else:
+            with self._lock:
+                try:
+                    self.flush()
+                finally:
+                    self._stop_reader()
 
     @locked
     def identify(self, item: DAPAccessIntf.ID) -> Union[int, str, None]:
@@ -1126,6 +1215,42 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
             return reg_read_repeat_cb()
         else:
             return reg_read_repeat_cb
+
+    @locked
+    def reg_read_repeat_async(self, num_repeats, reg_id, dap_index=0):
+        """@brief Read one or more words from the same DP or AP register without waiting.
+
+        Pipelined reads are enabled if necessary. The read is queued and the current command is
+        sent, so the returned future completes without any further action from the caller. If the
+        reader thread was started for async reads, it exits once all of them have completed.
+
+        @return A concurrent.futures.Future that is resolved with the list of words read, or with
+            the exception raised by the transfer.
+        """
+        assert isinstance(num_repeats, int)
+        assert reg_id in self.REG
+        assert isinstance(dap_index, int)
+
+        if self._reader_thread is None:
+            self._start_reader()
+            self._reader_is_temporary = True
+        elif self._reader_stop:
+            # The reader thread is exiting after an earlier batch; keep it running for this one.
+            self._reader_stop = False
+            self._reader_is_temporary = True
+        request = READ
+        if reg_id.value < 4:
+            request |= DP_ACC
+        else:
+            request |= AP_ACC
+        request |= (reg_id.value % 4) * 4
+        future = Future()
+        self._async_reads_pending += 1
+        future.add_done_callback(self._async_read_done)
+        transfer = self._write(dap_index, num_repeats, request, None, future)
+        assert transfer is not None
+        self._send_packet()
+        return future
     # ------------------------------------------- #
     #          Private functions
     # ------------------------------------------- #
@@ -1145,9 +1270,10 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         self._crnt_cmd = _Command(self._packet_size)
         # Packets that have been sent but not read
         self._commands_to_read.clear()
-        # Buffer for data returned for completed commands.
-        # This data will be added to transfers
-        self._command_response_buf = bytearray()
+        # Preallocated buffer into which each command is encoded
+        # before being written to the interface
+        if len(self._packet_buf) != self._packet_size:
+            self._packet_buf = bytearray(self._packet_size or 0)
 
     @locked
     def _read_packet(self):
@@ -1162,37 +1288,31 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         TRACE.debug("[cmd:%d] _read_packet: reading", cmd.uid)
         try:
             raw_data = self._interface.read()
-            raw_data = bytearray(raw_data)
-            decoded_data = cmd.decode_data(raw_data)
         except Exception as exception:
             TRACE.debug("[cmd:%d] _read_packet: got exception %r; aborting all transfers!", cmd.uid, exception)
             self._abort_all_transfers(exception)
             raise
+        self._process_response(cmd, raw_data)
 
-        decoded_data = bytearray(decoded_data)
-        self._command_response_buf.extend(decoded_data)
+    @locked
+    def _process_response(self, cmd, raw_data):
+        """@brief Decode a command's response and attach the read data to transfers."""
+        try:
+            decoded_data = cmd.decode_data(memoryview(raw_data))
+        except Exception as exception:
+            TRACE.debug("[cmd:%d] _read_packet: got exception %r; aborting all transfers!", cmd.uid, exception)
+            self._abort_all_transfers(exception)
+            raise
 
-        # Attach data to transfers
+        # Attach data to transfers. A transfer whose data continues in the
+        # next packet stays at the head of the transfer list.
         pos = 0
-        while True:
-            size_left = len(self._command_response_buf) - pos
-            if size_left == 0:
-                # If size left is 0 then the transfer list might
-                # be empty, so don't try to access element 0
-                break
+        size = len(decoded_data)
+        while pos < size:
             transfer = self._transfer_list[0]
-            size = transfer.get_data_size()
-            if size > size_left:
-                break
-
-            self._transfer_list.popleft()
-            data = self._command_response_buf[pos:pos + size]
-            pos += size
-            transfer.add_response(data)
-
-        # Remove used data from _command_response_buf
-        if pos > 0:
-            self._command_response_buf = self._command_response_buf[pos:]
+            pos += transfer.add_response(decoded_data[pos:])
+            if transfer.is_complete:
+                self._transfer_list.popleft()
 
     @locked
     def _send_packet(self):
@@ -1211,20 +1331,136 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         if len(self._commands_to_read) >= max_packets:
             TRACE.debug("[cmd:%d] _send_packet: reading packet; outstanding=%d >= max=%d",
                     cmd.uid, len(self._commands_to_read), max_packets)
-            self._read_packet()
+            if self._reader_thread is not None:
+                self._reader_cond.wait_for(lambda: len(self._commands_to_read) < max_packets)
+                self._raise_reader_error()
+                # An error on the reader thread discards the current command.
+                if cmd is not self._crnt_cmd:
+                    return
+            else:
+                self._read_packet()
         TRACE.debug("[cmd:%d] _send_packet: sending", cmd.uid)
-        data = cmd.encode_data()
+        data = cmd.encode_data(self._packet_buf)
         try:
-            self._interface.write(list(data))
+            self._interface.write(data)
         except Exception as exception:
             self._abort_all_transfers(exception)
             raise
         self._commands_to_read.append(cmd)
         self._crnt_cmd = _Command(self._packet_size)
+        if self._reader_thread is not None:
+            self._reader_cond.notify_all()
+
+    @locked
+    def _start_reader(self):
+        """@brief Start the pipelined read thread if it is not already running."""
+        if self._reader_thread is not None:
+            return
+        self.flush()
+        self._reader_stop = False
+        self._reader_error = None
+        self._reader_thread = threading.Thread(target=self._reader_task,
+                name=f"CMSIS-DAP {self._unique_id} reader")
+        self._reader_thread.daemon = True
+        self._reader_thread.start()
+
+    def _async_read_done(self, future):
+        """@brief Let a temporary reader thread exit once the last async read completes.
+
+        This is called on the reader thread, so it can't wait for the thread to exit. The thread
+        exits by itself after reading all outstanding responses.
+        """
+        with self._reader_cond:
+            self._async_reads_pending -= 1
+            if self._async_reads_pending == 0 and self._reader_is_temporary:
+                self._reader_is_temporary = False
+                self._reader_stop = True
+                self._reader_cond.notify_all()
+
+    @locked
+    def _stop_reader(self):
+        """@brief Stop the pipelined read thread and wait for it to exit."""
+        thread = self._reader_thread
+        if thread is None:
+            return
+        self._reader_stop = True
+        self._reader_cond.notify_all()
+        self._reader_cond.wait_for(lambda: not thread.is_alive() or self._reader_thread is None)
+        thread.join()
+        self._reader_thread = None
+
+    def _reader_task(self):
+        """@brief Pipelined read thread.
+
+        Responses are read without holding the lock so the calling thread can send further commands
+        while this thread waits for the probe. The lock is only taken to process each response.
+        """
+        try:
+            while True:
+                with self._reader_cond:
+                    self._reader_cond.wait_for(lambda: self._commands_to_read or self._reader_stop)
+                    if not self._commands_to_read:
+                        # Clear the thread while still holding the lock, so no caller can queue a
+                        # command for this thread after it has decided to exit.
+                        self._reader_thread = None
+                        self._reader_cond.notify_all()
+                        return
+                    cmd = self._commands_to_read[0]
+                try:
+                    raw_data = self._interface.read()
+                    exception = None
+                except Exception as err:
+                    exception = err
+                with self._reader_cond:
+                    # Drop the response if the calling thread aborted all transfers in the meantime.
+                    if not self._commands_to_read or self._commands_to_read[0] is not cmd:
+                        continue
+                    # An error delivered to the futures of async reads is reported through them
+                    # rather than from the next call that waits for the reader.
+                    has_futures = any(t.future is not None for t in self._transfer_list)
+                    try:
+                        self._commands_to_read.popleft()
+                        if exception is not None:
+                            TRACE.debug("[cmd:%d] _reader_task: got exception %r; aborting all transfers!",
+                                    cmd.uid, exception)
+                            self._abort_all_transfers(exception)
+                            raise exception
+                        self._process_response(cmd, raw_data)
+                    except Exception as err:
+                        if self._reader_error is None and not has_futures:
+                            self._reader_error = err
+                    finally:
+                        self._reader_cond.notify_all()
+        finally:
+            with self._reader_cond:
+                if self._reader_thread is threading.current_thread():
+                    self._reader_thread = None
+                self._reader_cond.notify_all()
+
+    def _raise_reader_error(self):
+        """@brief Raise an exception recorded by the reader thread, if any."""
+        error = self._reader_error
+        if error is not None:
+            self._reader_error = None
+            raise error
+
+    @locked
+    def _wait_for_transfer(self, transfer):
+        """@brief Wait for the reader thread to complete a transfer."""
+        while transfer._result is None and transfer._error is None:
+            # Make sure the command containing the transfer is sent.
+            if not self._crnt_cmd.get_empty():
+                self._send_packet()
+            elif not self._commands_to_read:
+                break
+            else:
+                self._reader_cond.wait()
+        if transfer._error is None:
+            self._raise_reader_error()
 
     @locked
     def _write(self, dap_index, transfer_count,
-               transfer_request, transfer_data):
+               transfer_request, transfer_data, future=None):
         """@brief Write one or more commands
         """
         assert dap_index == 0  # dap index currently unsupported
@@ -1237,6 +1473,7 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         if transfer_request & READ:
             transfer = _Transfer(self, dap_index, transfer_count,
                                  transfer_request, transfer_data)
+            transfer.future = future
             self._transfer_list.append(transfer)
 
         # Build physical packet by adding it to command
@@ -1288,6 +1525,8 @@ class DAPAccessCMSISDAP(DAPAccessIntf):
         # finish all pending reads and ignore the data
         # Only do this if the error is a transfer error.
         # Otherwise this could cause another exception
-        if isinstance(exception, DAPAccessIntf.TransferError):
+        # If the reader thread is running, only it may read responses.
+        if isinstance(exception, DAPAccessIntf.TransferError) \
+                and self._reader_thread in (None, threading.current_thread()):
             for _ in range(pending_reads):
                 self._interface.read()
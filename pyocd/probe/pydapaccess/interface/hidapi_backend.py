@@ -166,10 +166,9 @@ class HidApiUSB(Interface):
         """@brief Write data on the OUT endpoint associated to the HID interface"""
         if TRACE.isEnabledFor(logging.DEBUG):
             TRACE.debug("  USB OUT> (%d) %s", len(data), ' '.join([f'{i:02x}' for i in data]))
-        data.extend([0] * (self.packet_size - len(data)))
         if not _IS_WINDOWS:
             self.read_sem.release()
-        self.device.write([0] + data)
+        self.device.write(b'\x00' + bytes(data) + bytes(self.packet_size - len(data)))
 
     def read(self):
         """@brief Read data on the IN endpoint associated to the HID interface"""
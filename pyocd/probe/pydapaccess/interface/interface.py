@@ -50,6 +50,12 @@ class Interface:
         raise NotImplementedError()
 
     def write(self, data):
+        """@brief Write a command packet to the probe.
+
+        @param self
+        @param data Bytes-like object or list of ints. It must not be modified, and may only be
+            referenced for the duration of the call since the caller may reuse the buffer.
+        """
         raise NotImplementedError()
 
     def read(self):
@@ -203,7 +203,7 @@ class PyUSB(Interface):
         if TRACE.isEnabledFor(logging.DEBUG):
             TRACE.debug("  USB OUT> (%d) %s", len(data), ' '.join([f'{i:02x}' for i in data]))
 
-        data.extend([0] * (report_size - len(data)))
+        data = bytes(data) + bytes(report_size - len(data))
 
         self.read_sem.release()
 
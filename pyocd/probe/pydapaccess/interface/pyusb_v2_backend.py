@@ -218,7 +218,7 @@ class PyUSBv2(Interface):
 
         if self.ep_out:
             if (len(data) > 0) and (len(data) < self.packet_size) and (len(data) % self.ep_out.wMaxPacketSize == 0):
-                data.append(0)
+                data = bytes(data) + b'\x00'
 
         if TRACE.isEnabledFor(logging.DEBUG):
             TRACE.debug("  USB OUT> (%d) %s", len(data), ' '.join([f'{i:02x}' for i in data]))
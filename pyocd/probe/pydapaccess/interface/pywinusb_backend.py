@@ -147,8 +147,7 @@ class PyWinUSB(Interface):
         if TRACE.isEnabledFor(logging.DEBUG):
             TRACE.debug("  USB OUT> (%d) %s", len(data), ' '.join([f'{i:02x}' for i in data]))
 
-        data.extend([0] * (self.packet_size - len(data)))
-        self.report.send([0] + data)
+        self.report.send([0] + list(data) + [0] * (self.packet_size - len(data)))
 
     def read(self):
         """@brief Read data on the IN endpoint associated to the HID interface"""
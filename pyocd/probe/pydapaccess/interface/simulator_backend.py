@@ -0,0 +1,740 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import logging
+import struct
+from time import (perf_counter, sleep)
+from typing import (Deque, Dict, Iterable, List, Optional, Tuple)
+
+from .interface import Interface
+from ..dap_access_api import DAPAccessIntf
+from ..cmsis_dap_core import (
+    Command,
+    Capabilities,
+    Pin,
+    DAPTransferResponse,
+    DAP_OK,
+    DAP_ERROR,
+    )
+
+LOG = logging.getLogger(__name__)
+TRACE = LOG.getChild("trace")
+TRACE.setLevel(logging.CRITICAL)
+
+# Transfer request bits.
+_APnDP = 0x01
+_RnW = 0x02
+_A32 = 0x0c
+_VALUE_MATCH = 0x10
+_MATCH_MASK = 0x20
+
+# DP register values and bits.
+_DP_ABORT_STKERRCLR = 0x00000004
+_DP_CTRLSTAT_STICKYERR = 0x00000020
+_DP_CTRLSTAT_REQ_MASK = 0x50000000
+_DP_CTRLSTAT_ACK_SHIFT = 1
+_DP_SELECT_APSEL_MASK = 0xff000000
+_DP_SELECT_APSEL_SHIFT = 24
+_DP_SELECT_APBANKSEL_MASK = 0x000000f0
+_DP_SELECT_DPBANKSEL_MASK = 0x0000000f
+
+# MEM-AP register addresses.
+_AP_CSW = 0x00
+_AP_TAR = 0x04
+_AP_DRW = 0x0c
+_AP_BD0 = 0x10
+_AP_BD3 = 0x1c
+_AP_CFG = 0xf4
+_AP_BASE = 0xf8
+_AP_IDR = 0xfc
+
+# MEM-AP CSW bits.
+_CSW_SIZE_MASK = 0x00000007
+_CSW_ADDRINC_MASK = 0x00000030
+_CSW_SADDRINC = 0x00000010
+_CSW_DEVICEEN = 0x00000040
+_CSW_WRITABLE_MASK = 0x6f000037
+
+## Number of SWD bit periods used for one DP or AP register transfer, including the request,
+# turnaround, ACK, data, parity, and a couple of idle cycles.
+_SWD_BITS_PER_TRANSFER = 46
+
+class SimulatedDevice:
+    """@brief Base class for memory mapped devices that can be added to a SimulatedMemory."""
+
+    ## Size in bytes of the device's address range.
+    size = 0
+
+    def read(self, offset: int, size: int) -> Optional[bytes]:
+        """@brief Read _size_ bytes at _offset_ from the start of the device. Returns None on fault."""
+        raise NotImplementedError()
+
+    def write(self, offset: int, value: bytes) -> bool:
+        """@brief Write bytes at _offset_ from the start of the device. Returns False on fault."""
+        raise NotImplementedError()
+
+class SimulatedMemory:
+    """@brief Sparse little-endian memory model made up of independent regions.
+
+    Accesses that fall outside of all regions fault, just like accessing unmapped memory on a
+    real target. Memory mapped devices can be placed over the regions; an access that is entirely
+    within a device's address range is passed to the device.
+    """
+
+    def __init__(self, regions: Iterable[Tuple[int, int]],
+            devices: Iterable[Tuple[int, SimulatedDevice]] = ()) -> None:
+        """@brief Constructor.
+        @param self
+        @param regions Iterable of (start, length) tuples. Each region is zero filled initially.
+        @param devices Iterable of (start, device) tuples.
+        """
+        self._regions: List[Tuple[int, int, bytearray]] = [
+            (start, start + length, bytearray(length))
+            for start, length in regions
+            ]
+        self._devices: List[Tuple[int, int, SimulatedDevice]] = [
+            (start, start + device.size, device)
+            for start, device in devices
+            ]
+
+    def _find(self, addr: int, size: int) -> Optional[Tuple[int, bytearray]]:
+        for start, end, data in self._regions:
+            if start <= addr and (addr + size) <= end:
+                return start, data
+        return None
+
+    def _find_device(self, addr: int, size: int) -> Optional[Tuple[int, SimulatedDevice]]:
+        for start, end, device in self._devices:
+            if start <= addr and (addr + size) <= end:
+                return start, device
+        return None
+
+    def read(self, addr: int, size: int) -> Optional[bytes]:
+        """@brief Read _size_ bytes. Returns None if the access faults."""
+        if self._devices:
+            device = self._find_device(addr, size)
+            if device is not None:
+                return device[1].read(addr - device[0], size)
+        region = self._find(addr, size)
+        if region is None:
+            return None
+        start, data = region
+        offset = addr - start
+        return bytes(data[offset:offset + size])
+
+    def write(self, addr: int, value: bytes) -> bool:
+        """@brief Write bytes. Returns False if the access faults."""
+        if self._devices:
+            device = self._find_device(addr, len(value))
+            if device is not None:
+                return device[1].write(addr - device[0], value)
+        region = self._find(addr, len(value))
+        if region is None:
+            return False
+        start, data = region
+        offset = addr - start
+        data[offset:offset + len(value)] = value
+        return True
+
+class SimulatedCoreDebug(SimulatedDevice):
+    """@brief Model of the Cortex-M core debug registers DHCSR, DCRSR, DCRDR, and DEMCR.
+
+    Core registers are accessed through DCRSR and DCRDR the same way as on a real core, and are held
+    in a simple register file. The core never executes instructions. It is either halted or
+    running, and a single step just advances the PC by 2.
+    """
+
+    ## Address of DHCSR, the first of the core debug registers.
+    BASE = 0xE000EDF0
+
+    size = 0x10
+
+    DBGKEY = 0xA05F0000
+    C_DEBUGEN = (1 << 0)
+    C_HALT = (1 << 1)
+    C_STEP = (1 << 2)
+    S_REGRDY = (1 << 16)
+    S_HALT = (1 << 17)
+    DCRSR_REGWnR = (1 << 16)
+    DCRSR_REGSEL = 0x7f
+    PC = 15
+
+    def __init__(self) -> None:
+        self.registers = [0] * (self.DCRSR_REGSEL + 1)
+        self.halted = True
+        self._dhcsr_control = self.C_DEBUGEN | self.C_HALT
+        self._dcrdr = 0
+        self._demcr = 0
+
+    def _read_word(self, index: int) -> int:
+        if index == 0:
+            return (self._dhcsr_control & 0xffff) | self.S_REGRDY \
+                    | ((self.S_HALT | self.C_HALT) if self.halted else 0)
+        elif index == 2:
+            return self._dcrdr
+        elif index == 3:
+            return self._demcr
+        return 0
+
+    def _write_word(self, index: int, value: int) -> None:
+        if index == 0:
+            if (value & 0xffff0000) != self.DBGKEY:
+                return
+            self._dhcsr_control = value & 0xffff
+            if value & self.C_HALT:
+                self.halted = True
+            elif value & self.C_STEP:
+                self.registers[self.PC] = (self.registers[self.PC] + 2) & 0xffffffff
+                self.halted = True
+            else:
+                self.halted = False
+        elif index == 1:
+            regsel = value & self.DCRSR_REGSEL
+            if value & self.DCRSR_REGWnR:
+                self.registers[regsel] = self._dcrdr
+            else:
+                self._dcrdr = self.registers[regsel]
+        elif index == 2:
+            self._dcrdr = value
+        elif index == 3:
+            self._demcr = value
+
+    def read(self, offset: int, size: int) -> Optional[bytes]:
+        data = b''.join(self._read_word(i).to_bytes(4, 'little') for i in range(4))
+        return data[offset:offset + size]
+
+    def write(self, offset: int, value: bytes) -> bool:
+        # Sub-word writes are merged into the current register value.
+        for index in range(offset // 4, (offset + len(value) + 3) // 4):
+            word = bytearray(self._read_word(index).to_bytes(4, 'little'))
+            lo = max(offset, index * 4)
+            hi = min(offset + len(value), index * 4 + 4)
+            word[lo - index * 4:hi - index * 4] = value[lo - offset:hi - offset]
+            self._write_word(index, int.from_bytes(word, 'little'))
+        return True
+
+class SimulatedDAPTarget:
+    """@brief Model of an SW-DP with a single MEM-AP in front of a simulated memory.
+
+    The model responds to DP and AP register transfers the way a CMSIS-DAP probe's firmware reports
+    them to the host. That is, AP reads are not posted: the probe firmware takes care of reading
+    RDBUFF, so each AP read returns its own value.
+
+    Only APSEL 0 is implemented. It identifies as a Cortex-M3/M4 style AHB-AP with a 4 kB TAR
+    auto-increment wrap, supporting 8-, 16-, and 32-bit transfers.
+    """
+
+    DPIDR = 0x2ba01477
+    AP_IDR = 0x24770011
+    AP_BASE = 0xe00ff003
+    TAR_WRAP = 0x1000
+
+    def __init__(self, memory: SimulatedMemory) -> None:
+        self.memory = memory
+        self.ctrl_stat = 0
+        self.select = 0
+        self.rdbuff = 0
+        self.csw = _CSW_SADDRINC | 0x2
+        self.tar = 0
+        self.match_mask = 0xffffffff
+
+    def reset(self) -> None:
+        """@brief Reset the DP and AP registers to their power on values."""
+        self.ctrl_stat = 0
+        self.select = 0
+        self.rdbuff = 0
+        self.csw = _CSW_SADDRINC | 0x2
+        self.tar = 0
+
+    def transfer(self, request: int, value: int = 0) -> Tuple[int, int]:
+        """@brief Perform one register transfer.
+        @param self
+        @param request The CMSIS-DAP transfer request byte.
+        @param value Value to write for write requests.
+        @return Bi-tuple of the ACK value and the read data (0 for writes).
+        """
+        addr = request & _A32
+        is_read = (request & _RnW) != 0
+        if (request & _APnDP) == 0:
+            if is_read:
+                return DAPTransferResponse.ACK_OK, self._read_dp(addr)
+            self._write_dp(addr, value)
+            return DAPTransferResponse.ACK_OK, 0
+
+        # The AP is not accessible if the sticky error flag is set.
+        if self.ctrl_stat & _DP_CTRLSTAT_STICKYERR:
+            return DAPTransferResponse.ACK_FAULT, 0
+
+        ap_addr = (self.select & _DP_SELECT_APBANKSEL_MASK) | addr
+        apsel = (self.select & _DP_SELECT_APSEL_MASK) >> _DP_SELECT_APSEL_SHIFT
+        if is_read:
+            ok, result = self._read_ap(apsel, ap_addr)
+            self.rdbuff = result
+        else:
+            ok, result = self._write_ap(apsel, ap_addr, value), 0
+        if not ok:
+            self.ctrl_stat |= _DP_CTRLSTAT_STICKYERR
+            return DAPTransferResponse.ACK_FAULT, 0
+        return DAPTransferResponse.ACK_OK, result
+
+    def _block_address(self, request: int, count: int) -> Optional[int]:
+        """@brief Determine whether a block transfer can be performed in one memory access.
+
+        This is only possible for 32-bit DRW transfers with address increment that stay within the
+        TAR auto-increment wrap and don't fault.
+        """
+        if ((request & (_APnDP | _A32)) != (_APnDP | _AP_DRW)
+                or (self.select & (_DP_SELECT_APSEL_MASK | _DP_SELECT_APBANKSEL_MASK))
+                or (self.ctrl_stat & _DP_CTRLSTAT_STICKYERR)
+                or (self.csw & (_CSW_SIZE_MASK | _CSW_ADDRINC_MASK)) != (_CSW_SADDRINC | 2)
+                or (self.tar & 0x3)):
+            return None
+        wrap = self.TAR_WRAP - 1
+        if (self.tar & wrap) + 4 * count > self.TAR_WRAP:
+            return None
+        return self.tar
+
+    def _advance_tar(self, count: int) -> None:
+        wrap = self.TAR_WRAP - 1
+        self.tar = (self.tar & ~wrap) | ((self.tar + 4 * count) & wrap)
+
+    def read_block(self, request: int, count: int) -> Optional[bytes]:
+        """@brief Fast path for a 32-bit DRW block read.
+        @return The little-endian read data, or None if the transfer must be performed word by word.
+        """
+        addr = self._block_address(request, count)
+        if addr is None:
+            return None
+        data = self.memory.read(addr, 4 * count)
+        if data is not None:
+            self._advance_tar(count)
+            if count:
+                self.rdbuff = int.from_bytes(data[-4:], 'little')
+        return data
+
+    def write_block(self, request: int, data: bytes) -> bool:
+        """@brief Fast path for a 32-bit DRW block write.
+        @return Whether the write was performed.
+        """
+        addr = self._block_address(request, len(data) // 4)
+        if addr is None or not self.memory.write(addr, data):
+            return False
+        self._advance_tar(len(data) // 4)
+        return True
+
+    def _read_dp(self, addr: int) -> int:
+        if addr == 0x0:
+            return self.DPIDR
+        elif addr == 0x4:
+            if self.select & _DP_SELECT_DPBANKSEL_MASK:
+                return 0
+            return self.ctrl_stat
+        elif addr == 0x8:
+            # RESEND
+            return self.rdbuff
+        else:
+            return self.rdbuff
+
+    def _write_dp(self, addr: int, value: int) -> None:
+        if addr == 0x0:
+            if value & _DP_ABORT_STKERRCLR:
+                self.ctrl_stat &= ~_DP_CTRLSTAT_STICKYERR
+        elif addr == 0x4:
+            if self.select & _DP_SELECT_DPBANKSEL_MASK:
+                return
+            # The power-up ACK bits immediately follow the request bits.
+            reqs = value & _DP_CTRLSTAT_REQ_MASK
+            self.ctrl_stat = ((value & ~(_DP_CTRLSTAT_STICKYERR | (_DP_CTRLSTAT_REQ_MASK << _DP_CTRLSTAT_ACK_SHIFT)))
+                    | (self.ctrl_stat & _DP_CTRLSTAT_STICKYERR)
+                    | (reqs << _DP_CTRLSTAT_ACK_SHIFT)) & 0xffffffff
+        elif addr == 0x8:
+            self.select = value
+
+    def _read_ap(self, apsel: int, addr: int) -> Tuple[bool, int]:
+        if apsel != 0:
+            return True, 0
+        if addr == _AP_CSW:
+            return True, self.csw | _CSW_DEVICEEN
+        elif addr == _AP_TAR:
+            return True, self.tar
+        elif addr == _AP_DRW:
+            return self._access_drw(self.tar, None)
+        elif _AP_BD0 <= addr <= _AP_BD3:
+            return self._access_bd(addr, None)
+        elif addr == _AP_CFG:
+            return True, 0
+        elif addr == _AP_BASE:
+            return True, self.AP_BASE
+        elif addr == _AP_IDR:
+            return True, self.AP_IDR
+        return True, 0
+
+    def _write_ap(self, apsel: int, addr: int, value: int) -> bool:
+        if apsel != 0:
+            return True
+        if addr == _AP_CSW:
+            # Only 8-, 16-, and 32-bit sizes are supported; other sizes read back as 32-bit.
+            if (value & _CSW_SIZE_MASK) > 2:
+                value = (value & ~_CSW_SIZE_MASK) | 2
+            self.csw = value & _CSW_WRITABLE_MASK
+        elif addr == _AP_TAR:
+            self.tar = value
+        elif addr == _AP_DRW:
+            return self._access_drw(self.tar, value)[0]
+        elif _AP_BD0 <= addr <= _AP_BD3:
+            return self._access_bd(addr, value)[0]
+        return True
+
+    def _access_drw(self, addr: int, value: Optional[int]) -> Tuple[bool, int]:
+        size = 1 << (self.csw & _CSW_SIZE_MASK)
+        lane = addr & 0x3 & ~(size - 1)
+        if value is None:
+            data = self.memory.read(addr, size)
+            if data is None:
+                return False, 0
+            result = int.from_bytes(data, 'little') << (lane * 8)
+        else:
+            if not self.memory.write(addr, ((value >> (lane * 8)) & ((1 << (size * 8)) - 1)).to_bytes(size, 'little')):
+                return False, 0
+            result = 0
+        if (self.csw & _CSW_ADDRINC_MASK) == _CSW_SADDRINC:
+            wrap = self.TAR_WRAP - 1
+            self.tar = (addr & ~wrap) | ((addr + size) & wrap)
+        return True, result
+
+    def _access_bd(self, addr: int, value: Optional[int]) -> Tuple[bool, int]:
+        target_addr = (self.tar & ~0xf) | (addr - _AP_BD0)
+        if value is None:
+            data = self.memory.read(target_addr, 4)
+            if data is None:
+                return False, 0
+            return True, int.from_bytes(data, 'little')
+        return self.memory.write(target_addr, value.to_bytes(4, 'little')), 0
+
+class SimulatedCMSISDAPv2(Interface):
+    """@brief In-process emulation of a CMSIS-DAP v2 probe.
+
+    This interface implements the CMSIS-DAP command set in software on top of a
+    SimulatedDAPTarget, so DAPAccessCMSISDAP and everything above it can be run without hardware.
+    It is primarily intended for measuring host-side performance of the probe stack.
+
+    The packet size and count are reported through DAP_Info, just like a real probe, and writing
+    more than the packet count's worth of commands without reading responses raises an error. A
+    fixed latency can be added to each command response to model the USB round trip. If
+    _wire_timing_ is enabled, the time taken to clock the transfers over the SWD wire at the
+    current SWJ clock frequency is also modeled.
+
+    Statistics about the packets and transfers are kept in the #stats attribute.
+    """
+
+    isAvailable = True
+
+    ## Default memory regions: 1 MB of "flash" and 256 kB of "RAM".
+    DEFAULT_REGIONS = [(0x00000000, 0x100000), (0x20000000, 0x40000)]
+
+    ## System Control Space region of the default memory. It is plain memory, apart from the core
+    # debug registers which are modeled by a SimulatedCoreDebug.
+    SCS_REGION = (0xE000E000, 0x1000)
+
+    ## Initial values of SCS registers in the default memory, identifying a Cortex-M4 with an FPU.
+    SCS_VALUES = {
+        0xE000ED00: 0x410FC241, # CPUID
+        0xE000EF40: 0x10110021, # MVFR0
+        0xE000EF44: 0x11000011, # MVFR1
+        }
+
+    class Statistics:
+        """@brief Counters of simulated probe activity."""
+
+        def __init__(self) -> None:
+            self.reset()
+
+        def reset(self) -> None:
+            self.commands = 0
+            self.transfer_commands = 0
+            self.transfers = 0
+            self.bytes_out = 0
+            self.bytes_in = 0
+            self.max_outstanding = 0
+            self.device_time = 0.0
+
+        @property
+        def transfers_per_packet(self) -> float:
+            """@brief Average number of register transfers per DAP_Transfer[Block] command."""
+            return (self.transfers / self.transfer_commands) if self.transfer_commands else 0.0
+
+    def __init__(
+                self,
+                serial_number: str = "simulated-dap",
+                packet_size: int = 512,
+                packet_count: int = 8,
+                latency: float = 0.0,
+                wire_timing: bool = False,
+                memory: Optional[SimulatedMemory] = None,
+            ) -> None:
+        """@brief Constructor.
+        @param self
+        @param serial_number Unique ID for the simulated probe.
+        @param packet_size Maximum command packet size reported to the host.
+        @param packet_count Maximum number of outstanding commands reported to the host.
+        @param latency Seconds between a command being written and its response being available.
+            Latency of successive commands overlaps, as with real USB transfers.
+        @param wire_timing Whether to model the time required to perform transfers over SWD.
+        @param memory Optional SimulatedMemory instance. If not provided, a memory with
+            #DEFAULT_REGIONS and a simulated Cortex-M core in the System Control Space is created,
+            and the core is available as the #core attribute.
+        """
+        super().__init__()
+        self.vid = 0x0d28
+        self.pid = 0x0000
+        self.vendor_name = "pyOCD"
+        self.product_name = "Simulated CMSIS-DAP"
+        self.serial_number = serial_number
+        self.packet_size = packet_size
+        self.packet_count = packet_count
+        self.latency = latency
+        self.wire_timing = wire_timing
+        self.core: Optional[SimulatedCoreDebug] = None
+        if memory is None:
+            self.core = SimulatedCoreDebug()
+            memory = SimulatedMemory(self.DEFAULT_REGIONS + [self.SCS_REGION],
+                    devices=[(SimulatedCoreDebug.BASE, self.core)])
+            for addr, value in self.SCS_VALUES.items():
+                memory.write(addr, value.to_bytes(4, 'little'))
+        self.target = SimulatedDAPTarget(memory)
+        self.stats = self.Statistics()
+        self.closed = True
+        self._max_packet_size = packet_size
+        self._max_packet_count = packet_count
+        self._responses: Deque[Tuple[float, bytes]] = collections.deque()
+        self._device_busy_until = 0.0
+        self._clock = 1000000
+        self._pins = Pin.nRESET | Pin.SWDIO_TMS | Pin.SWCLK_TCK
+        self._match_retry = 0
+        self._info: Dict[int, bytes] = {
+            DAPAccessIntf.ID.VENDOR.value: self._info_str(self.vendor_name),
+            DAPAccessIntf.ID.PRODUCT.value: self._info_str(self.product_name),
+            DAPAccessIntf.ID.SER_NUM.value: self._info_str(serial_number),
+            DAPAccessIntf.ID.CMSIS_DAP_PROTOCOL_VERSION.value: self._info_str("2.1.0"),
+            DAPAccessIntf.ID.PRODUCT_FW_VERSION.value: self._info_str("1.0.0"),
+            DAPAccessIntf.ID.CAPABILITIES.value: bytes([Capabilities.SWD]),
+            DAPAccessIntf.ID.MAX_PACKET_COUNT.value: bytes([packet_count]),
+            DAPAccessIntf.ID.MAX_PACKET_SIZE.value: struct.pack('<H', packet_size),
+            }
+
+    @staticmethod
+    def _info_str(value: str) -> bytes:
+        return value.encode('utf-8') + b'\x00'
+
+    @staticmethod
+    def get_all_connected_interfaces():
+        # Simulated probes are never discovered; they must be created explicitly.
+        return []
+
+    @property
+    def is_bulk(self):
+        """@brief Whether the interface uses CMSIS-DAP v2 bulk endpoints."""
+        return True
+
+    def open(self):
+        assert self.closed is True
+        self._responses.clear()
+        self.closed = False
+
+    def close(self):
+        assert self.closed is False
+        self.closed = True
+        self._responses.clear()
+
+    def write(self, data):
+        """@brief Process a command packet and queue its response."""
+        if len(self._responses) >= self._max_packet_count:
+            raise DAPAccessIntf.DeviceError(
+                f"Simulated probe {self.serial_number} command overrun: "
+                f"more than {self._max_packet_count} outstanding commands")
+        if len(data) > self._max_packet_size:
+            raise DAPAccessIntf.DeviceError(
+                f"Simulated probe {self.serial_number} command of {len(data)} bytes exceeds packet size")
+
+        cmd = bytes(data)
+        now = perf_counter()
+        self.stats.commands += 1
+        self.stats.bytes_out += len(cmd)
+        response, transfer_count = self._process_command(cmd)
+        self.stats.device_time += perf_counter() - now
+        self.stats.bytes_in += len(response)
+
+        # The device processes commands one at a time. A command can start being processed after it
+        # arrives and after the previous command is finished.
+        service_time = 0.0
+        if self.wire_timing and transfer_count:
+            service_time = transfer_count * _SWD_BITS_PER_TRANSFER / self._clock
+        start = max(now, self._device_busy_until)
+        self._device_busy_until = start + service_time
+        self._responses.append((self._device_busy_until + self.latency, response))
+        self.stats.max_outstanding = max(self.stats.max_outstanding, len(self._responses))
+
+        if TRACE.isEnabledFor(logging.DEBUG):
+            TRACE.debug("  SIM OUT> (%d) %s", len(cmd), cmd.hex(' '))
+
+    def read(self):
+        """@brief Return the next command response, waiting until it is ready."""
+        if self.closed:
+            return b''
+        if not self._responses:
+            raise DAPAccessIntf.DeviceError(f"Timeout reading from probe {self.serial_number}")
+        ready_time, response = self._responses.popleft()
+        delay = ready_time - perf_counter()
+        if delay > 0:
+            sleep(delay)
+
+        if TRACE.isEnabledFor(logging.DEBUG):
+            TRACE.debug("  SIM IN < (%d) %s", len(response), response.hex(' '))
+
+        return response
+
+    def read_swo(self):
+        return bytearray()
+
+    def _process_command(self, cmd: bytes) -> Tuple[bytes, int]:
+        """@brief Execute one command.
+        @return Bi-tuple of response bytes and the number of register transfers performed.
+        """
+        cmd_id = cmd[0]
+        if cmd_id == Command.DAP_TRANSFER:
+            return self._dap_transfer(cmd)
+        elif cmd_id == Command.DAP_TRANSFER_BLOCK:
+            return self._dap_transfer_block(cmd)
+        elif cmd_id == Command.DAP_INFO:
+            value = self._info.get(cmd[1], b'')
+            return bytes([cmd_id, len(value)]) + value, 0
+        elif cmd_id == Command.DAP_CONNECT:
+            # Only SWD is supported; the default port maps to SWD.
+            port = cmd[1] if len(cmd) > 1 else 0
+            return bytes([cmd_id, 1 if port in (0, 1) else 0]), 0
+        elif cmd_id == Command.DAP_SWJ_CLOCK:
+            self._clock = max(struct.unpack_from('<I', cmd, 1)[0], 1)
+            return bytes([cmd_id, DAP_OK]), 0
+        elif cmd_id == Command.DAP_SWJ_PINS:
+            output, select = cmd[1], cmd[2]
+            self._pins = (self._pins & ~select) | (output & select)
+            if select & Pin.nRESET and not (output & Pin.nRESET):
+                self.target.reset()
+            return bytes([cmd_id, self._pins]), 0
+        elif cmd_id == Command.DAP_TRANSFER_CONFIGURE:
+            self._match_retry = struct.unpack_from('<H', cmd, 4)[0]
+            return bytes([cmd_id, DAP_OK]), 0
+        elif cmd_id == Command.DAP_WRITE_ABORT:
+            self.target.transfer(0, struct.unpack_from('<I', cmd, 2)[0])
+            return bytes([cmd_id, DAP_OK]), 1
+        elif cmd_id == Command.DAP_RESET_TARGET:
+            return bytes([cmd_id, DAP_OK, 0]), 0
+        elif cmd_id == Command.DAP_SWD_SEQUENCE:
+            return self._dap_swd_sequence(cmd), 0
+        elif cmd_id in (Command.DAP_LED, Command.DAP_DISCONNECT, Command.DAP_DELAY,
+                Command.DAP_SWJ_SEQUENCE, Command.DAP_SWD_CONFIGURE, Command.DAP_JTAG_CONFIGURE):
+            return bytes([cmd_id, DAP_OK]), 0
+        else:
+            # Unsupported commands return the DAP_Invalid response.
+            return bytes([DAP_ERROR]), 0
+
+    def _dap_swd_sequence(self, cmd: bytes) -> bytes:
+        # Output sequences are accepted and ignored. Input sequences read as all zeroes.
+        response = bytearray([cmd[0], DAP_OK])
+        pos = 2
+        for _ in range(cmd[1]):
+            info = cmd[pos]
+            pos += 1
+            cycles = (info & 0x3f) or 64
+            nbytes = (cycles + 7) // 8
+            if info & 0x80:
+                response += bytes(nbytes)
+            else:
+                pos += nbytes
+        return bytes(response)
+
+    def _do_transfer(self, request: int, value: int) -> Tuple[int, int]:
+        """@brief Perform one transfer, handling the value match and match mask requests."""
+        if request & _MATCH_MASK:
+            self.target.match_mask = value
+            return DAPTransferResponse.ACK_OK, 0
+        if request & _VALUE_MATCH:
+            for _ in range(self._match_retry + 1):
+                ack, data = self.target.transfer(request & ~_VALUE_MATCH)
+                if ack != DAPTransferResponse.ACK_OK:
+                    return ack, 0
+                if (data & self.target.match_mask) == value:
+                    return ack, 0
+            return ack | DAPTransferResponse.VALUE_MISMATCH_MASK, 0
+        return self.target.transfer(request, value)
+
+    def _dap_transfer(self, cmd: bytes) -> Tuple[bytes, int]:
+        count = cmd[2]
+        pos = 3
+        data = bytearray()
+        ack = DAPTransferResponse.ACK_OK
+        completed = 0
+        for _ in range(count):
+            request = cmd[pos]
+            pos += 1
+            if not (request & _RnW) or (request & _VALUE_MATCH):
+                value = struct.unpack_from('<I', cmd, pos)[0]
+                pos += 4
+            else:
+                value = 0
+            ack, result = self._do_transfer(request, value)
+            if ack != DAPTransferResponse.ACK_OK:
+                break
+            if (request & _RnW) and not (request & _VALUE_MATCH):
+                data += struct.pack('<I', result)
+            completed += 1
+        self.stats.transfer_commands += 1
+        self.stats.transfers += completed
+        return bytes([cmd[0], completed, ack]) + bytes(data), completed
+
+    def _dap_transfer_block(self, cmd: bytes) -> Tuple[bytes, int]:
+        count = cmd[2] | (cmd[3] << 8)
+        request = cmd[4]
+        ack = DAPTransferResponse.ACK_OK
+        completed = 0
+        if request & _RnW:
+            data = self.target.read_block(request, count)
+            if data is None:
+                words: List[int] = []
+                for _ in range(count):
+                    ack, result = self.target.transfer(request)
+                    if ack != DAPTransferResponse.ACK_OK:
+                        break
+                    words.append(result)
+                    completed += 1
+                data = struct.pack(f'<{len(words)}I', *words)
+            else:
+                completed = count
+        else:
+            values = cmd[5:5 + 4 * count]
+            if self.target.write_block(request, values):
+                completed = count
+            else:
+                for (value,) in struct.iter_unpack('<I', values):
+                    ack, _ = self.target.transfer(request, value)
+                    if ack != DAPTransferResponse.ACK_OK:
+                        break
+                    completed += 1
+            data = b''
+        self.stats.transfer_commands += 1
+        self.stats.transfers += completed
+        return struct.pack('<BHB', cmd[0], completed, ack) + data, completed
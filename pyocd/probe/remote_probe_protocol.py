@@ -0,0 +1,283 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""@brief Binary framing for the remote probe protocol.
+
+Version 1 of the remote probe protocol exchanges one JSON line per request and response. Version 2
+is negotiated with a JSON 'hello' request; once the server accepts it, the connection switches to
+the binary framing implemented here.
+
+Each message is a frame consisting of a little-endian u32 payload length followed by the payload.
+A request frame's payload is a sequence of request records, and the server answers each request
+frame with one response frame containing a response record for every request, in the same order.
+Clients may send further request frames before reading earlier responses.
+
+A request record is a u8 opcode followed by opcode-specific fields. All integers are little-endian
+u32 unless noted.
+
+- REQUEST: length, then UTF-8 JSON object with "request" and optional "arguments" keys, carrying any
+    version 1 request.
+- READ_DP, READ_AP: addr
+- WRITE_DP, WRITE_AP: addr, value
+- READ_AP_MULTIPLE: addr, count
+- WRITE_AP_MULTIPLE: addr, count, count words
+- READ_MEM: handle, addr, u8 transfer size
+- WRITE_MEM: handle, addr, value, u8 transfer size
+- READ_BLOCK32: handle, addr, word count
+- WRITE_BLOCK32: handle, addr, word count, words
+- READ_BLOCK8: handle, addr, byte count
+- WRITE_BLOCK8: handle, addr, byte count, bytes
+- LOCK, UNLOCK, FLUSH: no fields
+
+A response record is a u8 status code. For a non-zero status, a u16 length and a UTF-8 error
+message follow. Otherwise the result follows, if the request has one: a u32 value for single
+register and memory reads, a count followed by words or bytes for multiple and block reads, and a
+length followed by the JSON encoded result for REQUEST records. A zero length JSON result is None.
+"""
+
+import json
+import struct
+from enum import IntEnum
+from typing import (Any, Iterator, List, Optional, Sequence, Tuple)
+
+from ..core import exceptions
+from ..utility import conversion
+
+## Protocol version that uses binary framing.
+BINARY_PROTOCOL_VERSION = 2
+
+## Frame header containing the payload length.
+FRAME_HEADER = struct.Struct('<I')
+
+class Opcode(IntEnum):
+    """@brief Request record types."""
+    REQUEST = 0
+    READ_DP = 1
+    WRITE_DP = 2
+    READ_AP = 3
+    WRITE_AP = 4
+    READ_AP_MULTIPLE = 5
+    WRITE_AP_MULTIPLE = 6
+    READ_MEM = 7
+    WRITE_MEM = 8
+    READ_BLOCK32 = 9
+    WRITE_BLOCK32 = 10
+    READ_BLOCK8 = 11
+    WRITE_BLOCK8 = 12
+    LOCK = 13
+    UNLOCK = 14
+    FLUSH = 15
+
+class StatusCode:
+    """@brief Constants for errors reported from the server."""
+    GENERAL_ERROR = 1
+    PROBE_DISCONNECTED = 2
+    PROBE_ERROR = 3
+    TRANSFER_ERROR = 10
+    TRANSFER_TIMEOUT = 11
+    TRANSFER_FAULT = 12
+
+## Map from status code to exception class.
+STATUS_CODE_CLASS_MAP = {
+    StatusCode.GENERAL_ERROR: exceptions.Error,
+    StatusCode.PROBE_DISCONNECTED: exceptions.ProbeDisconnected,
+    StatusCode.PROBE_ERROR: exceptions.ProbeError,
+    StatusCode.TRANSFER_ERROR: exceptions.TransferError,
+    StatusCode.TRANSFER_TIMEOUT: exceptions.TransferTimeoutError,
+    StatusCode.TRANSFER_FAULT: exceptions.TransferFaultError,
+    }
+
+def get_exception_status_code(err: BaseException) -> int:
+    """@brief Convert an exception into a status code."""
+    # Must test the exception class in order of specific to general.
+    if isinstance(err, exceptions.ProbeDisconnected):
+        return StatusCode.PROBE_DISCONNECTED
+    elif isinstance(err, exceptions.ProbeError):
+        return StatusCode.PROBE_ERROR
+    elif isinstance(err, exceptions.TransferFaultError):
+        return StatusCode.TRANSFER_FAULT
+    elif isinstance(err, exceptions.TransferTimeoutError):
+        return StatusCode.TRANSFER_TIMEOUT
+    elif isinstance(err, exceptions.TransferError):
+        return StatusCode.TRANSFER_ERROR
+    else:
+        return StatusCode.GENERAL_ERROR
+
+## Fixed fields of each request record type, following the opcode.
+_REQUEST_FIELDS = {
+    Opcode.REQUEST: struct.Struct('<I'),
+    Opcode.READ_DP: struct.Struct('<I'),
+    Opcode.WRITE_DP: struct.Struct('<II'),
+    Opcode.READ_AP: struct.Struct('<I'),
+    Opcode.WRITE_AP: struct.Struct('<II'),
+    Opcode.READ_AP_MULTIPLE: struct.Struct('<II'),
+    Opcode.WRITE_AP_MULTIPLE: struct.Struct('<II'),
+    Opcode.READ_MEM: struct.Struct('<IIB'),
+    Opcode.WRITE_MEM: struct.Struct('<IIIB'),
+    Opcode.READ_BLOCK32: struct.Struct('<III'),
+    Opcode.WRITE_BLOCK32: struct.Struct('<III'),
+    Opcode.READ_BLOCK8: struct.Struct('<III'),
+    Opcode.WRITE_BLOCK8: struct.Struct('<III'),
+    Opcode.LOCK: struct.Struct('<'),
+    Opcode.UNLOCK: struct.Struct('<'),
+    Opcode.FLUSH: struct.Struct('<'),
+    }
+
+## Request record types whose last fixed field is the length of trailing data, and the number of
+# bytes per unit of that length.
+_REQUEST_DATA_UNIT = {
+    Opcode.REQUEST: 1,
+    Opcode.WRITE_AP_MULTIPLE: 4,
+    Opcode.WRITE_BLOCK32: 4,
+    Opcode.WRITE_BLOCK8: 1,
+    }
+
+## Request record types with a single u32 result.
+_WORD_RESULT_OPCODES = (Opcode.READ_DP, Opcode.READ_AP, Opcode.READ_MEM)
+
+## Request record types with a list of words as the result.
+_WORDS_RESULT_OPCODES = (Opcode.READ_AP_MULTIPLE, Opcode.READ_BLOCK32)
+
+_U8 = struct.Struct('<B')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+
+def _words_to_bytes(words: Sequence[int]) -> bytes:
+    return struct.pack('<%dI' % len(words), *words)
+
+def encode_request(opcode: Opcode, *args: Any) -> bytes:
+    """@brief Encode a request record.
+
+    @param opcode The request type.
+    @param args The request's fixed fields. For REQUEST records, the arguments are the request name
+        and the list of its arguments. For writes of multiple words or bytes, the data is passed
+        in place of the count field.
+    """
+    if opcode == Opcode.REQUEST:
+        name, request_args = args
+        rq = {"request": name}
+        if request_args:
+            rq["arguments"] = list(request_args)
+        data = json.dumps(rq).encode('utf-8')
+        args = (len(data),)
+    elif opcode in (Opcode.WRITE_AP_MULTIPLE, Opcode.WRITE_BLOCK32):
+        data = _words_to_bytes(args[-1])
+        args = args[:-1] + (len(data) // 4,)
+    elif opcode == Opcode.WRITE_BLOCK8:
+        data = bytes(args[-1])
+        args = args[:-1] + (len(data),)
+    else:
+        data = b''
+    return _U8.pack(opcode) + _REQUEST_FIELDS[opcode].pack(*args) + data
+
+def decode_requests(payload: bytes) -> Iterator[Tuple[Opcode, Tuple[Any, ...]]]:
+    """@brief Decode the request records in a frame payload.
+
+    @return Iterator of (opcode, arguments) tuples. The arguments of REQUEST records are the request
+        name and argument list. For writes of multiple words or bytes, the last argument is the
+        data as a list of words or as bytes.
+    @exception exceptions.Error The payload is malformed.
+    """
+    offset = 0
+    try:
+        while offset < len(payload):
+            opcode = Opcode(payload[offset])
+            fields = _REQUEST_FIELDS[opcode]
+            args = fields.unpack_from(payload, offset + 1)
+            offset += 1 + fields.size
+
+            unit = _REQUEST_DATA_UNIT.get(opcode)
+            if unit is not None:
+                end = offset + args[-1] * unit
+                if end > len(payload):
+                    raise exceptions.Error("truncated request data")
+                data = payload[offset:end]
+                offset = end
+                if opcode == Opcode.REQUEST:
+                    rq = json.loads(data.decode('utf-8'))
+                    args = (rq['request'], rq.get('arguments', []))
+                elif unit == 4:
+                    args = args[:-1] + (conversion.byte_list_to_u32le_list(data),)
+                else:
+                    args = args[:-1] + (data,)
+            yield opcode, args
+    except (ValueError, KeyError, TypeError, struct.error) as err:
+        raise exceptions.Error("malformed request frame: %s" % err) from err
+
+def encode_response(opcode: Opcode, result: Any = None, error: Optional[BaseException] = None) -> bytes:
+    """@brief Encode the response record for a request."""
+    if error is not None:
+        message = str(error).encode('utf-8')[:0xffff]
+        return _U8.pack(get_exception_status_code(error)) + _U16.pack(len(message)) + message
+    if opcode in _WORD_RESULT_OPCODES:
+        return b'\x00' + _U32.pack(result)
+    elif opcode in _WORDS_RESULT_OPCODES:
+        return b'\x00' + _U32.pack(len(result)) + _words_to_bytes(result)
+    elif opcode == Opcode.READ_BLOCK8:
+        return b'\x00' + _U32.pack(len(result)) + bytes(result)
+    elif opcode == Opcode.REQUEST:
+        data = json.dumps(result).encode('utf-8') if (result is not None) else b''
+        return b'\x00' + _U32.pack(len(data)) + data
+    else:
+        return b'\x00'
+
+def decode_responses(payload: bytes, opcodes: Sequence[Opcode]) \
+        -> List[Tuple[Any, Optional[exceptions.Error]]]:
+    """@brief Decode the response records in a frame payload.
+
+    @param payload The frame payload.
+    @param opcodes The opcodes of the requests in the corresponding request frame.
+    @return List with a (result, exception) tuple for each request. The exception is None if the
+        request succeeded.
+    @exception exceptions.ProbeError The payload is malformed.
+    """
+    results: List[Tuple[Any, Optional[exceptions.Error]]] = []
+    offset = 0
+    try:
+        for opcode in opcodes:
+            status = payload[offset]
+            offset += 1
+            if status != 0:
+                length, = _U16.unpack_from(payload, offset)
+                message = payload[offset + 2:offset + 2 + length].decode('utf-8', 'replace')
+                offset += 2 + length
+                exc_class = STATUS_CODE_CLASS_MAP.get(status, exceptions.ProbeError)
+                results.append((None, exc_class("error received from server for %s request (status code %i): %s"
+                        % (opcode.name.lower(), status, message))))
+                continue
+
+            result: Any = None
+            if opcode in _WORD_RESULT_OPCODES:
+                result, = _U32.unpack_from(payload, offset)
+                offset += 4
+            elif opcode in _WORDS_RESULT_OPCODES or opcode in (Opcode.READ_BLOCK8, Opcode.REQUEST):
+                count, = _U32.unpack_from(payload, offset)
+                offset += 4
+                size = count * 4 if opcode in _WORDS_RESULT_OPCODES else count
+                data = payload[offset:offset + size]
+                offset += size
+                if opcode in _WORDS_RESULT_OPCODES:
+                    result = conversion.byte_list_to_u32le_list(data)
+                elif opcode == Opcode.READ_BLOCK8:
+                    result = list(data)
+                elif data:
+                    result = json.loads(data.decode('utf-8'))
+            results.append((result, None))
+    except (IndexError, ValueError, struct.error) as err:
+        raise exceptions.ProbeError("malformed response frame from server: %s" % err) from err
+    if offset != len(payload):
+        raise exceptions.ProbeError("malformed response frame from server: unexpected data")
+    return results
@@ -18,9 +18,12 @@
 import logging
 import json
 import threading
-from typing import (Any, Optional, Tuple)
+from collections import deque
+from typing import (Any, Deque, List, Optional, Tuple)
 
 from .debug_probe import DebugProbe
+from . import remote_probe_protocol as rpp
+from .remote_probe_protocol import Opcode
 from ..core import exceptions
 from ..core.memory_interface import MemoryInterface
 from ..core.plugin import Plugin
@@ -31,6 +34,20 @@ LOG = logging.getLogger(__name__)
 TRACE = LOG.getChild("trace")
 TRACE.setLevel(logging.CRITICAL)
 
+class _PendingResult:
+    """@brief Result of a request sent with the binary protocol."""
+
+    __slots__ = ('opcode', 'is_checked', 'is_done', 'result', 'exc')
+
+    def __init__(self, opcode: Opcode, is_checked: bool) -> None:
+        self.opcode = opcode
+        ## Whether the caller will examine the result. Errors from other requests are reported
+        # at the next point the client waits for the server.
+        self.is_checked = is_checked
+        self.is_done = False
+        self.result: Any = None
+        self.exc: Optional[BaseException] = None
+
 class TCPClientProbe(DebugProbe):
     """@brief Probe class that connects to a debug probe server.
 
@@ -56,30 +73,30 @@ class TCPClientProbe(DebugProbe):
         ["result": <value>]
     }
     ````
+
+    When opened, the client asks the server for the binary protocol, described in the
+    @ref pyocd.probe.remote_probe_protocol "remote_probe_protocol" module, and falls back to JSON if
+    the server doesn't support it. With the binary protocol, writes and deferred reads are queued
+    locally and sent together in one frame when a result is required, and up to
+    MAX_FRAMES_IN_FLIGHT frames are sent before waiting for the server's responses. As with other
+    probes, errors from queued writes are raised by the next read or flush.
     """
 
     DEFAULT_PORT = 5555
 
+    ## Version of the original JSON protocol.
     PROTOCOL_VERSION = 1
 
-    class StatusCode:
-        """@brief Constants for errors reported from the server."""
-        GENERAL_ERROR = 1
-        PROBE_DISCONNECTED = 2
-        PROBE_ERROR = 3
-        TRANSFER_ERROR = 10
-        TRANSFER_TIMEOUT = 11
-        TRANSFER_FAULT = 12
+    ## Queued request records are sent once they reach this many bytes.
+    MAX_FRAME_SIZE = 64 * 1024
+
+    ## Number of request frames that may be sent before reading a response.
+    MAX_FRAMES_IN_FLIGHT = 2
+
+    StatusCode = rpp.StatusCode
 
     ## Map from status code to exception class.
-    STATUS_CODE_CLASS_MAP = {
-        StatusCode.GENERAL_ERROR: exceptions.Error,
-        StatusCode.PROBE_DISCONNECTED: exceptions.ProbeDisconnected,
-        StatusCode.PROBE_ERROR: exceptions.ProbeError,
-        StatusCode.TRANSFER_ERROR: exceptions.TransferError,
-        StatusCode.TRANSFER_TIMEOUT: exceptions.TransferTimeoutError,
-        StatusCode.TRANSFER_FAULT: exceptions.TransferFaultError,
-        }
+    STATUS_CODE_CLASS_MAP = rpp.STATUS_CODE_CLASS_MAP
 
     @classmethod
     def _extract_address(cls, unique_id):
@@ -102,16 +119,33 @@ class TCPClientProbe(DebugProbe):
         return cls(unique_id) if is_explicit else None
 
     def __init__(self, unique_id):
-        """@brief Constructor."""
+        """@brief Constructor.
+
+        @param self The object.
+        @param unique_id The server's address, with an optional port number. For a server hosting
+            several probes, the address is followed by a slash and the full or partial unique ID of
+            the probe to use, for instance "myserver:5555/0240000034".
+        """
         super(TCPClientProbe, self).__init__()
-        hostname, port = self._extract_address(unique_id)
+        address, _, probe_uid = unique_id.partition('/')
+        hostname, port = self._extract_address(address)
         self._uid = f"remote:{hostname}:{port}"
+        self._probe_uid = probe_uid or None
+        if self._probe_uid:
+            self._uid += "/" + self._probe_uid
         self._socket = ClientSocket(hostname, port)
         self._is_open = False
         self._request_id = 0
         self._lock_count = 0
         self._lock_count_lock = threading.RLock()
 
+        # Binary protocol state.
+        self._is_binary = False
+        self._queued_records = bytearray()
+        self._queued_results: List[_PendingResult] = []
+        self._frames_in_flight: Deque[List[_PendingResult]] = deque()
+        self._deferred_error: Optional[BaseException] = None
+
     @property
     def vendor_name(self):
         return self._read_property('vendor_name', "vendor")
@@ -154,6 +188,14 @@ class TCPClientProbe(DebugProbe):
         exception object. The latter is only non-None if the request failed and a non-zero status code was
         returned.
         """
+        if self._is_binary:
+            with self._lock:
+                pending = self._queue_record(Opcode.REQUEST, True, request, args)
+                self._wait_for(pending)
+                # Report an error from an earlier write before this request's own result.
+                exc = self._take_deferred_error() or pending.exc
+            return pending.result, exc
+
         # Protect requests with the local lock.
         with self._lock:
             rq = {
@@ -203,6 +245,105 @@ class TCPClientProbe(DebugProbe):
             raise exc
         return result
 
+    def _queue_record(self, opcode: Opcode, is_checked: bool, *args: Any) -> _PendingResult:
+        """@brief Add a binary protocol request record to the queue.
+
+        The caller must hold the probe's lock.
+        """
+        record = rpp.encode_request(opcode, *args)
+        TRACE.debug("Queued %s request (%i bytes)", opcode.name, len(record))
+        pending = _PendingResult(opcode, is_checked)
+        self._queued_records += record
+        self._queued_results.append(pending)
+        if len(self._queued_records) >= self.MAX_FRAME_SIZE:
+            self._send_queued_records()
+        return pending
+
+    def _send_queued_records(self) -> None:
+        """@brief Send queued request records to the server as one frame."""
+        if not self._queued_results:
+            return
+        if len(self._frames_in_flight) >= self.MAX_FRAMES_IN_FLIGHT:
+            self._receive_frame()
+        frame = rpp.FRAME_HEADER.pack(len(self._queued_records)) + self._queued_records
+        self._frames_in_flight.append(self._queued_results)
+        self._queued_records = bytearray()
+        self._queued_results = []
+        self._socket.write(frame)
+
+    def _receive_frame(self) -> None:
+        """@brief Read the response frame for the oldest request frame in flight."""
+        results = self._frames_in_flight.popleft()
+        header = self._socket.read_exact(rpp.FRAME_HEADER.size)
+        length, = rpp.FRAME_HEADER.unpack(header)
+        payload = self._socket.read_exact(length)
+        decoded = rpp.decode_responses(payload, [pending.opcode for pending in results])
+        for pending, (result, exc) in zip(results, decoded):
+            pending.result = result
+            pending.exc = exc
+            pending.is_done = True
+            if exc is not None:
+                LOG.debug("%s", exc)
+                if not pending.is_checked and (self._deferred_error is None):
+                    self._deferred_error = exc
+
+    def _wait_for(self, pending: Optional[_PendingResult] = None) -> None:
+        """@brief Send queued records and read responses until a request is complete.
+
+        If _pending_ is None, all outstanding requests are completed. The caller must hold the
+        probe's lock.
+        """
+        if (pending is None) or not pending.is_done:
+            self._send_queued_records()
+        while self._frames_in_flight and ((pending is None) or not pending.is_done):
+            self._receive_frame()
+
+    def _take_deferred_error(self) -> Optional[BaseException]:
+        exc = self._deferred_error
+        self._deferred_error = None
+        return exc
+
+    def _get_pending_result(self, pending: _PendingResult) -> Any:
+        """@brief Wait for a binary protocol request and return its result or raise its error."""
+        with self._lock:
+            self._wait_for(pending)
+            exc = self._take_deferred_error() or pending.exc
+        if exc is not None:
+            raise exc
+        return pending.result
+
+    def _read_request(self, opcode: Opcode, request: str, now: bool, *args: Any) -> Any:
+        """@brief Perform a read request, returning either the result or a callback."""
+        if self._is_binary:
+            with self._lock:
+                pending = self._queue_record(opcode, True, *args)
+
+            def read_binary_cb():
+                return self._get_pending_result(pending)
+
+            return read_binary_cb() if now else read_binary_cb
+
+        result, exc = self._perform_request_without_raise(request, *args)
+
+        def read_cb():
+            # Raise any exception here so the traceback includes the actual caller.
+            if exc is not None:
+                raise exc
+            return result
+
+        return read_cb() if now else read_cb
+
+    def _write_request(self, opcode: Opcode, request: str, *args: Any) -> None:
+        """@brief Perform a write request.
+
+        With the binary protocol the write is only queued, and any error is raised later.
+        """
+        if self._is_binary:
+            with self._lock:
+                self._queue_record(opcode, False, *args)
+        else:
+            self._perform_request(request, *args)
+
     _PROPERTY_CONVERTERS = {
             'capabilities':                 lambda value: [DebugProbe.Capability[v] for v in value],
             'supported_wire_protocols':     lambda value: [DebugProbe.Protocol[v] for v in value],
@@ -223,8 +364,20 @@ class TCPClientProbe(DebugProbe):
             self._is_open = True
             self._socket.set_timeout(0.1)
 
-        # Send hello message.
-        self._perform_request('hello', self.PROTOCOL_VERSION)
+        # Tell a multi-probe server which of its probes to use.
+        if self._probe_uid and not self._is_binary:
+            self._perform_request('select_probe', self._probe_uid)
+
+        # Send hello message, asking for the binary protocol first. Servers that predate it
+        # return an error, in which case the JSON protocol is used.
+        if not self._is_binary:
+            try:
+                self._perform_request('hello', rpp.BINARY_PROTOCOL_VERSION)
+            except exceptions.Error as err:
+                LOG.debug("server does not support the binary protocol (%s)", err)
+                self._perform_request('hello', self.PROTOCOL_VERSION)
+            else:
+                self._is_binary = True
 
         self._perform_request('open')
 
@@ -233,12 +386,13 @@ class TCPClientProbe(DebugProbe):
             self._perform_request('close')
             self._socket.close()
             self._is_open = False
+            self._is_binary = False
 
     def lock(self):
         # The lock count is then used to only send the remote lock request once.
         with self._lock_count_lock:
             if self._lock_count == 0:
-                self._perform_request('lock')
+                self._write_request(Opcode.LOCK, 'lock')
             self._lock_count += 1
 
     def unlock(self):
@@ -247,7 +401,11 @@ class TCPClientProbe(DebugProbe):
             assert self._lock_count > 0
             self._lock_count -= 1
             if self._lock_count == 0:
-                self._perform_request('unlock')
+                self._write_request(Opcode.UNLOCK, 'unlock')
+                # Don't hold the remote lock until the next request.
+                if self._is_binary:
+                    with self._lock:
+                        self._send_queued_records()
 
     ## @name Target control
     ##@{
@@ -282,7 +440,12 @@ class TCPClientProbe(DebugProbe):
         return self._perform_request('is_reset_asserted')
 
     def flush(self):
-        self._perform_request('flush')
+        if self._is_binary:
+            with self._lock:
+                pending = self._queue_record(Opcode.FLUSH, True)
+            self._get_pending_result(pending)
+        else:
+            self._perform_request('flush')
 
     ##@}
 
@@ -290,46 +453,22 @@ class TCPClientProbe(DebugProbe):
     ##@{
 
     def read_dp(self, addr, now=True):
-        result, exc = self._perform_request_without_raise('read_dp', addr)
-
-        def read_dp_cb():
-            # Raise any exception here so the traceback includes the actual caller.
-            if exc is not None:
-                raise exc
-            return result
-
-        return read_dp_cb() if now else read_dp_cb
+        return self._read_request(Opcode.READ_DP, 'read_dp', now, addr)
 
     def write_dp(self, addr, data):
-        self._perform_request('write_dp', addr, data)
+        self._write_request(Opcode.WRITE_DP, 'write_dp', addr, data)
 
     def read_ap(self, addr, now=True):
-        result, exc = self._perform_request_without_raise('read_ap', addr)
-
-        def read_ap_cb():
-            # Raise any exception here so the traceback includes the actual caller.
-            if exc is not None:
-                raise exc
-            return result
-
-        return read_ap_cb() if now else read_ap_cb
+        return self._read_request(Opcode.READ_AP, 'read_ap', now, addr)
 
     def write_ap(self, addr, data):
-        self._perform_request('write_ap', addr, data)
+        self._write_request(Opcode.WRITE_AP, 'write_ap', addr, data)
 
     def read_ap_multiple(self, addr, count=1, now=True):
-        results, exc = self._perform_request_without_raise('read_ap_multiple', addr, count)
-
-        def read_ap_multiple_cb():
-            # Raise any exception here so the traceback includes the actual caller.
-            if exc is not None:
-                raise exc
-            return results
-
-        return read_ap_multiple_cb() if now else read_ap_multiple_cb
+        return self._read_request(Opcode.READ_AP_MULTIPLE, 'read_ap_multiple', now, addr, count)
 
     def write_ap_multiple(self, addr, values):
-        self._perform_request('write_ap_multiple', addr, values)
+        self._write_request(Opcode.WRITE_AP_MULTIPLE, 'write_ap_multiple', addr, list(values))
 
     def get_memory_interface_for_ap(self, ap_address):
         handle = self._perform_request('get_memory_interface_for_ap',
@@ -366,30 +505,28 @@ class RemoteMemoryInterface(MemoryInterface):
 
     def write_memory(self, addr, data, transfer_size=32, **attrs):
         assert transfer_size in (8, 16, 32)
-        self._remote_probe._perform_request('write_mem', self._handle, addr, data, transfer_size)
+        self._remote_probe._write_request(Opcode.WRITE_MEM, 'write_mem', self._handle, addr, data, transfer_size)
 
     def read_memory(self, addr, transfer_size=32, now=True, **attrs):
         assert transfer_size in (8, 16, 32)
-        result, exc = self._remote_probe._perform_request_without_raise('read_mem', self._handle, addr, transfer_size)
-
-        def read_callback():
-            # Raise any exception here so the traceback includes the actual caller.
-            if exc is not None:
-                raise exc
-            return result
-        return read_callback() if now else read_callback
+        return self._remote_probe._read_request(Opcode.READ_MEM, 'read_mem', now, self._handle, addr, transfer_size)
 
     def write_memory_block32(self, addr, data, **attrs):
-        self._remote_probe._perform_request('write_block32', self._handle, addr, data)
+        self._remote_probe._write_request(Opcode.WRITE_BLOCK32, 'write_block32', self._handle, addr, list(data))
 
     def read_memory_block32(self, addr, size, **attrs):
-        return self._remote_probe._perform_request('read_block32', self._handle, addr, size)
+        return self._remote_probe._read_request(Opcode.READ_BLOCK32, 'read_block32', True, self._handle, addr, size)
 
     def write_memory_block8(self, addr, data, **attrs):
-        self._remote_probe._perform_request('write_block8', self._handle, addr, data)
+        if self._remote_probe._is_binary:
+            data = bytes(data)
+        else:
+            # Byte buffers are converted to a list to be encoded as JSON.
+            data = list(data)
+        self._remote_probe._write_request(Opcode.WRITE_BLOCK8, 'write_block8', self._handle, addr, data)
 
     def read_memory_block8(self, addr, size, **attrs):
-        return self._remote_probe._perform_request('read_block8', self._handle, addr, size)
+        return self._remote_probe._read_request(Opcode.READ_BLOCK8, 'read_block8', True, self._handle, addr, size)
 
 class TCPClientProbePlugin(Plugin):
     """@brief Plugin class for TCPClientProbePlugin."""
@@ -21,11 +21,13 @@ import json
 import socket
 from socketserver import (ThreadingTCPServer, StreamRequestHandler)
 from time import sleep
-from typing import (Callable, Dict, Optional, TYPE_CHECKING, Tuple, cast)
+from typing import (Any, Callable, Dict, List, Optional, TYPE_CHECKING, Tuple, cast)
 
 from .shared_probe_proxy import SharedDebugProbeProxy
 from ..core import exceptions
 from .debug_probe import DebugProbe
+from . import remote_probe_protocol as rpp
+from .remote_probe_protocol import Opcode
 from ..coresight.ap import (APVersion, APv1Address, APv2Address)
 
 if TYPE_CHECKING:
@@ -37,6 +39,13 @@ LOG = logging.getLogger(__name__)
 TRACE = LOG.getChild("trace")
 TRACE.setLevel(logging.CRITICAL)
 
+def probe_matches_unique_id(probe: DebugProbe, unique_id: str) -> bool:
+    """@brief Whether a full or partial unique ID selects a probe.
+
+    The comparison is case insensitive, matching probe selection with the `--uid` argument.
+    """
+    return unique_id.lower() in probe.unique_id.lower()
+
 class DebugProbeServer(threading.Thread):
     """@brief Shares a debug probe over a TCP server.
 
@@ -172,10 +181,18 @@ class TCPProbeServer(ThreadingTCPServer):
         LOG.error("Error while handling client request (client address %s):", client_address,
             exc_info=self._session.log_tracebacks)
 
-class DebugProbeRequestHandler(StreamRequestHandler):
-    """@brief Probe server request handler.
+class DebugProbeRequestProcessor:
+    """@brief Server side of the remote probe protocol for one client connection.
+
+    The processor performs the requests received from a client on the probe and builds the
+    responses, leaving it to the caller to read and write the connection. It is used both by
+    DebugProbeRequestHandler and by the @ref pyocd.probe.multi_probe_server.MultiProbeServer
+    "MultiProbeServer".
 
-    This class implements the server side for the remote probe protocol.
+    Connections start out using one-line JSON requests and responses, shown below. If the client's
+    'hello' request asks for protocol version 2, the connection switches to the binary framing
+    described in the @ref pyocd.probe.remote_probe_protocol "remote_probe_protocol" module once the
+    response has been sent. Clients that request version 1 continue to use JSON.
 
     request:
     ````
@@ -198,31 +215,24 @@ class DebugProbeRequestHandler(StreamRequestHandler):
     """
 
     ## Current version of the remote probe protocol.
-    PROTOCOL_VERSION = 1
+    PROTOCOL_VERSION = rpp.BINARY_PROTOCOL_VERSION
 
-    class StatusCode:
-        """@brief Constants for errors reported from the server."""
-        GENERAL_ERROR = 1
-        PROBE_DISCONNECTED = 2
-        PROBE_ERROR = 3
-        TRANSFER_ERROR = 10
-        TRANSFER_TIMEOUT = 11
-        TRANSFER_FAULT = 12
+    ## Protocol versions accepted in a 'hello' request.
+    SUPPORTED_PROTOCOL_VERSIONS = (1, rpp.BINARY_PROTOCOL_VERSION)
 
-    def setup(self):
-        # Do a DNS lookup on the client.
-        try:
-            info = socket.gethostbyaddr(self.client_address[0])
-            self._client_domain = info[0]
-        except socket.herror:
-            self._client_domain = self.client_address[0]
+    StatusCode = rpp.StatusCode
 
-        # Get the session and probe we're serving from the server.
-        self._session = cast(TCPProbeServer, self.server).session
-        self._probe = cast(TCPProbeServer, self.server).probe
+    def __init__(self, session: "Session", probe: DebugProbe, client_name: str) -> None:
+        """@brief Constructor.
 
-        LOG.info("Client %s (port %i) connected to probe %s",
-                self._client_domain, self.client_address[1], self._probe.unique_id)
+        @param self The object.
+        @param session The server's session.
+        @param probe The probe being served.
+        @param client_name Description of the client used in log messages.
+        """
+        self._session = session
+        self._probe = probe
+        self._client_name = client_name
 
         # Give the probe a session if it doesn't have one, in case it needs to access settings.
         # TODO: create a session proxy so client-side options can be accessed
@@ -233,15 +243,22 @@ class DebugProbeRequestHandler(StreamRequestHandler):
         self._next_ap_memif_handle: int = 0
         self._ap_memif_handles: Dict[int, "MemoryInterface"] = {}
 
+        # Set by a 'hello' request for the binary protocol.
+        self._is_binary: bool = False
+
+        # Number of unmatched lock requests from the client.
+        self._lock_depth: int = 0
+
         # Create the request handlers dict here so we can reference bound probe methods.
         self._REQUEST_HANDLERS: Dict[str, Tuple[Callable, int]] = {
                 # Command                Handler                            Arg count
                 'hello':                (self._request__hello,              1   ),
+                'select_probe':         (self._request__select_probe,       1   ), # 'select_probe', unique_id:str
                 'readprop':             (self._request__read_property,      1   ),
                 'open':                 (self._probe.open,                  0   ), # 'open'
                 'close':                (self._probe.close,                 0   ), # 'close'
-                'lock':                 (self._probe.lock,                  0   ), # 'lock'
-                'unlock':               (self._probe.unlock,                0   ), # 'unlock'
+                'lock':                 (self._lock,                        0   ), # 'lock'
+                'unlock':               (self._unlock,                      0   ), # 'unlock'
                 'connect':              (self._request__connect,            1   ), # 'connect', protocol:str
                 'disconnect':           (self._probe.disconnect,            0   ), # 'disconnect'
                 'swj_sequence':         (self._probe.swj_sequence,          2   ), # 'swj_sequence', length:int, bits:int
@@ -270,12 +287,48 @@ class DebugProbeRequestHandler(StreamRequestHandler):
                 'write_block8':         (self._request__write_block8,       3   ), # 'write_block8', handle:int, addr:int, data:List[int]
             }
 
-        # Let superclass do its thing.
-        super().setup()
+        # Handlers for binary protocol records. Reads are deferred so that all transfers in a frame
+        # can be queued by the probe before any results are needed.
+        self._BINARY_HANDLERS: Dict[Opcode, Callable] = {
+                Opcode.REQUEST:             self._perform_request,
+                Opcode.READ_DP:             lambda addr: self._probe.read_dp(addr, now=False),
+                Opcode.WRITE_DP:            self._probe.write_dp,
+                Opcode.READ_AP:             lambda addr: self._probe.read_ap(addr, now=False),
+                Opcode.WRITE_AP:            self._probe.write_ap,
+                Opcode.READ_AP_MULTIPLE:    lambda addr, count: self._probe.read_ap_multiple(addr, count, now=False),
+                Opcode.WRITE_AP_MULTIPLE:   self._probe.write_ap_multiple,
+                Opcode.READ_MEM:            lambda handle, addr, xfer_size:
+                                                self._get_memif(handle).read_memory(addr, xfer_size, now=False),
+                Opcode.WRITE_MEM:           self._request__write_mem,
+                Opcode.READ_BLOCK32:        self._request__read_block32,
+                Opcode.WRITE_BLOCK32:       self._request__write_block32,
+                Opcode.READ_BLOCK8:         self._request__read_block8,
+                Opcode.WRITE_BLOCK8:        self._request__write_block8,
+                Opcode.LOCK:                self._lock,
+                Opcode.UNLOCK:              self._unlock,
+                Opcode.FLUSH:               self._probe.flush,
+            }
 
-    def finish(self):
-        LOG.info("Client %s (port %i) disconnected from probe %s",
-                self._client_domain, self.client_address[1], self._probe.unique_id)
+    @property
+    def probe(self) -> DebugProbe:
+        return self._probe
+
+    @property
+    def is_binary(self) -> bool:
+        """@brief Whether the client's requests are in binary frames rather than JSON lines."""
+        return self._is_binary
+
+    @property
+    def lock_depth(self) -> int:
+        """@brief Number of lock requests from the client that have not been matched by an unlock."""
+        return self._lock_depth
+
+    def close(self) -> None:
+        """@brief Clean up after the client has disconnected."""
+        # Release the probe if the client went away while holding the lock.
+        while self._lock_depth:
+            self._lock_depth -= 1
+            self._probe.unlock()
 
         # Flush the probe and ignore any lingering errors.
         try:
@@ -283,125 +336,178 @@ class DebugProbeRequestHandler(StreamRequestHandler):
         except exceptions.Error as err:
             LOG.debug("exception while flushing probe on disconnect: %s", err)
 
-        super().finish()
-
-    def _send_error_response(self, status=1, message=""):
+    @staticmethod
+    def format_response(request_id: Any, result: Any = None, status: int = 0, message: str = "") -> bytes:
+        """@brief Build a JSON response line."""
         response_dict = {
-                "id": self._current_request_id,
+                "id": request_id,
                 "status": status,
-                "error": message,
             }
-        response = json.dumps(response_dict)
-        TRACE.debug("response: %s", response)
-        response_encoded = response.encode('utf-8')
-        self.wfile.write(response_encoded + b"\n")
-
-    def _send_response(self, result):
-        response_dict = {
-                "id": self._current_request_id,
-                "status": 0,
-            }
-        if result is not None:
+        if status != 0:
+            response_dict["error"] = message
+        elif result is not None:
             response_dict["result"] = result
         response = json.dumps(response_dict)
         TRACE.debug("response: %s", response)
-        response_encoded = response.encode('utf-8')
-        self.wfile.write(response_encoded + b"\n")
-
-    def handle(self):
-        # Process requests until the connection is closed.
-        while True:
-            request = None
-            request_type = "<missing>"
-            try:
-                request_dict = None
-                self._current_request_id = -1
+        return response.encode('utf-8') + b"\n"
 
-                # Read request line.
-                request = self.rfile.readline()
-                TRACE.debug("request: %s", request)
-                if len(request) == 0:
-                    LOG.debug("empty request, closing connection")
-                    return
+    def process_request_line(self, request: bytes) -> Tuple[bytes, Optional[Exception]]:
+        """@brief Perform a JSON request.
 
+        @return Tuple of the response line and, if the request raised an exception that is not a
+            pyOCD error, that exception. The caller should send the response and then reraise it.
+        """
+        TRACE.debug("request: %s", request)
+        request_id = -1
+        request_type = "<missing>"
+        try:
+            try:
+                request_dict = json.loads(request)
+            except json.JSONDecodeError:
+                return self.format_response(request_id, status=1, message="invalid request format"), None
+
+            if not isinstance(request_dict, dict):
+                return self.format_response(request_id, status=1, message="invalid request format"), None
+
+            if 'id' not in request_dict:
+                return self.format_response(request_id, status=1, message="missing request ID"), None
+            request_id = request_dict['id']
+
+            if 'request' not in request_dict:
+                return self.format_response(request_id, status=1, message="missing request field"), None
+            request_type = request_dict['request']
+
+            # Get arguments. If the key isn't present then there are no arguments.
+            request_args = request_dict.get('arguments', [])
+
+            if not isinstance(request_args, list):
+                return self.format_response(request_id, status=1,
+                        message="invalid request arguments format"), None
+
+            result = self._perform_request(request_type, request_args)
+            return self.format_response(request_id, result), None
+        # Catch all exceptions so that an error response can be returned, to not leave the client hanging.
+        except Exception as err:
+            LOG.error("Error processing '%s' request (ID %s, client %s, probe %s): %s",
+                    request_type, request_id, self._client_name, self._probe.unique_id, err,
+                    exc_info=self._session.log_tracebacks)
+            LOG.debug("Full request from error: %s", request.decode('utf-8', 'replace'))
+            response = self.format_response(request_id, status=self._get_exception_status_code(err),
+                    message=str(err))
+            # Reraise non-pyocd errors.
+            return response, (None if isinstance(err, exceptions.Error) else err)
+
+    def process_frame(self, payload: bytes) -> Tuple[Optional[bytes], Optional[Exception]]:
+        """@brief Perform the requests from one binary protocol frame.
+
+        @return Tuple of the response frame payload and the first non-pyocd exception raised by a
+            request, if any. The payload is None if the frame is malformed, in which case the
+            connection must be closed because the client and server can't resynchronise.
+        """
+        try:
+            requests = list(rpp.decode_requests(payload))
+        except exceptions.Error as err:
+            LOG.error("Invalid request frame from client %s (probe %s): %s",
+                    self._client_name, self._probe.unique_id, err)
+            return None, None
+
+        results: List[Any] = [None] * len(requests)
+        errors: List[Optional[Exception]] = [None] * len(requests)
+        deferred: List[int] = []
+        fatal_error: Optional[Exception] = None
+
+        def record_error(index: int, err: Exception) -> None:
+            nonlocal fatal_error
+            opcode, args = requests[index]
+            name = args[0] if (opcode == Opcode.REQUEST) else opcode.name.lower()
+            LOG.error("Error processing '%s' request (client %s, probe %s): %s",
+                    name, self._client_name, self._probe.unique_id, err,
+                    exc_info=self._session.log_tracebacks)
+            errors[index] = err
+            if (fatal_error is None) and not isinstance(err, exceptions.Error):
+                fatal_error = err
+
+        def resolve_deferred() -> None:
+            for index in deferred:
                 try:
-                    request_dict = json.loads(request)
-                except json.JSONDecodeError:
-                    self._send_error_response(message="invalid request format")
-                    continue
-
-                if not isinstance(request_dict, dict):
-                    self._send_error_response(message="invalid request format")
-                    continue
-
-                if 'id' not in request_dict:
-                    self._send_error_response(message="missing request ID")
-                    continue
-                self._current_request_id = request_dict['id']
-
-                if 'request' not in request_dict:
-                    self._send_error_response(message="missing request field")
-                    continue
-                request_type = request_dict['request']
-
-                # Get arguments. If the key isn't present then there are no arguments.
-                request_args = request_dict.get('arguments', [])
-
-                if not isinstance(request_args, list):
-                    self._send_error_response(message="invalid request arguments format")
-                    continue
-
-                if request_type not in self._REQUEST_HANDLERS:
-                    self._send_error_response(message="unknown request type")
-                    continue
-                handler, arg_count = self._REQUEST_HANDLERS[request_type]
-                self._check_args(request_args, arg_count)
-                result = handler(*request_args)
-
-                # Send a success response.
-                self._send_response(result)
-            # Catch all exceptions so that an error response can be returned, to not leave the client hanging.
+                    results[index] = results[index]()
+                except Exception as err:
+                    record_error(index, err)
+            deferred.clear()
+
+        for index, (opcode, args) in enumerate(requests):
+            # Complete deferred reads before anything that may use the probe on behalf of another
+            # client or end the connection.
+            if opcode in (Opcode.REQUEST, Opcode.UNLOCK, Opcode.FLUSH):
+                resolve_deferred()
+            try:
+                results[index] = self._BINARY_HANDLERS[opcode](*args)
             except Exception as err:
-                # Only send an error response if we received an request.
-                if request is not None:
-                    LOG.error("Error processing '%s' request (ID %i, client %s, probe %s): %s",
-                            request_type, self._current_request_id, self._client_domain, self._probe.unique_id, err,
-                            exc_info=self._session.log_tracebacks)
-                    LOG.debug("Full request from error: %s", request.decode('utf-8', 'replace'))
-                    self._send_error_response(status=self._get_exception_status_code(err),
-                            message=str(err))
-                else:
-                    LOG.error("Error before request was received: %s", err,
-                            exc_info=self._session.log_tracebacks)
-                # Reraise non-pyocd errors.
-                if not isinstance(err, exceptions.Error):
-                    raise
+                record_error(index, err)
+            else:
+                if callable(results[index]):
+                    deferred.append(index)
+        resolve_deferred()
+
+        response = bytearray()
+        for index, (opcode, _) in enumerate(requests):
+            try:
+                response += rpp.encode_response(opcode, results[index], errors[index])
+            except (TypeError, ValueError, OverflowError) as err:
+                # The result can't be encoded, for instance a property that isn't JSON serialisable.
+                record_error(index, exceptions.Error("invalid result: %s" % err))
+                response += rpp.encode_response(opcode, error=errors[index])
+        return bytes(response), fatal_error
 
     def _get_exception_status_code(self, err):
         """@brief Convert an exception class into a status code."""
-        # Must test the exception class in order of specific to general.
-        if isinstance(err, exceptions.ProbeDisconnected):
-            return self.StatusCode.PROBE_DISCONNECTED
-        elif isinstance(err, exceptions.ProbeError):
-            return self.StatusCode.PROBE_ERROR
-        elif isinstance(err, exceptions.TransferFaultError):
-            return self.StatusCode.TRANSFER_FAULT
-        elif isinstance(err, exceptions.TransferTimeoutError):
-            return self.StatusCode.TRANSFER_TIMEOUT
-        elif isinstance(err, exceptions.TransferError):
-            return self.StatusCode.TRANSFER_ERROR
-        else:
-            return self.StatusCode.GENERAL_ERROR
+        return rpp.get_exception_status_code(err)
 
     def _check_args(self, args, count):
         if len(args) != count:
             raise exceptions.Error("malformed request; invalid number of arguments")
 
+    def _perform_request(self, request_type: str, request_args: List[Any]) -> Any:
+        """@brief Look up and call the handler for a request."""
+        if request_type not in self._REQUEST_HANDLERS:
+            raise exceptions.Error("unknown request type")
+        handler, arg_count = self._REQUEST_HANDLERS[request_type]
+        self._check_args(request_args, arg_count)
+        return handler(*request_args)
+
+    def _get_memif(self, handle: int) -> "MemoryInterface":
+        try:
+            return self._ap_memif_handles[handle]
+        except KeyError:
+            raise exceptions.Error("invalid handle received from remote memory access") from None
+
     def _request__hello(self, version):
         # 'hello', protocol-version:int
-        if version != self.PROTOCOL_VERSION:
+        if version not in self.SUPPORTED_PROTOCOL_VERSIONS:
             raise exceptions.Error("client requested unsupported protocol version %i (expected %i)" %
                     (version, self.PROTOCOL_VERSION))
+        if (version == rpp.BINARY_PROTOCOL_VERSION) and not self._is_binary:
+            # Takes effect with the next request, after the client has seen this response.
+            LOG.debug("client %s switched to binary protocol", self._client_name)
+            self._is_binary = True
+
+    def _request__select_probe(self, unique_id):
+        # 'select_probe', unique_id:str
+        # Sent by clients that name a probe, which is only meaningful for a multi-probe server.
+        if not probe_matches_unique_id(self._probe, unique_id):
+            raise exceptions.ProbeError("this server does not serve probe '%s'" % unique_id)
+
+    def _lock(self):
+        # 'lock'
+        self._probe.lock()
+        self._lock_depth += 1
+
+    def _unlock(self):
+        # 'unlock'
+        if self._lock_depth == 0:
+            raise exceptions.Error("unlock request without matching lock")
+        self._lock_depth -= 1
+        self._probe.unlock()
 
     def _request__read_property(self, name):
         # 'readprop', name:str
@@ -446,43 +552,27 @@ class DebugProbeRequestHandler(StreamRequestHandler):
 
     def _request__read_mem(self, handle, addr, xfer_size):
         # 'read_mem', handle:int, addr:int, xfer_size:int -> int
-        if handle not in self._ap_memif_handles:
-            raise exceptions.Error("invalid handle received from remote memory access")
-        return self._ap_memif_handles[handle].read_memory(addr, xfer_size, now=True)
+        return self._get_memif(handle).read_memory(addr, xfer_size, now=True)
 
     def _request__write_mem(self, handle, addr, value, xfer_size):
         # 'write_mem', handle:int, addr:int, value:int, xfer_size:int
-        if handle not in self._ap_memif_handles:
-            raise exceptions.Error("invalid handle received from remote memory access")
-        self._ap_memif_handles[handle].write_memory(addr, value, xfer_size)
+        self._get_memif(handle).write_memory(addr, value, xfer_size)
 
     def _request__read_block32(self, handle, addr, word_count):
         # 'read_block32', handle:int, addr:int, word_count:int -> List[int]
-        # TODO use base64 data
-        if handle not in self._ap_memif_handles:
-            raise exceptions.Error("invalid handle received from remote memory access")
-        return self._ap_memif_handles[handle].read_memory_block32(addr, word_count)
+        return self._get_memif(handle).read_memory_block32(addr, word_count)
 
     def _request__write_block32(self, handle, addr, data):
         # 'write_block32', handle:int, addr:int, data:List[int]
-        # TODO use base64 data
-        if handle not in self._ap_memif_handles:
-            raise exceptions.Error("invalid handle received from remote memory access")
-        self._ap_memif_handles[handle].write_memory_block32(addr, data)
+        self._get_memif(handle).write_memory_block32(addr, data)
 
     def _request__read_block8(self, handle, addr, word_count):
         # 'read_block8', handle:int, addr:int, word_count:int -> List[int]
-        # TODO use base64 data
-        if handle not in self._ap_memif_handles:
-            raise exceptions.Error("invalid handle received from remote memory access")
-        return self._ap_memif_handles[handle].read_memory_block8(addr, word_count)
+        return self._get_memif(handle).read_memory_block8(addr, word_count)
 
     def _request__write_block8(self, handle, addr, data):
         # 'write_block8', handle:int, addr:int, data:List[int]
-        # TODO use base64 data
-        if handle not in self._ap_memif_handles:
-            raise exceptions.Error("invalid handle received from remote memory access")
-        self._ap_memif_handles[handle].write_memory_block8(addr, data)
+        self._get_memif(handle).write_memory_block8(addr, data)
 
     _PROPERTY_CONVERTERS = {
             'capabilities':                 lambda value: [v.name for v in value],
@@ -490,3 +580,75 @@ class DebugProbeRequestHandler(StreamRequestHandler):
             'wire_protocol':                lambda value: value.name if (value is not None) else None,
         }
 
+class DebugProbeRequestHandler(StreamRequestHandler):
+    """@brief Probe server request handler.
+
+    Reads requests from the client's connection and passes them to a DebugProbeRequestProcessor,
+    which implements the server side of the remote probe protocol.
+    """
+
+    ## Current version of the remote probe protocol.
+    PROTOCOL_VERSION = DebugProbeRequestProcessor.PROTOCOL_VERSION
+
+    StatusCode = rpp.StatusCode
+
+    ## Reduce latency of the many small responses.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # Do a DNS lookup on the client.
+        try:
+            info = socket.gethostbyaddr(self.client_address[0])
+            self._client_domain = info[0]
+        except socket.herror:
+            self._client_domain = self.client_address[0]
+
+        # Get the session and probe we're serving from the server.
+        self._session = cast(TCPProbeServer, self.server).session
+        self._probe = cast(TCPProbeServer, self.server).probe
+
+        LOG.info("Client %s (port %i) connected to probe %s",
+                self._client_domain, self.client_address[1], self._probe.unique_id)
+
+        self._processor = DebugProbeRequestProcessor(self._session, self._probe, self._client_domain)
+
+        # Let superclass do its thing.
+        super().setup()
+
+    def finish(self):
+        LOG.info("Client %s (port %i) disconnected from probe %s",
+                self._client_domain, self.client_address[1], self._probe.unique_id)
+        self._processor.close()
+        super().finish()
+
+    def handle(self):
+        # Process requests until the connection is closed.
+        header_size = rpp.FRAME_HEADER.size
+        while True:
+            if not self._processor.is_binary:
+                # Read request line.
+                request = self.rfile.readline()
+                if len(request) == 0:
+                    LOG.debug("empty request, closing connection")
+                    return
+                response, error = self._processor.process_request_line(request)
+            else:
+                header = self.rfile.read(header_size)
+                if len(header) < header_size:
+                    LOG.debug("connection closed")
+                    return
+                length, = rpp.FRAME_HEADER.unpack(header)
+                payload = self.rfile.read(length)
+                if len(payload) < length:
+                    LOG.debug("connection closed within a request frame")
+                    return
+                frame, error = self._processor.process_frame(payload)
+                if frame is None:
+                    return
+                response = rpp.FRAME_HEADER.pack(len(frame)) + frame
+
+            self.wfile.write(response)
+
+            # Reraise non-pyocd errors.
+            if error is not None:
+                raise error
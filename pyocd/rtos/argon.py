@@ -15,7 +15,7 @@
 # limitations under the License.
 
 from .provider import (TargetThread, ThreadProvider)
-from .common import (read_c_string, HandlerModeThread, EXC_RETURN_EXT_FRAME_MASK)
+from .common import (read_c_string, HandlerModeThread, EXC_RETURN_EXT_FRAME_MASK, SavedRegisterReader)
 from ..core import exceptions
 from ..core.target import Target
 from ..core.plugin import Plugin
@@ -57,11 +57,13 @@ class TargetList(object):
 
         while is_valid and next != head:
             try:
-                # Read the object from the node.
-                obj = self._context.read32(node + LIST_NODE_OBJ_OFFSET)
+                # Read the object and next node pointer from the node.
+                obj, next = self._context.read_memory_scatter([
+                        (node + LIST_NODE_OBJ_OFFSET, 32),
+                        (node + LIST_NODE_NEXT_OFFSET, 32),
+                        ])
                 yield obj
 
-                next = self._context.read32(node + LIST_NODE_NEXT_OFFSET)
                 node = next
             except exceptions.TransferError:
                 LOG.warning("TransferError while reading list elements (list=0x%08x, node=0x%08x), terminating list", self._list, node)
@@ -152,6 +154,7 @@ class ArgonThreadContext(DebugContext):
         super(ArgonThreadContext, self).__init__(parent)
         self._thread = thread
         self._has_fpu = self.core.has_fpu
+        self._saved_registers = SavedRegisterReader(parent)
 
     def read_core_registers_raw(self, reg_list):
         reg_list = [index_for_reg(reg) for reg in reg_list]
@@ -196,6 +199,10 @@ class ArgonThreadContext(DebugContext):
                 hwStacked = 0x68
                 swStacked = 0x60
 
+        # Read the saved registers. The software stacked registers are not present in an exception.
+        frameStart = swStacked if inException else 0
+        saved = self._saved_registers.read(sp - frameStart, table, frameStart, swStacked + hwStacked)
+
         for reg in reg_list:
             # Must handle stack pointer specially.
             if reg == 13:
@@ -205,22 +212,18 @@ class ArgonThreadContext(DebugContext):
                     reg_vals.append(sp + swStacked + hwStacked)
                 continue
 
-            # Look up offset for this register on the stack.
-            spOffset = table.get(reg, None)
-            if spOffset is None:
-                reg_vals.append(self._parent.read_core_register_raw(reg))
-                continue
-            if inException:
-                spOffset -= swStacked
-
-            try:
-                if spOffset >= 0:
-                    reg_vals.append(self._parent.read32(sp + spOffset))
+            # Use the saved register if it's in the frame, otherwise the live one.
+            value = saved.get(reg)
+            if value is None:
+                if reg in table:
+                    # Saved by the RTOS but not present in the frame - try live one.
+                    try:
+                        value = self._parent.read_core_register_raw(reg)
+                    except exceptions.TransferError:
+                        value = 0
                 else:
-                    # Not available - try live one
-                    reg_vals.append(self._parent.read_core_register_raw(reg))
-            except exceptions.TransferError:
-                reg_vals.append(0)
+                    value = self._parent.read_core_register_raw(reg)
+            reg_vals.append(value)
 
         return reg_vals
 
@@ -275,9 +278,10 @@ class ArgonThread(TargetThread):
 
     def update_info(self):
         try:
-            self._priority = self._target_context.read8(self._base + THREAD_PRIORITY_OFFSET)
-
-            self._state = self._target_context.read8(self._base + THREAD_STATE_OFFSET)
+            self._priority, self._state = self._target_context.read_memory_scatter([
+                    (self._base + THREAD_PRIORITY_OFFSET, 8),
+                    (self._base + THREAD_STATE_OFFSET, 8),
+                    ])
             if self._state > self.DONE:
                 self._state = self.UNKNOWN
         except exceptions.TransferError:
@@ -16,10 +16,14 @@
 # limitations under the License.
 
 import logging
+from typing import (Dict, Optional, Tuple, TYPE_CHECKING)
 
 from .provider import TargetThread
 from ..core import exceptions
 
+if TYPE_CHECKING:
+    from ..debug.context import DebugContext
+
 LOG = logging.getLogger(__name__)
 
 ## Mask on EXC_RETURN indicating whether space for FP registers is allocated
@@ -61,6 +65,78 @@ def read_c_string(context, ptr):
 
     return s
 
+class SavedRegisterReader:
+    """@brief Reads the registers of a thread that are saved in target memory.
+
+    RTOS thread contexts recover the registers of threads that are not running from the exception
+    frame stacked by the core plus the registers saved by the RTOS on a context switch. Rather than
+    reading each register individually, read() fetches the entire frame with one block read and
+    decodes the registers from it.
+
+    Each thread context should own an instance. Frames are cached until the core's run token
+    changes, so repeated register queries for a thread while the target is halted only read
+    target memory once.
+    """
+
+    def __init__(self, context: "DebugContext") -> None:
+        """@brief Constructor.
+        @param self
+        @param context The context used to read memory, normally the thread context's parent.
+        """
+        self._context = context
+        self._run_token: Optional[int] = None
+        self._frames: Dict[Tuple[int, int], Optional[bytes]] = {}
+
+    def _read_frame(self, addr: int, size: int) -> Optional[bytes]:
+        run_token = self._context.core.run_token
+        if run_token != self._run_token:
+            self._frames.clear()
+            self._run_token = run_token
+
+        key = (addr, size)
+        try:
+            return self._frames[key]
+        except KeyError:
+            pass
+
+        try:
+            data: Optional[bytes] = bytes(self._context.read_memory_block8(addr, size))
+        except exceptions.TransferError:
+            LOG.debug("Transfer error while reading saved registers [0x%08x:0x%08x]", addr, addr + size)
+            data = None
+        self._frames[key] = data
+        return data
+
+    def read(self, addr: int, offsets: Dict[int, int], start: int, end: int) -> Dict[int, int]:
+        """@brief Read the registers saved in a frame.
+
+        @param self
+        @param addr Address to which the offsets are relative.
+        @param offsets Dict of register index to offset of the saved register.
+        @param start Offset of the first byte of the frame that is present in memory.
+        @param end Offset of the end of the frame.
+        @return Dict of register index to value for the registers whose offset is within the
+            frame. All values are 0 if the frame can't be read.
+        """
+        data = self._read_frame(addr + start, end - start)
+        result = {}
+        for reg, offset in offsets.items():
+            if start <= offset and offset + 4 <= end:
+                if data is None:
+                    result[reg] = 0
+                else:
+                    result[reg] = int.from_bytes(data[offset - start:offset - start + 4], 'little')
+        return result
+
+    def read_word(self, addr: int) -> int:
+        """@brief Read one saved word, such as the exception return value, through the cache.
+        @exception TransferError The word can't be read.
+        """
+        data = self._read_frame(addr, 4)
+        if data is None:
+            raise exceptions.TransferError("unable to read saved word at 0x%08x" % addr)
+        return int.from_bytes(data, 'little')
+
 class HandlerModeThread(TargetThread):
     """@brief Class representing the handler mode."""
 
@@ -15,7 +15,7 @@
 # limitations under the License.
 
 from .provider import (TargetThread, ThreadProvider)
-from .common import (read_c_string, HandlerModeThread, EXC_RETURN_EXT_FRAME_MASK)
+from .common import (read_c_string, HandlerModeThread, EXC_RETURN_EXT_FRAME_MASK, SavedRegisterReader)
 from ..core import exceptions
 from ..core.target import Target
 from ..core.plugin import Plugin
@@ -31,6 +31,8 @@ LIST_NODE_NEXT_OFFSET = 8 # 4?
 LIST_NODE_OBJECT_OFFSET = 12
 
 THREAD_STACK_POINTER_OFFSET = 0
+THREAD_STATE_LIST_OWNER_OFFSET = 20 # xStateListItem.pvContainer
+THREAD_EVENT_LIST_OWNER_OFFSET = 40 # xEventListItem.pvContainer
 THREAD_PRIORITY_OFFSET = 44
 THREAD_NAME_OFFSET = 52
 
@@ -45,22 +47,25 @@ class TargetList(object):
     def __iter__(self):
         prev = -1
         found = 0
-        count = self._context.read32(self._list)
+        count, node = self._context.read_memory_scatter([
+                (self._list, 32),
+                (self._list + LIST_INDEX_OFFSET, 32),
+                ])
         if count == 0:
             return
 
-        node = self._context.read32(self._list + LIST_INDEX_OFFSET)
-
         while (node != 0) and (node != prev) and (found < count):
             try:
-                # Read the object from the node.
-                obj = self._context.read32(node + LIST_NODE_OBJECT_OFFSET)
+                # Read the object and next list node pointer from the node.
+                obj, next_node = self._context.read_memory_scatter([
+                        (node + LIST_NODE_OBJECT_OFFSET, 32),
+                        (node + LIST_NODE_NEXT_OFFSET, 32),
+                        ])
                 yield obj
                 found += 1
 
-                # Read next list node pointer.
                 prev = node
-                node = self._context.read32(node + LIST_NODE_NEXT_OFFSET)
+                node = next_node
             except exceptions.TransferError:
                 LOG.warning("TransferError while reading list elements (list=0x%08x, node=0x%08x), terminating list", self._list, node)
                 node = 0
@@ -157,6 +162,7 @@ class FreeRTOSThreadContext(DebugContext):
         super(FreeRTOSThreadContext, self).__init__(parent)
         self._thread = thread
         self._has_fpu = self.core.has_fpu
+        self._saved_registers = SavedRegisterReader(parent)
 
     def read_core_registers_raw(self, reg_list):
         reg_list = [index_for_reg(reg) for reg in reg_list]
@@ -191,7 +197,7 @@ class FreeRTOSThreadContext(DebugContext):
                 else:
                     # Read stacked exception return LR.
                     offset = self.FPU_BASIC_REGISTER_OFFSETS[-1]
-                    exceptionLR = self._parent.read32(sp + offset)
+                    exceptionLR = self._saved_registers.read_word(sp + offset)
 
                 # Check bit 4 of the saved exception LR to determine if FPU registers were stacked.
                 if (exceptionLR & EXC_RETURN_EXT_FRAME_MASK) != 0:
@@ -204,6 +210,10 @@ class FreeRTOSThreadContext(DebugContext):
             except exceptions.TransferError:
                 LOG.debug("Transfer error while reading thread's saved LR")
 
+        # Read the saved registers. The software stacked registers are not present in an exception.
+        frameStart = swStacked if inException else 0
+        saved = self._saved_registers.read(sp - frameStart, table, frameStart, swStacked + hwStacked)
+
         for reg in reg_list:
             # Must handle stack pointer specially.
             if reg == 13:
@@ -213,22 +223,18 @@ class FreeRTOSThreadContext(DebugContext):
                     reg_vals.append(sp + swStacked + hwStacked)
                 continue
 
-            # Look up offset for this register on the stack.
-            spOffset = table.get(reg, None)
-            if spOffset is None:
-                reg_vals.append(self._parent.read_core_register_raw(reg))
-                continue
-            if inException:
-                spOffset -= swStacked
-
-            try:
-                if spOffset >= 0:
-                    reg_vals.append(self._parent.read32(sp + spOffset))
+            # Use the saved register if it's in the frame, otherwise the live one.
+            value = saved.get(reg)
+            if value is None:
+                if reg in table:
+                    # Saved by the RTOS but not present in the frame - try live one.
+                    try:
+                        value = self._parent.read_core_register_raw(reg)
+                    except exceptions.TransferError:
+                        value = 0
                 else:
-                    # Not available - try live one
-                    reg_vals.append(self._parent.read_core_register_raw(reg))
-            except exceptions.TransferError:
-                reg_vals.append(0)
+                    value = self._parent.read_core_register_raw(reg)
+            reg_vals.append(value)
 
         return reg_vals
 
@@ -283,6 +289,10 @@ class FreeRTOSThread(TargetThread):
     def priority(self):
         return self._priority
 
+    @priority.setter
+    def priority(self, value):
+        self._priority = value
+
     @property
     def unique_id(self):
         return self._base
@@ -329,6 +339,7 @@ class FreeRTOSThreadProvider(ThreadProvider):
         self._symbols = None
         self._total_priorities = 0
         self._threads = {}
+        self._list_states = {}
 
     def init(self, symbolProvider):
         # Lookup required symbols.
@@ -346,6 +357,11 @@ class FreeRTOSThreadProvider(ThreadProvider):
         if tasksWaitingTerminationSym is not None:
             self._symbols['xTasksWaitingTermination'] = tasksWaitingTerminationSym['xTasksWaitingTermination']
 
+        # Look up optional uxTaskNumber, which is incremented whenever a task is created.
+        taskNumberSym = self._lookup_symbols(["uxTaskNumber"], symbolProvider)
+        if taskNumberSym is not None:
+            self._symbols['uxTaskNumber'] = taskNumberSym['uxTaskNumber']
+
         # Look up vPortEnableVFP() to determine if the FreeRTOS port supports the FPU.
         vPortEnableVFP = self._lookup_symbols(["vPortEnableVFP"], symbolProvider)
         self._fpu_port = vPortEnableVFP is not None
@@ -374,6 +390,16 @@ class FreeRTOSThreadProvider(ThreadProvider):
             return False
         LOG.debug("FreeRTOS: number of priorities is %d", self._total_priorities)
 
+        # Map the address of each task state list to the state of the tasks it holds.
+        self._list_states = {self._symbols['pxReadyTasksLists'] + i * LIST_SIZE: FreeRTOSThread.READY
+                for i in range(self._total_priorities)}
+        self._list_states[self._symbols['xDelayedTaskList1']] = FreeRTOSThread.BLOCKED
+        self._list_states[self._symbols['xDelayedTaskList2']] = FreeRTOSThread.BLOCKED
+        if 'xSuspendedTaskList' in self._symbols:
+            self._list_states[self._symbols['xSuspendedTaskList']] = FreeRTOSThread.SUSPENDED
+        if 'xTasksWaitingTermination' in self._symbols:
+            self._list_states[self._symbols['xTasksWaitingTermination']] = FreeRTOSThread.DELETED
+
         self._target.session.subscribe(self.event_handler, Target.Event.POST_FLASH_PROGRAM)
         self._target.session.subscribe(self.event_handler, Target.Event.POST_RESET)
 
@@ -381,20 +407,79 @@ class FreeRTOSThreadProvider(ThreadProvider):
 
     def invalidate(self):
         self._threads = {}
+        self._scheduler_generation = None
 
     def event_handler(self, notification):
         # Invalidate threads list if flash is reprogrammed.
         LOG.debug("FreeRTOS: invalidating threads list: %s" % (repr(notification)))
         self.invalidate();
 
-    def _build_thread_list(self):
+    def _read_scheduler_generation(self):
+        # The number of tasks changes when tasks are created or deleted. uxTaskNumber catches a
+        # task being deleted and another created while the target was running.
+        names = ['uxCurrentNumberOfTasks']
+        if 'uxTaskNumber' in self._symbols:
+            names.append('uxTaskNumber')
+        return tuple(self._target_context.read_memory_scatter((self._symbols[name], 32) for name in names))
+
+    def _refresh_threads(self):
+        # Rebuild if the previous build didn't find every task.
+        threads = [t for t in self._threads.values() if isinstance(t, FreeRTOSThread)]
+        if not threads or len(threads) != self._scheduler_generation[0]:
+            return False
+
+        # Read the current task, plus the lists containing each task and its priority.
+        requests = [(self._symbols['pxCurrentTCB'], 32)]
+        for t in threads:
+            requests += [
+                    (t.unique_id + THREAD_STATE_LIST_OWNER_OFFSET, 32),
+                    (t.unique_id + THREAD_EVENT_LIST_OWNER_OFFSET, 32),
+                    (t.unique_id + THREAD_PRIORITY_OFFSET, 32),
+                    ]
+        try:
+            values = self._target_context.read_memory_scatter(requests)
+        except exceptions.TransferError:
+            LOG.debug("FreeRTOS: TransferError while refreshing threads")
+            return False
+
+        currentThread = values[0]
+        states = []
+        for i, t in enumerate(threads):
+            stateList, eventList, priority = values[1 + i * 3:4 + i * 3]
+            # Tasks unblocked while the scheduler is suspended are held in xPendingReadyList by
+            # their event list item.
+            if eventList == self._symbols['xPendingReadyList']:
+                state = FreeRTOSThread.READY
+            else:
+                state = self._list_states.get(stateList)
+                if state is None:
+                    LOG.debug("FreeRTOS: thread 0x%08x is in unknown list 0x%08x", t.unique_id, stateList)
+                    return False
+            states.append((t, FreeRTOSThread.RUNNING if t.unique_id == currentThread else state, priority))
+
         newThreads = {}
+        for t, state, priority in states:
+            t.state = state
+            t.priority = priority
+            newThreads[t.unique_id] = t
+
+        # Create fake handler mode thread.
+        if self._target_context.read_core_register('ipsr') > 0:
+            t = HandlerModeThread(self._target_context, self)
+            newThreads[t.unique_id] = t
+
+        self._threads = newThreads
+        return True
 
-        # Read the number of threads.
-        threadCount = self._target_context.read32(self._symbols['uxCurrentNumberOfTasks'])
+    def _build_thread_list(self):
+        newThreads = {}
 
-        # Read the current thread.
-        currentThread = self._target_context.read32(self._symbols['pxCurrentTCB'])
+        # Read the number of threads, the current thread, and the top ready priority.
+        threadCount, currentThread, topPriority = self._target_context.read_memory_scatter([
+                (self._symbols['uxCurrentNumberOfTasks'], 32),
+                (self._symbols['pxCurrentTCB'], 32),
+                (self._symbols['uxTopReadyPriority'], 32),
+                ])
 
         # We should only be building the thread list if the scheduler is running, so a zero thread
         # count or a null current thread means something is bizarrely wrong.
@@ -402,9 +487,6 @@ class FreeRTOSThreadProvider(ThreadProvider):
             LOG.warning("FreeRTOS: no threads even though the scheduler is running")
             return
 
-        # Read the top ready priority.
-        topPriority = self._target_context.read32(self._symbols['uxTopReadyPriority'])
-
         # Handle an uxTopReadyPriority value larger than the number of lists. This is most likely
         # caused by the configUSE_PORT_OPTIMISED_TASK_SELECTION option being enabled, which treats
         # uxTopReadyPriority as a bitmap instead of integer. This is ok because uxTopReadyPriority
@@ -53,6 +53,9 @@ class ThreadProvider(object):
         self._last_run_token = -1
         self._read_from_target = False
 
+        ## Scheduler generation words read when the thread list was last updated.
+        self._scheduler_generation = None
+
     def _lookup_symbols(self, symbolList, symbolProvider, allowPartial = False):
         syms = {}
         for name in symbolList:
@@ -73,6 +76,24 @@ class ThreadProvider(object):
     def _build_thread_list(self):
         raise NotImplementedError()
 
+    def _read_scheduler_generation(self):
+        """@brief Read the scheduler state that identifies the set of threads.
+
+        Providers that support incremental updates return values, such as the number of threads,
+        that change whenever a thread is created or deleted. As long as the values are unchanged,
+        _refresh_threads() is called in place of _build_thread_list() after the target has run.
+
+        @return Tuple of values, or None to always rebuild the thread list.
+        """
+        return None
+
+    def _refresh_threads(self):
+        """@brief Update the state of the known threads without rebuilding the thread list.
+        @retval True The threads were updated.
+        @retval False The thread list must be rebuilt.
+        """
+        return False
+
     def _is_thread_list_dirty(self):
         token = self._target.run_token
         if token == self._last_run_token:
@@ -83,7 +104,12 @@ class ThreadProvider(object):
 
     def update_threads(self):
         if self._is_thread_list_dirty() and self._read_from_target:
-            self._build_thread_list()
+            generation = self._read_scheduler_generation()
+            if (generation is None) or (generation != self._scheduler_generation) \
+                    or not self._refresh_threads():
+                LOG.debug("Rebuilding thread list")
+                self._build_thread_list()
+            self._scheduler_generation = generation
 
     def get_threads(self):
         raise NotImplementedError()
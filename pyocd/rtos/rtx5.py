@@ -14,7 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 from .provider import (TargetThread, ThreadProvider)
-from .common import (read_c_string, HandlerModeThread, EXC_RETURN_EXT_FRAME_MASK)
+from .common import (read_c_string, HandlerModeThread, EXC_RETURN_EXT_FRAME_MASK, SavedRegisterReader)
 from ..core import exceptions
 from ..core.target import Target
 from ..core.plugin import Plugin
@@ -135,6 +135,7 @@ class RTXThreadContext(DebugContext):
         super(RTXThreadContext, self).__init__(parent)
         self._thread = thread
         self._has_fpu = self.core.has_fpu
+        self._saved_registers = SavedRegisterReader(parent)
 
     def read_core_registers_raw(self, reg_list):
         reg_list = [index_for_reg(reg) for reg in reg_list]
@@ -180,8 +181,11 @@ class RTXThreadContext(DebugContext):
             except exceptions.TransferError:
                 LOG.debug("Transfer error while reading thread's saved LR")
 
-        for reg in reg_list:
+        # Read the saved registers. The software stacked registers are not present in an exception.
+        frameStart = swStacked if inException else 0
+        saved = self._saved_registers.read(sp - frameStart, table, frameStart, swStacked + hwStacked)
 
+        for reg in reg_list:
             # Must handle stack pointer specially.
             if reg == 13:
                 if inException:
@@ -190,22 +194,18 @@ class RTXThreadContext(DebugContext):
                     reg_vals.append(sp + swStacked + hwStacked)
                 continue
 
-            # Look up offset for this register on the stack.
-            spOffset = table.get(reg, None)
-            if spOffset is None:
-                reg_vals.append(self._parent.read_core_register_raw(reg))
-                continue
-            if inException:
-                spOffset -= swStacked
-
-            try:
-                if spOffset >= 0:
-                    reg_vals.append(self._parent.read32(sp + spOffset))
+            # Use the saved register if it's in the frame, otherwise the live one.
+            value = saved.get(reg)
+            if value is None:
+                if reg in table:
+                    # Saved by the RTOS but not present in the frame - try live one.
+                    try:
+                        value = self._parent.read_core_register_raw(reg)
+                    except exceptions.TransferError:
+                        value = 0
                 else:
-                    # Not available - try live one
-                    reg_vals.append(self._parent.read_core_register_raw(reg))
-            except exceptions.TransferError:
-                reg_vals.append(0)
+                    value = self._parent.read_core_register_raw(reg)
+            reg_vals.append(value)
 
         return reg_vals
 
@@ -256,8 +256,10 @@ class RTXTargetThread(TargetThread):
 
     def update_state(self):
         try:
-            state = self._target_context.read8(self._base + RTXTargetThread.STATE_OFFSET)
-            priority = self._target_context.read8(self._base + RTXTargetThread.PRIORITY_OFFSET)
+            state, priority = self._target_context.read_memory_scatter([
+                    (self._base + RTXTargetThread.STATE_OFFSET, 8),
+                    (self._base + RTXTargetThread.PRIORITY_OFFSET, 8),
+                    ])
         except exceptions.TransferError as exc:
             LOG.debug("Transfer error while reading thread %x state: %s", self._base, exc)
         else:
@@ -16,7 +16,7 @@
 
 from .provider import (TargetThread, ThreadProvider)
 from .common import (read_c_string, HandlerModeThread,
-                     EXC_RETURN_EXT_FRAME_MASK)
+                     EXC_RETURN_EXT_FRAME_MASK, SavedRegisterReader)
 from ..core import exceptions
 from ..core.target import Target
 from ..core.plugin import Plugin
@@ -53,8 +53,13 @@ class TargetList(object):
 
         while is_valid and next != head:
             try:
+                thread_id, next = self._context.read_memory_scatter([
+                        (node, 32),
+                        (node + THREAD_NEXT_OFFSET, 32),
+                        ])
+
                 # Check if this is really a thread
-                if self._context.read32(node) == TX_THREAD_ID:
+                if thread_id == TX_THREAD_ID:
                     # Yields the thread pointer.
                     yield node
                 else:
@@ -63,7 +68,6 @@ class TargetList(object):
                     LOG.warning(
                         "Wrong thread ID found. Memory corruption or unknown extensions")
 
-                next = self._context.read32(node + THREAD_NEXT_OFFSET)
                 node = next
             except exceptions.TransferError:
                 LOG.warning(
@@ -175,6 +179,7 @@ class ThreadXThreadContext(DebugContext):
         super(ThreadXThreadContext, self).__init__(parent)
         self._thread = thread
         self._has_fpu = self.core.has_fpu
+        self._saved_registers = SavedRegisterReader(parent)
         if self.core.architecture != CoreArchitecture.ARMv6M:
             # Use the default offsets for this istance
             self._nofpu_register_offsets = self.NOFPU_REGISTER_OFFSETS
@@ -217,7 +222,7 @@ class ThreadXThreadContext(DebugContext):
                 else:
                     # Read stacked exception return LR.
                     offset = self.FPU_REGISTER_OFFSETS[-1]
-                    exceptionLR = self._parent.read32(sp + offset)
+                    exceptionLR = self._saved_registers.read_word(sp + offset)
 
                 # Check bit 4 of the exception LR to determine if FPU registers were stacked.
                 if (exceptionLR & EXC_RETURN_EXT_FRAME_MASK) == 0:
@@ -227,8 +232,11 @@ class ThreadXThreadContext(DebugContext):
             except exceptions.TransferError:
                 LOG.debug("Transfer error while reading thread's saved LR")
 
-        for reg in reg_list:
+        # Read the saved registers. The software stacked registers are not present in an exception.
+        frameStart = swStacked if inException else 0
+        saved = self._saved_registers.read(sp - frameStart, table, frameStart, swStacked + hwStacked)
 
+        for reg in reg_list:
             # Must handle stack pointer specially.
             if reg == 13:
                 if inException:
@@ -237,22 +245,18 @@ class ThreadXThreadContext(DebugContext):
                     reg_vals.append(sp + swStacked + hwStacked)
                 continue
 
-            # Look up offset for this register on the stack.
-            spOffset = table.get(reg, None)
-            if spOffset is None:
-                reg_vals.append(self._parent.read_core_register_raw(reg))
-                continue
-            if inException:
-                spOffset -= swStacked
-
-            try:
-                if spOffset >= 0:
-                    reg_vals.append(self._parent.read32(sp + spOffset))
+            # Use the saved register if it's in the frame, otherwise the live one.
+            value = saved.get(reg)
+            if value is None:
+                if reg in table:
+                    # Saved by the RTOS but not present in the frame - try live one.
+                    try:
+                        value = self._parent.read_core_register_raw(reg)
+                    except exceptions.TransferError:
+                        value = 0
                 else:
-                    # Not available - try live one
-                    reg_vals.append(self._parent.read_core_register_raw(reg))
-            except exceptions.TransferError:
-                reg_vals.append(0)
+                    value = self._parent.read_core_register_raw(reg)
+            reg_vals.append(value)
 
         return reg_vals
 
@@ -288,12 +292,12 @@ class ThreadXThread(TargetThread):
         self._target_context = targetContext
         self._provider = provider
         self._base = base
-        self._state = self._target_context.read32(
-            self._base + THREAD_STATE_OFFSET)
-        self._priority = self._target_context.read32(
-            self._base + THREAD_PRIORITY_OFFSET)
+        self._state, self._priority, namePtr = self._target_context.read_memory_scatter([
+            (self._base + THREAD_STATE_OFFSET, 32),
+            (self._base + THREAD_PRIORITY_OFFSET, 32),
+            (self._base + THREAD_NAME_OFFSET, 32),
+            ])
         self._name = ""
-        namePtr = self._target_context.read32(self._base + THREAD_NAME_OFFSET)
         if namePtr != 0:
             self._name = read_c_string(self._target_context, namePtr)
         if len(self._name) == 0:
@@ -311,15 +315,20 @@ class ThreadXThread(TargetThread):
 
     def update_info(self):
         try:
-            self._priority = self._target_context.read32(
-                self._base + THREAD_PRIORITY_OFFSET)
-            self._state = self._target_context.read32(
-                self._base + THREAD_STATE_OFFSET)
-            if not self.READY <= self._state <= self.PRIORITYCHANGE:
-                self._state = self.UNKNOWN
+            self.set_info(*self._target_context.read_memory_scatter([
+                (self._base + THREAD_PRIORITY_OFFSET, 32),
+                (self._base + THREAD_STATE_OFFSET, 32),
+                ]))
         except exceptions.TransferError:
             LOG.debug("Transfer error while reading thread info")
 
+    def set_info(self, priority, state):
+        """@brief Set the thread's priority and state from values read from the target."""
+        self._priority = priority
+        self._state = state
+        if not self.READY <= self._state <= self.PRIORITYCHANGE:
+            self._state = self.UNKNOWN
+
     @property
     def state(self):
         return self._state
@@ -416,6 +425,7 @@ class ThreadXThreadProvider(ThreadProvider):
 
     def invalidate(self):
         self._threads = {}
+        self._scheduler_generation = None
 
     def event_handler(self, notification):
         # Invalidate threads list if flash is reprogrammed.
@@ -423,6 +433,53 @@ class ThreadXThreadProvider(ThreadProvider):
                   (repr(notification)))
         self.invalidate()
 
+    def _read_scheduler_generation(self):
+        return tuple(self._target_context.read_memory_scatter([
+                (self._created_cnt, 32),
+                (self._created_ptr, 32),
+                ]))
+
+    def _refresh_threads(self):
+        # Rebuild if the previous build didn't find every thread.
+        threads = [t for t in self._threads.values() if isinstance(t, ThreadXThread)]
+        threadCount, head = self._scheduler_generation
+        if not threads or len(threads) != threadCount or threads[0].unique_id != head:
+            return False
+
+        requests = []
+        for t in threads:
+            requests += [
+                    (t.unique_id + THREAD_ID_OFFSET, 32),
+                    (t.unique_id + THREAD_NEXT_OFFSET, 32),
+                    (t.unique_id + THREAD_PRIORITY_OFFSET, 32),
+                    (t.unique_id + THREAD_STATE_OFFSET, 32),
+                    ]
+        try:
+            values = self._target_context.read_memory_scatter(requests)
+        except exceptions.TransferError:
+            LOG.debug("ThreadX: TransferError while refreshing threads")
+            return False
+
+        # Verify that the created list still links the same threads in the same order. A deleted
+        # thread has its ID cleared.
+        for i, t in enumerate(threads):
+            threadId, next = values[i * 4:i * 4 + 2]
+            if threadId != TX_THREAD_ID or next != threads[(i + 1) % len(threads)].unique_id:
+                return False
+
+        newThreads = {}
+        for i, t in enumerate(threads):
+            t.set_info(*values[i * 4 + 2:i * 4 + 4])
+            newThreads[t.unique_id] = t
+
+        # Create fake handler mode thread.
+        if self._target_context.read_core_register('ipsr') > 0:
+            t = HandlerModeThread(self._target_context, self)
+            newThreads[t.unique_id] = t
+
+        self._threads = newThreads
+        return True
+
     def _build_thread_list(self):
         # Read the number of threads.
         threadCount = self._target_context.read32(self._created_cnt)
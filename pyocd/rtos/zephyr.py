@@ -19,7 +19,7 @@
 import logging
 
 from .provider import (TargetThread, ThreadProvider)
-from .common import (read_c_string, HandlerModeThread)
+from .common import (read_c_string, HandlerModeThread, SavedRegisterReader)
 from ..core import exceptions
 from ..core.target import Target
 from ..core.plugin import Plugin
@@ -79,6 +79,7 @@ class ZephyrThreadContext(DebugContext):
         super(ZephyrThreadContext, self).__init__(parent)
         self._thread = thread
         self._has_fpu = self.core.has_fpu
+        self._saved_registers = SavedRegisterReader(parent)
 
     def read_core_registers_raw(self, reg_list):
         reg_list = [index_for_reg(reg) for reg in reg_list]
@@ -103,6 +104,12 @@ class ZephyrThreadContext(DebugContext):
             sp = self._thread.get_stack_pointer()
         exceptionFrame = 0x20
 
+        # The callee-saved registers are read from the thread structure and the exception stack
+        # frame registers from the stack.
+        calleeSaved = self._saved_registers.read(self._thread._base + self._thread._offsets["t_stack_ptr"],
+                self.CALLEE_SAVED_OFFSETS, -32, 0)
+        stackFrame = self._saved_registers.read(sp, self.STACK_FRAME_OFFSETS, 0, exceptionFrame)
+
         for reg in reg_list:
 
             # If this is a stack pointer register, add an offset to account for the exception stack frame
@@ -112,35 +119,17 @@ class ZephyrThreadContext(DebugContext):
                 reg_vals.append(val)
                 continue
 
-            # If this is a callee-saved register, read it from the thread structure
-            calleeOffset = self.CALLEE_SAVED_OFFSETS.get(reg, None)
-            if calleeOffset is not None:
-                try:
-                    addr = self._thread._base + self._thread._offsets["t_stack_ptr"] + calleeOffset
-                    val = self._parent.read32(addr)
-                    reg_vals.append(val)
-                    LOG.debug("Reading callee-saved register %d at 0x%08x = 0x%x", reg, addr, val)
-                except exceptions.TransferError:
-                    reg_vals.append(0)
-                continue
-
-            # If this is a exception stack frame register, read it from the stack
-            stackFrameOffset = self.STACK_FRAME_OFFSETS.get(reg, None)
-            if stackFrameOffset is not None:
-                try:
-                    addr = sp + stackFrameOffset
-                    val = self._parent.read32(addr)
-                    reg_vals.append(val)
-                    LOG.debug("Reading stack frame register %d at 0x%08x = 0x%x", reg, addr, val)
-                except exceptions.TransferError:
-                    reg_vals.append(0)
-                continue
-
-            # If we get here, this is a register not in any of the dictionaries
-            val = self._parent.read_core_register_raw(reg)
-            LOG.debug("Reading live register %d = 0x%x", reg, val)
+            if reg in calleeSaved:
+                val = calleeSaved[reg]
+                LOG.debug("Reading callee-saved register %d = 0x%x", reg, val)
+            elif reg in stackFrame:
+                val = stackFrame[reg]
+                LOG.debug("Reading stack frame register %d = 0x%x", reg, val)
+            else:
+                # If we get here, this is a register not in any of the dictionaries
+                val = self._parent.read_core_register_raw(reg)
+                LOG.debug("Reading live register %d = 0x%x", reg, val)
             reg_vals.append(val)
-            continue
 
         return reg_vals
 
@@ -192,8 +181,11 @@ class ZephyrThread(TargetThread):
 
     def update_info(self):
         try:
-            self._priority = twos_complement(self._target_context.read8(self._base + self._offsets["t_prio"]), width=8)
-            self._state = self._target_context.read8(self._base + self._offsets["t_state"])
+            priority, self._state = self._target_context.read_memory_scatter([
+                    (self._base + self._offsets["t_prio"], 8),
+                    (self._base + self._offsets["t_state"], 8),
+                    ])
+            self._priority = twos_complement(priority, width=8)
 
             if self._provider.version > 0:
                 addr = self._base + self._offsets["t_name"]
@@ -296,11 +288,12 @@ class ZephyrThreadProvider(ThreadProvider):
             LOG.error("Unsupported _kernel_thread_info_size_t_size")
             return None
 
-        offsets = {}
-        for index, name in enumerate(self.ZEPHYR_OFFSETS):
-            offset = self._symbols["_kernel_thread_info_offsets"] + index * size
-            offsets[name] = self._target_context.read32(offset)
-            LOG.debug("%s = 0x%04x", name, offsets[name])
+        values = self._target_context.read_memory_scatter(
+                (self._symbols["_kernel_thread_info_offsets"] + index * size, 32)
+                for index in range(len(self.ZEPHYR_OFFSETS)))
+        offsets = dict(zip(self.ZEPHYR_OFFSETS, values))
+        for name, offset in offsets.items():
+            LOG.debug("%s = 0x%04x", name, offset)
 
         return offsets
 
@@ -15,26 +15,45 @@
 # limitations under the License.
 
 import argparse
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (List, Optional, Sequence, Tuple, TYPE_CHECKING)
 import logging
 from pathlib import Path
+from time import perf_counter
 
 from .base import SubcommandBase
+from ..core import exceptions
 from ..core.helpers import ConnectHelper
-from ..flash.file_programmer import FileProgrammer
+from ..core.session import Session
+from ..flash.file_programmer import (FileProgrammer, ImageFile)
 from ..utility.cmdline import (
     convert_session_options,
     int_base_0,
+    positive_int,
 )
 
+if TYPE_CHECKING:
+    from ..probe.debug_probe import DebugProbe
+
 LOG = logging.getLogger(__name__)
 
+@dataclass
+class BoardLoadResult:
+    """@brief Outcome of loading images into one board."""
+    unique_id: str
+    description: str
+    byte_count: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
 class LoadSubcommand(SubcommandBase):
     """@brief `pyocd load` and `flash` subcommand."""
 
     NAMES = ['load', 'flash']
     HELP = "Load one or more images into target device memory."
-    EPILOG = "Supported file formats are: binary, Intel hex, and ELF32."
+    EPILOG = "Supported file formats are: binary, Intel hex, Motorola S-record, and ELF32. With --probes or " \
+            "--all-probes, the files are read once and loaded into each board in parallel."
     DEFAULT_LOG_LEVEL = logging.WARNING
 
     ## @brief Valid erase mode options.
@@ -57,7 +76,7 @@ class LoadSubcommand(SubcommandBase):
                  "Only allowed if a single binary file is being loaded.")
         parser_options.add_argument("--trust-crc", action="store_true",
             help="Use only the CRC of each page to determine if it already has the same data.")
-        parser_options.add_argument("--format", choices=("bin", "hex", "elf"),
+        parser_options.add_argument("--format", choices=("bin", "hex", "srec", "elf"),
             help="File format. Default is to use the file's extension. If multiple files are provided, then "
                  "all must be of this type.")
         parser_options.add_argument("--skip", metavar="BYTES", default=0, type=int_base_0,
@@ -65,6 +84,15 @@ class LoadSubcommand(SubcommandBase):
         parser_options.add_argument("--no-reset", action="store_true",
             help="Specify to prevent resetting device after programming has finished.")
 
+        multi_options = parser.add_argument_group("multiple board options")
+        multi_options.add_argument("--probes", metavar="UIDS", action="append",
+            help="Load into each of the debug probes with these comma-separated full or partial unique IDs in "
+                 "parallel. Can be used more than once.")
+        multi_options.add_argument("--all-probes", action="store_true",
+            help="Load into all connected debug probes in parallel.")
+        multi_options.add_argument("--jobs", type=positive_int, default=None, metavar="N",
+            help="Maximum number of boards to load at the same time. Default is all selected boards.")
+
         parser.add_argument("file", metavar="<file-path>", nargs="+",
             help="File to write to memory. Binary files can have an optional base address appended to the file "
                  "name as '@<address>', for instance 'app.bin@0x20000'.")
@@ -80,6 +108,13 @@ class LoadSubcommand(SubcommandBase):
             raise ValueError("--base-address cannot be set when loading more than one file; "
                     "use a base address suffix instead")
 
+        files = self._get_files()
+        if files is None:
+            return 1
+
+        if self._args.probes or self._args.all_probes:
+            return self._load_multiple(files)
+
         session = ConnectHelper.session_with_chosen_probe(
                             project_dir=self._args.project_dir,
                             config_file=self._args.config,
@@ -102,26 +137,7 @@ class LoadSubcommand(SubcommandBase):
                             chip_erase=self._args.erase,
                             trust_crc=self._args.trust_crc,
                             no_reset=self._args.no_reset)
-            for filename in self._args.file:
-                # Get an initial path with the argument as-is.
-                file_path = Path(filename).expanduser()
-
-                # Look for a base address suffix. If the supplied argument including an address suffix
-                # references an existing file, then the address suffix is not extracted.
-                if "@" in filename and not file_path.exists():
-                    filename, suffix = filename.rsplit("@", 1)
-                    try:
-                        base_address = int_base_0(suffix)
-                    except ValueError:
-                        LOG.error(f'Base address suffix "{suffix}" on file "{filename}" is not a valid integer address')
-                        return 1
-                else:
-                    base_address = self._args.base_address
-
-                # Resolve our path.
-                file_path = Path(filename).expanduser().resolve()
-                filename = str(file_path)
-
+            for filename, base_address in files:
                 if base_address is None:
                     LOG.info("Loading %s", filename)
                 else:
@@ -134,4 +150,122 @@ class LoadSubcommand(SubcommandBase):
 
         return 0
 
+    def _get_files(self) -> Optional[List[Tuple[str, Optional[int]]]]:
+        """@brief Resolve file arguments to a list of paths and base addresses."""
+        files: List[Tuple[str, Optional[int]]] = []
+        for filename in self._args.file:
+            # Get an initial path with the argument as-is.
+            file_path = Path(filename).expanduser()
+
+            # Look for a base address suffix. If the supplied argument including an address suffix
+            # references an existing file, then the address suffix is not extracted.
+            if "@" in filename and not file_path.exists():
+                filename, suffix = filename.rsplit("@", 1)
+                try:
+                    base_address = int_base_0(suffix)
+                except ValueError:
+                    LOG.error(f'Base address suffix "{suffix}" on file "{filename}" is not a valid integer address')
+                    return None
+            else:
+                base_address = self._args.base_address
+
+            # Resolve our path.
+            file_path = Path(filename).expanduser().resolve()
+            files.append((str(file_path), base_address))
+        return files
+
+    def _select_probes(self) -> Optional[List["DebugProbe"]]:
+        """@brief Return the probes selected by --probes or --all-probes."""
+        probes = ConnectHelper.get_all_connected_probes(blocking=(not self._args.no_wait))
+        if self._args.all_probes:
+            return probes
 
+        selected = []
+        for uids in self._args.probes:
+            for uid in filter(None, (u.strip() for u in uids.split(","))):
+                matches = [p for p in probes if uid.lower() in p.unique_id.lower()]
+                if len(matches) != 1:
+                    LOG.error("Unique ID '%s' matches %s", uid,
+                            "no connected probe" if not matches else "more than one probe")
+                    return None
+                if matches[0] not in selected:
+                    selected.append(matches[0])
+        return selected
+
+    def _load_multiple(self, files: Sequence[Tuple[str, Optional[int]]]) -> int:
+        """@brief Load the files into several boards in parallel.
+
+        Each file is read and parsed once, then loaded into each board from a worker thread with its
+        own session. A summary of the results for each board is printed at the end.
+        """
+        images = []
+        for filename, base_address in files:
+            LOG.info("Reading %s", filename)
+            images.append(ImageFile(filename, self._args.format, base_address=base_address, skip=self._args.skip))
+
+        probes = self._select_probes()
+        if not probes:
+            LOG.error("No target device available")
+            return 1
+
+        start = perf_counter()
+        with ThreadPoolExecutor(max_workers=(self._args.jobs or len(probes)),
+                thread_name_prefix="load") as executor:
+            results = list(executor.map(lambda probe: self._load_board(probe, images), probes))
+        elapsed = perf_counter() - start
+
+        pt = self._get_pretty_table(["Unique ID", "Probe", "Bytes", "Time", "Result"])
+        for result in results:
+            pt.add_row([
+                result.unique_id,
+                result.description,
+                result.byte_count,
+                "%.2f s" % result.elapsed,
+                "OK" if result.error is None else "Failed: " + result.error,
+                ])
+        print(pt)
+
+        passed = sum(1 for result in results if result.error is None)
+        total_bytes = sum(result.byte_count for result in results if result.error is None)
+        print("Loaded {} of {} boards, {} bytes in {:.2f} s ({:.1f} kB/s)".format(
+                passed, len(results), total_bytes, elapsed, total_bytes / elapsed / 1024 if elapsed else 0.0))
+        return 0 if (passed == len(results)) else 1
+
+    def _load_board(self, probe: "DebugProbe", images: Sequence[ImageFile]) -> BoardLoadResult:
+        """@brief Load images into the board connected to one probe. Called from a worker thread."""
+        result = BoardLoadResult(probe.unique_id, probe.description)
+        start = perf_counter()
+        try:
+            options = convert_session_options(self._args.options)
+            # Progress bars from several boards at once would be interleaved.
+            options['hide_programming_progress'] = True
+            session = Session(probe,
+                            project_dir=self._args.project_dir,
+                            config_file=self._args.config,
+                            user_script=self._args.script,
+                            no_config=self._args.no_config,
+                            pack=self._args.pack,
+                            target_override=self._args.target_override,
+                            frequency=self._args.frequency,
+                            connect_mode=self._args.connect_mode,
+                            options=options,
+                            option_defaults=self._modified_option_defaults(),
+                            )
+            with session:
+                programmer = FileProgrammer(session,
+                                chip_erase=self._args.erase,
+                                trust_crc=self._args.trust_crc,
+                                no_reset=self._args.no_reset)
+                for image in images:
+                    programmer.program(image)
+                    result.byte_count += image.size
+        except (exceptions.Error, ValueError, OSError) as err:
+            LOG.error("Loading board %s failed: %s", probe.unique_id, err,
+                    exc_info=Session.get_current().log_tracebacks)
+            result.error = str(err) or err.__class__.__name__
+        except Exception as err:
+            # An unexpected error for one board must not abort the other workers or lose the summary.
+            LOG.error("Loading board %s failed with unexpected error: %s", probe.unique_id, err, exc_info=True)
+            result.error = str(err) or err.__class__.__name__
+        result.elapsed = perf_counter() - start
+        return result
@@ -0,0 +1,193 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import logging
+import os
+import sys
+from time import (monotonic, sleep)
+from typing import (List, Optional, TYPE_CHECKING)
+
+from .base import SubcommandBase
+from ..core.helpers import ConnectHelper
+from ..core.target import Target
+from ..debug.elf.elf import ELFBinaryFile
+from ..trace.profiler import (PCSampleHistogram, ProfileReport, ProfileSymbolizer)
+from ..trace.swv import SWVReader
+from ..utility.cmdline import (convert_frequency, convert_session_options, int_base_0)
+
+if TYPE_CHECKING:
+    from ..coresight.dwt import DWT
+
+LOG = logging.getLogger(__name__)
+
+class ProfileSubcommand(SubcommandBase):
+    """@brief `pyocd profile` subcommand."""
+
+    NAMES = ['profile']
+    HELP = "Statistical profiling using DWT PC sampling."
+    EPILOG = "The 'swo' method captures periodic PC sample packets over SWO and requires the target's " \
+            "system clock frequency. The 'pcsr' method polls the DWT PCSR register through the debug " \
+            "probe, which works without SWO but takes far fewer samples."
+
+    ## Number of PCSR reads queued at once by the pcsr method.
+    PCSR_BATCH_SIZE = 64
+
+    @classmethod
+    def get_args(cls) -> List[argparse.ArgumentParser]:
+        """@brief Add this subcommand to the subparsers object."""
+        profile_parser = argparse.ArgumentParser(description='profile', add_help=False)
+
+        profile_options = profile_parser.add_argument_group("profile options")
+        profile_options.add_argument("-e", "--elf", metavar="PATH",
+            help="ELF file used to symbolize sampled addresses.")
+        profile_options.add_argument("-c", "--core", default=0, type=int_base_0,
+            help="Core number to profile. Default is core 0.")
+        profile_options.add_argument("-d", "--duration", type=float, default=10.0, metavar="SECONDS",
+            help="Sampling duration in seconds. Default is 10. Press Ctrl-C to stop early.")
+        profile_options.add_argument("-m", "--method", choices=("swo", "pcsr"), default="swo",
+            help="Sampling method. Default is swo.")
+        profile_options.add_argument("-i", "--interval", type=int_base_0, default=4096, metavar="CYCLES",
+            help="Approximate number of core cycles between PC samples for the swo method. Supported intervals "
+                 "are 64 to 1024 in steps of 64, and 1024 to 16384 in steps of 1024. Default is 4096.")
+        profile_options.add_argument("--system-clock", type=convert_frequency, default=None, metavar="FREQ",
+            help="Target system clock frequency, used to compute the SWO baud rate divider. Defaults to the "
+                 "swv_system_clock session option.")
+        profile_options.add_argument("--swo-clock", type=convert_frequency, default=None, metavar="FREQ",
+            help="SWO baud rate. Defaults to the swv_clock session option.")
+
+        output_options = profile_parser.add_argument_group("output options")
+        output_options.add_argument("--format", choices=("functions", "flat", "collapsed"),
+            default="functions",
+            help="Report format. 'functions' lists the percentage of samples per function, 'flat' lists samples "
+                 "per address, and 'collapsed' writes collapsed stack text for flame graph tools. Default is "
+                 "functions.")
+        output_options.add_argument("-l", "--lines", action="store_true",
+            help="Include source line information in flat and collapsed reports.")
+        output_options.add_argument("-n", "--top", type=int, default=None, metavar="N",
+            help="Only list the N most sampled functions or addresses.")
+        output_options.add_argument("-o", "--output", metavar="PATH",
+            help="Write the report to a file instead of stdout.")
+
+        return [cls.CommonOptions.COMMON, cls.CommonOptions.CONNECT, profile_parser]
+
+    def invoke(self) -> int:
+        """@brief Handle 'profile' subcommand."""
+        session = ConnectHelper.session_with_chosen_probe(
+                            project_dir=self._args.project_dir,
+                            config_file=self._args.config,
+                            user_script=self._args.script,
+                            no_config=self._args.no_config,
+                            pack=self._args.pack,
+                            unique_id=self._args.unique_id,
+                            target_override=self._args.target_override,
+                            frequency=self._args.frequency,
+                            blocking=(not self._args.no_wait),
+                            connect_mode=self._args.connect_mode,
+                            options=convert_session_options(self._args.options),
+                            option_defaults=self._modified_option_defaults(),
+                            )
+        if session is None:
+            LOG.error("No target device available")
+            return 1
+
+        histogram = PCSampleHistogram()
+        with session:
+            assert session.target
+            core = session.target.cores[self._args.core]
+            dwt: Optional["DWT"] = getattr(core, 'dwt', None)
+            if dwt is None:
+                LOG.error("Core %d does not have a DWT", self._args.core)
+                return 1
+
+            if core.get_state() == Target.State.HALTED:
+                core.resume()
+
+            if self._args.method == 'swo':
+                if not self._sample_swo(session, dwt, histogram):
+                    return 1
+            else:
+                self._sample_pcsr(dwt, histogram)
+
+        elf = ELFBinaryFile(os.path.expanduser(self._args.elf)) if self._args.elf else None
+        self._write_report(ProfileReport(histogram, ProfileSymbolizer(elf)))
+        return 0
+
+    def _sample_swo(self, session, dwt: "DWT", histogram: PCSampleHistogram) -> bool:
+        """@brief Collect periodic PC sample packets over SWO."""
+        sys_clock = self._args.system_clock or session.options.get('swv_system_clock')
+        if not sys_clock:
+            LOG.error("The target system clock frequency must be set with --system-clock or the "
+                    "swv_system_clock option")
+            return False
+        swo_clock = self._args.swo_clock or session.options.get('swv_clock')
+
+        reader = SWVReader(session, self._args.core)
+        if not reader.init(sys_clock, swo_clock, None, sink=histogram):
+            return False
+        try:
+            interval = dwt.enable_pc_sampling(self._args.interval)
+            LOG.info("Sampling PC every %d cycles for %g seconds", interval, self._args.duration)
+            self._wait()
+        finally:
+            dwt.disable_pc_sampling()
+            reader.stop()
+
+        probe_stats, _ = reader.statistics
+        if probe_stats.drops:
+            LOG.warning("%d bytes of SWO data were dropped; the profile may be skewed", probe_stats.drops)
+        return True
+
+    def _sample_pcsr(self, dwt: "DWT", histogram: PCSampleHistogram) -> None:
+        """@brief Collect PC samples by polling the DWT PCSR register."""
+        if not dwt.dwt_configured:
+            dwt.init()
+        pcsr = dwt.address + dwt.DWT_PCSR
+        LOG.info("Polling PCSR for %g seconds", self._args.duration)
+        deadline = monotonic() + self._args.duration
+        pending = []
+        try:
+            while monotonic() < deadline:
+                # Queue a batch of reads so they are sent to the probe together.
+                pending = [dwt.ap.read32(pcsr, now=False) for _ in range(self.PCSR_BATCH_SIZE)]
+                pending.reverse()
+                while pending:
+                    histogram.add_sample(pending.pop()())
+        except KeyboardInterrupt:
+            # Complete the queued reads so the probe is left idle.
+            for result in pending:
+                result()
+
+    def _wait(self) -> None:
+        """@brief Wait for the sampling duration or until interrupted."""
+        try:
+            sleep(self._args.duration)
+        except KeyboardInterrupt:
+            pass
+
+    def _write_report(self, report: ProfileReport) -> None:
+        if self._args.format == 'functions':
+            text = report.format_functions(self._args.top)
+        elif self._args.format == 'flat':
+            text = report.format_flat(self._args.top, lines=self._args.lines)
+        else:
+            text = report.format_collapsed(lines=self._args.lines)
+
+        if self._args.output:
+            with open(self._args.output, 'w') as f:
+                f.write(text)
+        else:
+            sys.stdout.write(text)
@@ -21,6 +21,7 @@
 
 import argparse
 import logging
+import os
 import sys
 from time import sleep
 import time
@@ -54,6 +55,9 @@ class RTTSubcommand(SubcommandBase):
                                  help="Start address of RTT control block search range.")
         rtt_options.add_argument("-s", "--size", type=int_base_0, default=None,
                                  help="Size of RTT control block search range.")
+        rtt_options.add_argument("--elf", metavar="PATH",
+                                 help="ELF file of the running firmware. The address of its _SEGGER_RTT "
+                                 "symbol is checked before searching for the control block.")
         rtt_options.add_argument("--up-channel-id", type=int, default=0,
                                  help="Up channel ID.")
         rtt_options.add_argument("--down-channel-id", type=int, default=0,
@@ -92,6 +96,9 @@ class RTTSubcommand(SubcommandBase):
 
                 target: SoCTarget = session.board.target
 
+                if self._args.elf is not None:
+                    target.elf = os.path.expanduser(self._args.elf)
+
                 control_block = RTTControlBlock.from_target(target,
                             address = self._args.address,
                             size = self._args.size)
@@ -24,6 +24,7 @@ from ..core.helpers import ConnectHelper
 from ..core.session import Session
 from ..utility.cmdline import convert_session_options
 from ..probe.tcp_probe_server import DebugProbeServer
+from ..probe.multi_probe_server import MultiProbeServer
 
 LOG = logging.getLogger(__name__)
 
@@ -63,6 +64,10 @@ class ServerSubcommand(SubcommandBase):
             "'<probe-type>:' where <probe-type> is the name of a probe plugin.")
         server_options.add_argument("-W", "--no-wait", action="store_true",
             help="Do not wait for a probe to be connected if none are available.")
+        server_options.add_argument("--all-probes", action="store_true",
+            help="Serve all connected probes on one port. Clients select a probe by appending '/' and its "
+            "unique ID to the server address, for example 'remote:myserver/0240000034'. Probes connected "
+            "or disconnected while the server runs are detected automatically.")
 
         return [cls.CommonOptions.LOGGING, server_parser]
 
@@ -76,8 +81,12 @@ class ServerSubcommand(SubcommandBase):
                 serve_local_only=self._args.serve_local_only,
                 options=session_options)
 
+        if self._args.all_probes:
+            self._serve_all_probes(session)
+            return
+
         # The ultimate intent is to serve all available probes by default. For now we just serve
-        # a single probe.
+        # a single probe unless --all-probes is passed.
         probe = ConnectHelper.choose_probe(unique_id=self._args.unique_id)
         if probe is None:
             return
@@ -100,3 +109,15 @@ class ServerSubcommand(SubcommandBase):
             server.stop()
             raise
 
+    def _serve_all_probes(self, session: Session) -> None:
+        """@brief Serve every connected probe with a single multi-probe server."""
+        server = MultiProbeServer(session, self._args.port_number, self._args.serve_local_only)
+        LOG.debug("Starting multi-probe server")
+        server.start()
+
+        try:
+            while server.is_running:
+                sleep(0.1)
+        except (KeyboardInterrupt, Exception):
+            server.stop()
+            raise
@@ -0,0 +1,123 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import logging
+import sys
+from time import perf_counter
+from typing import (List, Optional, Sequence)
+
+from .base import SubcommandBase
+from ..coresight.cortex_m import CortexM
+from ..trace.capture import (CaptureFormatError, SWOCaptureReader)
+from ..trace.events import TraceEvent
+from ..trace.sink import TraceEventSink
+from ..trace.swo import SWOParser
+from ..trace.swv import SWVEventSink
+
+LOG = logging.getLogger(__name__)
+
+class OfflineCore:
+    """@brief Stand-in for the traced core used to name exceptions without a connected target."""
+
+    def exception_number_to_name(self, exc_num: int) -> Optional[str]:
+        if exc_num < len(CortexM.CORE_EXCEPTION):
+            return CortexM.CORE_EXCEPTION[exc_num]
+        else:
+            return "Interrupt %d" % (exc_num - len(CortexM.CORE_EXCEPTION))
+
+class EventPrinter(TraceEventSink):
+    """@brief Trace event sink that prints one event per line."""
+
+    def receive(self, event: TraceEvent) -> None:
+        print(event)
+
+    def receive_batch(self, events: Sequence[TraceEvent]) -> None:
+        if events:
+            print("\n".join(str(event) for event in events))
+
+class EventCounter(TraceEventSink):
+    """@brief Trace event sink that only counts events."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def receive(self, event: TraceEvent) -> None:
+        self.count += 1
+
+    def receive_batch(self, events: Sequence[TraceEvent]) -> None:
+        self.count += len(events)
+
+class SWVReplaySubcommand(SubcommandBase):
+    """@brief `pyocd swv-replay` subcommand."""
+
+    NAMES = ['swv-replay']
+    HELP = "Decode a recorded SWO capture file."
+
+    @classmethod
+    def get_args(cls) -> List[argparse.ArgumentParser]:
+        """@brief Add this subcommand to the subparsers object."""
+        replay_parser = argparse.ArgumentParser(description='swv-replay', add_help=False)
+
+        replay_options = replay_parser.add_argument_group("replay options")
+        replay_options.add_argument("--start", type=float, default=0.0, metavar="SECONDS",
+            help="Start replaying from this many seconds after the start of the capture.")
+        output_group = replay_options.add_mutually_exclusive_group()
+        output_group.add_argument("--itm", action="store_true",
+            help="Write the text from ITM stimulus port 0 instead of printing trace events.")
+        output_group.add_argument("--stats", action="store_true",
+            help="Only report the number of events and the decoding speed.")
+        output_group.add_argument("--recorded", action="store_true",
+            help="Print the trace events recorded in the capture instead of decoding the raw data.")
+
+        replay_parser.add_argument("capture", metavar="PATH", help="SWO capture file.")
+
+        return [cls.CommonOptions.LOGGING, replay_parser]
+
+    def invoke(self) -> int:
+        """@brief Handle 'swv-replay' subcommand."""
+        try:
+            reader = SWOCaptureReader(self._args.capture)
+        except (OSError, CaptureFormatError) as err:
+            LOG.error("Unable to open capture: %s", err)
+            return 1
+
+        core = OfflineCore()
+        with reader:
+            if self._args.recorded:
+                printer = EventPrinter()
+                for event in reader.read_events(core.exception_number_to_name):
+                    printer.receive(event)
+                return 0
+
+            sink: TraceEventSink
+            if self._args.itm:
+                sink = SWVEventSink(sys.stdout)
+            elif self._args.stats:
+                sink = EventCounter()
+            else:
+                sink = EventPrinter()
+            parser = SWOParser(core, sink)
+
+            start = perf_counter()
+            count = reader.replay(parser, start_time=self._args.start)
+            elapsed = perf_counter() - start
+
+            if self._args.stats:
+                assert isinstance(sink, EventCounter)
+                print("Decoded {} bytes into {} events in {:.3f} s ({:.2f} MB/s)".format(
+                        count, sink.count, elapsed, count / max(elapsed, 1e-9) / 1e6))
+        return 0
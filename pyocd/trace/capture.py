@@ -0,0 +1,457 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""@brief Binary SWO capture file format.
+
+A capture file holds the raw SWO byte stream read from a probe, optionally followed by the trace
+events decoded from it, so that trace can be recorded cheaply and decoded or analysed later.
+
+All integers are little endian. The file starts with a header:
+
+Offset | Type    | Description
+-------|---------|------------------------------------------------------------
+0      | char[8] | Magic "PYOCDSWO".
+8      | u16     | Format version, currently 1.
+10     | u16     | Flags. Bit 0 set if chunk payloads are zlib compressed.
+12     | f64     | Capture start time as seconds since the epoch.
+
+The header is followed by any number of chunks, each a 28 byte chunk header and its payload:
+
+Offset | Type    | Description
+-------|---------|------------------------------------------------------------
+0      | u8      | Chunk type: 1 for raw SWO data, 2 for decoded events, 3 for the index.
+1      | u8[3]   | Reserved.
+4      | f64     | Host time of the first data in the chunk, in seconds from the start time.
+12     | u64     | Offset in the raw SWO stream, or index of the first event, of the chunk.
+20     | u32     | Number of raw bytes or events in the chunk.
+24     | u32     | Length of the payload stored in the file.
+
+Decoded events are stored as 24 byte records with the fields kind (u8), flags (u8), size (u8),
+reserved (u8), port (u32), timestamp (u64), value (u32), and extra (u32). Kind, port, value, and
+size have the same meaning as the columns of TraceEventBlock. For data trace events the flags
+indicate which of the PC, address, and value are present, plus the read/write direction, with the
+PC or address stored in the extra field.
+
+When the capture is closed, an index chunk is written. Its payload lists the file offset, host
+time, and stream offset of each raw data chunk. The file ends with a 16 byte trailer holding the
+file offset of the index chunk and the magic "SWOINDEX". If the trailer is missing, for instance
+because the capture was not closed, the reader rebuilds the index by scanning the chunks.
+"""
+
+import io
+import logging
+import struct
+import threading
+import zlib
+from time import (monotonic, time)
+from typing import (BinaryIO, Callable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union)
+
+from . import events
+from .sink import TraceEventSink
+from .swo import SWOParser
+
+LOG = logging.getLogger(__name__)
+
+MAGIC = b"PYOCDSWO"
+INDEX_MAGIC = b"SWOINDEX"
+VERSION = 1
+
+FLAG_COMPRESSED = 0x1
+
+CHUNK_RAW = 1
+CHUNK_EVENTS = 2
+CHUNK_INDEX = 3
+
+_FILE_HEADER = struct.Struct('<8sHHd')
+_CHUNK_HEADER = struct.Struct('<B3xdQII')
+_EVENT_RECORD = struct.Struct('<BBBxIQII')
+_INDEX_ENTRY = struct.Struct('<QdQ')
+_TRAILER = struct.Struct('<Q8s')
+
+# Flags for data trace event records.
+_DT_HAS_PC = 0x1
+_DT_HAS_ADDR = 0x2
+_DT_HAS_VALUE = 0x4
+_DT_IS_READ = 0x8
+
+class CaptureFormatError(Exception):
+    """@brief Raised when a file is not a valid SWO capture."""
+    pass
+
+class CaptureIndexEntry(NamedTuple):
+    """@brief Location of one raw data chunk in a capture file."""
+    file_offset: int
+    host_time: float
+    stream_offset: int
+
+class SWOCaptureWriter(TraceEventSink):
+    """@brief Writes raw SWO data and decoded trace events to a capture file.
+
+    Raw SWO data is passed to write_raw(). To also record decoded events, connect the writer as a
+    sink of the SWOParser, usually through a TraceEventTee. Data is collected in memory and written
+    as a chunk once enough has accumulated, so each call is cheap.
+
+    Methods may be called from different threads.
+    """
+
+    ## Default number of raw bytes per chunk.
+    DEFAULT_CHUNK_SIZE = 64 * 1024
+
+    ## Number of events per event chunk.
+    EVENTS_PER_CHUNK = 4096
+
+    def __init__(self, file: Union[str, BinaryIO], compress: bool = False,
+            chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        """@brief Constructor.
+        @param self
+        @param file Path of the capture file to create, or a binary file object open for writing.
+        @param compress Whether to compress chunk payloads with zlib.
+        @param chunk_size Number of raw SWO bytes to collect before writing a chunk.
+        """
+        if isinstance(file, str):
+            self._file: BinaryIO = open(file, 'wb')
+            self._owns_file = True
+        else:
+            self._file = file
+            self._owns_file = False
+        self._compress = compress
+        self._chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._start = monotonic()
+        self._index: List[CaptureIndexEntry] = []
+        self._raw = bytearray()
+        self._raw_time = 0.0
+        self._stream_offset = 0
+        self._event_records = bytearray()
+        self._event_count = 0
+        self._event_time = 0.0
+        self._event_index = 0
+        self._closed = False
+
+        self._file.write(_FILE_HEADER.pack(MAGIC, VERSION, FLAG_COMPRESSED if compress else 0, time()))
+
+    def write_raw(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        """@brief Record raw SWO data."""
+        with self._lock:
+            if not self._raw:
+                self._raw_time = monotonic() - self._start
+            self._raw += data
+            if len(self._raw) >= self._chunk_size:
+                self._flush_raw()
+
+    def receive(self, event: events.TraceEvent) -> None:
+        """@brief Record a decoded trace event."""
+        self.receive_batch((event,))
+
+    def receive_batch(self, events: Sequence[events.TraceEvent]) -> None:
+        """@brief Record a batch of decoded trace events.
+
+        Events of types that cannot be stored in a capture are ignored.
+        """
+        pack = _EVENT_RECORD.pack
+        records = []
+        for event in events:
+            record = self._encode_event(event)
+            if record is not None:
+                records.append(pack(*record))
+        self._add_event_records(records)
+
+    def receive_block(self, block: events.TraceEventBlock) -> None:
+        """@brief Record a block of decoded trace events."""
+        pack = _EVENT_RECORD.pack
+        data_trace = iter(block.data_trace)
+        records = []
+        for kind, ts, port, value, size in zip(block.kinds, block.timestamps, block.ports, block.values,
+                block.sizes):
+            if kind == events.TraceEventBlock.DATA_TRACE:
+                record = self._encode_event(next(data_trace))
+                assert record is not None
+                records.append(pack(*record))
+            else:
+                records.append(pack(kind, 0, size, port, ts, value, 0))
+        self._add_event_records(records)
+
+    def close(self) -> None:
+        """@brief Write remaining data and the index, then close the file if it was opened here."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._flush_raw()
+            self._flush_events()
+
+            index_offset = self._file.tell()
+            payload = b''.join(_INDEX_ENTRY.pack(*entry) for entry in self._index)
+            self._write_chunk(CHUNK_INDEX, 0.0, 0, len(self._index), payload)
+            self._file.write(_TRAILER.pack(index_offset, INDEX_MAGIC))
+            self._file.flush()
+            if self._owns_file:
+                self._file.close()
+
+    def __enter__(self) -> "SWOCaptureWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @staticmethod
+    def _encode_event(event: events.TraceEvent) -> Optional[Tuple[int, int, int, int, int, int, int]]:
+        """@brief Convert an event object to the fields of an event record."""
+        ts = event.timestamp
+        if isinstance(event, events.TraceITMEvent):
+            return (events.TraceEventBlock.ITM, 0, event.width, event.port, ts, event.data, 0)
+        elif isinstance(event, events.TracePeriodicPC):
+            return (events.TraceEventBlock.PERIODIC_PC, 0, 0, 0, ts, event.pc, 0)
+        elif isinstance(event, events.TraceEventCounter):
+            return (events.TraceEventBlock.EVENT_COUNTER, 0, 0, 0, ts, event.counter_mask, 0)
+        elif isinstance(event, events.TraceExceptionEvent):
+            return (events.TraceEventBlock.EXCEPTION, 0, event.action, event.exception_number, ts, 0, 0)
+        elif isinstance(event, events.TraceOverflow):
+            return (events.TraceEventBlock.OVERFLOW, 0, 0, 0, ts, 0, 0)
+        elif isinstance(event, events.TraceDataTraceEvent):
+            flags = 0
+            extra = 0
+            if event.pc is not None:
+                flags |= _DT_HAS_PC
+                extra = event.pc
+            elif event.address is not None:
+                flags |= _DT_HAS_ADDR
+                extra = event.address
+            if event.value is not None:
+                flags |= _DT_HAS_VALUE
+            if event.is_read:
+                flags |= _DT_IS_READ
+            return (events.TraceEventBlock.DATA_TRACE, flags, event.transfer_size or 0,
+                    event.comparator or 0, ts, event.value or 0, extra)
+        else:
+            return None
+
+    def _add_event_records(self, records: List[bytes]) -> None:
+        if not records:
+            return
+        with self._lock:
+            if not self._event_count:
+                self._event_time = monotonic() - self._start
+            self._event_records += b''.join(records)
+            self._event_count += len(records)
+            if self._event_count >= self.EVENTS_PER_CHUNK:
+                self._flush_events()
+
+    def _flush_raw(self) -> None:
+        if not self._raw:
+            return
+        self._index.append(CaptureIndexEntry(self._file.tell(), self._raw_time, self._stream_offset))
+        self._write_chunk(CHUNK_RAW, self._raw_time, self._stream_offset, len(self._raw), self._raw)
+        self._stream_offset += len(self._raw)
+        self._raw = bytearray()
+
+    def _flush_events(self) -> None:
+        if not self._event_count:
+            return
+        self._write_chunk(CHUNK_EVENTS, self._event_time, self._event_index, self._event_count,
+                self._event_records)
+        self._event_index += self._event_count
+        self._event_records = bytearray()
+        self._event_count = 0
+
+    def _write_chunk(self, kind: int, host_time: float, offset: int, count: int,
+            payload: Union[bytes, bytearray]) -> None:
+        if self._compress:
+            payload = zlib.compress(payload)
+        self._file.write(_CHUNK_HEADER.pack(kind, host_time, offset, count, len(payload)))
+        self._file.write(payload)
+
+class SWOCaptureReader:
+    """@brief Reads an SWO capture file written by SWOCaptureWriter."""
+
+    def __init__(self, file: Union[str, BinaryIO]) -> None:
+        """@brief Constructor.
+        @param self
+        @param file Path of the capture file, or a binary file object open for reading.
+        @exception CaptureFormatError The file is not an SWO capture, or is an unsupported version.
+        """
+        if isinstance(file, str):
+            self._file: BinaryIO = open(file, 'rb')
+            self._owns_file = True
+        else:
+            self._file = file
+            self._owns_file = False
+
+        header = self._file.read(_FILE_HEADER.size)
+        if len(header) < _FILE_HEADER.size:
+            raise CaptureFormatError("file is too short to be an SWO capture")
+        magic, version, flags, self._start_time = _FILE_HEADER.unpack(header)
+        if magic != MAGIC:
+            raise CaptureFormatError("file is not an SWO capture")
+        if version != VERSION:
+            raise CaptureFormatError("unsupported SWO capture version %d" % version)
+        self._compressed = bool(flags & FLAG_COMPRESSED)
+        self._index = self._load_index()
+
+    @property
+    def start_time(self) -> float:
+        """@brief Capture start time in seconds since the epoch."""
+        return self._start_time
+
+    @property
+    def is_compressed(self) -> bool:
+        return self._compressed
+
+    @property
+    def index(self) -> List[CaptureIndexEntry]:
+        """@brief Index entries for the raw data chunks, in order."""
+        return self._index
+
+    def close(self) -> None:
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self) -> "SWOCaptureReader":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def read_raw(self, start_time: float = 0.0) -> Iterator[Tuple[float, bytes]]:
+        """@brief Iterate over the raw SWO data.
+        @param self
+        @param start_time Skip chunks whose data was entirely received before this many seconds from
+            the start of the capture. The time index is used to seek directly to the first chunk.
+        @return Iterator of (host time, data) tuples, one per raw data chunk.
+        """
+        entries = self._index
+        first = 0
+        for i, entry in enumerate(entries):
+            if entry.host_time > start_time:
+                break
+            first = i
+        for entry in entries[first:]:
+            self._file.seek(entry.file_offset)
+            chunk = self._read_chunk()
+            if chunk is None:
+                raise CaptureFormatError("SWO capture index refers to an invalid chunk")
+            kind, host_time, _, _, payload = chunk
+            yield host_time, payload
+
+    def read_events(self, exception_name_fn: Optional[Callable[[int], Optional[str]]] = None) \
+            -> Iterator[events.TraceEvent]:
+        """@brief Iterate over the decoded events recorded in the capture.
+        @param self
+        @param exception_name_fn Optional callable returning the name of an exception number.
+        """
+        for kind, _, _, _, payload in self._iter_chunks():
+            if kind != CHUNK_EVENTS:
+                continue
+            for record in _EVENT_RECORD.iter_unpack(payload):
+                yield self._decode_event(record, exception_name_fn)
+
+    def replay(self, parser: SWOParser, start_time: float = 0.0) -> int:
+        """@brief Pass the raw SWO data through an SWO parser as fast as possible.
+        @param self
+        @param parser The parser, which should be reset and connected to a sink.
+        @param start_time Time in seconds from the start of the capture to begin replaying from.
+        @return Number of raw bytes replayed.
+        """
+        count = 0
+        for _, data in self.read_raw(start_time):
+            parser.parse(data)
+            count += len(data)
+        return count
+
+    def _load_index(self) -> List[CaptureIndexEntry]:
+        """@brief Read the index using the trailer, or rebuild it by scanning the chunks."""
+        self._file.seek(0, io.SEEK_END)
+        end = self._file.tell()
+        if end >= _FILE_HEADER.size + _TRAILER.size:
+            self._file.seek(end - _TRAILER.size)
+            index_offset, magic = _TRAILER.unpack(self._file.read(_TRAILER.size))
+            if magic == INDEX_MAGIC:
+                self._file.seek(index_offset)
+                chunk = self._read_chunk()
+                if chunk is not None and chunk[0] == CHUNK_INDEX:
+                    payload = chunk[4]
+                    return [CaptureIndexEntry(*entry) for entry in _INDEX_ENTRY.iter_unpack(payload)]
+
+        LOG.debug("SWO capture has no index; scanning chunks")
+        index = []
+        self._file.seek(_FILE_HEADER.size)
+        while True:
+            offset = self._file.tell()
+            header = self._file.read(_CHUNK_HEADER.size)
+            if len(header) < _CHUNK_HEADER.size:
+                break
+            kind, host_time, stream_offset, _, length = _CHUNK_HEADER.unpack(header)
+            # Ignore an incomplete chunk at the end of the file.
+            if offset + _CHUNK_HEADER.size + length > end:
+                break
+            if kind == CHUNK_RAW:
+                index.append(CaptureIndexEntry(offset, host_time, stream_offset))
+            self._file.seek(length, io.SEEK_CUR)
+        return index
+
+    def _iter_chunks(self) -> Iterator[Tuple[int, float, int, int, bytes]]:
+        """@brief Iterate over all data chunks in file order."""
+        offset = _FILE_HEADER.size
+        while True:
+            self._file.seek(offset)
+            chunk = self._read_chunk()
+            if chunk is None or chunk[0] == CHUNK_INDEX:
+                return
+            offset = self._file.tell()
+            yield chunk
+
+    def _read_chunk(self) -> Optional[Tuple[int, float, int, int, bytes]]:
+        """@brief Read the chunk at the current file position.
+        @return Tuple of the chunk type, host time, offset, count, and uncompressed payload, or None if
+            the end of the file or an incomplete chunk is reached.
+        """
+        header = self._file.read(_CHUNK_HEADER.size)
+        if len(header) < _CHUNK_HEADER.size:
+            return None
+        kind, host_time, offset, count, length = _CHUNK_HEADER.unpack(header)
+        payload = self._file.read(length)
+        if len(payload) < length:
+            return None
+        if self._compressed:
+            payload = zlib.decompress(payload)
+        return kind, host_time, offset, count, payload
+
+    @staticmethod
+    def _decode_event(record: Tuple[int, int, int, int, int, int, int],
+            exception_name_fn: Optional[Callable[[int], Optional[str]]]) -> events.TraceEvent:
+        kind, flags, size, port, ts, value, extra = record
+        if kind == events.TraceEventBlock.ITM:
+            return events.TraceITMEvent(port, value, size, ts)
+        elif kind == events.TraceEventBlock.PERIODIC_PC:
+            return events.TracePeriodicPC(value, ts)
+        elif kind == events.TraceEventBlock.EVENT_COUNTER:
+            return events.TraceEventCounter(value, ts)
+        elif kind == events.TraceEventBlock.EXCEPTION:
+            name = exception_name_fn(port) if (exception_name_fn is not None) else None
+            return events.TraceExceptionEvent(port, name, size, ts)
+        elif kind == events.TraceEventBlock.OVERFLOW:
+            return events.TraceOverflow(ts)
+        elif kind == events.TraceEventBlock.DATA_TRACE:
+            has_value = bool(flags & _DT_HAS_VALUE)
+            return events.TraceDataTraceEvent(cmpn=port,
+                    pc=(extra if (flags & _DT_HAS_PC) else None),
+                    addr=(extra if (flags & _DT_HAS_ADDR) else None),
+                    value=(value if has_value else None),
+                    rnw=(bool(flags & _DT_IS_READ) if has_value else None),
+                    sz=(size if has_value else None),
+                    ts=ts)
+        else:
+            raise CaptureFormatError("invalid event kind %d in SWO capture" % kind)
@@ -15,7 +15,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Optional
+from array import array
+from typing import (Callable, Iterator, List, Optional)
 
 class TraceEvent:
     """@brief Base trace event class."""
@@ -244,3 +245,67 @@ class TraceDataTraceEvent(TraceEvent):
                 msg += " Value={}:{:#010x}".format(rnw, self.value)
         return "[{}] DWT: Data Trace {}".format(self.timestamp, msg.strip())
 
+
+class TraceEventBlock:
+    """@brief Block of trace events stored in columns.
+
+    Each event is a row across the #kinds, #timestamps, #ports, #values, and #sizes arrays. The
+    meaning of the port, value, and size columns depends on the kind of event:
+
+    Kind             | Port                 | Value           | Size
+    -----------------|----------------------|-----------------|------------------
+    ITM              | stimulus port        | data            | width in bytes
+    EVENT_COUNTER    | 0                    | counter mask    | 0
+    EXCEPTION        | exception number     | 0               | action
+    PERIODIC_PC      | 0                    | PC, 0 for sleep | 0
+    OVERFLOW         | 0                    | 0               | 0
+    DATA_TRACE       | comparator           | see below       | 0
+
+    Data trace events have too many fields to fit the columns. For these rows, the value column
+    holds the data value if present, otherwise the address or PC, and the complete event objects are
+    kept in order in #data_trace.
+
+    Iterating over a block yields TraceEvent objects identical to those that SWOParser sends when not
+    in columnar mode.
+    """
+
+    ITM = 0
+    EVENT_COUNTER = 1
+    EXCEPTION = 2
+    PERIODIC_PC = 3
+    OVERFLOW = 4
+    DATA_TRACE = 5
+
+    def __init__(self, exception_name_fn: Optional[Callable[[int], Optional[str]]] = None) -> None:
+        """@brief Constructor.
+        @param self
+        @param exception_name_fn Optional callable returning the name of an exception number. Used to
+            fill in the exception name of TraceExceptionEvent objects when iterating.
+        """
+        self.kinds = array('B')
+        self.timestamps = array('Q')
+        self.ports = array('I')
+        self.values = array('I')
+        self.sizes = array('B')
+        self.data_trace: List[TraceDataTraceEvent] = []
+        self._exception_name_fn = exception_name_fn
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __iter__(self) -> Iterator[TraceEvent]:
+        data_trace = iter(self.data_trace)
+        for kind, ts, port, value, size in zip(self.kinds, self.timestamps, self.ports, self.values, self.sizes):
+            if kind == self.ITM:
+                yield TraceITMEvent(port, value, size, ts)
+            elif kind == self.EVENT_COUNTER:
+                yield TraceEventCounter(value, ts)
+            elif kind == self.EXCEPTION:
+                name = self._exception_name_fn(port) if (self._exception_name_fn is not None) else None
+                yield TraceExceptionEvent(port, name, size, ts)
+            elif kind == self.PERIODIC_PC:
+                yield TracePeriodicPC(value, ts)
+            elif kind == self.OVERFLOW:
+                yield TraceOverflow(ts)
+            else:
+                yield next(data_trace)
@@ -0,0 +1,229 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import (Any, Dict, List, NamedTuple, Optional, Sequence, Tuple)
+
+from .events import (TraceEvent, TraceEventBlock, TracePeriodicPC)
+from .sink import TraceEventSink
+
+## Function name used for samples taken while the core was sleeping.
+SLEEP_NAME = "[sleep]"
+
+## Function name used for samples at addresses without a symbol.
+UNKNOWN_NAME = "[unknown]"
+
+class PCSampleHistogram(TraceEventSink):
+    """@brief Trace event sink that counts periodic PC samples by address.
+
+    Only the sample count for each distinct PC is kept, so memory use depends on the size of the
+    code being executed rather than the number of samples. Samples are symbolized when a report is
+    generated. PC values can also be added directly with add_sample(), for example from polling the
+    DWT PCSR register.
+    """
+
+    ## PCSR value read when the PC could not be sampled.
+    PCSR_UNAVAILABLE = 0xffffffff
+
+    def __init__(self) -> None:
+        self._counts: Dict[int, int] = {}
+        self.sleep_count = 0
+
+    @property
+    def counts(self) -> Dict[int, int]:
+        """@brief Dict of sample count by PC, not including sleep samples."""
+        return self._counts
+
+    @property
+    def total(self) -> int:
+        """@brief Total number of samples, including sleep samples."""
+        return sum(self._counts.values()) + self.sleep_count
+
+    def add_sample(self, pc: int) -> None:
+        """@brief Add one PC sample.
+        @param self
+        @param pc The sampled PC. A value of 0 is counted as a sleep sample. PCSR_UNAVAILABLE is ignored.
+        """
+        if pc == 0:
+            self.sleep_count += 1
+        elif pc != self.PCSR_UNAVAILABLE:
+            self._counts[pc] = self._counts.get(pc, 0) + 1
+
+    def receive(self, event: TraceEvent) -> None:
+        if isinstance(event, TracePeriodicPC):
+            self.add_sample(event.pc)
+
+    def receive_batch(self, events: Sequence[TraceEvent]) -> None:
+        for event in events:
+            if isinstance(event, TracePeriodicPC):
+                self.add_sample(event.pc)
+
+    def receive_block(self, block: TraceEventBlock) -> None:
+        counts = self._counts
+        for kind, pc in zip(block.kinds, block.values):
+            if kind == TraceEventBlock.PERIODIC_PC:
+                if pc == 0:
+                    self.sleep_count += 1
+                elif pc != self.PCSR_UNAVAILABLE:
+                    counts[pc] = counts.get(pc, 0) + 1
+
+class ProfileSymbolizer:
+    """@brief Maps sampled addresses to function names and source lines.
+
+    Lookups are cached per address, so each distinct address is decoded only once.
+    """
+
+    def __init__(self, elf: Optional[Any] = None) -> None:
+        """@brief Constructor.
+        @param self
+        @param elf An ELFBinaryFile, or None to report bare addresses.
+        """
+        self._elf = elf
+        self._functions: Dict[int, Tuple[str, int]] = {}
+        self._lines: Dict[int, Optional[str]] = {}
+
+    def function(self, addr: int) -> Tuple[str, int]:
+        """@brief Look up the function containing an address.
+        @return Tuple of the function name and the offset of _addr_ from the start of the function.
+            For unknown addresses the name is UNKNOWN_NAME and the offset is the address.
+        """
+        try:
+            return self._functions[addr]
+        except KeyError:
+            pass
+        result = (UNKNOWN_NAME, addr)
+        if self._elf is not None:
+            decoder = self._elf.symbol_decoder
+            # Thumb function symbols have bit 0 set, so their start address is one less than the
+            # symbol value.
+            sym = decoder.get_symbol_for_address(addr) or decoder.get_symbol_for_address(addr | 1)
+            if sym is not None:
+                result = (sym.name, addr - (sym.address & ~1))
+        self._functions[addr] = result
+        return result
+
+    def line(self, addr: int) -> Optional[str]:
+        """@brief Look up the source location of an address.
+        @return String of the form "file:line", or None if there is no line information.
+        """
+        try:
+            return self._lines[addr]
+        except KeyError:
+            pass
+        result = None
+        if self._elf is not None:
+            info = self._elf.address_decoder.get_line_for_address(addr)
+            if info is not None:
+                filename = info.filename.decode() if isinstance(info.filename, bytes) else info.filename
+                result = "%s:%d" % (filename, info.line)
+        self._lines[addr] = result
+        return result
+
+class FunctionProfile(NamedTuple):
+    """@brief Samples attributed to one function."""
+    name: str
+    samples: int
+    percent: float
+
+class AddressProfile(NamedTuple):
+    """@brief Samples at one address."""
+    address: int
+    function: str
+    offset: int
+    samples: int
+    percent: float
+
+class ProfileReport:
+    """@brief Formats a PC sample histogram as flat, per-function, or collapsed stack profiles."""
+
+    def __init__(self, histogram: PCSampleHistogram, symbolizer: ProfileSymbolizer) -> None:
+        self._histogram = histogram
+        self._symbolizer = symbolizer
+        self._total = histogram.total
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    def _percent(self, samples: int) -> float:
+        return (100.0 * samples / self._total) if self._total else 0.0
+
+    def functions(self) -> List[FunctionProfile]:
+        """@brief Samples per function, most sampled first. Sleep samples are a separate entry."""
+        totals: Dict[str, int] = {}
+        for addr, count in self._histogram.counts.items():
+            name = self._symbolizer.function(addr)[0]
+            totals[name] = totals.get(name, 0) + count
+        if self._histogram.sleep_count:
+            totals[SLEEP_NAME] = self._histogram.sleep_count
+        return sorted((FunctionProfile(name, count, self._percent(count)) for name, count in totals.items()),
+                key=lambda p: (-p.samples, p.name))
+
+    def addresses(self) -> List[AddressProfile]:
+        """@brief Samples per address, most sampled first."""
+        result = []
+        for addr, count in self._histogram.counts.items():
+            name, offset = self._symbolizer.function(addr)
+            result.append(AddressProfile(addr, name, offset, count, self._percent(count)))
+        return sorted(result, key=lambda p: (-p.samples, p.address))
+
+    def format_functions(self, limit: Optional[int] = None) -> str:
+        """@brief Table of sample counts and percentages per function."""
+        lines = ["{:>10} {:>7}  {}".format("Samples", "%", "Function")]
+        for entry in self.functions()[:limit]:
+            lines.append("{:>10} {:>6.2f}%  {}".format(entry.samples, entry.percent, entry.name))
+        lines.append("{:>10} total".format(self._total))
+        return "\n".join(lines) + "\n"
+
+    def format_flat(self, limit: Optional[int] = None, lines: bool = False) -> str:
+        """@brief Table of sample counts and percentages per address.
+        @param self
+        @param limit Maximum number of addresses to list.
+        @param lines Whether to include the source location of each address.
+        """
+        result = ["{:>10} {:>7}  {:<10}  {}".format("Samples", "%", "Address", "Location")]
+        for entry in self.addresses()[:limit]:
+            if entry.function == UNKNOWN_NAME:
+                location = UNKNOWN_NAME
+            else:
+                location = "{}+{:#x}".format(entry.function, entry.offset)
+            if lines:
+                source = self._symbolizer.line(entry.address)
+                if source is not None:
+                    location += " (%s)" % source
+            result.append("{:>10} {:>6.2f}%  {:#010x}  {}".format(entry.samples, entry.percent, entry.address,
+                    location))
+        return "\n".join(result) + "\n"
+
+    def format_collapsed(self, lines: bool = False) -> str:
+        """@brief Collapsed stack text for flame graph tools.
+
+        PC sampling does not record call stacks, so each stack has the sampled function as the only
+        frame, optionally followed by the source line as a second frame.
+
+        @param self
+        @param lines Whether to add the source location of each sample as a frame.
+        """
+        stacks: Dict[str, int] = {}
+        for addr, count in self._histogram.counts.items():
+            stack = self._symbolizer.function(addr)[0]
+            if lines:
+                source = self._symbolizer.line(addr)
+                if source is not None:
+                    stack += ";" + source
+            stacks[stack] = stacks.get(stack, 0) + count
+        if self._histogram.sleep_count:
+            stacks[SLEEP_NAME] = self._histogram.sleep_count
+        return "".join("%s %d\n" % (stack, count) for stack, count in sorted(stacks.items()))
@@ -19,7 +19,7 @@ import collections.abc
 from typing import (TYPE_CHECKING, Iterable, List, Optional, Sequence, Union)
 
 if TYPE_CHECKING:
-    from .events import TraceEvent
+    from .events import (TraceEvent, TraceEventBlock)
 
 class TraceEventSink:
     """@brief Abstract interface for a trace event sink."""
@@ -30,6 +30,30 @@ class TraceEventSink:
         """
         raise NotImplementedError()
 
+    def receive_batch(self, events: Sequence["TraceEvent"]) -> None:
+        """@brief Handle a batch of trace events.
+
+        The default implementation passes each event to receive(). Sinks that can process many events
+        at once with less overhead should override this method.
+
+        @param self
+        @param events Sequence of TraceEvent instances, in the order they were generated.
+        """
+        for event in events:
+            self.receive(event)
+
+    def receive_block(self, block: "TraceEventBlock") -> None:
+        """@brief Handle a block of trace events.
+
+        The default implementation converts the block to event objects and passes them to
+        receive_batch(). Sinks that can work directly on the columns of the block should override
+        this method.
+
+        @param self
+        @param block A TraceEventBlock instance.
+        """
+        self.receive_batch(list(block))
+
 class TraceEventFilter(TraceEventSink):
     """@brief Abstract interface for a trace event filter."""
 
@@ -57,6 +81,27 @@ class TraceEventFilter(TraceEventSink):
             else:
                 self._sink.receive(event)
 
+    def receive_batch(self, events: Sequence["TraceEvent"]) -> None:
+        """@brief Handle a batch of trace events.
+
+        Each event is passed through the filter() method. All resulting events are passed on to the
+        connected trace sink in a single batch.
+
+        @param self
+        @param events Sequence of TraceEvent instances.
+        """
+        filtered_events: List["TraceEvent"] = []
+        for event in events:
+            filtered_event = self.filter(event)
+            if filtered_event is None:
+                continue
+            elif isinstance(filtered_event, collections.abc.Iterable):
+                filtered_events.extend(filtered_event)
+            else:
+                filtered_events.append(filtered_event)
+        if filtered_events and (self._sink is not None):
+            self._sink.receive_batch(filtered_events)
+
     def filter(self, event: "TraceEvent") -> Union[None, "TraceEvent", Sequence["TraceEvent"]]:
         """@brief Filter a single trace event.
 
@@ -94,3 +139,20 @@ class TraceEventTee(TraceEventSink):
         for sink in self._sinks:
             sink.receive(event)
 
+    def receive_batch(self, events: Sequence["TraceEvent"]) -> None:
+        """@brief Replicate a batch of trace events to all connected downstream trace event sinks.
+
+        @param self
+        @param events Sequence of TraceEvent instances.
+        """
+        for sink in self._sinks:
+            sink.receive_batch(events)
+
+    def receive_block(self, block: "TraceEventBlock") -> None:
+        """@brief Replicate a block of trace events to all connected downstream trace event sinks.
+
+        @param self
+        @param block A TraceEventBlock instance.
+        """
+        for sink in self._sinks:
+            sink.receive_block(block)
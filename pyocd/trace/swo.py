@@ -15,14 +15,112 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import (TYPE_CHECKING, Generator, Iterable, List, Optional)
+from typing import (TYPE_CHECKING, Iterable, List, Optional, Tuple, Union)
+from typing_extensions import Protocol
 
 from . import events
 
 if TYPE_CHECKING:
-    from ..core.core_target import CoreTarget
     from .sink import TraceEventSink
 
+class _ExceptionNamingCore(Protocol):
+    """@brief The part of the core interface used by SWOParser."""
+
+    def exception_number_to_name(self, exc_num: int) -> Optional[str]:
+        ...
+
+# Operations for SWO packet headers, used in the header lookup table.
+_OP_INVALID = 0         # Single byte packet that is ignored.
+_OP_SYNC = 1
+_OP_OVERFLOW = 2
+_OP_LTS_SHORT = 3       # Local timestamp format 2; param is the timestamp delta.
+_OP_LTS_LONG = 4        # Local timestamp format 1; param is the TC field.
+_OP_EXT_SHORT = 5       # Single byte ITM page extension; param is the page.
+_OP_EXT_LONG = 6        # Extension with continuation bytes; param is the SH bit.
+_OP_ITM = 7             # param is the stimulus port within the page.
+_OP_EVENT_COUNTER = 8
+_OP_EXCEPTION = 9
+_OP_PERIODIC_PC = 10
+_OP_DATA_PC = 11        # param is the comparator number.
+_OP_DATA_ADDR = 12      # param is the comparator number.
+_OP_DATA_VALUE = 13     # param is the comparator number, plus 4 for a read.
+_OP_SKIP = 14           # Source packet with payload that is ignored.
+
+def _decode_header(hdr: int) -> Tuple[int, int, int]:
+    """@brief Classify an SWO packet header byte.
+    @return Tuple of operation, payload size in bytes for source packets, and a parameter.
+    """
+    if hdr == 0:
+        return _OP_SYNC, 0, 0
+    elif hdr == 0x70:
+        return _OP_OVERFLOW, 0, 0
+    # Protocol packet.
+    elif (hdr & 0x3) == 0:
+        c = (hdr >> 7) & 0x1
+        d = (hdr >> 4) & 0b111
+        # Local timestamp.
+        if (hdr & 0xf) == 0 and d not in (0x0, 0x3):
+            if c == 1:
+                return _OP_LTS_LONG, 0, (hdr >> 4) & 0x3
+            else:
+                return _OP_LTS_SHORT, 0, (hdr >> 4) & 0x7
+        # Global timestamp. TODO handle global timestamp
+        elif hdr in (0b10010100, 0b10110100):
+            return _OP_INVALID, 0, 0
+        # Extension.
+        elif (hdr & 0x8) == 0x8:
+            sh = (hdr >> 2) & 0x1
+            if c == 1:
+                return _OP_EXT_LONG, 0, sh
+            elif sh == 0:
+                # Extension packet with sh==0 sets ITM stimulus page.
+                return _OP_EXT_SHORT, 0, (hdr >> 4) & 0x7
+            else:
+                return _OP_INVALID, 0, 0
+        # Reserved packet.
+        else:
+            return _OP_INVALID, 0, 0
+    # Source packet.
+    else:
+        l = 1 << ((hdr & 0x3) - 1)
+        a = (hdr >> 3) & 0x1f
+        # Instrumentation packet.
+        if (hdr & 0x4) == 0:
+            return _OP_ITM, l, a
+        # Hardware source packets...
+        elif a == 0:
+            return _OP_EVENT_COUNTER, l, 0
+        elif a == 1:
+            return _OP_EXCEPTION, l, 0
+        elif a == 2:
+            return _OP_PERIODIC_PC, l, 0
+        elif 8 <= a <= 23:
+            type = (hdr >> 6) & 0x3
+            cmpn = (hdr >> 4) & 0x3
+            bit3 = (hdr >> 3) & 0x1
+            if type == 0b01 and bit3 == 0:
+                return _OP_DATA_PC, l, cmpn
+            elif type == 0b01 and bit3 == 1:
+                return _OP_DATA_ADDR, l, cmpn
+            elif type == 0b10:
+                return _OP_DATA_VALUE, l, cmpn | (4 if bit3 == 0 else 0)
+        # Invalid DWT 'a' value or data trace type.
+        return _OP_SKIP, l, 0
+
+## Lookup table of decoded SWO packet headers, indexed by header byte.
+_HEADER_TABLE: List[Tuple[int, int, int]] = [_decode_header(hdr) for hdr in range(256)]
+
+## Event row kinds, from TraceEventBlock.
+_ITM = events.TraceEventBlock.ITM
+_EVENT_COUNTER = events.TraceEventBlock.EVENT_COUNTER
+_EXCEPTION = events.TraceEventBlock.EXCEPTION
+_PERIODIC_PC = events.TraceEventBlock.PERIODIC_PC
+_OVERFLOW = events.TraceEventBlock.OVERFLOW
+_DATA_TRACE = events.TraceEventBlock.DATA_TRACE
+
+## Pending event row: kind, timestamp, port, value, size, and data trace event object.
+_EventRow = Tuple[int, int, int, int, int, Optional[events.TraceDataTraceEvent]]
+
 class SWOParser:
     """@brief SWO data stream parser.
 
@@ -31,24 +129,40 @@ class SWOParser:
     event sink object that is a subclass of TraceEventSink. The event sink must either be provided
     when the SWOParser is constructed, or can be set using the connect() method.
 
+    Whole buffers of data are decoded at once using a lookup table of packet headers. A packet that
+    is incomplete at the end of a buffer is saved and completed by the next call to parse().
+
+    All events completed during a call to parse() are sent to the sink's receive_batch() method
+    together when the call returns. In columnar mode, they are instead passed to the sink's
+    receive_block() method as a TraceEventBlock.
+
     A SWOParser instance can be reused for multiple SWO sessions. If a break in SWO data streaming
     occurs, the reset() method should be called before passing further data to parse().
     """
-    def __init__(self, core: "CoreTarget", sink: Optional["TraceEventSink"] = None) -> None:
+    def __init__(self, core: _ExceptionNamingCore, sink: Optional["TraceEventSink"] = None,
+            columnar: bool = False) -> None:
+        """@brief Constructor.
+        @param self
+        @param core The core being traced. Used to look up exception names. Any object with an
+            exception_number_to_name() method, such as a CoreTarget, is accepted.
+        @param sink Optional downstream trace sink or filter.
+        @param columnar Whether to send events to the sink in TraceEventBlock objects.
+        """
         self.reset()
         self._core = core
         self._sink = sink
+        self._columnar = columnar
 
     def reset(self) -> None:
         self._bytes_parsed = 0
+        self._events_parsed = 0
         self._itm_page = 0
         self._timestamp = 0
-        self._pending_events: List[events.TraceEvent] = []
-        self._pending_data_trace = None
-
-        # Get generator instance and prime it.
-        self._parser = self._parse()
-        next(self._parser)
+        self._pending_rows: List[_EventRow] = []
+        self._pending_data_trace: Optional[events.TraceDataTraceEvent] = None
+        self._residual = b''
+        self._ready_rows: List[_EventRow] = []
+        self._ready_timestamps: List[int] = []
 
     def connect(self, sink: "TraceEventSink") -> None:
         """@brief Connect the downstream trace sink or filter."""
@@ -59,226 +173,260 @@ class SWOParser:
         """@brief The number of bytes of SWO data parsed thus far."""
         return self._bytes_parsed
 
+    @property
+    def events_parsed(self) -> int:
+        """@brief The number of trace events sent to the event sink thus far."""
+        return self._events_parsed
+
     def parse(self, data: Iterable[int]) -> None:
         """@brief Process SWO data.
 
         This method will return once the provided data is consumed, and can be called again when
         more data is available. There is no minimum or maximum limit on the size of the provided
-        data. As trace events are identified during parsing, they will be passed to the event
-        sink object passed into the constructor or connect().
+        data. Trace events identified during parsing are passed in one batch to the event sink
+        object passed into the constructor or connect() before returning.
 
         @param self
-        @param data A sequence of integer byte values, usually a bytearray.
+        @param data A sequence of integer byte values, usually a bytes or bytearray object.
         """
-        for value in data:
-            self._parser.send(value)
-            self._bytes_parsed += 1
-
-    def _flush_events(self) -> None:
-        """@brief Send all pending events to event sink."""
-        if self._sink is not None:
-            for event in self._pending_events:
-                self._sink.receive(event)
-        self._pending_events = []
-
-    def _merge_data_trace_events(self, event: events.TraceEvent) -> bool:
-        """@brief Look for pairs of data trace events and merge."""
-        if isinstance(event, events.TraceDataTraceEvent):
-            # Record the first data trace event.
-            if self._pending_data_trace is None:
-                self._pending_data_trace = event
-            else:
-                # We've got the second in a pair. If the comparator numbers are the same, then
-                # we can merge the two events. Otherwise we just add them to the pending event
-                # queue separately.
-                if event.comparator == self._pending_data_trace.comparator:
-                    # Merge the two data trace events.
-                    ev = events.TraceDataTraceEvent(cmpn=event.comparator,
-                        pc=(event.pc or self._pending_data_trace.pc),
-                        addr=(event.address or self._pending_data_trace.address),
-                        value=(event.value or self._pending_data_trace.value),
-                        rnw=(event.is_read or self._pending_data_trace.is_read),
-                        sz=(event.transfer_size or self._pending_data_trace.transfer_size),
-                        ts=self._pending_data_trace.timestamp)
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
+        self._bytes_parsed += len(data)
+        buf = (self._residual + data) if self._residual else data
+        self._residual = bytes(buf[self._parse_buffer(buf):])
+        if self._ready_rows:
+            self._send_events()
+
+    def _parse_buffer(self, buf: Union[bytes, bytearray, memoryview]) -> int:
+        """@brief Decode all complete packets in a buffer.
+        @return Offset of the first byte not consumed, the start of an incomplete packet.
+        """
+        table = _HEADER_TABLE
+        # The pending rows list is replaced each time events are flushed.
+        add_row = self._pending_rows.append
+        timestamp = self._timestamp
+        n = len(buf)
+        i = 0
+        while i < n:
+            op, size, param = table[buf[i]]
+
+            # Source packets.
+            if op >= _OP_ITM:
+                end = i + 1 + size
+                if end > n:
+                    break
+                if size == 1:
+                    payload = buf[i + 1]
                 else:
-                    ev = self._pending_data_trace
-                self._pending_events.append(ev)
-                self._pending_data_trace = None
-            return True
-        # If we get a non-data-trace event while waiting for a second data trace event, then
-        # just place the pending data trace event in the pending event queue.
-        elif self._pending_data_trace is not None:
-            self._pending_events.append(self._pending_data_trace)
-            self._pending_data_trace = None
-        return False
-
-    def _send_event(self, event: events.TraceEvent) -> None:
-        """@brief Process event objects and decide when to send to event sink.
-
-        This method handles the logic to associate a timestamp event with the prior other
-        event. A list of pending events is built up until either a timestamp or overflow event
-        is generated, at which point all pending events are flushed to the event sink. If a
-        timestamp is seen, the timestamp of all pending events is set prior to flushing.
+                    payload = int.from_bytes(buf[i + 1:end], 'little')
+                i = end
+
+                if op == _OP_ITM:
+                    if self._pending_data_trace is not None:
+                        self._add_pending_data_trace()
+                    add_row((_ITM, timestamp, self._itm_page * 32 + param, payload, size, None))
+                elif op == _OP_PERIODIC_PC:
+                    if self._pending_data_trace is not None:
+                        self._add_pending_data_trace()
+                    # A payload of 0 indicates a period PC sleep event.
+                    add_row((_PERIODIC_PC, timestamp, 0, payload, 0, None))
+                elif op == _OP_EVENT_COUNTER:
+                    if self._pending_data_trace is not None:
+                        self._add_pending_data_trace()
+                    add_row((_EVENT_COUNTER, timestamp, 0, payload, 0, None))
+                elif op == _OP_EXCEPTION:
+                    fn = (payload >> 12) & 0x3
+                    if 1 <= fn <= 3:
+                        if self._pending_data_trace is not None:
+                            self._add_pending_data_trace()
+                        add_row((_EXCEPTION, timestamp, payload & 0x1ff, 0, fn, None))
+                elif op == _OP_DATA_PC:
+                    self._add_data_trace(events.TraceDataTraceEvent(cmpn=param, pc=payload, ts=timestamp))
+                elif op == _OP_DATA_ADDR:
+                    self._add_data_trace(events.TraceDataTraceEvent(cmpn=param, addr=payload, ts=timestamp))
+                elif op == _OP_DATA_VALUE:
+                    self._add_data_trace(events.TraceDataTraceEvent(
+                            cmpn=(param & 0x3), value=payload, rnw=(param >= 4), sz=size, ts=timestamp))
+            # Local timestamp packet format 2.
+            elif op == _OP_LTS_SHORT:
+                i += 1
+                timestamp += param
+                self._timestamp = timestamp
+                self._timestamp_received(timestamp)
+                add_row = self._pending_rows.append
+            # Local timestamp packet format 1.
+            elif op == _OP_LTS_LONG:
+                end = self._find_continuation_end(buf, i + 1)
+                if end < 0:
+                    break
+                ts = 0
+                for byte in buf[i + 1:end]:
+                    ts = (ts << 7) | (byte & 0x7f)
+                i = end
+                timestamp += ts
+                self._timestamp = timestamp
+                self._timestamp_received(timestamp)
+                add_row = self._pending_rows.append
+            elif op == _OP_SYNC:
+                # Count the zero bytes, then consume the first non-zero byte. If it is 0x80 after at
+                # least 5 zero bytes the sync is valid, but the ITM page is reset either way.
+                j = i + 1
+                while j < n and buf[j] == 0:
+                    j += 1
+                if j == n:
+                    # Only the count of up to 5 zero bytes is significant, so limit the saved data.
+                    return max(i, n - 5)
+                i = j + 1
+                self._itm_page = 0
+            elif op == _OP_OVERFLOW:
+                i += 1
+                if self._pending_data_trace is not None:
+                    self._add_pending_data_trace()
+                add_row((_OVERFLOW, timestamp, 0, 0, 0, None))
+                self._flush_events()
+                add_row = self._pending_rows.append
+            elif op == _OP_EXT_SHORT:
+                i += 1
+                self._itm_page = param
+            elif op == _OP_EXT_LONG:
+                end = self._find_continuation_end(buf, i + 1)
+                if end < 0:
+                    break
+                ex = 0
+                for byte in buf[i + 1:end]:
+                    ex = (ex << 7) | (byte & 0x7f)
+                i = end
+                if param == 0:
+                    # Extension packet with sh==0 sets ITM stimulus page.
+                    self._itm_page = ex
+            else:
+                i += 1
+        return i
+
+    @staticmethod
+    def _find_continuation_end(buf: Union[bytes, bytearray, memoryview], start: int) -> int:
+        """@brief Find the end of the continuation bytes of a packet.
+        @return Offset just past the first byte at or after _start_ with bit 7 clear, or -1 if
+            there is no such byte in the buffer.
         """
-        flush = False
+        n = len(buf)
+        i = start
+        while i < n:
+            if (buf[i] & 0x80) == 0:
+                return i + 1
+            i += 1
+        return -1
 
-        # Handle merging data trace events.
-        if self._merge_data_trace_events(event):
+    def _add_pending_data_trace(self) -> None:
+        """@brief Add the pending unpaired data trace event to the pending rows."""
+        event = self._pending_data_trace
+        assert event is not None
+        self._pending_rows.append(self._data_trace_row(event))
+        self._pending_data_trace = None
+
+    @staticmethod
+    def _data_trace_row(event: events.TraceDataTraceEvent) -> _EventRow:
+        value = event.value
+        if value is None:
+            value = event.address if (event.address is not None) else event.pc
+        return (_DATA_TRACE, event.timestamp, event.comparator or 0, value or 0, 0, event)
+
+    def _add_data_trace(self, event: events.TraceDataTraceEvent) -> None:
+        """@brief Look for pairs of data trace events and merge."""
+        # Record the first data trace event.
+        if self._pending_data_trace is None:
+            self._pending_data_trace = event
             return
 
-        if isinstance(event, events.TraceTimestamp):
-            for ev in self._pending_events:
-                ev.timestamp = event.timestamp
-            flush = True
+        # We've got the second in a pair. If the comparator numbers are the same, then
+        # we can merge the two events. Otherwise we just add them to the pending event
+        # queue separately.
+        first = self._pending_data_trace
+        if event.comparator == first.comparator:
+            # Merge the two data trace events.
+            ev = events.TraceDataTraceEvent(cmpn=event.comparator,
+                pc=(event.pc if (event.pc is not None) else first.pc),
+                addr=(event.address if (event.address is not None) else first.address),
+                value=(event.value if (event.value is not None) else first.value),
+                rnw=(event.is_read if (event.is_read is not None) else first.is_read),
+                sz=(event.transfer_size if (event.transfer_size is not None) else first.transfer_size),
+                ts=first.timestamp)
         else:
-            self._pending_events.append(event)
-            if isinstance(event, events.TraceOverflow):
-                flush = True
+            ev = first
+        self._pending_rows.append(self._data_trace_row(ev))
+        self._pending_data_trace = None
+
+    def _timestamp_received(self, timestamp: int) -> None:
+        """@brief Set the timestamp of all pending events and flush them to the event sink."""
+        if self._pending_data_trace is not None:
+            self._add_pending_data_trace()
+        self._flush_events(timestamp)
 
-        if flush:
-            self._flush_events()
+    def _flush_events(self, timestamp: Optional[int] = None) -> None:
+        """@brief Move all pending events to the list of events ready to send to the event sink.
 
-    def _parse(self) -> Generator[None, int, None]:
-        """@brief SWO parser as generator function coroutine.
+        Ready events are sent to the event sink by _send_events() at the end of parse().
 
-        The generator yields every time it needs a byte of SWO data. The caller must use the
-        generator's send() method to provide the next byte.
+        @param self
+        @param timestamp If not None, the timestamp is applied to all pending events.
         """
-        timestamp = 0
-        invalid = False
-        while True:
-            byte = yield
-            hdr = byte
-
-            # Sync packet.
-            if hdr == 0:
-                packets = 0
-                while True:
-                    # Check for final 1 bit after at least 5 all-zero sync packets
-                    if (packets >= 5) and (byte == 0x80):
-                        break
-                    elif byte == 0:
-                        packets += 1
-                    else:
-                        # Get early non-zero packet, reset sync packet counter.
-                        #packets = 0
-                        invalid = True
-                        break
-                    byte = yield
-                self._itm_page = 0
-            # Overflow packet.
-            elif hdr == 0x70:
-                self._send_event(events.TraceOverflow(timestamp))
-            # Protocol packet.
-            elif (hdr & 0x3) == 0:
-                c = (hdr >> 7) & 0x1
-                d = (hdr >> 4) & 0b111
-                # Local timestamp.
-                if (hdr & 0xf) == 0 and d not in (0x0, 0x3):
-                    ts = 0
-                    tc = 0
-                    # Local timestamp packet format 1.
-                    if c == 1:
-                        tc = (hdr >> 4) & 0x3
-                        while c == 1:
-                            byte = yield
-                            ts = (ts << 7) | (byte & 0x7f)
-                            c = (byte >> 7) & 0x1
-                    # Local timestamp packet format 2.
-                    else:
-                        ts = (hdr >> 4) & 0x7
-                    timestamp += ts
-                    self._send_event(events.TraceTimestamp(tc, timestamp))
-                # Global timestamp.
-                elif hdr in (0b10010100, 0b10110100):
-                    # TODO handle global timestamp
-                    # t = (hdr >> 5) & 0x1
-                    pass
-                # Extension.
-                elif (hdr & 0x8) == 0x8:
-                    sh = (hdr >> 2) & 0x1
-                    if c == 0:
-                        ex = (hdr >> 4) & 0x7
-                    else:
-                        ex = 0
-                        while c == 1:
-                            byte = yield
-                            ex = (ex << 7) | (byte & 0x7f)
-                            c = (byte >> 7) & 0x1
-                    if sh == 0:
-                        # Extension packet with sh==0 sets ITM stimulus page.
-                        self._itm_page = ex
-                    else:
-                        #self._send_event(events.TraceEvent("Extension: SH={:d} EX={:#x}\n".format(sh, ex), timestamp))
-                        invalid = True
-                # Reserved packet.
-                else:
-                    invalid = True
-            # Source packet.
-            else:
-                ss = hdr & 0x3
-                l = 1 << (ss - 1)
-                a = (hdr >> 3) & 0x1f
-                if l == 1:
-                    payload = yield
-                elif l == 2:
-                    byte1 = yield
-                    byte2 = yield
-                    payload = (byte1 |
-                                (byte2 << 8))
-                else:
-                    byte1 = yield
-                    byte2 = yield
-                    byte3 = yield
-                    byte4 = yield
-                    payload = (byte1 |
-                                (byte2 << 8) |
-                                (byte3 << 16) |
-                                (byte4 << 24))
-
-                # Instrumentation packet.
-                if (hdr & 0x4) == 0:
-                    port = (self._itm_page * 32) + a
-                    self._send_event(events.TraceITMEvent(port, payload, l, timestamp))
-                # Hardware source packets...
-                # Event counter
-                elif a == 0:
-                    self._send_event(events.TraceEventCounter(payload, timestamp))
-                # Exception trace
-                elif a == 1:
-                    exception_number = payload & 0x1ff
-                    # TODO remove exception name and dependency on core
-                    exception_name = self._core.exception_number_to_name(exception_number)
-                    fn = (payload >> 12) & 0x3
-                    if 1 <= fn <= 3:
-                        self._send_event(events.TraceExceptionEvent(
-                                exception_number, exception_name, fn, timestamp))
-                    else:
-                        invalid = True
-                # Periodic PC
-                elif a == 2:
-                    # A payload of 0 indicates a period PC sleep event.
-                    self._send_event(events.TracePeriodicPC(payload, timestamp))
-                # Data trace
-                elif 8 <= a <= 23:
-                    type = (hdr >> 6) & 0x3
-                    cmpn = (hdr >> 4) & 0x3
-                    bit3 = (hdr >> 3) & 0x1
-                    # PC value
-                    if type == 0b01 and bit3 == 0:
-                        self._send_event(events.TraceDataTraceEvent(cmpn=cmpn, pc=payload, ts=timestamp))
-                    # Address
-                    elif type == 0b01 and bit3 == 1:
-                        self._send_event(events.TraceDataTraceEvent(cmpn=cmpn, addr=payload, ts=timestamp))
-                    # Data value
-                    elif type == 0b10:
-                        self._send_event(events.TraceDataTraceEvent(
-                                cmpn=cmpn, value=payload, rnw=(bit3 == 0), sz=l, ts=timestamp))
-                    else:
-                        invalid = True
-                # Invalid DWT 'a' value.
-                else:
-                    invalid = True
+        rows = self._pending_rows
+        self._pending_rows = []
+        if self._sink is None or not rows:
+            return
+        self._ready_rows.extend(rows)
+        if timestamp is not None:
+            self._ready_timestamps.extend([timestamp] * len(rows))
+        else:
+            self._ready_timestamps.extend(row[1] for row in rows)
 
+    def _send_events(self) -> None:
+        """@brief Send ready events to the event sink as a batch or TraceEventBlock."""
+        rows = self._ready_rows
+        timestamps = self._ready_timestamps
+        self._ready_rows = []
+        self._ready_timestamps = []
+        self._events_parsed += len(rows)
+        assert self._sink is not None
+        if self._columnar:
+            self._sink.receive_block(self._build_block(rows, timestamps))
+        else:
+            self._sink.receive_batch(self._build_events(rows, timestamps))
 
+    def _build_events(self, rows: List[_EventRow], timestamps: List[int]) -> List[events.TraceEvent]:
+        """@brief Convert event rows to event objects."""
+        result: List[events.TraceEvent] = []
+        for (kind, _, port, value, size, obj), ts in zip(rows, timestamps):
+            if kind == _ITM:
+                result.append(events.TraceITMEvent(port, value, size, ts))
+            elif kind == _PERIODIC_PC:
+                result.append(events.TracePeriodicPC(value, ts))
+            elif kind == _EVENT_COUNTER:
+                result.append(events.TraceEventCounter(value, ts))
+            elif kind == _EXCEPTION:
+                # TODO remove exception name and dependency on core
+                result.append(events.TraceExceptionEvent(
+                        port, self._core.exception_number_to_name(port), size, ts))
+            elif kind == _OVERFLOW:
+                result.append(events.TraceOverflow(ts))
+            else:
+                assert obj is not None
+                obj.timestamp = ts
+                result.append(obj)
+        return result
 
+    def _build_block(self, rows: List[_EventRow], timestamps: List[int]) -> events.TraceEventBlock:
+        """@brief Convert event rows to a TraceEventBlock."""
+        block = events.TraceEventBlock(self._core.exception_number_to_name)
+        kinds, _, ports, values, sizes, objs = zip(*rows)
+        block.kinds.extend(kinds)
+        block.timestamps.extend(timestamps)
+        block.ports.extend(ports)
+        block.values.extend(values)
+        block.sizes.extend(sizes)
+        if _DATA_TRACE in block.kinds:
+            for obj, ts in zip(objs, timestamps):
+                if obj is not None:
+                    obj.timestamp = ts
+                    block.data_trace.append(obj)
+        return block
@@ -18,10 +18,11 @@
 
 import logging
 import threading
-from time import sleep
-from typing import (Optional, TextIO, TYPE_CHECKING)
+from time import (monotonic, sleep)
+from typing import (Optional, Sequence, TextIO, Tuple, TYPE_CHECKING)
 
-from .sink import TraceEventSink
+from .capture import SWOCaptureWriter
+from .sink import (TraceEventSink, TraceEventTee)
 from .events import (TraceEvent, TraceITMEvent)
 from .swo import SWOParser
 from ..coresight.itm import ITM
@@ -29,6 +30,7 @@ from ..coresight.tpiu import TPIU
 from ..core.target import Target
 from ..core import exceptions
 from ..probe.debug_probe import DebugProbe
+from ..utility.ring_buffer import RingBuffer
 from ..utility.server import StreamServer
 
 if TYPE_CHECKING:
@@ -72,8 +74,81 @@ class SWVEventSink(TraceEventSink):
 
         self._console.write(data)
 
+    def receive_batch(self, events: Sequence[TraceEvent]) -> None:
+        """@brief Handle a batch of SWV trace events.
+
+        The text from all ITM events in the batch is written to the console at once.
+
+        @param self
+        @param events Sequence of TraceEvent instances.
+        """
+        chars = []
+        for event in events:
+            if not isinstance(event, TraceITMEvent):
+                continue
+            width = event.width
+            if width not in (1, 2, 4):
+                continue
+            data = event.data
+            for _ in range(width):
+                chars.append(chr(data & 0xff))
+                data >>= 8
+        if chars:
+            self._console.write(''.join(chars))
+
+class TraceStageStatistics:
+    """@brief Throughput and loss counters for one stage of the SWV pipeline.
+
+    Counters are updated only by the thread running the stage, so no locking is required to read
+    them for reporting.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.bytes = 0
+        self.events = 0
+        self.drops = 0
+        self._start = monotonic()
+        self._stop: Optional[float] = None
+
+    def stop(self) -> None:
+        """@brief Freeze the elapsed time used to compute rates."""
+        self._stop = monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        """@brief Seconds the stage has been running."""
+        end = self._stop if (self._stop is not None) else monotonic()
+        return max(end - self._start, 1e-9)
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.elapsed
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.elapsed
+
+    def __str__(self) -> str:
+        return "{}: {} bytes ({:.0f} B/s), {} events ({:.0f} events/s), {} bytes dropped".format(
+                self.name, self.bytes, self.bytes_per_second, self.events, self.events_per_second,
+                self.drops)
+
 class SWVReader(threading.Thread):
-    """@brief Sets up SWV and processes data in a background thread."""
+    """@brief Sets up SWV and processes data in background threads.
+
+    The SWVReader thread reads SWO data from the probe and writes it into a bounded RingBuffer. A
+    second thread reads data from the ring buffer and passes it to the SWOParser, so probe reads
+    are not delayed by parsing or by slow event sinks. If the parser falls behind and the ring
+    buffer fills, the reader thread waits briefly for room before dropping data. Dropped data is
+    counted in the statistics of the probe stage.
+    """
+
+    ## Maximum time in seconds the reader thread waits for room in a full ring buffer.
+    BACKPRESSURE_TIMEOUT = 0.1
+
+    ## Time in seconds the parser thread waits for data before checking for shutdown.
+    PARSER_POLL_TIMEOUT = 0.1
 
     def __init__(self, session: "Session", core_number: int = 0, lock: Optional[threading.Lock] = None) -> None:
         """@brief Constructor.
@@ -87,6 +162,11 @@ class SWVReader(threading.Thread):
         self._shutdown_event = threading.Event()
         self._swo_clock = 0
         self._lock = lock
+        self._buffer = RingBuffer(self._session.options.get('swv_buffer_size'))
+        self._parser_thread: Optional[threading.Thread] = None
+        self._capture: Optional[SWOCaptureWriter] = None
+        self._probe_stats = TraceStageStatistics("probe")
+        self._parser_stats = TraceStageStatistics("parser")
 
         target = self._session.target
         assert target
@@ -95,13 +175,24 @@ class SWVReader(threading.Thread):
 
         self._session.subscribe(self._reset_handler, Target.Event.POST_RESET, self._core)
 
-    def init(self, sys_clock: int, swo_clock: int, console: TextIO) -> bool:
+    @property
+    def statistics(self) -> Tuple[TraceStageStatistics, TraceStageStatistics]:
+        """@brief Statistics for the probe reader and parser stages, in that order.
+
+        The probe stage counts bytes read from the probe and bytes dropped because the ring buffer
+        was full. The parser stage counts bytes parsed and trace events generated.
+        """
+        return (self._probe_stats, self._parser_stats)
+
+    def init(self, sys_clock: int, swo_clock: int, console: Optional[TextIO],
+            sink: Optional[TraceEventSink] = None) -> bool:
         """@brief Configures trace graph and starts thread.
 
         This method performs all steps required to start up SWV. It first calls the target's
         trace_start() method, which allows for target-specific trace initialization. Then it
         configures the TPIU and ITM modules. A simple trace data processing graph is created that
-        connects an SWVEventSink with a SWOParser. Finally, the reader thread is started.
+        connects an SWVEventSink, or the provided sink, with a SWOParser. Finally, the reader thread
+        is started.
 
         If the debug probe or target do not support SWO, a warning is printed and False returns,
         but nothing else is done (no exception raised).
@@ -109,7 +200,10 @@ class SWVReader(threading.Thread):
         @param self
         @param sys_clock System clock frequency in Hertz, from which the SWO clock is derived.
         @param swo_clock Desired SWO output frequency in Hertz.
-        @param console File-like object to which SWV data will be written.
+        @param console File-like object to which SWV data will be written. Not used if _sink_ is
+            provided.
+        @param sink Optional trace event sink that receives the decoded events instead of an
+            SWVEventSink writing to _console_.
 
         @return Boolean indicating whether the SWV reader was successfully started.
         """
@@ -142,8 +236,23 @@ class SWVReader(threading.Thread):
             return False
 
         self._parser = SWOParser(self._core)
-        self._sink = SWVEventSink(console)
-        self._parser.connect(self._sink)
+        if sink is not None:
+            self._sink = sink
+        else:
+            assert console is not None
+            self._sink = SWVEventSink(console)
+
+        # If capture is enabled, record the decoded events along with the console output.
+        capture_path = self._session.options.get('swv_capture_file')
+        if capture_path:
+            self._capture = SWOCaptureWriter(capture_path,
+                    compress=self._session.options.get('swv_capture_compress'))
+            LOG.info("Recording SWO capture to %s", capture_path)
+            tee = TraceEventTee()
+            tee.connect([self._sink, self._capture])
+            self._parser.connect(tee)
+        else:
+            self._parser.connect(self._sink)
 
         self.start()
 
@@ -174,8 +283,8 @@ class SWVReader(threading.Thread):
         """@brief SWV reader thread routine.
 
         Starts the probe receiving SWO data by calling DebugProbe.swo_start(). For as long as the
-        thread runs, it reads SWO data from the probe and passes it to the SWO parser created in
-        init(). When the thread is signaled to stop, it calls DebugProbe.swo_stop() before exiting.
+        thread runs, it reads SWO data from the probe, records it to the capture file if capture
+        is enabled, and writes it to the ring buffer consumed by the parser thread. When the thread is signaled to stop, it calls DebugProbe.swo_stop() before exiting.
         """
         assert self._session.probe
 
@@ -196,22 +305,35 @@ class SWVReader(threading.Thread):
             pass
         self._session.probe.swo_start(self._swo_clock)
 
+        self._parser_thread = threading.Thread(target=self._parse_data, name="SWVParser", daemon=True)
+        self._parser_thread.start()
+
         while not self._shutdown_event.is_set():
             data = self._session.probe.swo_read()
-            if data:
-                if swv_raw_server:
-                    swv_raw_server.write(data)
-                self._parser.parse(data)
 
             if self._lock:
                 self._lock.release()
 
+            if data:
+                if swv_raw_server:
+                    swv_raw_server.write(data)
+                # Record the raw data before it enters the ring buffer, so the capture is complete
+                # even if the parser falls behind and data is dropped.
+                if self._capture is not None:
+                    self._capture.write_raw(data)
+                self._probe_stats.bytes += len(data)
+                accepted = self._buffer.write(data, timeout=self.BACKPRESSURE_TIMEOUT)
+                if accepted < len(data):
+                    self._probe_stats.drops += len(data) - accepted
+                    LOG.debug("SWV buffer overflow, dropped %d bytes", len(data) - accepted)
+
             sleep(0.001)
 
             if self._lock:
                 self._lock.acquire()
 
         self._session.probe.swo_stop()
+        self._probe_stats.stop()
 
         if swv_raw_server:
             swv_raw_server.stop()
@@ -219,6 +341,32 @@ class SWVReader(threading.Thread):
         if self._lock:
             self._lock.release()
 
+        # Let the parser thread process the remaining buffered data and exit.
+        self._buffer.close()
+        self._parser_thread.join()
+        if self._capture is not None:
+            self._capture.close()
+
+        for stats in self.statistics:
+            LOG.debug("SWV %s", stats)
+
+    def _parse_data(self) -> None:
+        """@brief SWV parser thread routine.
+
+        Reads SWO data from the ring buffer and passes it to the SWO parser until the ring buffer
+        is closed and empty.
+        """
+        while True:
+            data = self._buffer.read(timeout=self.PARSER_POLL_TIMEOUT)
+            if data:
+                events_before = self._parser.events_parsed
+                self._parser.parse(data)
+                self._parser_stats.bytes += len(data)
+                self._parser_stats.events += self._parser.events_parsed - events_before
+            elif self._buffer.is_closed:
+                break
+        self._parser_stats.stop()
+
     def _reset_handler(self, notification: "Notification") -> None:
         """@brief Reset notification handler.
 
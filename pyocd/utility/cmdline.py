@@ -15,6 +15,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import argparse
 import logging
 from typing import (Any, Callable, Dict, Iterable, List, Optional, Tuple, Union, cast)
 
@@ -295,6 +296,17 @@ def int_base_0(x: str) -> int:
     return int(x, base=0)
 
 
+def positive_int(x: str) -> int:
+    """@brief Argparse type converter for an integer argument that must be at least 1."""
+    try:
+        value = int(x)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer value: '{x}'")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}")
+    return value
+
+
 def flatten_args(args: Iterable[Iterable[Any]]) -> List[Any]:
     """@brief Converts a list of lists to a single list."""
     return [item for sublist in args for item in sublist]
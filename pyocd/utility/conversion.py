@@ -17,7 +17,7 @@
 
 import struct
 import binascii
-from typing import (Any, Iterator, List, Sequence, Tuple, cast)
+from typing import (Any, Iterator, List, Sequence, Tuple, Union, cast)
 
 from .mask import align_up
 
@@ -53,18 +53,39 @@ def nbit_le_list_to_byte_list(data: Sequence[int], bitwidth: int) -> List[int]:
     """
     return [(x >> shift) & 0xff for x in data for shift in range(0, bitwidth, 8)]
 
+## Types that support the buffer protocol and are handled without conversion to a list.
+BYTES_TYPES = (bytes, bytearray, memoryview)
+
+def as_byte_view(data: Union[bytes, bytearray, memoryview, Sequence[int]]) -> memoryview:
+    """@brief Return a read-only memoryview of unsigned bytes for the given data.
+
+    Slicing the returned view does not copy the data, so a single buffer can be passed through
+    several layers as slices. bytes and memoryview objects are used as is. Anything else, including
+    bytearrays and lists of byte values, is first copied once to a bytes object so that later
+    changes to the caller's buffer do not affect the view.
+    """
+    if isinstance(data, memoryview):
+        return data.cast('B') if (data.format != 'B') else data
+    if not isinstance(data, bytes):
+        data = bytes(data)
+    return memoryview(data)
+
 def byte_list_to_u32le_list(data: Sequence[int], pad: int = 0x00) -> List[int]:
     """@brief Convert a list of bytes to a list of 32-bit integers (little endian)
 
     If the length of the data list is not a multiple of 4, then the pad value is used
     for the additional required bytes.
     """
-    res = []
-    for i in range(len(data) // 4):
-        res.append(data[i * 4 + 0] |
-                   data[i * 4 + 1] << 8 |
-                   data[i * 4 + 2] << 16 |
-                   data[i * 4 + 3] << 24)
+    count = len(data) // 4
+    if isinstance(data, BYTES_TYPES):
+        res = list(struct.unpack_from("<%dI" % count, data))
+    else:
+        res = []
+        for i in range(count):
+            res.append(data[i * 4 + 0] |
+                       data[i * 4 + 1] << 8 |
+                       data[i * 4 + 2] << 16 |
+                       data[i * 4 + 3] << 24)
     remainder = (len(data) % 4)
     if remainder != 0:
         pad_count = 4 - remainder
@@ -73,13 +94,11 @@ def byte_list_to_u32le_list(data: Sequence[int], pad: int = 0x00) -> List[int]:
 
 def u32le_list_to_byte_list(data: Sequence[int]) -> List[int]:
     """@brief Convert a word array into a byte array"""
-    res = []
-    for x in data:
-        res.append((x >> 0) & 0xff)
-        res.append((x >> 8) & 0xff)
-        res.append((x >> 16) & 0xff)
-        res.append((x >> 24) & 0xff)
-    return res
+    try:
+        return list(struct.pack("<%dI" % len(data), *data))
+    except struct.error:
+        # Values out of range are masked to 32 bits.
+        return list(struct.pack("<%dI" % len(data), *(x & 0xffffffff for x in data)))
 
 def u16le_list_to_byte_list(data: Sequence[int]) -> List[int]:
     """@brief Convert a halfword array into a byte array"""
@@ -0,0 +1,136 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from time import monotonic
+from typing import (Optional, Union)
+
+class RingBuffer:
+    """@brief Bounded byte FIFO for passing data between a producer and a consumer thread.
+
+    The buffer has a fixed capacity. If a write does not fit, the writer waits up to the timeout
+    passed to write() for the reader to make room. This back-pressure slows down the producer
+    instead of losing data. Data that still does not fit after the timeout is dropped, and
+    counted by the #dropped property.
+
+    Once close() is called, writes are ignored and reads return the remaining data followed by
+    an empty bytes object.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """@brief Constructor.
+        @param self
+        @param capacity Maximum number of bytes held in the buffer.
+        """
+        assert capacity > 0
+        self._buffer = bytearray(capacity)
+        self._capacity = capacity
+        self._head = 0 # Offset of the oldest byte.
+        self._count = 0
+        self._dropped = 0
+        self._high_water = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def capacity(self) -> int:
+        """@brief Maximum number of bytes held in the buffer."""
+        return self._capacity
+
+    @property
+    def dropped(self) -> int:
+        """@brief Total number of bytes that were dropped because the buffer was full."""
+        return self._dropped
+
+    @property
+    def high_water(self) -> int:
+        """@brief The largest number of bytes held in the buffer at once."""
+        return self._high_water
+
+    @property
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        return self._count
+
+    def write(self, data: Union[bytes, bytearray, memoryview], timeout: float = 0.0) -> int:
+        """@brief Add data to the buffer.
+
+        @param self
+        @param data Bytes-like object with the data to add.
+        @param timeout Maximum time in seconds to wait for the reader to make room for all of _data_.
+        @return The number of bytes added to the buffer. The rest of _data_ was dropped.
+        """
+        size = len(data)
+        with self._cond:
+            if self._closed:
+                return 0
+            if size > self._capacity - self._count and timeout > 0:
+                deadline = monotonic() + timeout
+                while size > self._capacity - self._count and not self._closed:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._closed:
+                    return 0
+
+            accepted = min(size, self._capacity - self._count)
+            if accepted:
+                tail = (self._head + self._count) % self._capacity
+                first = min(accepted, self._capacity - tail)
+                self._buffer[tail:tail + first] = data[:first]
+                if first < accepted:
+                    self._buffer[:accepted - first] = data[first:accepted]
+                self._count += accepted
+                self._high_water = max(self._high_water, self._count)
+                self._cond.notify_all()
+            self._dropped += size - accepted
+            return accepted
+
+    def read(self, max_size: Optional[int] = None, timeout: Optional[float] = None) -> bytes:
+        """@brief Remove data from the buffer.
+
+        Waits until data is available, the timeout passes, or the buffer is closed.
+
+        @param self
+        @param max_size Maximum number of bytes to return. If None, all buffered data is returned.
+        @param timeout Maximum time in seconds to wait for data. None means wait forever.
+        @return Bytes object that is empty if no data was available.
+        """
+        with self._cond:
+            if not self._count and not self._closed:
+                self._cond.wait_for(lambda: self._count or self._closed, timeout)
+
+            size = self._count if (max_size is None) else min(max_size, self._count)
+            if not size:
+                return b''
+            end = self._head + size
+            if end <= self._capacity:
+                result = bytes(self._buffer[self._head:end])
+            else:
+                result = bytes(self._buffer[self._head:]) + bytes(self._buffer[:end - self._capacity])
+            self._head = end % self._capacity
+            self._count -= size
+            self._cond.notify_all()
+            return result
+
+    def close(self) -> None:
+        """@brief Stop accepting data and wake up any waiting reader or writer."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
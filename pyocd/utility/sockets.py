@@ -94,6 +94,7 @@ class ClientSocket(object):
 
     def connect(self):
         self._socket = socket.create_connection(self._address, self._timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
     def close(self):
         if self._socket is not None:
@@ -141,3 +142,22 @@ class ClientSocket(object):
                 else:
                     break
             self._buffer += data
+
+    def read_exact(self, size):
+        """@brief Read exactly _size_ bytes.
+
+        Any data buffered by readline() is returned first.
+
+        @exception ConnectionError The connection was closed before enough data was received.
+        """
+        while len(self._buffer) < size:
+            try:
+                data = self.read(max(self._packet_size, size - len(self._buffer)))
+            except socket.timeout:
+                continue
+            if not data:
+                raise ConnectionError("connection closed by peer")
+            self._buffer += data
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
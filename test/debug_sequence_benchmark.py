@@ -0,0 +1,72 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import argparse
+from time import perf_counter
+
+from pyocd.core.session import Session
+from pyocd.debug.sequences.sequences import (Block, DebugSequence, DebugSequenceExecutionContext, WhileControl)
+
+from unit.test_debug_sequences import (
+    AND_OR_EXPRS,
+    CMP_EXPRS,
+    INT_EXPRS,
+    LONGER_EXPRS,
+    PRECEDENCE_EXPRS,
+    TERNARY_EXPRS,
+    UNARY_OP_EXPRS,
+    MockProbe,
+    SequenceDelegateForTesting,
+    )
+
+def build_sequence(loops):
+    """@brief Build a sequence that evaluates the unit test corpora and then polls in a while loop."""
+    corpus = UNARY_OP_EXPRS + INT_EXPRS + CMP_EXPRS + AND_OR_EXPRS + PRECEDENCE_EXPRS + LONGER_EXPRS \
+            + TERNARY_EXPRS
+    seq = DebugSequence('benchmark')
+    seq.add_child(Block("\n".join("__var v%d = %s;" % (i, expr) for i, (expr, _) in enumerate(corpus))))
+    seq.add_child(Block("__var n = 0; __var acc = 0;"))
+    loop = WhileControl("n < %d" % loops)
+    loop.add_child(Block("acc = (acc + (n << 2) * 3) & 0xffff; n += 1; acc ^= n > 5 ? n : 0;"))
+    seq.add_child(loop)
+    return seq
+
+def main():
+    parser = argparse.ArgumentParser(description='Debug sequence execution benchmark')
+    parser.add_argument('-n', '--count', type=int, default=200, help="Number of sequence executions.")
+    parser.add_argument('-l', '--loops', type=int, default=20, help="Iterations of the while loop.")
+    args = parser.parse_args()
+
+    session = Session(None)
+    setattr(session, '_probe', MockProbe())
+    context = DebugSequenceExecutionContext(session, SequenceDelegateForTesting(), pname=None)
+    seq = build_sequence(args.loops)
+
+    start = perf_counter()
+    seq.execute(context)
+    first = perf_counter() - start
+
+    start = perf_counter()
+    for _ in range(args.count):
+        seq.execute(context)
+    elapsed = perf_counter() - start
+
+    print("First execution:       %.3f ms" % (first * 1000))
+    print("Subsequent executions: %.3f ms" % (elapsed / args.count * 1000))
+
+if __name__ == "__main__":
+    main()
@@ -59,6 +59,9 @@ class FlashTestResult(TestResult):
         self.analyze = None
         self.analyze_rate = None
         self.chip_erase_rate = None
+        self.page_erase_cpu_time = None
+        self.page_erase_same_cpu_time = None
+        self.cpu_time_byte_count = None
 
 class FlashTest(Test):
     def __init__(self):
@@ -110,6 +113,24 @@ class FlashTest(Test):
                   file=output_file)
         print("", file=output_file)
 
+        print("\n\n------ Host CPU Time ------", file=output_file)
+        print(rate_format_str.format("Target", "Size", "Page Erase", "Page Erase (Same data)"),
+              file=output_file)
+        print("", file=output_file)
+        for result in result_list:
+            if result.board is None:
+                continue
+            if result.passed and result.page_erase_cpu_time is not None \
+                    and result.page_erase_same_cpu_time is not None:
+                size = "%d KB" % (result.cpu_time_byte_count // 1024)
+                page_erase_cpu = "%.3f s" % result.page_erase_cpu_time
+                page_erase_same_cpu = "%.3f s" % result.page_erase_same_cpu_time
+            else:
+                size = page_erase_cpu = page_erase_same_cpu = "Fail"
+            print(rate_format_str.format(result.board, size, page_erase_cpu, page_erase_same_cpu),
+                  file=output_file)
+        print("", file=output_file)
+
     def run(self, board):
         try:
             result = self.test_function(board.unique_id)
@@ -241,6 +262,8 @@ def flash_test(board_id):
                 print("TEST PASSED")
                 test_pass_count += 1
                 result.page_erase_rate = float(len(new_data)) / float(info.program_time)
+                result.page_erase_cpu_time = info.host_cpu_time
+                result.cpu_time_byte_count = len(new_data)
             else:
                 print("TEST FAILED")
             test_count += 1
@@ -380,6 +403,7 @@ def flash_test(board_id):
                 print("TEST PASSED")
                 test_pass_count += 1
                 result.page_erase_rate_same = float(len(new_data)) / float(info.program_time)
+                result.page_erase_same_cpu_time = info.host_cpu_time
                 result.analyze = info.analyze_type
                 result.analyze_time = info.analyze_time
                 result.analyze_rate = float(len(new_data)) / float(info.analyze_time)
@@ -0,0 +1,151 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import threading
+from time import perf_counter
+
+from pyocd.gdbserver.gdbserver import (escape, unescape)
+from pyocd.gdbserver.packet_io import (checksum, GDBServerPacketIOThread)
+
+def legacy_unescape(data):
+    """@brief The previous unescape(), which pops escape characters from a list."""
+    data_idx = 0
+    result = list(data)
+    while data_idx < len(result):
+        if result[data_idx] == 0x7d:
+            result.pop(data_idx)
+            result[data_idx] = result[data_idx] ^ 0x20
+        data_idx += 1
+    return result
+
+def legacy_escape(data):
+    """@brief The previous escape(), which builds a list one byte at a time."""
+    result = []
+    for c in data:
+        if c in b'#$}*':
+            result += [0x7d, c ^ 0x20]
+        else:
+            result.append(c)
+    return bytes(result)
+
+class LegacyFramer:
+    """@brief The previous framing loop, which re-slices and rescans the buffer for every read."""
+
+    def __init__(self):
+        self.buffer = b''
+        self.packets = []
+
+    def process(self):
+        while len(self.buffer):
+            try:
+                pkt_begin = self.buffer.index(b"$")
+                pkt_end = self.buffer.index(b"#") + 2
+                if pkt_begin >= 0 and pkt_end < len(self.buffer):
+                    pkt = self.buffer[pkt_begin:pkt_end + 1]
+                    self.buffer = self.buffer[pkt_end + 1:]
+                    data, cksum = pkt[1:].split(b'#')
+                    if checksum(data).lower() == cksum.lower():
+                        self.packets.append(pkt)
+                else:
+                    break
+            except ValueError:
+                break
+
+class NullSocket:
+    port = 0
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def set_timeout(self, timeout):
+        pass
+
+    def read(self):
+        self.closed.wait()
+        return b""
+
+    def write(self, data):
+        return len(data)
+
+def make_packets(size, count, escape_fraction):
+    """@brief Build _count_ X packets each carrying _size_ bytes of data before escaping."""
+    packets = []
+    for _ in range(count):
+        data = bytearray(os.urandom(size))
+        for i in range(0, size, max(1, int(1 / escape_fraction)) if escape_fraction else size + 1):
+            data[i] = ord('}')
+        payload = b"X20000000,%x:" % size + escape(data)
+        packets.append((bytes(data), b"$" + payload + b"#" + checksum(payload)))
+    return packets
+
+def timed(fn, *args):
+    start = perf_counter()
+    fn(*args)
+    return perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='GDB remote serial protocol packet benchmark')
+    parser.add_argument('-s', '--size', type=int, default=64 * 1024, help="Packet data size in bytes.")
+    parser.add_argument('-n', '--count', type=int, default=16, help="Number of packets.")
+    parser.add_argument('-r', '--read-size', type=int, default=2048,
+            help="Size of each socket read the packets arrive in.")
+    args = parser.parse_args()
+
+    format_str = "{:<24}{:>12}{:>12}{:>10}"
+    for escape_fraction in (0.0, 0.01, 0.5):
+        packets = make_packets(args.size, args.count, escape_fraction)
+        stream = b"".join(packet for _, packet in packets)
+        escaped = [packet[packet.index(b":") + 1:-3] for _, packet in packets]
+        raw = [data for data, _ in packets]
+
+        sock = NullSocket()
+        packet_io = GDBServerPacketIOThread(sock)
+        packet_io.send_acks = False
+
+        chunks = [stream[i:i + args.read_size] for i in range(0, len(stream), args.read_size)]
+
+        def old_framing():
+            framer = LegacyFramer()
+            for chunk in chunks:
+                framer.buffer += chunk
+                framer.process()
+
+        def new_framing():
+            for chunk in chunks:
+                packet_io._buffer += chunk
+                packet_io._process_data()
+
+        print("{} x {} byte packets in {} byte reads, {:.0%} escaped bytes".format(
+                args.count, args.size, args.read_size, escape_fraction))
+        print(format_str.format("Operation", "Old (ms)", "New (ms)", "Speedup"))
+        for name, old, new in (
+                ("framing", old_framing, new_framing),
+                ("escape", lambda: [legacy_escape(d) for d in raw], lambda: [escape(d) for d in raw]),
+                ("unescape", lambda: [legacy_unescape(d) for d in escaped], lambda: [unescape(d) for d in escaped]),
+                ):
+            old_time = timed(old)
+            new_time = timed(new)
+            print(format_str.format(name, "%.2f" % (old_time * 1000), "%.2f" % (new_time * 1000),
+                    "%.1fx" % (old_time / new_time)))
+        print()
+
+        sock.closed.set()
+        packet_io.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""@brief Compare gdb memory dump and load throughput for different RSP packet sizes.
+
+For each packet size, a gdbserver is started for the board and gdb is run in batch mode to dump the
+default RAM region to a file and to load the board's test binary into boot memory. gdb prints a
+timestamp between commands, so gdb startup and connection time are excluded.
+
+Requires a gdb with Python support, arm-none-eabi-gdb-py by default, and objcopy.
+"""
+
+import argparse
+import os
+import subprocess
+import tempfile
+import threading
+
+from pyocd.__main__ import PyOCDTool
+from pyocd.core.helpers import ConnectHelper
+from pyocd.core.memory_map import MemoryType
+from test_util import (
+    binary_to_elf_file,
+    get_session_options,
+    get_test_binary_path,
+    )
+
+TIMESTAMP = "python import time; print('TIMESTAMP', time.perf_counter())"
+
+def run_gdb(gdb, port, dump_path, ram_region, elf_path):
+    """@brief Run the gdb commands and return the dump and load times in seconds."""
+    commands = [
+        "set pagination off",
+        "target remote localhost:%d" % port,
+        "monitor halt",
+        TIMESTAMP,
+        "dump binary memory %s 0x%x 0x%x" % (dump_path, ram_region.start, ram_region.end + 1),
+        TIMESTAMP,
+        "load %s" % elf_path,
+        TIMESTAMP,
+        "kill",
+        ]
+    args = [gdb, "--nh", "--batch"]
+    for command in commands:
+        args += ["-ex", command]
+    output = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=True,
+            universal_newlines=True).stdout
+    times = [float(line.split()[1]) for line in output.splitlines() if line.startswith('TIMESTAMP')]
+    if len(times) != 3:
+        raise RuntimeError("unexpected gdb output:\n" + output)
+    return times[1] - times[0], times[2] - times[1]
+
+def main():
+    parser = argparse.ArgumentParser(description='gdb throughput benchmark')
+    parser.add_argument('-u', '--uid', help="Debug probe unique ID.")
+    parser.add_argument('--gdb', default="arm-none-eabi-gdb-py", help="gdb executable.")
+    parser.add_argument('-p', '--port', type=int, default=3333, help="gdbserver port.")
+    parser.add_argument('sizes', nargs='*', default=["2048", "auto"],
+            help="Packet sizes to compare, or 'auto' to let the gdbserver choose.")
+    args = parser.parse_args()
+
+    with ConnectHelper.session_with_chosen_probe(unique_id=args.uid, **get_session_options()) as session:
+        uid = session.probe.unique_id
+        memory_map = session.target.get_memory_map()
+        ram_region = memory_map.get_default_region_of_type(MemoryType.RAM)
+        rom_region = memory_map.get_boot_memory()
+        binary_file = get_test_binary_path(session.board.test_binary)
+    elf_path = binary_to_elf_file(binary_file, rom_region.start)
+    load_size = os.path.getsize(binary_file)
+
+    format_str = "{:<12}{:>14}{:>14}"
+    print("RAM dump: {} bytes; load: {} bytes".format(ram_region.length, load_size))
+    print(format_str.format("Packet size", "Dump (kB/s)", "Load (kB/s)"))
+    try:
+        for size in args.sizes:
+            server_args = ['gdbserver', '--port=%d' % args.port, '--uid=%s' % uid, '--telnet-port=0']
+            if size != 'auto':
+                server_args += ['-O', 'gdbserver_packet_size=%s' % size]
+            server = PyOCDTool()
+            server_thread = threading.Thread(target=server.run, args=[server_args], daemon=True)
+            server_thread.start()
+
+            with tempfile.TemporaryDirectory() as temp_dir:
+                dump_time, load_time = run_gdb(args.gdb, args.port, os.path.join(temp_dir, "ram.bin"),
+                        ram_region, elf_path)
+            server_thread.join(timeout=10)
+
+            print(format_str.format(size, "%.1f" % (ram_region.length / dump_time / 1024),
+                    "%.1f" % (load_size / load_time / 1024)))
+    finally:
+        os.remove(elf_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import io
+import itertools
+import os
+import tracemalloc
+from time import perf_counter
+
+from intelhex import IntelHex
+
+from pyocd.flash.record_file import iter_ihex_segments
+
+def ranges(addresses):
+    """@brief Yield (start, end) tuples of the contiguous runs in a sorted list of byte addresses."""
+    for _, group in itertools.groupby(enumerate(addresses), lambda x: x[1] - x[0]):
+        group = list(group)
+        yield group[0][1], group[-1][1]
+
+def synthesize_hex(size, base=0x90000000):
+    """@brief Generate Intel HEX text for a contiguous image of _size_ bytes at _base_."""
+    ih = IntelHex()
+    ih.frombytes(os.urandom(size), offset=base)
+    out = io.StringIO()
+    ih.write_hex_file(out)
+    return out.getvalue()
+
+def parse_intelhex(text):
+    """@brief The previous FileProgrammer approach: IntelHex, a sorted address list, and int lists."""
+    hexfile = IntelHex(io.StringIO(text))
+    addresses = hexfile.addresses()
+    addresses.sort()
+    total = 0
+    for start, end in ranges(addresses):
+        total += len(list(hexfile.tobinarray(start=start, size=end - start + 1)))
+    return total
+
+def parse_streaming(text):
+    return sum(len(data) for _, data in iter_ihex_segments(io.StringIO(text)))
+
+def measure(fn, text):
+    tracemalloc.start()
+    start = perf_counter()
+    total = fn(text)
+    elapsed = perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, total
+
+def main():
+    parser = argparse.ArgumentParser(description='Intel HEX parsing benchmark')
+    parser.add_argument('files', nargs='*', help="Intel HEX files. If none are provided, one is synthesized.")
+    parser.add_argument('-s', '--size', type=int, default=4 * 1024 * 1024,
+            help="Size in bytes of the synthesized image.")
+    args = parser.parse_args()
+
+    files = []
+    for path in args.files:
+        with open(path, 'r') as f:
+            files.append((path, f.read()))
+    if not files:
+        files.append(("synthesized", synthesize_hex(args.size)))
+
+    format_str = "{:<12}{:>12}{:>12}{:>16}{:>10}"
+    for name, text in files:
+        print("{}: {} bytes of text".format(name, len(text)))
+        print(format_str.format("Parser", "Time (s)", "MB/s", "Peak memory", "Speedup"))
+        baseline = None
+        for label, fn in (("intelhex", parse_intelhex), ("streaming", parse_streaming)):
+            elapsed, peak, total = measure(fn, text)
+            if baseline is None:
+                baseline = elapsed
+            print(format_str.format(label, "%.3f" % elapsed, "%.2f" % (total / elapsed / 1e6),
+                    "%.1f MB" % (peak / 1e6), "%.1fx" % (baseline / elapsed)))
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -18,14 +18,22 @@ from __future__ import print_function
 
 import os
 import sys
-from time import (sleep, time)
+from time import (perf_counter, sleep, time)
 from random import randrange
 import traceback
 import argparse
 import logging
 
 from pyocd.core.helpers import ConnectHelper
+from pyocd.core.session import Session
+from pyocd.coresight.ap import (AccessPort, APv1Address)
+from pyocd.coresight.cortex_m import CortexM
+from pyocd.debug.cache import CachingDebugContext
+from pyocd.gdbserver.context_facade import GDBDebugContextFacade
+from pyocd.probe.cmsis_dap_probe import CMSISDAPProbe
 from pyocd.probe.pydapaccess import DAPAccess
+from pyocd.probe.pydapaccess.dap_access_cmsis_dap import DAPAccessCMSISDAP
+from pyocd.probe.pydapaccess.interface.simulator_backend import SimulatedCMSISDAPv2
 from pyocd.core.memory_map import MemoryType
 from pyocd.utility import conversion
 
@@ -232,13 +240,139 @@ def speed_test(board_id):
         result.passed = test_count == test_pass_count
         return result
 
+def simulated_speed_test(packet_size=512, packet_count=8, latency=0.0, test_size=256 * 1024, repeat=3,
+        pipelined=False):
+    """@brief Measure host-side probe stack throughput against a simulated CMSIS-DAP v2 probe.
+
+    The full DAPAccessCMSISDAP/CMSISDAPProbe/DebugPort/MEM_AP stack is used, so the results reflect
+    pyOCD's own overhead plus the configured per-packet latency. No hardware is required.
+
+    If _pipelined_ is True, the CMSIS-DAP backend's pipelined reads are enabled.
+
+    @return Dict of results: write and read speeds in B/s, packets/s, average transfers per packet, and
+        host-side overhead per packet in microseconds.
+    """
+    interface = SimulatedCMSISDAPv2(packet_size=packet_size, packet_count=packet_count, latency=latency)
+    probe = CMSISDAPProbe(DAPAccessCMSISDAP(None, interface=interface))
+    results = {}
+    with Session(probe, auto_open=False, no_config=True, target_override='cortex_m',
+            **{'warning.cortex_m_default': False, 'cmsis_dap.pipelined_reads': pipelined}) as session:
+        session.open(init_board=False)
+        try:
+            dp = session.target.dp
+            dp.connect()
+            ap = AccessPort.create(dp, APv1Address(0))
+
+            test_addr = SimulatedCMSISDAPv2.DEFAULT_REGIONS[1][0]
+            word_count = test_size // 4
+            data = [randrange(0, 0x100000000) for x in range(word_count)]
+
+            def measure(fn):
+                interface.stats.reset()
+                best = None
+                total = 0.0
+                for _ in range(repeat):
+                    start = perf_counter()
+                    fn()
+                    diff = perf_counter() - start
+                    total += diff
+                    best = diff if (best is None) else min(best, diff)
+                # Host overhead excludes the time the simulated probe spent processing commands.
+                stats = interface.stats
+                host_overhead = (total - stats.device_time) / max(stats.commands, 1)
+                return best, stats.commands / repeat, stats.transfers_per_packet, host_overhead
+
+            def write():
+                ap.write_memory_block32(test_addr, data)
+                dp.flush()
+
+            block = []
+            def read():
+                block[:] = ap.read_memory_block32(test_addr, word_count)
+
+            for name, fn in (("write", write), ("read", read)):
+                diff, packets, efficiency, host_overhead = measure(fn)
+                results[name + "_speed"] = test_size / diff
+                results[name + "_packets_per_second"] = packets / diff
+                results[name + "_transfers_per_packet"] = efficiency
+                results[name + "_host_us_per_packet"] = host_overhead * 1e6
+                print("Simulated block32 %s of %i bytes took %.3f s: %.3f kB/s, %.1f packets/s, %.1f transfers/packet, "
+                        "%.1f us host overhead/packet"
+                        % (name, test_size, diff, test_size / diff / 1000, packets / diff, efficiency,
+                            host_overhead * 1e6))
+
+            if block != data:
+                print("ERROR: simulated read data does not match written data")
+                results['passed'] = False
+            else:
+                results['passed'] = True
+        finally:
+            session.close()
+    return results
+
+def simulated_step_test(packet_size=512, packet_count=8, latency=0.0, steps=200, snapshot=False):
+    """@brief Measure gdb step latency against a simulated CMSIS-DAP v2 probe and Cortex-M core.
+
+    Each iteration performs the work of a gdb single step: the core is stepped, then the stop reply
+    registers and the full register context for a 'g' packet are read through a caching debug context.
+
+    If _snapshot_ is True, the register cache reads a snapshot of all registers on the first read after
+    each step.
+
+    @return Dict of results: average step latency in seconds and the average number of probe packets
+        per step.
+    """
+    interface = SimulatedCMSISDAPv2(packet_size=packet_size, packet_count=packet_count, latency=latency)
+    probe = CMSISDAPProbe(DAPAccessCMSISDAP(None, interface=interface))
+    results = {}
+    with Session(probe, auto_open=False, no_config=True, target_override='cortex_m',
+            **{'warning.cortex_m_default': False, 'cache.register_snapshot': snapshot}) as session:
+        session.open(init_board=False)
+        try:
+            dp = session.target.dp
+            dp.connect()
+            ap = AccessPort.create(dp, APv1Address(0))
+            core = CortexM(session, ap, session.target.memory_map)
+            core.init()
+            facade = GDBDebugContextFacade(CachingDebugContext(core))
+
+            interface.stats.reset()
+            start = perf_counter()
+            for _ in range(steps):
+                core.step()
+                facade.get_t_response()
+                facade.get_register_context()
+            diff = perf_counter() - start
+
+            results['step_latency'] = diff / steps
+            results['packets_per_step'] = interface.stats.commands / steps
+            print("Simulated gdb step + 'g' %s snapshot: %.3f ms/step, %.1f packets/step"
+                    % ("with" if snapshot else "without", diff / steps * 1000, interface.stats.commands / steps))
+            results['passed'] = core.read_core_register_raw('pc') == 2 * steps
+        finally:
+            session.close()
+    return results
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='pyOCD speed test')
     parser.add_argument('-d', '--debug', action="store_true", help='Enable debug logging')
     parser.add_argument("-da", "--daparg", dest="daparg", nargs='+', help="Send setting to DAPAccess layer.")
+    parser.add_argument('--simulate', action="store_true",
+            help="Benchmark the probe stack against a simulated CMSIS-DAP v2 probe instead of hardware.")
+    parser.add_argument('--packet-size', type=int, default=512, help="Simulated probe packet size.")
+    parser.add_argument('--packet-count', type=int, default=8, help="Simulated probe packet count.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Simulated per-packet latency in seconds.")
+    parser.add_argument('--pipelined', action="store_true", help="Enable pipelined reads for the simulated probe.")
     args = parser.parse_args()
     level = logging.DEBUG if args.debug else logging.INFO
     logging.basicConfig(level=level)
+    if args.simulate:
+        result = simulated_speed_test(args.packet_size, args.packet_count, args.latency, pipelined=args.pipelined)
+        passed = result['passed']
+        for snapshot in (False, True):
+            passed = simulated_step_test(args.packet_size, args.packet_count, args.latency,
+                    snapshot=snapshot)['passed'] and passed
+        sys.exit(0 if passed else 1)
     DAPAccess.set_args(args.daparg)
     session = ConnectHelper.session_with_chosen_probe(**get_session_options())
     test = SpeedTest()
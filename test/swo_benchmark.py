@@ -0,0 +1,108 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import random
+from time import perf_counter
+
+from pyocd.trace.sink import TraceEventSink
+from pyocd.trace.swo import SWOParser
+
+from unit.swo_reference import ReferenceSWOParser
+
+# Size of the buffers passed to the parser, similar to a probe's SWO read size.
+CHUNK_SIZE = 4096
+
+class NullCore:
+    def exception_number_to_name(self, exc_num):
+        return None
+
+class CountingSink(TraceEventSink):
+    def __init__(self):
+        self.count = 0
+
+    def receive(self, event):
+        self.count += 1
+
+    def receive_batch(self, events):
+        self.count += len(events)
+
+    def receive_block(self, block):
+        self.count += len(block)
+
+def synthesize_capture(size, seed=0):
+    """@brief Generate SWO data that looks like ITM printf output mixed with PC sampling.
+
+    Characters are written to stimulus port 0 one byte at a time, with a periodic PC sample and
+    a local timestamp after every few packets.
+    """
+    rng = random.Random(seed)
+    data = bytearray([0x00] * 5 + [0x80])
+    text = b"The quick brown fox jumps over the lazy dog %d\n"
+    line = 0
+    while len(data) < size:
+        for c in text % line:
+            data += bytes([0x01, c])
+            if rng.random() < 0.1:
+                data += bytes([0x17]) + rng.randrange(0x08000000, 0x08010000).to_bytes(4, 'little')
+            if rng.random() < 0.2:
+                data += bytes([0xc0, rng.randrange(0x80, 0x100), rng.randrange(0x7f)])
+        line += 1
+    return bytes(data[:size])
+
+def run_parser(parser_class, data, **kwargs):
+    sink = CountingSink()
+    parser = parser_class(NullCore(), sink, **kwargs)
+    start = perf_counter()
+    for offset in range(0, len(data), CHUNK_SIZE):
+        parser.parse(data[offset:offset + CHUNK_SIZE])
+    elapsed = perf_counter() - start
+    return elapsed, sink.count
+
+def main():
+    parser = argparse.ArgumentParser(description='SWO parser benchmark')
+    parser.add_argument('captures', nargs='*', help="Raw SWO capture files. If none are provided, "
+            "a capture is synthesized.")
+    parser.add_argument('-s', '--size', type=int, default=4 * 1024 * 1024,
+            help="Size of the synthesized capture in bytes.")
+    args = parser.parse_args()
+
+    captures = []
+    for path in args.captures:
+        with open(path, 'rb') as f:
+            captures.append((path, f.read()))
+    if not captures:
+        captures.append(("synthesized", synthesize_capture(args.size)))
+
+    format_str = "{:<16}{:>12}{:>12}{:>14}{:>10}"
+    for name, data in captures:
+        print("{}: {} bytes".format(name, len(data)))
+        print(format_str.format("Parser", "Time (s)", "MB/s", "Events/s", "Speedup"))
+        baseline = None
+        for label, parser_class, kwargs in (
+                    ("reference", ReferenceSWOParser, {}),
+                    ("objects", SWOParser, {}),
+                    ("columnar", SWOParser, {'columnar': True}),
+                ):
+            elapsed, count = run_parser(parser_class, data, **kwargs)
+            if baseline is None:
+                baseline = elapsed
+            print(format_str.format(label, "%.3f" % elapsed, "%.2f" % (len(data) / elapsed / 1e6),
+                    "%.0f" % (count / elapsed), "%.1fx" % (baseline / elapsed)))
+        print()
+
+if __name__ == "__main__":
+    main()
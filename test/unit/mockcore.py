@@ -114,9 +114,9 @@ class MockCore(CoreSightCoreComponent, MemoryInterface):
                     raise KeyError("register %s not available in this CPU", info.name)
 
     def read_memory(self, addr, transfer_size=32, now=True):
-        assert now is True
         bytes_data = self.read_memory_block8(addr, transfer_size // 8)
-        return conversion.byte_list_to_nbit_le_list(bytes_data, transfer_size)[0]
+        value = conversion.byte_list_to_nbit_le_list(bytes_data, transfer_size)[0]
+        return value if now else (lambda: value)
 
     def read_memory_block8(self, addr, size):
         for r, m in self.regions:
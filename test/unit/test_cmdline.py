@@ -15,6 +15,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import argparse
 import pytest
 import six
 
@@ -23,6 +24,7 @@ from pyocd.utility.cmdline import (
     convert_vector_catch,
     VECTOR_CATCH_CHAR_MAP,
     convert_session_options,
+    positive_int,
     )
 from pyocd.core.target import Target
 from pyocd.target import normalise_target_type_name
@@ -143,6 +145,16 @@ class TestConvertSessionOptions(object):
         # Valid
         assert convert_session_options(['test_binary=abc']) == {'test_binary': 'abc'}
 
+class TestPositiveInt:
+    def test_valid(self):
+        assert positive_int("1") == 1
+        assert positive_int("16") == 16
+
+    @pytest.mark.parametrize("value", ["0", "-2", "x"])
+    def test_invalid(self, value):
+        with pytest.raises(argparse.ArgumentTypeError):
+            positive_int(value)
+
 class TestTargetTypeNormalisation:
     def test_passthrough(self):
         assert normalise_target_type_name("foobar") == "foobar"
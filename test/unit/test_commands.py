@@ -0,0 +1,62 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import io
+import pytest
+from unittest import mock
+
+from pyocd.commands import commands
+from pyocd.commands.execution_context import CommandExecutionContext
+from pyocd.coresight.coresight_target import CoreSightTarget
+from pyocd.debug.cache import CachingDebugContext
+
+RAM = 0x20000000
+
+@pytest.fixture(scope='function')
+def cache_context(mockcore):
+    context = mock.MagicMock(spec=CachingDebugContext)
+    context.parent = mockcore
+    return context
+
+@pytest.fixture(scope='function')
+def commander(mockcore, cache_context):
+    core = mock.Mock()
+    core.get_target_context.return_value = cache_context
+    target = mock.MagicMock(spec=CoreSightTarget)
+    target.aps = {0: mockcore}
+    target.cores = {0: core}
+    target.elf = None
+    target.svd_device = None
+    session = mock.MagicMock()
+    session.target = target
+    context = CommandExecutionContext(no_init=True, output_stream=io.StringIO())
+    context.attach_session(session)
+    context.selected_ap_address = 0
+    return context
+
+def test_memory_commands_registered():
+    assert commands.FlushCacheCommand.INFO['names'] == ['flushcache']
+    assert commands.FindCommand.INFO['names'] == ['find']
+
+def test_flushcache(commander, cache_context):
+    commander.process_command_line("flushcache")
+    cache_context.invalidate.assert_called_once_with()
+
+def test_find(mockcore, commander):
+    mockcore.write_memory_block8(RAM + 0x10, [0xaa, 0x55])
+    commander.process_command_line("find 0x%08x 64 0xaa 0x55" % RAM)
+    assert "Found pattern at address 0x%08x" % (RAM + 0x10) in commander.output_stream.getvalue()
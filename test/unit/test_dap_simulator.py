@@ -0,0 +1,466 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from time import sleep
+from unittest import mock
+
+from pyocd.core import exceptions
+from pyocd.core.memory_interface import MemoryInterface
+from pyocd.core.session import Session
+from pyocd.core.target import Target
+from pyocd.coresight.ap import (AccessPort, APv1Address, CSW_SIZE32, MEM_AP_CSW, MEM_AP_DRW, MEM_AP_TAR)
+from pyocd.coresight.cortex_m import CortexM
+from pyocd.probe.cmsis_dap_probe import CMSISDAPProbe
+from pyocd.probe.debug_probe import DebugProbe
+from pyocd.probe.pydapaccess.dap_access_api import DAPAccessIntf
+from pyocd.probe.pydapaccess.cmsis_dap_core import Command
+from pyocd.probe.pydapaccess.dap_access_cmsis_dap import (
+    AP_ACC,
+    DP_ACC,
+    READ,
+    WRITE,
+    DAPAccessCMSISDAP,
+    _Command,
+)
+from pyocd.probe.pydapaccess.interface.simulator_backend import (
+    SimulatedCMSISDAPv2,
+    SimulatedCoreDebug,
+    SimulatedDAPTarget,
+    SimulatedMemory,
+)
+from pyocd.utility.timeout import Timeout
+
+RAM = 0x20000000
+
+@pytest.fixture(scope='function')
+def sim():
+    return SimulatedCMSISDAPv2(packet_size=512, packet_count=4)
+
+@pytest.fixture(scope='function')
+def link(sim):
+    link = DAPAccessCMSISDAP(None, interface=sim)
+    link.open()
+    yield link
+    link.close()
+
+@pytest.fixture(scope='function')
+def mem_ap(sim):
+    probe = CMSISDAPProbe(DAPAccessCMSISDAP(None, interface=sim))
+    session = Session(probe, no_config=True, target_override='cortex_m',
+            **{'warning.cortex_m_default': False})
+    session.open(init_board=False)
+    session.target.dp.connect()
+    ap = AccessPort.create(session.target.dp, APv1Address(0))
+    session.target.dp.aps[ap.address] = ap
+    yield ap
+    session.close()
+
+class RawAcceleratedMemoryInterface(MemoryInterface):
+    """@brief Accelerated memory interface that, like probe firmware, moves CSW and TAR itself."""
+
+    def __init__(self, dp, ap_address):
+        self._dp = dp
+        self._ap = ap_address.address
+
+    def _select(self, addr, csw):
+        self._dp.write_ap(self._ap + MEM_AP_CSW, csw | CSW_SIZE32)
+        self._dp.write_ap(self._ap + MEM_AP_TAR, addr)
+
+    def write_memory(self, addr, data, transfer_size=32, csw=0):
+        assert transfer_size == 32
+        self._select(addr, csw)
+        self._dp.write_ap(self._ap + MEM_AP_DRW, data)
+
+    def read_memory(self, addr, transfer_size=32, now=True, csw=0):
+        assert transfer_size == 32
+        self._select(addr, csw)
+        return self._dp.read_ap(self._ap + MEM_AP_DRW, now)
+
+    def write_memory_block32(self, addr, data, csw=0):
+        for offset, value in enumerate(data):
+            self.write_memory(addr + offset * 4, value, csw=csw)
+
+    def read_memory_block32(self, addr, size, csw=0):
+        return [self.read_memory(addr + offset * 4, csw=csw) for offset in range(size)]
+
+@pytest.fixture(scope='function')
+def accel_ap(sim):
+    probe = CMSISDAPProbe(DAPAccessCMSISDAP(None, interface=sim))
+    session = Session(probe, no_config=True, target_override='cortex_m',
+            **{'warning.cortex_m_default': False})
+    session.open(init_board=False)
+    dp = session.target.dp
+    dp.connect()
+    with mock.patch.object(probe, 'get_memory_interface_for_ap',
+            lambda address: RawAcceleratedMemoryInterface(dp, address)):
+        ap = AccessPort.create(dp, APv1Address(0))
+    dp.aps[ap.address] = ap
+    yield ap
+    session.close()
+
+@pytest.fixture(scope='function')
+def core(sim, mem_ap):
+    core = CortexM(mem_ap.dp.session, mem_ap, mem_ap.dp.session.target.memory_map)
+    core.init()
+    return core
+
+class TestSimulatedMemory:
+    def test_read_write(self):
+        mem = SimulatedMemory([(0x1000, 0x100)])
+        assert mem.write(0x1010, b'\x01\x02\x03')
+        assert mem.read(0x100f, 5) == b'\x00\x01\x02\x03\x00'
+
+    def test_fault(self):
+        mem = SimulatedMemory([(0x1000, 0x100)])
+        assert mem.read(0x10fe, 4) is None
+        assert not mem.write(0x2000, b'\x00')
+
+class TestSimulatedProbe:
+    def test_info(self, link):
+        assert link.identify(DAPAccessIntf.ID.MAX_PACKET_SIZE) == 512
+        assert link.identify(DAPAccessIntf.ID.MAX_PACKET_COUNT) == 4
+        assert link.protocol_version == (2, 1, 0)
+        assert link.get_unique_id() == "simulated-dap"
+
+    def test_dp_idr(self, link):
+        link.connect(DAPAccessIntf.PORT.SWD)
+        assert link.read_reg(DAPAccessIntf.REG.DP_0x0) == 0x2ba01477
+
+    def test_packet_overrun(self, sim):
+        sim.open()
+        for _ in range(4):
+            sim.write([0x00, 0x01])
+        with pytest.raises(DAPAccessIntf.DeviceError):
+            sim.write([0x00, 0x01])
+
+    def test_packet_count_respected(self, sim, mem_ap):
+        data = list(range(4096))
+        mem_ap.write_memory_block32(RAM, data)
+        assert mem_ap.read_memory_block32(RAM, len(data)) == data
+        assert sim.stats.max_outstanding <= 4
+
+class TestSimulatedMemAP:
+    def test_transfer_sizes(self, mem_ap):
+        assert mem_ap.supported_transfer_sizes == {8, 16, 32}
+        assert mem_ap.auto_increment_page_size == 0x1000
+
+    def test_sub_word(self, mem_ap):
+        mem_ap.write32(RAM, 0x44332211)
+        mem_ap.write8(RAM + 1, 0xaa)
+        mem_ap.write16(RAM + 2, 0xbbcc)
+        assert mem_ap.read32(RAM) == 0xbbccaa11
+        assert mem_ap.read8(RAM + 3) == 0xbb
+        assert mem_ap.read16(RAM) == 0xaa11
+
+    def test_block_across_wrap(self, mem_ap):
+        data = [i * 0x01010101 & 0xffffffff for i in range(3000)]
+        mem_ap.write_memory_block32(RAM + 0xff0, data)
+        assert mem_ap.read_memory_block32(RAM + 0xff0, len(data)) == data
+
+    def test_fault(self, mem_ap):
+        with pytest.raises(exceptions.TransferFaultError):
+            mem_ap.read32(0x10000000)
+        # Sticky error is cleared and accesses work again.
+        mem_ap.write32(RAM, 0x12345678)
+        assert mem_ap.read32(RAM) == 0x12345678
+
+    def test_read_memory_scatter(self, sim, mem_ap):
+        mem_ap.write_memory_block32(RAM, [0x11111111, 0x22222222, 0x33333333])
+        mem_ap.dp.flush()
+        sim.stats.reset()
+        assert mem_ap.read_memory_scatter([(RAM + 8, 32), (RAM, 8), (RAM + 4, 16)]) == [0x33333333, 0x11, 0x2222]
+        assert sim.stats.transfer_commands == 1
+
+    def test_read_memory_scatter_fault(self, mem_ap):
+        mem_ap.write32(RAM, 0x12345678)
+        with pytest.raises(exceptions.TransferFaultError):
+            mem_ap.read_memory_scatter([(RAM, 32), (0x10000000, 32), (RAM, 32)])
+        assert mem_ap.read_memory_scatter([(RAM, 32)]) == [0x12345678]
+
+class TestTARShadow:
+    def test_sequential_words(self, sim, mem_ap):
+        mem_ap.write32(RAM, 1)
+        mem_ap.dp.flush()
+        sim.stats.reset()
+        before = mem_ap.statistics
+        for i in range(1, 8):
+            mem_ap.write32(RAM + 4 * i, i + 1)
+        mem_ap.dp.flush()
+        # Only the DRW writes are performed.
+        assert sim.stats.transfers == 7
+        assert mem_ap.statistics.tar_writes_skipped == before.tar_writes_skipped + 7
+        assert mem_ap.read_memory_block32(RAM, 8) == list(range(1, 9))
+
+    def test_sequential_sub_word(self, sim, mem_ap):
+        mem_ap.write_memory_block8(RAM, list(range(16)))
+        mem_ap.read8(RAM)
+        sim.stats.reset()
+        assert [mem_ap.read8(RAM + i) for i in range(1, 4)] == [1, 2, 3]
+        assert [mem_ap.read16(RAM + i) for i in range(4, 8, 2)] == [0x0504, 0x0706]
+        # Only CSW is written, to switch to 16-bit transfers. TAR never needs to be written.
+        assert sim.stats.transfers == 3 + 1 + 2
+
+    def test_consecutive_blocks(self, sim, mem_ap):
+        data = list(range(64))
+        mem_ap.write_memory_block32(RAM, data)
+        before = mem_ap.statistics
+        mem_ap.read_memory_block32(RAM, 32)
+        assert mem_ap.read_memory_block32(RAM + 128, 32) == data[32:]
+        after = mem_ap.statistics
+        assert after.tar_writes == before.tar_writes + 1
+        assert after.tar_writes_skipped == before.tar_writes_skipped + 1
+
+    def test_page_boundary(self, mem_ap):
+        page = mem_ap.auto_increment_page_size
+        mem_ap.write32(RAM + page - 4, 0x11111111)
+        before = mem_ap.statistics
+        mem_ap.write32(RAM + page, 0x22222222)
+        assert mem_ap.statistics.tar_writes == before.tar_writes + 1
+        assert mem_ap.read_memory_block32(RAM + page - 4, 2) == [0x11111111, 0x22222222]
+
+    def test_invalidated_by_fault(self, mem_ap):
+        mem_ap.write32(RAM, 0x12345678)
+        with pytest.raises(exceptions.TransferFaultError):
+            mem_ap.read_memory_block32(0x10000000, 4)
+        assert mem_ap._cached_tar == -1
+        assert mem_ap.read32(RAM) == 0x12345678
+
+    def test_invalidated_by_deferred_fault(self, sim, mem_ap):
+        # Memory with a one word hole within a TAR auto-increment page. The write to the hole faults
+        # when the queued transfers are flushed, so TAR is not advanced to the next address as the
+        # shadow had predicted.
+        sim.target.memory = SimulatedMemory([(RAM, 0x100), (RAM + 0x104, 0x100)])
+        mem_ap.write32(RAM + 0x100, 0)
+        assert mem_ap._cached_tar == RAM + 0x104
+        with pytest.raises(exceptions.TransferFaultError):
+            mem_ap.dp.flush()
+        mem_ap.write32(RAM + 0x104, 0x12345678)
+        mem_ap.dp.flush()
+        assert mem_ap.read32(RAM + 0x104) == 0x12345678
+
+    def test_invalidated_by_raw_ap_access(self, mem_ap):
+        mem_ap.write_memory_block32(RAM, [1, 2])
+        mem_ap.write32(RAM + 0x40, 3)
+        assert mem_ap.read32(RAM) == 1
+        mem_ap.dp.write_ap(mem_ap.address.address | MEM_AP_TAR, RAM + 0x40)
+        mem_ap.dp.invalidate_ap_caches()
+        assert mem_ap.read32(RAM + 4) == 2
+
+    def test_invalidated_by_accelerated_access(self, accel_ap):
+        accel_ap.write_memory_block32(RAM, [1, 2, 3, 4])
+        accel_ap.write32(RAM + 0x40, 5)
+        with accel_ap.locked():
+            accel_ap.set_banked_base(RAM)
+            assert accel_ap.read32(RAM + 0x40) == 5
+            assert (accel_ap._cached_csw, accel_ap._cached_tar) == (-1, -1)
+            # The TAR write is not skipped, although the accelerated read moved TAR elsewhere.
+            accel_ap.set_banked_base(RAM)
+            assert accel_ap.read_banked(4) == 2
+
+    def test_invalidated_by_reset(self, sim, mem_ap):
+        mem_ap.write32(RAM, 0x12345678)
+        sim.target.tar = 0
+        mem_ap.dp.session.notify(Target.Event.PRE_RESET, mem_ap.dp.session.target)
+        assert mem_ap.read32(RAM + 4) == 0
+        assert mem_ap.read32(RAM) == 0x12345678
+
+class TestPacketEncoding:
+    def test_block_write_encoding(self):
+        cmd = _Command(64)
+        cmd.add(2, WRITE | AP_ACC | 0x0c, [0x11223344, 0xaabbccdd], 0)
+        buf = bytearray(64)
+        data = cmd.encode_data(buf)
+        assert isinstance(data, memoryview)
+        assert data.obj is buf
+        assert bytes(data) == bytes([Command.DAP_TRANSFER_BLOCK, 0, 2, 0, 0x0d,
+                0x44, 0x33, 0x22, 0x11, 0xdd, 0xcc, 0xbb, 0xaa])
+
+    def test_transfer_encoding(self):
+        cmd = _Command(64)
+        cmd.add(1, WRITE | AP_ACC | 0x04, [0x1_2000_0000], 0) # truncated to 32 bits
+        cmd.add(2, READ | AP_ACC | 0x0c, None, 0)
+        data = cmd.encode_data()
+        assert bytes(data) == bytes([Command.DAP_TRANSFER, 0, 3,
+                0x05, 0x00, 0x00, 0x00, 0x20, 0x0f, 0x0f])
+
+    def test_block_read_decoding(self):
+        cmd = _Command(64)
+        cmd.add(2, READ | AP_ACC | 0x0c, None, 0)
+        cmd.encode_data()
+        response = memoryview(bytes([Command.DAP_TRANSFER_BLOCK, 2, 0, 1, 1, 2, 3, 4, 5, 6, 7, 8, 0, 0]))
+        decoded = cmd.decode_data(response)
+        assert bytes(decoded) == bytes(range(1, 9))
+
+    def test_transfer_split_across_packets(self, link):
+        link.connect(DAPAccessIntf.PORT.SWD)
+        link.set_deferred_transfer(True)
+        transfer = link._write(0, 1000, READ | DP_ACC | 0x0, None)
+        single = link.read_reg(DAPAccessIntf.REG.DP_0x0, now=False)
+        assert transfer.get_result() == [0x2ba01477] * 1000
+        assert single() == 0x2ba01477
+
+    def test_backend_receives_bytes_like(self, sim, mem_ap):
+        written = []
+        original_write = sim.write
+        def write(data):
+            written.append(type(data))
+            original_write(data)
+        sim.write = write
+        mem_ap.write_memory_block32(RAM, [1, 2, 3])
+        mem_ap.dp.flush()
+        assert memoryview in written
+
+class TestPipelinedReads:
+    @pytest.fixture(scope='function')
+    def probe(self, sim):
+        probe = CMSISDAPProbe(DAPAccessCMSISDAP(None, interface=sim))
+        session = Session(probe, no_config=True, target_override='cortex_m',
+                **{'warning.cortex_m_default': False, 'cmsis_dap.pipelined_reads': True})
+        session.open(init_board=False)
+        session.target.dp.connect()
+        yield probe
+        session.close()
+
+    def test_reader_thread_lifecycle(self, link):
+        link.set_pipelined_reads(True)
+        assert link._reader_thread is not None
+        link.set_pipelined_reads(False)
+        assert link._reader_thread is None
+
+    def test_fault_not_raised_again(self, link):
+        link.connect(DAPAccessIntf.PORT.SWD)
+        link.set_pipelined_reads(True)
+        link.set_deferred_transfer(True)
+        link.write_reg(DAPAccessIntf.REG.AP_0x4, 0x10000000) # TAR
+        with pytest.raises(DAPAccessIntf.TransferFaultError):
+            link.read_reg(DAPAccessIntf.REG.AP_0xC)
+        # The fault was delivered to the read, so it must not be raised again.
+        assert link.read_reg(DAPAccessIntf.REG.DP_0x0) == 0x2ba01477
+        link.flush()
+
+    def test_async_reader_stops(self, link):
+        link.connect(DAPAccessIntf.PORT.SWD)
+        future = link.reg_read_repeat_async(2, DAPAccessIntf.REG.DP_0x0)
+        assert future.result(timeout=5) == [0x2ba01477] * 2
+        with Timeout(5) as t_o:
+            while t_o.check() and link._reader_thread is not None:
+                sleep(0.01)
+        assert link._reader_thread is None
+        assert link.read_reg(DAPAccessIntf.REG.DP_0x0) == 0x2ba01477
+
+    def test_async_reader_kept_when_enabled(self, link):
+        link.connect(DAPAccessIntf.PORT.SWD)
+        link.set_pipelined_reads(True)
+        assert link.reg_read_repeat_async(1, DAPAccessIntf.REG.DP_0x0).result(timeout=5) == [0x2ba01477]
+        assert link._reader_thread is not None
+        assert not link._reader_stop
+
+    def test_read_ap_multiple_async(self, sim, probe):
+        ap = AccessPort.create(probe.session.target.dp, APv1Address(0))
+        data = list(range(1024))
+        ap.write_memory_block32(RAM, data)
+        ap.write_reg(0x00, ap._csw | 0x2) # CSW: 32-bit, auto-increment
+        ap.write_reg(0x04, RAM) # TAR
+        futures = [probe.read_ap_multiple_async(0x0c, 256) for _ in range(4)]
+        assert [w for f in futures for w in f.result(timeout=5)] == data
+        assert sim.stats.max_outstanding <= 4
+
+    def test_default_async_implementation(self, probe):
+        probe.write_dp(0x8, 0xf0) # SELECT AP bank 0xf
+        future = DebugProbe.read_ap_multiple_async(probe, 0xfc, 2)
+        assert future.result() == [SimulatedDAPTarget.AP_IDR] * 2
+
+    def test_async_fault(self, probe):
+        ap = AccessPort.create(probe.session.target.dp, APv1Address(0))
+        ap.write_reg(0x04, 0x10000000) # TAR
+        future = probe.read_ap_multiple_async(0x0c, 4)
+        assert isinstance(future.exception(timeout=5), exceptions.TransferFaultError)
+
+    def test_memory_block_read(self, probe):
+        ap = AccessPort.create(probe.session.target.dp, APv1Address(0))
+        data = [i * 0x01010101 & 0xffffffff for i in range(5000)]
+        ap.write_memory_block32(RAM + 0x100, data)
+        assert ap.read_memory_block32(RAM + 0x100, len(data)) == data
+
+    def test_memory_block_read_fault(self, probe):
+        ap = AccessPort.create(probe.session.target.dp, APv1Address(0))
+        # The read runs off the end of RAM.
+        with pytest.raises(exceptions.TransferFaultError):
+            ap.read_memory_block32(RAM + 0x3f000, 0x800)
+        ap.write32(RAM, 0x12345678)
+        assert ap.read32(RAM) == 0x12345678
+
+    def test_write_fault(self, probe):
+        ap = AccessPort.create(probe.session.target.dp, APv1Address(0))
+        with pytest.raises(exceptions.TransferFaultError):
+            ap.write_memory_block32(0x10000000, [1, 2, 3])
+            probe.flush()
+
+class TestCoreRegisters:
+    def test_simulated_core(self, core):
+        assert core.has_fpu
+        assert core.is_halted()
+
+    def test_read_write(self, sim, core):
+        core.write_core_registers_raw(['r0', 'pc', 's3', 'd2', 'primask', 'apsr'],
+                [1, 0x1000, 5, (7 << 32) | 6, 1, 0xf0000000])
+        assert sim.core.registers[2] == 0x00 # r2 untouched
+        assert core.read_core_registers_raw(['r0', 'pc', 's3', 'd2', 's4', 's5', 'primask', 'cfbp', 'xpsr']) == [
+                1, 0x1000, 5, (7 << 32) | 6, 6, 7, 1, 1, 0xf0000000]
+
+    def test_banked_transfers(self, sim, core):
+        regs = ['r%d' % i for i in range(13)]
+        sim.core.registers[0:13] = range(100, 113)
+        sim.stats.reset()
+        assert core.read_core_registers_raw(regs) == list(range(100, 113))
+        # DHCSR check for halt, then one SELECT, CSW, and TAR write followed by three banked
+        # register transfers per register.
+        assert sim.stats.transfers <= 3 * len(regs) + 6
+
+    def test_not_halted(self, sim, core):
+        sim.core.halted = False
+        with pytest.raises(exceptions.CoreRegisterAccessError):
+            core.read_core_registers_raw(['r0'])
+        with pytest.raises(exceptions.CoreRegisterAccessError):
+            core.write_core_registers_raw(['r0'], [0])
+
+    def test_step(self, sim, core):
+        core.write_core_register_raw('pc', 0x100)
+        core.step()
+        assert core.read_core_register_raw('pc') == 0x102
+        assert core.is_halted()
+
+    def test_accelerated_memory_interface(self, sim, accel_ap):
+        core = CortexM(accel_ap.dp.session, accel_ap, accel_ap.dp.session.target.memory_map)
+        core.init()
+        sim.core.registers[0:2] = [100, 101]
+        # The banked data registers must not be used, as the probe may not support raw AP accesses.
+        with mock.patch.object(accel_ap, 'set_banked_base', side_effect=AssertionError), \
+                mock.patch.object(accel_ap, 'read_banked', side_effect=AssertionError), \
+                mock.patch.object(accel_ap, 'write_banked', side_effect=AssertionError):
+            assert core.read_core_registers_raw(['r0', 'r1']) == [100, 101]
+            core.write32(RAM, 0x12345678)
+            core.write_core_registers_raw(['r1', 'xpsr'], [0x55, 0x01000000])
+            assert core.read32(RAM) == 0x12345678
+            assert core.read_core_registers_raw(['r0', 'r1', 'xpsr']) == [100, 0x55, 0x01000000]
+
+    def test_memory_access_after_banked(self, core):
+        core.read_core_registers_raw(['r0'])
+        core.write32(RAM, 0x12345678)
+        assert core.read32(RAM) == 0x12345678
+        assert core.read32(SimulatedCoreDebug.BASE) & CortexM.S_HALT
+
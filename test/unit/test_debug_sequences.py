@@ -34,6 +34,9 @@ from pyocd.debug.sequences.sequences import (
     IfControl,
     Parser,
     SemanticChecker,
+    CompiledCode,
+    TRACE,
+    _Compiler,
     _ConstantFolder,
 )
 from pyocd.core.session import Session
@@ -142,6 +145,110 @@ def block_context(context: DebugSequenceExecutionContext):
     ctxmgr = context._push(seq, scope)
     return context
 
+# Block execution corpora as (expression, result) pairs. Also used by debug_sequence_benchmark.py.
+UNARY_OP_EXPRS = [
+    ("-1", 0xffffffffffffffff),
+    ("-2", 0xfffffffffffffffe),
+    ("!1", 0),
+    ("!0", 1),
+    ("+1", 1),
+    ("~0xffff", 0xffffffffffff0000),
+    ]
+
+INT_EXPRS = [
+    ("1 + 1", 2),
+    ("2 - 1", 1),
+    ("2 * 4", 8),
+    ("4 / 2", 2),
+    ("5 % 4", 1),
+    ("1 << 12", 4096),
+    ("0x80 >> 4", 0x8),
+    ("0b1000 | 0x2", 0b1010),
+    ("0b1100 & 0b0100", 0b0100),
+    ]
+
+CMP_EXPRS = [
+    ("1 == 1", 1),
+    ("1 == 0", 0),
+    ("0 == 1", 0),
+    ("1 != 1", 0),
+    ("1 != 0", 1),
+    ("0 != 1", 1),
+    ("20 > 10", 1),
+    ("20 > 20", 0),
+    ("20 > 100", 0),
+    ("5 >= 2", 1),
+    ("5 >= 5", 1),
+    ("5 >= 100", 0),
+    ("10 < 20", 1),
+    ("10 < 10", 0),
+    ("10 < 4", 0),
+    ("10 <= 20", 1),
+    ("10 <= 10", 1),
+    ("10 <= 5", 0),
+    ]
+
+AND_OR_EXPRS = [
+    ("1 && 1", 1),
+    ("1 && 0", 0),
+    ("0 && 1", 0),
+    ("0 && 0", 0),
+    ("1 || 1", 1),
+    ("1 || 0", 1),
+    ("0 || 1", 1),
+    ("0 || 0", 0),
+    ("5 && 1000", 1),
+    ("432 && 0", 0),
+    ("0 && 2", 0),
+    ("0 && 0", 0),
+    ("348 || 4536", 1),
+    ("5 || 0", 1),
+    ("0 || 199", 1),
+    ("0 || 0", 0),
+    ]
+
+PRECEDENCE_EXPRS = [
+    ("1 + 2 * 5", 11),
+    ("7 * 12 + 5", 89),
+    ("1 + 5 - 3", 3),
+    ("(1 + 2) * 5", 15),
+    ("1 + (2 * 5)", 11),
+    ("2 + 16 / 2", 10),
+    ("1 + 17 % 3", 3),
+    ("2 * 3 * 4", 24),
+    ("0 || 1 && 1", 1),
+    ("0 && 1 || 0", 0),
+    ("1 == 6 > 5", 1),
+    ("1 != 6 < 12", 0),
+    ("1 << 4 > 1 << 2", 1),
+    ("1 << (4 > 1) << 2", 8),
+    ("!1 == 0", 1),
+    ]
+
+LONGER_EXPRS = [
+    ("(7 * (1 << 3) + 1) >> 1", 28),
+    ]
+
+TERNARY_EXPRS = [
+    ("1 ? (1 + 1) : (1 - 1)", 2),
+    ("0 ? 10: 20", 20),
+    ("1 << 5 ? 17 * (2 + 1) : 0", 51),
+    ]
+
+COMPOUND_ASSIGN_EXPRS = [
+    ("x += 1", 2),
+    ("x -= 1", 0),
+    ("x *= 10", 10),
+    ("x /= 1", 1),
+    ("x %= 1", 0),
+    ("x &= 3", 1),
+    ("x |= 0x40", 0x41),
+    ("x ^= 3", 2),
+    ("x <<= 5", 1 << 5),
+    ("x >>= 0", 1),
+    ]
+
+
 class TestDebugSequenceScope:
     def test_name(self):
         s = Scope(name='test')
@@ -372,55 +479,19 @@ class TestDebugSequenceBlockExecute:
         s.execute(block_context)
         assert block_context.current_scope.get("x") == 123
 
-    @pytest.mark.parametrize(("expr", "result"), [
-            ("-1", 0xffffffffffffffff),
-            ("-2", 0xfffffffffffffffe),
-            ("!1", 0),
-            ("!0", 1),
-            ("+1", 1),
-            ("~0xffff", 0xffffffffffff0000),
-        ])
+    @pytest.mark.parametrize(("expr", "result"), UNARY_OP_EXPRS)
     def test_int_unary_ops(self, block_context, expr, result):
         s = Block("__var x = %s;" % expr)
         s.execute(block_context)
         assert block_context.current_scope.get("x") == result
 
-    @pytest.mark.parametrize(("expr", "result"), [
-            ("1 + 1", 2),
-            ("2 - 1", 1),
-            ("2 * 4", 8),
-            ("4 / 2", 2),
-            ("5 % 4", 1),
-            ("1 << 12", 4096),
-            ("0x80 >> 4", 0x8),
-            ("0b1000 | 0x2", 0b1010),
-            ("0b1100 & 0b0100", 0b0100),
-        ])
+    @pytest.mark.parametrize(("expr", "result"), INT_EXPRS)
     def test_int_expr(self, block_context, expr, result):
         s = Block("__var x = %s;" % expr)
         s.execute(block_context)
         assert block_context.current_scope.get("x") == result
 
-    @pytest.mark.parametrize(("expr", "result"), [
-            ("1 == 1", 1),
-            ("1 == 0", 0),
-            ("0 == 1", 0),
-            ("1 != 1", 0),
-            ("1 != 0", 1),
-            ("0 != 1", 1),
-            ("20 > 10", 1),
-            ("20 > 20", 0),
-            ("20 > 100", 0),
-            ("5 >= 2", 1),
-            ("5 >= 5", 1),
-            ("5 >= 100", 0),
-            ("10 < 20", 1),
-            ("10 < 10", 0),
-            ("10 < 4", 0),
-            ("10 <= 20", 1),
-            ("10 <= 10", 1),
-            ("10 <= 5", 0),
-        ])
+    @pytest.mark.parametrize(("expr", "result"), CMP_EXPRS)
     def test_bool_cmp_expr(self, block_context, expr, result):
         s = Block("__var x = %s;" % expr)
         s.execute(block_context)
@@ -428,46 +499,13 @@ class TestDebugSequenceBlockExecute:
 
     # Aside from the obvious, verify that && and || are evaluated as in C rather than Python.
     # That is, they must produce a 1 or 0 and not the value of either operand.
-    @pytest.mark.parametrize(("expr", "result"), [
-            ("1 && 1", 1),
-            ("1 && 0", 0),
-            ("0 && 1", 0),
-            ("0 && 0", 0),
-            ("1 || 1", 1),
-            ("1 || 0", 1),
-            ("0 || 1", 1),
-            ("0 || 0", 0),
-            ("5 && 1000", 1),
-            ("432 && 0", 0),
-            ("0 && 2", 0),
-            ("0 && 0", 0),
-            ("348 || 4536", 1),
-            ("5 || 0", 1),
-            ("0 || 199", 1),
-            ("0 || 0", 0),
-        ])
+    @pytest.mark.parametrize(("expr", "result"), AND_OR_EXPRS)
     def test_bool_and_or_expr(self, block_context, expr, result):
         s = Block("__var x = %s;" % expr)
         s.execute(block_context)
         assert block_context.current_scope.get("x") == result
 
-    @pytest.mark.parametrize(("expr", "result"), [
-            ("1 + 2 * 5", 11),
-            ("7 * 12 + 5", 89),
-            ("1 + 5 - 3", 3),
-            ("(1 + 2) * 5", 15),
-            ("1 + (2 * 5)", 11),
-            ("2 + 16 / 2", 10),
-            ("1 + 17 % 3", 3),
-            ("2 * 3 * 4", 24),
-            ("0 || 1 && 1", 1),
-            ("0 && 1 || 0", 0),
-            ("1 == 6 > 5", 1),
-            ("1 != 6 < 12", 0),
-            ("1 << 4 > 1 << 2", 1),
-            ("1 << (4 > 1) << 2", 8),
-            ("!1 == 0", 1),
-        ])
+    @pytest.mark.parametrize(("expr", "result"), PRECEDENCE_EXPRS)
     def test_precedence(self, block_context, expr, result):
         s = Block("__var x = %s;" % expr)
         logging.info("Block: %s", s._ast.pretty())
@@ -475,9 +513,7 @@ class TestDebugSequenceBlockExecute:
         actual = block_context.current_scope.get("x")
         assert actual == result
 
-    @pytest.mark.parametrize(("expr", "result"), [
-            ("(7 * (1 << 3) + 1) >> 1", 28),
-        ])
+    @pytest.mark.parametrize(("expr", "result"), LONGER_EXPRS)
     def test_longer_expr(self, block_context, expr, result):
         s = Block("__var x = %s;" % expr)
         logging.info("Block: %s", s._ast.pretty())
@@ -493,11 +529,7 @@ class TestDebugSequenceBlockExecute:
         actual = block_context.current_scope.get("__Result")
         assert actual == 0xffffffffffffffff
 
-    @pytest.mark.parametrize(("expr", "result"), [
-            ("1 ? (1 + 1) : (1 - 1)", 2),
-            ("0 ? 10: 20", 20),
-            ("1 << 5 ? 17 * (2 + 1) : 0", 51),
-        ])
+    @pytest.mark.parametrize(("expr", "result"), TERNARY_EXPRS)
     def test_ternary_expr(self, block_context, expr, result):
         s = Block(f"__var x = {expr};")
         logging.info("Block: %s", s._ast.pretty())
@@ -505,18 +537,7 @@ class TestDebugSequenceBlockExecute:
         actual = block_context.current_scope.get("x")
         assert actual == result
 
-    @pytest.mark.parametrize(("expr", "result"), [
-            ("x += 1", 2),
-            ("x -= 1", 0),
-            ("x *= 10", 10),
-            ("x /= 1", 1),
-            ("x %= 1", 0),
-            ("x &= 3", 1),
-            ("x |= 0x40", 0x41),
-            ("x ^= 3", 2),
-            ("x <<= 5", 1 << 5),
-            ("x >>= 0", 1),
-        ])
+    @pytest.mark.parametrize(("expr", "result"), COMPOUND_ASSIGN_EXPRS)
     def test_compound_assign(self, block_context, expr, result):
         s = Block("__var x = 1; %s;" % expr)
         s.execute(block_context)
@@ -662,6 +683,51 @@ class TestSemanticChecker:
         c = SemanticChecker(ast, scope, context)
         c.check()
 
+class TestCompiledCode:
+    def test_compiled_once(self, block_context):
+        s = Block("__var x = 1; x += 1;")
+        with mock.patch.object(SemanticChecker, 'check') as check, \
+                mock.patch.object(_Compiler, 'compile', autospec=True, side_effect=_Compiler.compile) as compile:
+            s.execute(block_context)
+            s.execute(block_context)
+            assert check.call_count == 1
+            assert compile.call_count == 1
+        assert block_context.current_scope.get("x") == 2
+
+    def test_checked_per_pname(self, session, delegate, scope):
+        code = CompiledCode(Parser.parse("a + 1"))
+        with mock.patch.object(SemanticChecker, 'check') as check:
+            for pname in (None, "cm4", "cm4"):
+                code.execute(scope, DebugSequenceExecutionContext(session, delegate, pname=pname))
+            assert check.call_count == 2
+
+    def test_result(self, context, scope):
+        assert CompiledCode(Parser.parse("")).execute(scope, context) is None
+        assert CompiledCode(Parser.parse("__var x = 2;")).execute(scope, context) is None
+        assert CompiledCode(Parser.parse("__var x = 2; x * b")).execute(scope, context) == 256
+        assert CompiledCode(Parser.parse("valid_fn_no_args()")).execute(scope, context) == 0
+
+    def test_undefined_variable(self, context, scope):
+        code = CompiledCode(Parser.parse("__var x = y + 1;"))
+        with pytest.raises(DebugSequenceSemanticError):
+            code.execute(scope, context)
+
+    def test_eager_evaluation(self, context, scope):
+        # Both branches of a ternary and both operands of || are evaluated.
+        code = CompiledCode(Parser.parse("__var x = a ? (b = 1) : (b = 2); __var y = 1 || (a = 5);"))
+        code.execute(scope, context)
+        assert scope.get("x") == 2
+        assert scope.get("b") == 2
+        assert scope.get("a") == 5
+
+    def test_trace(self, context, scope):
+        TRACE.setLevel(logging.DEBUG)
+        try:
+            code = CompiledCode(Parser.parse("__var x = b + 1; valid_fn_1_arg(x); x"))
+            assert code.execute(scope, context) == 129
+        finally:
+            TRACE.setLevel(logging.CRITICAL)
+
 class TestDebugSequences:
     def test_pname(self):
         seq = DebugSequence('test', pname="cm4")
@@ -0,0 +1,273 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from binascii import crc32
+import os
+import random
+
+import pytest
+
+from pyocd.core.memory_map import FlashRegion
+from pyocd.flash.builder import FlashBuilder
+from pyocd.flash.fingerprint import (FlashFingerprintDatabase, RegionFingerprint, region_crc_blocks)
+from pyocd.flash.flash import (Flash, FlashInfo, PageInfo, SectorInfo)
+
+class MockProbe:
+    unique_id = "0123456789"
+
+class MockSession:
+    def __init__(self, target):
+        self.options = {'flash.timeout.program': None}
+        self.probe = MockProbe()
+        self.target = target
+
+    def notify(self, *args):
+        pass
+
+class MockFlashTarget:
+    """@brief Target holding the contents of a single flash region."""
+
+    def __init__(self, region):
+        self.session = MockSession(self)
+        self.part_number = "mock"
+        self.region = region
+        self.memory = bytearray([region.erased_byte_value]) * region.length
+        self.reads = 0
+
+    def read_memory_block8(self, addr, size):
+        self.reads += size
+        offset = addr - self.region.start
+        return list(self.memory[offset:offset + size])
+
+    def reset_and_halt(self):
+        pass
+
+class MockFlash:
+    """@brief Flash algorithm stand-in that programs the mock target's memory."""
+
+    Operation = Flash.Operation
+    TIMEOUT_ERROR = Flash.TIMEOUT_ERROR
+
+    def __init__(self, region, crc_supported=True, double_buffer=False):
+        self.region = region
+        self.target = MockFlashTarget(region)
+        self.crc_supported = crc_supported
+        self.is_erase_all_supported = True
+        self.is_double_buffering_supported = double_buffer
+        self.programmed_pages = []
+        self.crc_calls = 0
+        self._buffers = {}
+        region.flash = self
+
+    def get_sector_info(self, addr):
+        if not self.region.contains_address(addr):
+            return None
+        base = addr - (addr - self.region.start) % self.region.sector_size
+        return SectorInfo(base, self.region.erase_sector_weight, self.region.sector_size)
+
+    def get_page_info(self, addr):
+        if not self.region.contains_address(addr):
+            return None
+        base = addr - (addr - self.region.start) % self.region.page_size
+        return PageInfo(base, self.region.program_page_weight, self.region.page_size)
+
+    def get_flash_info(self):
+        return FlashInfo(self.region.start, self.region.erase_all_weight, self.crc_supported)
+
+    def init(self, operation, address=None, clock=0, reset=True):
+        pass
+
+    def uninit(self):
+        pass
+
+    def cleanup(self):
+        pass
+
+    def compute_crcs(self, sectors):
+        self.crc_calls += 1
+        return [crc32(self._slice(addr, size)) for addr, size in sectors]
+
+    def erase_all(self):
+        self.target.memory[:] = bytes([self.region.erased_byte_value]) * len(self.target.memory)
+
+    def erase_sector(self, addr):
+        offset = addr - self.region.start
+        self.target.memory[offset:offset + self.region.sector_size] = \
+                bytes([self.region.erased_byte_value]) * self.region.sector_size
+
+    def program_page(self, addr, data):
+        offset = addr - self.region.start
+        self.target.memory[offset:offset + len(data)] = bytes(data)
+        self.programmed_pages.append(addr)
+
+    def load_page_buffer(self, buffer_number, addr, data):
+        self._buffers[buffer_number] = bytes(data)
+
+    def start_program_page_with_buffer(self, buffer_number, addr):
+        self.program_page(addr, self._buffers[buffer_number])
+
+    def wait_for_completion(self, timeout=None):
+        return 0
+
+    def _slice(self, addr, size):
+        offset = addr - self.region.start
+        return bytes(self.target.memory[offset:offset + size])
+
+def make_flash(**kwargs):
+    region = FlashRegion(start=0x8000, length=0x4000, sector_size=0x400, page_size=0x100,
+            is_boot_memory=True)
+    return MockFlash(region, **kwargs)
+
+def random_bytes(size, seed=0):
+    rng = random.Random(seed)
+    return bytes(rng.randrange(256) for _ in range(size))
+
+class TestFlashBuilder:
+    @pytest.mark.parametrize("convert", [bytes, bytearray, list, memoryview])
+    def test_input_types(self, convert):
+        flash = make_flash()
+        data = random_bytes(0x1234)
+        builder = FlashBuilder(flash)
+        builder.add_data(0x8100, convert(data))
+        builder.program(chip_erase="sector")
+        assert flash._slice(0x8100, len(data)) == data
+
+    def test_full_pages_are_not_copied(self):
+        flash = make_flash()
+        data = random_bytes(0x400)
+        builder = FlashBuilder(flash)
+        builder.add_data(0x8400, data)
+        builder._build_sectors_and_pages(keep_unwritten=False)
+        assert len(builder.page_list) == 4
+        for page in builder.page_list:
+            assert isinstance(page.data, memoryview)
+            assert page.data.obj is data
+
+    @pytest.mark.parametrize("keep_unwritten", [True, False])
+    def test_partial_pages(self, keep_unwritten):
+        flash = make_flash()
+        old = random_bytes(flash.region.length, seed=1)
+        flash.target.memory[:] = old
+        builder = FlashBuilder(flash)
+        builder.add_data(0x8010, b"\x01\x02\x03")
+        builder.add_data(0x8180, bytes(range(0x100)))
+        builder.program(chip_erase="sector", keep_unwritten=keep_unwritten)
+
+        if keep_unwritten:
+            expected = bytearray(old[:0x400])
+        else:
+            expected = bytearray(b"\xff" * 0x400)
+        expected[0x10:0x13] = b"\x01\x02\x03"
+        expected[0x180:0x280] = bytes(range(0x100))
+        assert flash._slice(0x8000, 0x400) == expected
+
+    @pytest.mark.parametrize("crc_supported", [True, False])
+    @pytest.mark.parametrize("double_buffer", [True, False])
+    def test_unchanged_pages_skipped(self, crc_supported, double_buffer):
+        flash = make_flash(crc_supported=crc_supported, double_buffer=double_buffer)
+        data = random_bytes(0x800)
+        flash.target.memory[0:0x800] = data
+        builder = FlashBuilder(flash)
+        changed = bytearray(data)
+        changed[0x500] ^= 0xff
+        builder.add_data(0x8000, changed)
+        info = builder.program(chip_erase="sector")
+        assert flash._slice(0x8000, 0x800) == changed
+        # Only the sector containing the changed byte is erased and programmed.
+        assert sorted(flash.programmed_pages) == [0x8400, 0x8500, 0x8600, 0x8700]
+        assert info.skipped_page_count == 4
+
+    def test_erased_pages_skipped_with_chip_erase(self):
+        flash = make_flash()
+        builder = FlashBuilder(flash)
+        builder.add_data(0x8000, b"\xff" * 0x200 + b"\x00" * 0x100)
+        builder.program(chip_erase="chip")
+        assert flash.programmed_pages == [0x8200]
+
+    def test_overlap(self):
+        builder = FlashBuilder(make_flash())
+        builder.add_data(0x8000, b"\x00" * 0x10)
+        with pytest.raises(ValueError):
+            builder.add_data(0x8008, [0] * 0x10)
+
+class TestFingerprint:
+    @pytest.fixture(scope='function')
+    def flash(self, tmp_path):
+        flash = make_flash()
+        flash.target.session.options['flash.fingerprint_file'] = str(tmp_path / "fingerprints.json")
+        return flash
+
+    def program(self, flash, data, **kwargs):
+        flash.programmed_pages = []
+        flash.target.reads = 0
+        flash.crc_calls = 0
+        builder = FlashBuilder(flash)
+        builder.add_data(flash.region.start, data)
+        return builder.program(chip_erase="sector", **kwargs)
+
+    def test_unchanged_pages_skipped_without_analysis(self, flash):
+        data = bytearray(random_bytes(0x1000))
+        self.program(flash, data)
+        assert os.path.exists(flash.target.session.options['flash.fingerprint_file'])
+
+        data[0x420] ^= 0xff
+        self.program(flash, data)
+        assert flash.programmed_pages == [0x8400, 0x8500, 0x8600, 0x8700]
+        # One region CRC to validate the fingerprint and one to record the new one, with no page
+        # analysis or reads.
+        assert flash.crc_calls == 2
+        assert flash.target.reads == 0
+        assert flash._slice(0x8000, 0x1000) == data
+
+    def test_outdated_fingerprint_ignored(self, flash):
+        data = random_bytes(0x1000)
+        self.program(flash, data)
+
+        # Modify flash behind the builder's back.
+        flash.target.memory[0x10] ^= 0xff
+        self.program(flash, data)
+        assert flash.programmed_pages == [0x8000, 0x8100, 0x8200, 0x8300]
+        assert flash._slice(0x8000, 0x1000) == data
+
+    def test_erased_sectors_forgotten(self, flash):
+        self.program(flash, random_bytes(0x800))
+        self.program(flash, random_bytes(0x100, seed=1), keep_unwritten=False)
+        db = FlashFingerprintDatabase(flash.target.session.options['flash.fingerprint_file'])
+        fingerprint = db.get("0123456789/mock/flash@0x00008000")
+        assert sorted(fingerprint.page_crcs) == [0x8000, 0x8400, 0x8500, 0x8600, 0x8700]
+
+    def test_not_used_without_smart_flash(self, flash):
+        data = random_bytes(0x400)
+        self.program(flash, data)
+        self.program(flash, data, smart_flash=False)
+        assert len(flash.programmed_pages) == 4
+
+def test_region_crc_blocks():
+    assert list(region_crc_blocks(0x8000, 0x4000)) == [(0x8000, 0x4000)]
+    assert list(region_crc_blocks(0, 0x6000)) == [(0, 0x4000), (0x4000, 0x2000)]
+    assert list(region_crc_blocks(0x1000, 0x7000)) == [(0x1000, 0x1000), (0x2000, 0x2000), (0x4000, 0x4000)]
+
+def test_database_round_trip(tmp_path):
+    path = tmp_path / "db.json"
+    db = FlashFingerprintDatabase(str(path))
+    assert db.get("a") is None
+    db.put("a", RegionFingerprint([1, 2], {0x8000: 3}))
+    db.put("b", RegionFingerprint([4], {}))
+    assert db.get("a") == RegionFingerprint([1, 2], {0x8000: 3})
+    db.put("b", None)
+    assert db.get("b") is None
+    path.write_text("not json")
+    assert db.get("a") is None
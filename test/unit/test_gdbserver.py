@@ -14,10 +14,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
+
+import pytest
+
 from pyocd.gdbserver.gdbserver import (
+    choose_packet_size,
     escape,
+    MAX_PACKET_SIZE,
+    MIN_PACKET_SIZE,
     unescape,
 )
+from pyocd.gdbserver.packet_io import (
+    checksum,
+    GDBServerPacketIOThread,
+)
 
 # escaped chars: '#$}*'
 # escaped by prefixing with '}' and xor'ing the char with 0x20
@@ -65,3 +76,105 @@ class TestGdbServerEscaping:
     def test_unescape_combined(self):
         assert unescape(b"}\x03}\x04}]}\x0a") == list(b"#$}*")
         assert unescape(b"}]}]}]") == list(b"}}}")
+
+    def test_unescape_escaped_escape(self):
+        # An escaped 0x5d is a '}' following the escape character.
+        assert unescape(b"a}}b") == list(b"a]b")
+        assert unescape(b"}}}}") == list(b"]]")
+
+    def test_round_trip(self):
+        data = bytes(range(256)) * 16 + b"}}}###$$$***"
+        assert unescape(escape(data)) == list(data)
+
+class MockSocket:
+    """@brief Socket whose reads block until closed, so the packet thread never consumes data."""
+
+    port = 3333
+
+    def __init__(self):
+        self.closed = threading.Event()
+        self.written = []
+
+    def set_timeout(self, timeout):
+        pass
+
+    def read(self):
+        self.closed.wait()
+        return b""
+
+    def write(self, data):
+        self.written.append(bytes(data))
+        return len(data)
+
+def make_packet(data):
+    return b"$" + data + b"#" + checksum(data)
+
+class TestPacketFraming:
+    @pytest.fixture
+    def packet_io(self):
+        sock = MockSocket()
+        packet_io = GDBServerPacketIOThread(sock)
+        yield packet_io
+        sock.closed.set()
+        packet_io.join()
+
+    def feed(self, packet_io, data):
+        packet_io._buffer += data
+        packet_io._process_data()
+
+    def received(self, packet_io):
+        packets = []
+        while True:
+            packet = packet_io.receive(block=False)
+            if packet is None:
+                return packets
+            packets.append(packet)
+
+    def test_packets_in_one_read(self, packet_io):
+        packets = [make_packet(b"g"), make_packet(b"m0,4"), make_packet(b"X0,2:}]}\x03")]
+        self.feed(packet_io, b"".join(packets))
+        assert self.received(packet_io) == packets
+        assert packet_io._abstract_socket.written == [b"+"] * 3
+        assert len(packet_io._buffer) == 0
+
+    def test_packet_split_across_reads(self, packet_io):
+        packet = make_packet(b"vFlashWrite:0:" + bytes(range(32)))
+        for i in range(len(packet)):
+            self.feed(packet_io, packet[i:i + 1])
+        assert self.received(packet_io) == [packet]
+
+    def test_bad_checksum(self, packet_io):
+        self.feed(packet_io, b"$g#00")
+        assert self.received(packet_io) == []
+        assert packet_io._abstract_socket.written == [b"-"]
+
+    def test_ctrl_c_and_junk(self, packet_io):
+        self.feed(packet_io, b"junk\x03more" + make_packet(b"c"))
+        assert packet_io.interrupt_event.is_set()
+        assert self.received(packet_io) == [make_packet(b"c")]
+
+    def test_ack_handling(self, packet_io):
+        packet_io.send(make_packet(b"OK"))
+        self.feed(packet_io, b"-")
+        # A nack resends the last packet.
+        assert packet_io._abstract_socket.written == [make_packet(b"OK")] * 2
+        self.feed(packet_io, b"+" + make_packet(b"g"))
+        assert self.received(packet_io) == [make_packet(b"g")]
+
+class TestPacketSize:
+    @pytest.mark.parametrize(("latency", "throughput", "expected"), [
+            # Slow probe: the minimum size.
+            (0.001, 20 * 1024, MIN_PACKET_SIZE),
+            # Full speed USB probe.
+            (0.001, 200 * 1024, 16 * 1024),
+            # High speed USB probe: the maximum size.
+            (0.0005, 4 * 1024 * 1024, MAX_PACKET_SIZE),
+        ])
+    def test_choose_packet_size(self, latency, throughput, expected):
+        assert choose_packet_size(latency, throughput) == expected
+
+    def test_power_of_two(self):
+        for throughput in range(1000, 2000000, 9973):
+            size = choose_packet_size(0.001, throughput)
+            assert size & (size - 1) == 0
+            assert MIN_PACKET_SIZE <= size <= MAX_PACKET_SIZE
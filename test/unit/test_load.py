@@ -0,0 +1,113 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+from unittest import mock
+
+import pytest
+
+from pyocd.core.helpers import ConnectHelper
+from pyocd.flash.file_programmer import ImageFile
+from pyocd.subcommands.load_cmd import LoadSubcommand
+
+HEX = b""":020000040001F9
+:0400000001020304F2
+:0400100005060708D2
+:00000001FF
+"""
+
+class MockProbe:
+    def __init__(self, unique_id):
+        self.unique_id = unique_id
+        self.description = "probe " + unique_id
+
+class TestImageFile:
+    def test_hex(self, tmp_path):
+        path = tmp_path / "image.hex"
+        path.write_bytes(HEX)
+        image = ImageFile(str(path))
+        assert image.format == 'hex'
+        assert [(addr, bytes(data)) for addr, data in image.segments] == [
+                (0x10000, b"\x01\x02\x03\x04"), (0x10010, b"\x05\x06\x07\x08")]
+        assert image.size == 8
+
+    def test_bin(self, tmp_path):
+        path = tmp_path / "image.bin"
+        path.write_bytes(bytes(range(16)))
+        image = ImageFile(str(path), base_address=0x2000, skip=4)
+        assert image.format == 'bin'
+        assert len(image.segments) == 1
+        assert image.segments[0][0] == 0x2000
+        assert bytes(image.segments[0][1]) == bytes(range(4, 16))
+
+    def test_unknown_format(self, tmp_path):
+        path = tmp_path / "image.xyz"
+        path.write_bytes(b"")
+        with pytest.raises(ValueError):
+            ImageFile(str(path))
+
+class TestArguments:
+    def parse(self, *args):
+        parser = argparse.ArgumentParser(parents=LoadSubcommand.get_args(), add_help=False)
+        return parser.parse_args([*args, "image.hex"])
+
+    def test_jobs(self):
+        assert self.parse("--jobs", "2").jobs == 2
+        assert self.parse().jobs is None
+
+    @pytest.mark.parametrize("jobs", ["0", "-1"])
+    def test_invalid_jobs(self, jobs):
+        with pytest.raises(SystemExit):
+            self.parse("--jobs", jobs)
+
+class TestSelectProbes:
+    PROBES = [MockProbe("0240000012345"), MockProbe("0240000067890"), MockProbe("E6614C311B")]
+
+    def select(self, probes=None, all_probes=False):
+        args = argparse.Namespace(probes=probes, all_probes=all_probes, no_wait=True)
+        cmd = LoadSubcommand.__new__(LoadSubcommand)
+        cmd._args = args
+        with mock.patch.object(ConnectHelper, 'get_all_connected_probes', return_value=self.PROBES):
+            return cmd._select_probes()
+
+    def test_all(self):
+        assert self.select(all_probes=True) == self.PROBES
+
+    def test_partial_uids(self):
+        assert self.select(["67890,e6614c"]) == [self.PROBES[1], self.PROBES[2]]
+        assert self.select(["12345", "12345"]) == [self.PROBES[0]]
+
+    @pytest.mark.parametrize("uid", ["0240", "missing"])
+    def test_no_unique_match(self, uid):
+        assert self.select([uid]) is None
+
+class TestLoadMultiple:
+    PROBES = [MockProbe("0240000012345"), MockProbe("0240000067890")]
+
+    def test_unexpected_error_reported(self, tmp_path, capsys):
+        path = tmp_path / "image.hex"
+        path.write_bytes(HEX)
+        args = argparse.Namespace(format=None, skip=0, jobs=None, options=None, project_dir=None,
+                config=None, script=None, no_config=True, pack=None, target_override=None,
+                frequency=None, connect_mode=None, erase=None, trust_crc=False, no_reset=False)
+        cmd = LoadSubcommand.__new__(LoadSubcommand)
+        cmd._args = args
+        with mock.patch.object(cmd, '_select_probes', return_value=self.PROBES), \
+                mock.patch('pyocd.subcommands.load_cmd.Session', side_effect=RuntimeError("boom")):
+            assert cmd._load_multiple([(str(path), None)]) == 1
+        out = capsys.readouterr().out
+        assert out.count("Failed: boom") == 2
+        assert "Loaded 0 of 2 boards" in out
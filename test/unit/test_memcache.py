@@ -108,27 +108,27 @@ class TestMemoryCache:
     def test_16_no_mem_region(self, mockcore, memcache):
         assert memcache.read_memory_block8(0x30000000, 4) == [0x55] * 4
         # Make sure we didn't cache anything.
-        assert memcache._cache.overlap(0x30000000, 0x30000004) == set()
+        assert memcache._get_cached_ranges(0x30000000, 0x30000004) == []
 
     def test_17_noncacheable_region_read(self, mockcore, memcache):
         mockcore.write_memory_block8(0x20000410, [90, 91, 92, 93])
         assert memcache.read_memory_block8(0x20000410, 4) == [90, 91, 92, 93]
         # Make sure we didn't cache anything.
-        assert memcache._cache.overlap(0x20000410, 0x20000414) == set()
+        assert memcache._get_cached_ranges(0x20000410, 0x20000414) == []
 
     def test_18_noncacheable_region_write(self, mockcore, memcache):
         memcache.write_memory_block8(0x20000410, [1, 2, 3, 4])
         mockcore.write_memory_block8(0x20000410, [90, 91, 92, 93])
         assert memcache.read_memory_block8(0x20000410, 4) == [90, 91, 92, 93]
         # Make sure we didn't cache anything.
-        assert memcache._cache.overlap(0x20000410, 0x20000414) == set()
+        assert memcache._get_cached_ranges(0x20000410, 0x20000414) == []
 
     def test_19_write_into_cached(self, mockcore, memcache):
         mockcore.write_memory_block8(4, [1, 2, 3, 4, 5, 6, 7, 8])
         assert memcache.read_memory_block8(4, 8) == [1, 2, 3, 4, 5, 6, 7, 8]
         memcache.write_memory_block8(6, [128, 129, 130, 131])
         assert memcache.read_memory_block8(4, 8) == [1, 2, 128, 129, 130, 131, 7, 8]
-        assert len(list(memcache._cache.overlap(4, 12))[0].data) == 8
+        assert memcache._get_cached_ranges(4, 12) == [(4, 12)]
 
     def test_20_empty_read(self, memcache):
         assert memcache.read_memory_block8(128, 0) == []
@@ -181,6 +181,96 @@ class TestMemoryCache:
         assert block == data[0x7e:0x82]
 
 
+    def test_27_merge_contiguous(self, memcache):
+        for addr in range(0x20000000, 0x20000100, 4):
+            memcache.read_memory_block8(addr, 4)
+        assert memcache._get_cached_ranges(0x20000000, 0x20000100) == [(0x20000000, 0x20000100)]
+        memcache.read_memory_block8(0x20000108, 4)
+        memcache.read_memory_block8(0x20000100, 16)
+        assert memcache._get_cached_ranges(0x20000000, 0x20000200) == [(0x20000000, 0x20000110)]
+
+    def test_28_read_across_pages(self, mockcore):
+        mockcore.memory_map = memory_map.MemoryMap(memory_map.RamRegion(start=0, length=0x10000))
+        memcache = MemoryCache(DebugContext(mockcore), mockcore)
+        page = MemoryCache.PAGE_SIZE
+        memcache.read_memory_block8(page + 0x10, 4)
+        assert memcache.read_memory_block8(page - 0x10, 0x40) == [0x55] * 0x40
+        assert memcache.metrics.hits == 4
+        assert memcache.metrics.misses == 0x40
+        assert memcache._get_cached_ranges(0, 2 * page) == [(page - 0x10, page), (page, page + 0x30)]
+
+    def test_29_hit_metrics(self, memcache):
+        memcache.write_memory_block8(0x20000000, [1, 2, 3, 4])
+        memcache.read_memory_block8(0x20000000, 8)
+        memcache.read_memory_block8(0x20000000, 8)
+        assert memcache.metrics.reads == 2
+        assert memcache.metrics.hits == 12
+        assert memcache.metrics.misses == 4
+        assert memcache.metrics.writes == 4
+        assert memcache.metrics.percent_hit == 75
+
+    def test_30_lru_eviction(self, mockcore):
+        # Use a larger memory map than the mock core's.
+        mockcore.memory_map = memory_map.MemoryMap(memory_map.RamRegion(start=0, length=0x10000))
+        memcache = MemoryCache(DebugContext(mockcore), mockcore, size_limit=MemoryCache.PAGE_SIZE + 16)
+        page = MemoryCache.PAGE_SIZE
+        memcache.read_memory_block8(0, 16)
+        memcache.read_memory_block8(page, 16)
+        # Touch page 0 so page 1 is least recently used.
+        memcache.read_memory_block8(0, 4)
+        memcache.read_memory_block8(2 * page, page)
+        assert memcache.size == page + 16
+        assert memcache._get_cached_ranges(0, 3 * page) == [(0, 16), (2 * page, 3 * page)]
+        assert memcache.metrics.evictions == 1
+
+    def test_31_invalidated_by_run_token(self, mockcore, memcache):
+        memcache.read_memory_block8(0x20000000, 4)
+        mockcore.run_token += 1
+        memcache.read_memory_block8(0x20000010, 4)
+        assert memcache._get_cached_ranges(0x20000000, 0x20000100) == [(0x20000010, 0x20000014)]
+
+    def test_32_flash_survives_run_token(self, mockcore, memcache):
+        mockcore.write_memory_block8(0, [1, 2, 3, 4])
+        assert memcache.read_memory_block8(0, 4) == [1, 2, 3, 4]
+        memcache.read_memory_block8(0x20000000, 4)
+        mockcore.run_token += 1
+        mockcore.write_memory_block8(0, [5, 6, 7, 8])
+        assert memcache.read_memory_block8(0, 4) == [1, 2, 3, 4]
+        assert memcache._get_cached_ranges(0x20000000, 0x20000100) == []
+        assert memcache.read_only_metrics.hits == 4
+        assert memcache.read_only_metrics.misses == 4
+        assert memcache.metrics.total == 0
+
+    def test_33_invalidate_clears_flash(self, mockcore, memcache):
+        memcache.read_memory_block8(0, 4)
+        memcache.read_memory_block8(0x20000000, 4)
+        memcache.invalidate()
+        assert memcache.size == 0
+        mockcore.write_memory_block8(0, [5, 6, 7, 8])
+        assert memcache.read_memory_block8(0, 4) == [5, 6, 7, 8]
+        assert memcache.read_only_metrics.misses == 4
+
+    def test_33a_flash_invalidated_on_run(self, mockcore, memcache):
+        # Flash modified by the target firmware can opt back in to invalidation on run.
+        mockcore.flash_region.invalidate_cache_on_run = True
+        mockcore.write_memory_block8(0, [1, 2, 3, 4])
+        assert memcache.read_memory_block8(0, 4) == [1, 2, 3, 4]
+        mockcore.run_token += 1
+        mockcore.write_memory_block8(0, [5, 6, 7, 8])
+        assert memcache.read_memory_block8(0, 4) == [5, 6, 7, 8]
+        assert memcache.read_only_metrics.total == 0
+
+    def test_34_scatter(self, mockcore, memcache):
+        mockcore.write_memory_block8(0x20000000, [1, 2, 3, 4, 5, 6, 7, 8])
+        mockcore.write_memory_block8(0x20000400, [9, 10])
+        memcache.read_memory_block8(0x20000000, 4)
+        assert memcache.read_memory_scatter([(0x20000000, 32), (0x20000004, 16), (0x20000400, 8), (0x20000007, 8)]) \
+                == [0x04030201, 0x0605, 9, 8]
+        # The first word was a hit and the other cacheable locations were added to the cache.
+        assert memcache.metrics.hits == 4
+        assert memcache._get_cached_ranges(0x20000000, 0x20000400) == [(0x20000000, 0x20000006), (0x20000007, 0x20000008)]
+        mockcore.write_memory_block8(0x20000004, [0, 0])
+        assert memcache.read_memory_scatter([(0x20000004, 16)]) == [0x0605]
 
 # TODO test read32/16/8 with and without callbacks
 
@@ -0,0 +1,175 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from pyocd.core import exceptions
+from pyocd.probe.multi_probe_server import MultiProbeServer
+from pyocd.probe.tcp_client_probe import TCPClientProbe
+
+from .test_remote_probe import MockProbe
+
+class MockSession:
+    log_tracebacks = False
+
+    def __init__(self, hotplug_interval=0):
+        self.options = {
+            'probeserver.port': 0,
+            'serve_local_only': True,
+            'probeserver.hotplug_interval': hotplug_interval,
+            }
+
+class NamedMockProbe(MockProbe):
+    def __init__(self, unique_id):
+        super().__init__()
+        self.unique_id = unique_id
+        self.description = "Mock probe"
+
+@pytest.fixture
+def make_server():
+    servers = []
+    clients = []
+
+    def make(probes, hotplug_interval=0, scanner=None):
+        server = MultiProbeServer(MockSession(hotplug_interval), probes=probes, scanner=scanner)
+        server.start()
+        servers.append(server)
+
+        def connect(probe_uid=None):
+            address = "localhost:%d" % server.port
+            if probe_uid is not None:
+                address += "/" + probe_uid
+            client = TCPClientProbe(address)
+            clients.append(client)
+            client.open()
+            return client
+        return server, connect
+
+    yield make
+
+    for client in clients:
+        try:
+            client.close()
+        except exceptions.Error:
+            pass
+    for server in servers:
+        server.stop()
+
+def request(port, name, *args):
+    with socket.create_connection(('localhost', port)) as sock:
+        sock.sendall(json.dumps({"id": 1, "request": name, "arguments": list(args)}).encode() + b"\n")
+        return json.loads(sock.makefile().readline())
+
+def wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.01)
+
+class TestMultiProbeServer:
+    def test_select_probe(self, make_server):
+        probes = [NamedMockProbe("AAAA0001"), NamedMockProbe("BBBB0002")]
+        server, connect = make_server(probes)
+        client_a = connect("aaaa")
+        client_b = connect("0002")
+        client_a.write_ap(0x04, 1)
+        client_b.write_ap(0x04, 2)
+        assert client_a.read_ap(0x04) == 1
+        assert client_b.read_ap(0x04) == 2
+        assert probes[0].ap_regs[0x04] == 1
+        assert probes[1].ap_regs[0x04] == 2
+
+    def test_selection_errors(self, make_server):
+        server, connect = make_server([NamedMockProbe("AAAA0001"), NamedMockProbe("AAAA0002")])
+        with pytest.raises(exceptions.ProbeError):
+            connect()
+        with pytest.raises(exceptions.ProbeError):
+            connect("aaaa")
+        with pytest.raises(exceptions.ProbeError):
+            connect("cccc")
+
+    def test_single_probe_without_selection(self, make_server):
+        probe = NamedMockProbe("AAAA0001")
+        server, connect = make_server([probe])
+        client = connect()
+        client.write_ap(0x08, 3)
+        assert client.read_ap(0x08) == 3
+
+    def test_lock_excludes_other_clients(self, make_server):
+        probe = NamedMockProbe("AAAA0001")
+        server, connect = make_server([probe])
+        client_a = connect()
+        client_b = connect()
+
+        client_a.lock()
+        client_a.read_ap(0x00)
+        done = threading.Event()
+
+        def other_client():
+            client_b.write_ap(0x04, 2)
+            client_b.read_ap(0x04)
+            done.set()
+
+        thread = threading.Thread(target=other_client)
+        thread.start()
+        assert not done.wait(0.2)
+        client_a.write_ap(0x04, 1)
+        client_a.unlock()
+        thread.join(5)
+        assert done.is_set()
+        assert probe.ap_regs[0x04] == 2
+        assert server.statistics["AAAA0001"].max_wait_time >= 0.1
+
+    def test_disconnect_releases_lock(self, make_server):
+        server, connect = make_server([NamedMockProbe("AAAA0001")])
+        client_a = connect()
+        client_a.lock()
+        client_a.read_ap(0x00)
+        client_a.close()
+        client_b = connect()
+        client_b.write_ap(0x04, 5)
+        assert client_b.read_ap(0x04) == 5
+
+    def test_list_probes(self, make_server):
+        server, connect = make_server([NamedMockProbe("AAAA0001"), NamedMockProbe("BBBB0002")])
+        client = connect("bbbb")
+        client.read_ap(0x00)
+        response = request(server.port, 'list_probes')
+        assert response['status'] == 0
+        probes = response['result']
+        assert [p['unique_id'] for p in probes] == ["AAAA0001", "BBBB0002"]
+        assert probes[1]['statistics']['requests'] > 0
+
+    def test_hotplug(self, make_server):
+        probes = [NamedMockProbe("AAAA0001")]
+        server, connect = make_server(None, hotplug_interval=0.02, scanner=lambda: list(probes))
+        assert server.unique_ids == ["AAAA0001"]
+
+        probes.append(NamedMockProbe("BBBB0002"))
+        wait_for(lambda: server.unique_ids == ["AAAA0001", "BBBB0002"])
+        client = connect("bbbb")
+
+        # A probe that disappears is kept until its clients disconnect.
+        del probes[1]
+        time.sleep(0.1)
+        assert "BBBB0002" in server.unique_ids
+        client.close()
+        wait_for(lambda: server.unique_ids == ["AAAA0001"])
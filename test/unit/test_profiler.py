@@ -0,0 +1,125 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from pyocd.coresight.dwt import DWT
+from pyocd.debug.elf.decoder import (LineInfo, SymbolInfo)
+from pyocd.trace.profiler import (PCSampleHistogram, ProfileReport, ProfileSymbolizer)
+from pyocd.trace.swo import SWOParser
+
+from .test_swo import (MockCore, hw, short_ts)
+
+class MockSymbolDecoder:
+    SYMBOLS = [
+        SymbolInfo('main', 0x1001, 0x20, 'STT_FUNC'),
+        SymbolInfo('busy_loop', 0x1021, 0x10, 'STT_FUNC'),
+        ]
+
+    def get_symbol_for_address(self, addr):
+        for sym in self.SYMBOLS:
+            if sym.address <= addr < sym.address + sym.size:
+                return sym
+        return None
+
+class MockAddressDecoder:
+    def get_line_for_address(self, addr):
+        if 0x1000 <= addr < 0x1040:
+            return LineInfo(None, b'main.c', b'', (addr - 0x1000) // 8 + 10)
+        return None
+
+class MockELF:
+    symbol_decoder = MockSymbolDecoder()
+    address_decoder = MockAddressDecoder()
+
+def samples(*pcs):
+    data = []
+    for pc in pcs:
+        data += hw(2, pc, 4) if pc else hw(2, 0, 1)
+    return bytes(data + short_ts(1))
+
+@pytest.fixture(scope='function')
+def histogram():
+    histogram = PCSampleHistogram()
+    SWOParser(MockCore(), histogram).parse(samples(0x1000, 0x1020, 0x1022, 0x1022, 0x2000, 0))
+    return histogram
+
+class TestPCSampleHistogram:
+    def test_counts(self, histogram):
+        assert histogram.counts == {0x1000: 1, 0x1020: 1, 0x1022: 2, 0x2000: 1}
+        assert histogram.sleep_count == 1
+        assert histogram.total == 6
+
+    def test_columnar(self, histogram):
+        columnar = PCSampleHistogram()
+        SWOParser(MockCore(), columnar, columnar=True).parse(samples(0x1000, 0x1020, 0x1022, 0x1022, 0x2000, 0))
+        assert columnar.counts == histogram.counts
+        assert columnar.sleep_count == histogram.sleep_count
+
+    def test_pcsr_unavailable(self):
+        histogram = PCSampleHistogram()
+        histogram.add_sample(0xffffffff)
+        histogram.add_sample(0x1000)
+        assert histogram.total == 1
+
+    @pytest.mark.parametrize("columnar", [False, True])
+    def test_traced_pcsr_unavailable(self, columnar):
+        histogram = PCSampleHistogram()
+        SWOParser(MockCore(), histogram, columnar=columnar).parse(samples(0xffffffff, 0x1000, 0))
+        assert histogram.counts == {0x1000: 1}
+        assert histogram.total == 2
+
+class TestProfileReport:
+    def test_functions(self, histogram):
+        report = ProfileReport(histogram, ProfileSymbolizer(MockELF()))
+        assert [(p.name, p.samples) for p in report.functions()] == [
+                ('busy_loop', 2), ('main', 2), ('[sleep]', 1), ('[unknown]', 1), ]
+        text = report.format_functions()
+        assert "33.33%  busy_loop" in text
+        assert "6 total" in text
+
+    def test_flat(self, histogram):
+        report = ProfileReport(histogram, ProfileSymbolizer(MockELF()))
+        lines = report.format_flat(limit=2, lines=True).splitlines()
+        assert len(lines) == 3
+        assert lines[1].split() == ['2', '33.33%', '0x00001022', 'busy_loop+0x2', '(main.c:14)']
+        assert lines[2].split()[3] == 'main+0x0'
+
+    def test_collapsed(self, histogram):
+        report = ProfileReport(histogram, ProfileSymbolizer(MockELF()))
+        assert report.format_collapsed() == "[sleep] 1\n[unknown] 1\nbusy_loop 2\nmain 2\n"
+        assert "main;main.c:10 1\n" in report.format_collapsed(lines=True)
+
+    def test_no_elf(self, histogram):
+        report = ProfileReport(histogram, ProfileSymbolizer())
+        assert report.format_collapsed() == "[sleep] 1\n[unknown] 5\n"
+
+    def test_lazy_symbolization(self, histogram):
+        symbolizer = ProfileSymbolizer(MockELF())
+        ProfileReport(histogram, symbolizer).functions()
+        assert len(symbolizer._functions) == len(histogram.counts)
+
+class TestPCSamplingDivider:
+    @pytest.mark.parametrize(("interval", "expected"), [
+            (1, (0, 0, 64)),
+            (64, (0, 0, 64)),
+            (1000, (0, 15, 1024)),
+            (4096, (1, 3, 4096)),
+            (5000, (1, 4, 5120)),
+            (1000000, (1, 15, 16384)),
+            ])
+    def test_divider(self, interval, expected):
+        assert DWT.pc_sampling_divider(interval) == expected
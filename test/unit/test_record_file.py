@@ -0,0 +1,121 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import itertools
+import random
+
+import pytest
+from intelhex import IntelHex
+
+from pyocd.flash.record_file import (RecordFileError, iter_ihex_segments, iter_srec_segments)
+
+def srec(record_type, addr_size, addr, data):
+    """@brief Build one S-record line."""
+    body = addr.to_bytes(addr_size, 'big') + bytes(data)
+    body = bytes([len(body) + 1]) + body
+    return "S%d%s%02X\n" % (record_type, body.hex().upper(), ~sum(body) & 0xff)
+
+def ranges(addresses):
+    """@brief Yield (start, end) tuples of the contiguous runs in a sorted list of byte addresses."""
+    for _, group in itertools.groupby(enumerate(addresses), lambda x: x[1] - x[0]):
+        group = list(group)
+        yield group[0][1], group[-1][1]
+
+def make_intelhex(seed=0):
+    ih = IntelHex()
+    rng = random.Random(seed)
+    # Contiguous ranges spanning extended linear address boundaries, plus a few isolated bytes.
+    for start, size in ((0x0, 300), (0xfff0, 64), (0x08000000, 5000), (0x2000ffff, 2)):
+        for offset in range(size):
+            ih[start + offset] = rng.randrange(256)
+    ih[0x1000] = 0x55
+    return ih
+
+def intelhex_text(ih):
+    out = io.StringIO()
+    ih.write_hex_file(out)
+    return out.getvalue()
+
+class TestIntelHex:
+    def test_matches_intelhex(self):
+        ih = make_intelhex()
+        segments = list(iter_ihex_segments(io.StringIO(intelhex_text(ih))))
+        expected = [(start, ih.tobinstr(start=start, size=end - start + 1))
+                for start, end in ranges(sorted(ih.addresses()))]
+        assert segments == expected
+
+    def test_binary_mode(self):
+        text = intelhex_text(make_intelhex())
+        assert list(iter_ihex_segments(io.BytesIO(text.encode()))) == \
+                list(iter_ihex_segments(io.StringIO(text)))
+
+    def test_extended_segment_address(self):
+        lines = [":020000021000EC", ":0400100001020304E2", ":00000001FF"]
+        assert list(iter_ihex_segments(lines)) == [(0x10010, b'\x01\x02\x03\x04')]
+
+    def test_stops_at_eof(self):
+        lines = [":0100000055AA", ":00000001FF", "garbage"]
+        assert list(iter_ihex_segments(lines)) == [(0, b'\x55')]
+
+    def test_out_of_order(self):
+        lines = [":01001000559A", ":0100000011EE", ":0100010022DC"]
+        assert list(iter_ihex_segments(lines)) == [(0x10, b'\x55'), (0, b'\x11\x22')]
+
+    @pytest.mark.parametrize("line", [
+            "0100000055AA",     # missing colon
+            ":0100000055AB",    # bad checksum
+            ":0200000055A9",    # length mismatch
+            ":01000000GGAA",    # invalid hex
+            ":0100000655A4",    # unknown record type
+            ":01000004FFFC",    # short extended address record
+            ])
+    def test_errors(self, line):
+        with pytest.raises(RecordFileError) as excinfo:
+            list(iter_ihex_segments(["", line]))
+        assert excinfo.value.line_number == 2
+
+class TestSRecord:
+    def test_data_records(self):
+        lines = [
+            srec(0, 2, 0, b"header"),
+            srec(1, 2, 0x1000, range(16)),
+            srec(1, 2, 0x1010, range(16, 20)),
+            srec(2, 3, 0x123456, b"\xaa"),
+            srec(3, 4, 0x08000000, b"\x01\x02"),
+            srec(5, 2, 4, b""),
+            srec(7, 4, 0x08000000, b""),
+            ]
+        assert list(iter_srec_segments(lines)) == [
+                (0x1000, bytes(range(20))),
+                (0x123456, b"\xaa"),
+                (0x08000000, b"\x01\x02"),
+                ]
+
+    def test_lowercase_and_binary(self):
+        line = srec(3, 4, 0x20000000, b"\xde\xad").lower().encode()
+        assert list(iter_srec_segments(io.BytesIO(line))) == [(0x20000000, b"\xde\xad")]
+
+    @pytest.mark.parametrize("line", [
+            "X1030000FC",       # missing S
+            "S1030000FD",       # bad checksum
+            "S1050000FA",       # length mismatch
+            "S4030000FC",       # unknown record type
+            "S3030000FC",       # data record shorter than its address
+            ])
+    def test_errors(self, line):
+        with pytest.raises(RecordFileError):
+            list(iter_srec_segments([line]))
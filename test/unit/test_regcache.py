@@ -20,7 +20,7 @@ import logging
 from pyocd.cache.register import RegisterCache
 from pyocd.debug.context import DebugContext
 from pyocd.coresight.cortex_m import CortexM
-from pyocd.coresight.cortex_m_core_registers import CortexMCoreRegisterInfo
+from pyocd.coresight.cortex_m_core_registers import (CortexMCoreRegisterInfo, index_for_reg)
 from pyocd.core import memory_map
 from pyocd.utility import conversion
 from pyocd.utility import mask
@@ -205,7 +205,29 @@ class TestRegisterCache:
         with pytest.raises(KeyError):
             regcache_no_fpu.write_core_registers_raw(['s1'], [1.234])
 
-
-
-
+    def test_snapshot(self, mockcore):
+        regcache = RegisterCache(DebugContext(mockcore), mockcore, snapshot=True)
+        self.set_core_regs(mockcore)
+        reads = []
+        original_read = mockcore.read_core_registers_raw
+        def read_core_registers_raw(reg_list):
+            reads.append(list(reg_list))
+            return original_read(reg_list)
+        mockcore.read_core_registers_raw = read_core_registers_raw
+
+        # The first read after a halt reads the snapshot in one batch.
+        assert regcache.read_core_registers_raw(['pc']) == [get_expected_reg_value('pc')]
+        assert len(reads) == 1
+        assert regcache.read_core_registers_raw(['r0', 'sp', 'xpsr', 'primask', 's7', 'fpscr']) == [
+            get_expected_reg_value(r) for r in ['r0', 'sp']] + [
+            get_expected_xpsr(), get_expected_reg_value('primask'),
+            get_expected_reg_value('s7'), get_expected_reg_value('fpscr')]
+        assert len(reads) == 1
+        # Registers outside the snapshot groups are read on demand.
+        assert regcache.read_core_registers_raw(['msp_s']) == [get_expected_reg_value('msp_s')]
+        assert reads[1] == [index_for_reg('msp_s')]
+
+        mockcore.run_token += 1
+        regcache.read_core_registers_raw(['r1'])
+        assert len(reads[2]) == len(reads[0])
 
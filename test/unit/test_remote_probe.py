@@ -0,0 +1,237 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+import pytest
+
+from pyocd.core import exceptions
+from pyocd.coresight.ap import APv1Address
+from pyocd.probe import remote_probe_protocol as rpp
+from pyocd.probe.remote_probe_protocol import Opcode
+from pyocd.probe.tcp_client_probe import TCPClientProbe
+from pyocd.probe.tcp_probe_server import (DebugProbeRequestProcessor, TCPProbeServer)
+
+## AP register address whose reads fail.
+FAULT_ADDR = 0xfc
+
+class MockSession:
+    log_tracebacks = False
+
+class MockMemoryInterface:
+    def __init__(self):
+        self.memory = bytearray(0x1000)
+
+    def read_memory(self, addr, transfer_size=32, now=True):
+        value = int.from_bytes(self.memory[addr:addr + transfer_size // 8], 'little')
+        return value if now else (lambda: value)
+
+    def write_memory(self, addr, value, transfer_size=32):
+        if addr >= len(self.memory):
+            raise exceptions.TransferFaultError(fault_address=addr)
+        self.memory[addr:addr + transfer_size // 8] = value.to_bytes(transfer_size // 8, 'little')
+
+    def read_memory_block8(self, addr, size):
+        return list(self.memory[addr:addr + size])
+
+    def write_memory_block8(self, addr, data):
+        self.memory[addr:addr + len(data)] = bytes(data)
+
+    def read_memory_block32(self, addr, size):
+        data = self.memory[addr:addr + size * 4]
+        return [int.from_bytes(data[i:i + 4], 'little') for i in range(0, len(data), 4)]
+
+    def write_memory_block32(self, addr, data):
+        for i, value in enumerate(data):
+            self.write_memory(addr + i * 4, value)
+
+class MockProbe:
+    unique_id = "mock"
+
+    def __init__(self):
+        self.session = None
+        self.calls = []
+        self.ap_regs = {}
+        self.memif = MockMemoryInterface()
+
+    def __getattr__(self, name):
+        # Requests the tests don't use do nothing.
+        return lambda *args: None
+
+    def lock(self):
+        self.calls.append('lock')
+
+    def unlock(self):
+        self.calls.append('unlock')
+
+    def flush(self):
+        self.calls.append('flush')
+
+    def read_dp(self, addr, now=True):
+        return self.read_ap(addr, now)
+
+    def write_dp(self, addr, data):
+        self.write_ap(addr, data)
+
+    def read_ap(self, addr, now=True):
+        self.calls.append(('read_ap', addr))
+
+        def read_ap_cb():
+            if addr == FAULT_ADDR:
+                raise exceptions.TransferFaultError()
+            return self.ap_regs.get(addr, 0)
+        return read_ap_cb() if now else read_ap_cb
+
+    def write_ap(self, addr, data):
+        self.calls.append(('write_ap', addr, data))
+        self.ap_regs[addr] = data
+
+    def read_ap_multiple(self, addr, count=1, now=True):
+        values = [self.ap_regs.get(addr, 0)] * count
+        return values if now else (lambda: values)
+
+    def write_ap_multiple(self, addr, values):
+        for value in values:
+            self.write_ap(addr, value)
+
+    def get_memory_interface_for_ap(self, ap_address):
+        return self.memif
+
+@pytest.fixture(params=[True, False], ids=["binary", "json"])
+def remote(request, monkeypatch):
+    """@brief Yields a (client, server-side probe) pair connected over localhost."""
+    if not request.param:
+        # Emulate a server that predates the binary protocol.
+        monkeypatch.setattr(DebugProbeRequestProcessor, 'SUPPORTED_PROTOCOL_VERSIONS', (1,))
+    probe = MockProbe()
+    server = TCPProbeServer(('localhost', 0), MockSession(), probe)
+    server.server_bind()
+    server.server_activate()
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+
+    client = TCPClientProbe("localhost:%d" % server.socket.getsockname()[1])
+    client.open()
+    assert client._is_binary == request.param
+    yield client, probe
+
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+class TestRemoteProbe:
+    def test_ap_access(self, remote):
+        client, probe = remote
+        client.write_ap(0x04, 0x1234)
+        assert client.read_ap(0x04) == 0x1234
+        cb = client.read_dp(0x04, now=False)
+        client.write_ap_multiple(0x0c, [1, 2, 3])
+        assert client.read_ap_multiple(0x0c, 2) == [3, 3]
+        assert cb() == 0x1234
+
+    def test_memory(self, remote):
+        client, probe = remote
+        memif = client.get_memory_interface_for_ap(APv1Address(0))
+        memif.write_memory_block32(0x100, [0x11223344, 0xdeadbeef])
+        memif.write_memory_block8(0x108, b"\x01\x02\x03")
+        memif.write_memory(0x10c, 0xab, 8)
+        assert memif.read_memory_block32(0x100, 2) == [0x11223344, 0xdeadbeef]
+        assert memif.read_memory_block8(0x106, 7) == [0xad, 0xde, 1, 2, 3, 0, 0xab]
+        assert memif.read_memory(0x100, 16) == 0x3344
+        assert memif.read_memory(0x104, now=False)() == 0xdeadbeef
+
+    def test_read_error(self, remote):
+        client, probe = remote
+        cb = client.read_ap(FAULT_ADDR, now=False)
+        with pytest.raises(exceptions.TransferFaultError):
+            cb()
+        # The connection remains usable.
+        client.write_ap(0x04, 5)
+        assert client.read_ap(0x04) == 5
+
+    def test_request_error(self, remote):
+        client, probe = remote
+        with pytest.raises(exceptions.Error):
+            client._perform_request('connect', 'no_such_protocol')
+        client.flush()
+
+class TestBinaryProtocol:
+    @pytest.fixture
+    def client(self, remote):
+        client, probe = remote
+        if not client._is_binary:
+            pytest.skip("binary protocol only")
+        return client, probe
+
+    def test_batching(self, client):
+        client, probe = client
+        writes = []
+        write = client._socket.write
+        client._socket.write = lambda data: (writes.append(data), write(data))
+
+        client.lock()
+        for i in range(100):
+            client.write_ap(0x04, i)
+        callbacks = [client.read_ap(0x04, now=False) for _ in range(10)]
+        assert writes == []
+        assert [cb() for cb in callbacks] == [99] * 10
+        client.unlock()
+
+        # The writes and reads travel in a single frame, and unlock is sent without waiting.
+        assert len(writes) == 2
+        client.flush()
+        assert probe.calls[0] == 'lock'
+        assert probe.calls[-2:] == ['unlock', 'flush']
+
+    def test_large_frames_are_split(self, client):
+        client, probe = client
+        memif = client.get_memory_interface_for_ap(APv1Address(0))
+        count = client.MAX_FRAME_SIZE // 4
+        data = [i & 0xff for i in range(count * 3)]
+        for _ in range(4):
+            memif.write_memory_block8(0, data)
+        assert len(client._frames_in_flight) <= client.MAX_FRAMES_IN_FLIGHT
+        assert memif.read_memory_block8(0, len(data)) == data
+
+    def test_write_error_raised_at_next_read(self, client):
+        client, probe = client
+        memif = client.get_memory_interface_for_ap(APv1Address(0))
+        memif.write_memory_block32(0x2000, [1])
+        with pytest.raises(exceptions.Error):
+            client.read_ap(0x04)
+        assert client.read_ap(0x04) == 0
+
+def test_frame_round_trip():
+    records = [
+        (Opcode.REQUEST, ('hello', [2])),
+        (Opcode.WRITE_MEM, (1, 0x2000, 0xff, 8)),
+        (Opcode.WRITE_BLOCK32, (0, 0x100, [1, 0xffffffff])),
+        (Opcode.WRITE_BLOCK8, (0, 0x100, b"abc")),
+        (Opcode.UNLOCK, ()),
+        ]
+    payload = b''.join(rpp.encode_request(opcode, *args) for opcode, args in records)
+    assert list(rpp.decode_requests(payload)) == records
+    with pytest.raises(exceptions.Error):
+        list(rpp.decode_requests(payload[:-8]))
+
+    opcodes = [Opcode.READ_AP, Opcode.READ_BLOCK32, Opcode.REQUEST, Opcode.FLUSH]
+    payload = (rpp.encode_response(Opcode.READ_AP, 7)
+            + rpp.encode_response(Opcode.READ_BLOCK32, [1, 2])
+            + rpp.encode_response(Opcode.REQUEST, {"a": 1})
+            + rpp.encode_response(Opcode.FLUSH, error=exceptions.TransferTimeoutError("x")))
+    results = rpp.decode_responses(payload, opcodes)
+    assert [r for r, _ in results[:3]] == [7, [1, 2], {"a": 1}]
+    assert isinstance(results[3][1], exceptions.TransferTimeoutError)
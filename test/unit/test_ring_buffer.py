@@ -0,0 +1,73 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from pyocd.utility.ring_buffer import RingBuffer
+
+class TestRingBuffer:
+    def test_write_read(self):
+        rb = RingBuffer(16)
+        assert rb.write(b'hello') == 5
+        assert len(rb) == 5
+        assert rb.read(2) == b'he'
+        assert rb.read() == b'llo'
+        assert rb.read(timeout=0) == b''
+
+    def test_wrap(self):
+        rb = RingBuffer(8)
+        rb.write(b'abcdef')
+        assert rb.read(4) == b'abcd'
+        assert rb.write(b'ghijk') == 5
+        assert rb.read() == b'efghijk'
+        assert rb.high_water == 7
+
+    def test_overflow(self):
+        rb = RingBuffer(4)
+        assert rb.write(b'abcdef') == 4
+        assert rb.dropped == 2
+        assert rb.write(b'x') == 0
+        assert rb.dropped == 3
+        assert rb.read() == b'abcd'
+
+    def test_backpressure(self):
+        rb = RingBuffer(4)
+        rb.write(b'abcd')
+        def reader():
+            assert rb.read(4, timeout=1) == b'abcd'
+        thread = threading.Thread(target=reader)
+        thread.start()
+        assert rb.write(b'efgh', timeout=5) == 4
+        thread.join()
+        assert rb.dropped == 0
+        assert rb.read() == b'efgh'
+
+    def test_close(self):
+        rb = RingBuffer(4)
+        rb.write(b'ab')
+        rb.close()
+        assert rb.write(b'cd') == 0
+        assert rb.read() == b'ab'
+        assert rb.read() == b''
+
+    def test_close_wakes_reader(self):
+        rb = RingBuffer(4)
+        result = []
+        thread = threading.Thread(target=lambda: result.append(rb.read()))
+        thread.start()
+        rb.close()
+        thread.join(timeout=5)
+        assert result == [b'']
@@ -0,0 +1,178 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+
+from pyocd.core import exceptions
+from pyocd.coresight.core_ids import CoreArchitecture
+from pyocd.debug.context import DebugContext
+from pyocd.rtos.common import SavedRegisterReader
+from pyocd.rtos.freertos import FreeRTOSThreadContext
+from pyocd.rtos.threadx import (TX_THREAD_ID, ThreadXThread, ThreadXThreadProvider)
+
+RAM = 0x20000000
+
+class CountingContext(DebugContext):
+    """@brief Context that counts block reads and faults reads of an address range."""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.reads = 0
+        self.fault_range = None
+
+    def read_memory_block8(self, addr, size):
+        self.reads += 1
+        if self.fault_range and addr < self.fault_range[1] and addr + size > self.fault_range[0]:
+            raise exceptions.TransferFaultError()
+        return super().read_memory_block8(addr, size)
+
+class MockThread:
+    def __init__(self, sp):
+        self.is_current = False
+        self.sp = sp
+
+    def get_stack_pointer(self):
+        return self.sp
+
+@pytest.fixture(scope='function')
+def context(mockcore):
+    return CountingContext(DebugContext(mockcore))
+
+class TestSavedRegisterReader:
+    def test_read(self, mockcore, context):
+        mockcore.write_memory_block32(RAM + 0x100, [10, 11, 12, 13])
+        reader = SavedRegisterReader(context)
+        assert reader.read(RAM + 0x100, {0: 0, 1: 4, 2: 8, 3: 12}, 4, 12) == {1: 11, 2: 12}
+        assert context.reads == 1
+
+    def test_cached_per_run_token(self, mockcore, context):
+        mockcore.write_memory_block32(RAM + 0x100, [10, 11])
+        reader = SavedRegisterReader(context)
+        reader.read(RAM + 0x100, {0: 0, 1: 4}, 0, 8)
+        mockcore.write_memory_block32(RAM + 0x100, [20, 21])
+        assert reader.read(RAM + 0x100, {0: 0, 1: 4}, 0, 8) == {0: 10, 1: 11}
+        assert context.reads == 1
+        mockcore.run_token += 1
+        assert reader.read(RAM + 0x100, {0: 0, 1: 4}, 0, 8) == {0: 20, 1: 21}
+        assert context.reads == 2
+
+    def test_fault(self, context):
+        context.fault_range = (RAM + 0x100, RAM + 0x108)
+        reader = SavedRegisterReader(context)
+        assert reader.read(RAM + 0x100, {0: 0, 1: 4}, 0, 8) == {0: 0, 1: 0}
+        with pytest.raises(exceptions.TransferError):
+            reader.read_word(RAM + 0x104)
+
+class TestFreeRTOSThreadContext:
+    def test_nofpu_frame(self, mockcore_no_fpu):
+        context = CountingContext(DebugContext(mockcore_no_fpu))
+        sp = RAM + 0x200
+        # r4-r11 saved by the RTOS followed by the hardware stacked r0-r3, r12, lr, pc, xpsr.
+        mockcore_no_fpu.write_memory_block32(sp, list(range(104, 112)) + [100, 101, 102, 103, 112, 114, 115, 0x01000000])
+        thread_context = FreeRTOSThreadContext(context, MockThread(sp))
+        regs = ['r0', 'r3', 'r4', 'r11', 'r12', 'sp', 'lr', 'pc', 'xpsr']
+        assert thread_context.read_core_registers_raw(regs) == [
+                100, 103, 104, 111, 112, sp + 0x40, 114, 115, 0x01000000]
+        assert context.reads == 1
+
+    def test_live_register_fault_in_exception(self, mockcore_no_fpu):
+        class ExceptionContext(CountingContext):
+            def read_core_register(self, reg):
+                return {'ipsr': 3, 'psp': sp}[reg]
+
+            def read_core_register_raw(self, reg):
+                raise exceptions.TransferFaultError()
+
+        context = ExceptionContext(DebugContext(mockcore_no_fpu))
+        sp = RAM + 0x220
+        mockcore_no_fpu.write_memory_block32(sp, [100, 101, 102, 103, 112, 114, 115, 0x01000000])
+        thread = MockThread(0)
+        thread.is_current = True
+        thread_context = FreeRTOSThreadContext(context, thread)
+        # The RTOS saved registers are not in the exception frame, and the live ones can't be read.
+        assert thread_context.read_core_registers_raw(['r0', 'r4', 'r11', 'pc']) == [100, 0, 0, 115]
+
+class MockTarget:
+    def __init__(self, core, context):
+        self.core = core
+        self.context = context
+
+    @property
+    def run_token(self):
+        return self.core.run_token
+
+    def get_target_context(self):
+        return self.context
+
+class TestThreadXRefresh:
+    COUNT = RAM
+    CREATED = RAM + 4
+    THREADS = [RAM + 0x100, RAM + 0x200]
+
+    def write_thread(self, core, base, next, priority, state, thread_id=TX_THREAD_ID):
+        core.write_memory_block32(base, [thread_id] + [0] * 33 + [next])
+        core.write_memory_block32(base + 44, [priority, state])
+
+    @pytest.fixture(scope='function')
+    def provider(self, mockcore, context):
+        mockcore.architecture = CoreArchitecture.ARMv7M
+        mockcore.write_memory_block32(self.COUNT, [2, self.THREADS[0]])
+        self.write_thread(mockcore, self.THREADS[0], self.THREADS[1], 1, ThreadXThread.READY)
+        self.write_thread(mockcore, self.THREADS[1], self.THREADS[0], 2, 4)
+        provider = ThreadXThreadProvider(MockTarget(mockcore, context))
+        provider._created_cnt = self.COUNT
+        provider._created_ptr = self.CREATED
+        provider.read_from_target = True
+        provider.builds = 0
+        build = provider._build_thread_list
+        def counting_build():
+            provider.builds += 1
+            build()
+        provider._build_thread_list = counting_build
+        provider.update_threads()
+        assert provider.builds == 1
+        return provider
+
+    def test_refresh(self, mockcore, provider):
+        threads = dict(provider._threads)
+        mockcore.write_memory_block32(self.THREADS[1] + 44, [3, ThreadXThread.READY])
+        mockcore.run_token += 1
+        provider.update_threads()
+        assert provider.builds == 1
+        assert provider._threads == threads
+        assert threads[self.THREADS[1]].priority == 3
+        assert threads[self.THREADS[1]].state == ThreadXThread.READY
+
+    def test_rebuild_on_new_thread(self, mockcore, provider):
+        self.write_thread(mockcore, self.THREADS[1], RAM + 0x300, 2, 4)
+        self.write_thread(mockcore, RAM + 0x300, self.THREADS[0], 5, 4)
+        mockcore.write32(self.COUNT, 3)
+        mockcore.run_token += 1
+        provider.update_threads()
+        assert provider.builds == 2
+        assert sorted(provider._threads) == self.THREADS + [RAM + 0x300]
+
+    def test_rebuild_on_replaced_thread(self, mockcore, provider):
+        # Thread deleted and another created in its place since the last update, so the thread
+        # count is unchanged.
+        self.write_thread(mockcore, self.THREADS[1], 0, 2, 4, thread_id=0)
+        self.write_thread(mockcore, self.THREADS[0], RAM + 0x300, 1, ThreadXThread.READY)
+        self.write_thread(mockcore, RAM + 0x300, self.THREADS[0], 5, 4)
+        mockcore.run_token += 1
+        provider.update_threads()
+        assert provider.builds == 2
+        assert sorted(provider._threads) == [self.THREADS[0], RAM + 0x300]
@@ -0,0 +1,145 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from types import SimpleNamespace
+
+import pytest
+
+from pyocd.core.memory_map import (FlashRegion, MemoryMap, RamRegion)
+from pyocd.debug import rtt
+from pyocd.debug.rtt import GenericRTTControlBlock
+
+RAM_START = 0x20000000
+RAM_SIZE = 0x40000
+CONTROL_BLOCK_ID = b"SEGGER RTT"
+
+class MockTarget:
+    part_number = "mock"
+
+    def __init__(self):
+        self.memory_map = MemoryMap(
+            FlashRegion(start=0, length=0x1000, blocksize=0x400, is_boot_memory=True),
+            RamRegion(start=RAM_START, length=RAM_SIZE),
+            )
+        self.flash = bytearray(0x1000)
+        self.ram = bytearray(RAM_SIZE)
+        self.elf = None
+        self.bytes_read = 0
+
+    def get_memory_map(self):
+        return self.memory_map
+
+    def _slice(self, addr, size):
+        self.bytes_read += size
+        if addr < RAM_START:
+            return self.flash[addr:addr + size]
+        offset = addr - RAM_START
+        return self.ram[offset:offset + size]
+
+    def read_memory_block8(self, addr, size):
+        return list(self._slice(addr, size))
+
+    def read_memory_block32(self, addr, size):
+        assert addr % 4 == 0
+        data = self._slice(addr, size * 4)
+        return [int.from_bytes(data[i:i + 4], 'little') for i in range(0, len(data), 4)]
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    rtt._FOUND_ADDRESSES.clear()
+
+def find(target, address=None, size=None):
+    return GenericRTTControlBlock(target, address=address, size=size)._find_control_block()
+
+def place(target, addr, data=CONTROL_BLOCK_ID):
+    offset = addr - RAM_START
+    target.ram[offset:offset + len(data)] = data
+
+class TestControlBlockSearch:
+    @pytest.mark.parametrize("addr", [
+        RAM_START,
+        RAM_START + 0x1235,
+        # Straddling a search chunk boundary.
+        RAM_START + rtt.CONTROL_BLOCK_SEARCH_CHUNK_SIZE - 5,
+        RAM_START + RAM_SIZE - len(CONTROL_BLOCK_ID),
+        ])
+    def test_found(self, addr):
+        target = MockTarget()
+        place(target, addr)
+        assert find(target) == addr
+
+    def test_not_found(self):
+        target = MockTarget()
+        place(target, RAM_START + 0x100, b"SEGGER RTX")
+        assert find(target) is None
+
+    def test_partial_match(self):
+        target = MockTarget()
+        place(target, RAM_START + 0x100, b"SEGGER SEGGER RTT")
+        assert find(target) == RAM_START + 0x107
+
+    def test_first_match(self):
+        target = MockTarget()
+        place(target, RAM_START + 0x3000)
+        place(target, RAM_START + 0x2000)
+        assert find(target) == RAM_START + 0x2000
+
+    def test_search_range(self):
+        target = MockTarget()
+        place(target, RAM_START + 0x2002)
+        assert find(target, RAM_START + 0x2000, 0x10) == RAM_START + 0x2002
+        assert find(target, RAM_START + 0x2000, 0x8) is None
+        assert find(target, RAM_START + 0x2002) == RAM_START + 0x2002
+        assert find(target, RAM_START + 0x3000, 0x1003) is None
+
+    def test_unaligned_search_range(self):
+        # The range is measured from the word aligned search address.
+        target = MockTarget()
+        place(target, RAM_START + 0x2006)
+        assert find(target, RAM_START + 0x2002, 0x10) == RAM_START + 0x2006
+        target = MockTarget()
+        place(target, RAM_START + 0x2007)
+        assert find(target, RAM_START + 0x2002, 0x10) is None
+
+    def test_elf_symbol(self):
+        target = MockTarget()
+        addr = RAM_START + 0x30000
+        place(target, addr)
+        symbols = SimpleNamespace(get_symbol_for_name=lambda name:
+                SimpleNamespace(address=addr) if name == "_SEGGER_RTT" else None)
+        target.elf = SimpleNamespace(symbol_decoder=symbols)
+        assert find(target) == addr
+        assert target.bytes_read < 0x1000
+
+        # A stale symbol address falls back to searching.
+        target.elf = SimpleNamespace(symbol_decoder=SimpleNamespace(
+                get_symbol_for_name=lambda name: SimpleNamespace(address=RAM_START)))
+        assert find(target) == addr
+
+    def test_remembered_address(self):
+        target = MockTarget()
+        addr = RAM_START + 0x30000
+        place(target, addr)
+        assert find(target) == addr
+        target.bytes_read = 0
+        assert find(target) == addr
+        assert target.bytes_read < 0x1000
+
+        # Different firmware is searched again.
+        target.flash[0:4] = b"\x00\x10\x00\x20"
+        place(target, addr, b"\x00" * len(CONTROL_BLOCK_ID))
+        place(target, RAM_START + 0x100)
+        assert find(target) == RAM_START + 0x100
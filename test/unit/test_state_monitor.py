@@ -0,0 +1,157 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+import pytest
+
+from pyocd.core import exceptions
+from pyocd.core.target import Target
+from pyocd.debug.state_monitor import TargetStateMonitor
+from pyocd.utility.notification import Notifier
+from pyocd.utility.timeout import Timeout
+
+class MockSession(Notifier):
+    def __init__(self):
+        super().__init__()
+        self.options = {
+            'debug.halt_poll_interval.min': 0.001,
+            'debug.halt_poll_interval.max': 0.004,
+            }
+
+class MockCore:
+    """@brief Core that halts after a number of state reads, optionally failing some of them."""
+
+    core_number = 0
+
+    def __init__(self, running_polls, failing_polls=()):
+        self.running_polls = running_polls
+        self.failing_polls = set(failing_polls)
+        self.polls = 0
+
+    def get_state(self):
+        self.polls += 1
+        if self.polls in self.failing_polls:
+            raise exceptions.TransferError("mock fault")
+        if self.polls > self.running_polls:
+            return Target.State.HALTED
+        return Target.State.RUNNING
+
+    def get_halt_reason(self):
+        return Target.HaltReason.BREAKPOINT
+
+@pytest.fixture
+def session():
+    return MockSession()
+
+@pytest.fixture
+def monitor(session):
+    monitor = TargetStateMonitor(session)
+    yield monitor
+    monitor.stop()
+
+class Recorder:
+    def __init__(self, session, monitor):
+        self.monitor = monitor
+        self.notifications = []
+        self.threads = set()
+        self.wake_event = threading.Event()
+        session.subscribe(self, [Target.Event.POST_HALT, TargetStateMonitor.STATE_ERROR_EVENT])
+
+    def __call__(self, notification):
+        self.notifications.append((notification.event, notification.source, notification.data))
+        self.threads.add(threading.current_thread())
+
+    def wait_for_halt(self, core, timeout=5):
+        """@brief Dispatch notifications from this thread until the core halts."""
+        with Timeout(timeout) as t_o:
+            while t_o.check():
+                self.wake_event.wait(0.1)
+                self.wake_event.clear()
+                self.monitor.dispatch_notifications(core)
+                if any(event == Target.Event.POST_HALT for event, _, _ in self.notifications):
+                    return True
+        return False
+
+class TestTargetStateMonitor:
+    def test_halt_notification(self, session, monitor):
+        recorder = Recorder(session, monitor)
+        core = MockCore(running_polls=10)
+        monitor.watch(core, recorder.wake_event)
+        assert recorder.wait_for_halt(core)
+        assert recorder.notifications == [(Target.Event.POST_HALT, core, Target.HaltReason.BREAKPOINT)]
+        # Subscribers are only called from the thread that dispatches the notifications.
+        assert recorder.threads == {threading.current_thread()}
+        assert not monitor.is_watching(core)
+
+        stats = monitor.statistics
+        assert stats.polls == 11
+        assert stats.halts == 1
+        assert stats.errors == 0
+        assert stats.watch_time > 0
+        assert 0 < stats.probe_utilization <= 1
+
+    def test_errors_reported_once(self, session, monitor):
+        recorder = Recorder(session, monitor)
+        core = MockCore(running_polls=5, failing_polls=(2, 3, 4))
+        monitor.watch(core, recorder.wake_event)
+        assert recorder.wait_for_halt(core)
+        events = [event for event, _, _ in recorder.notifications]
+        assert events == [TargetStateMonitor.STATE_ERROR_EVENT, Target.Event.POST_HALT]
+        assert isinstance(recorder.notifications[0][2], exceptions.TransferError)
+        assert monitor.statistics.errors == 3
+
+    def test_unwatch(self, session, monitor):
+        recorder = Recorder(session, monitor)
+        core = MockCore(running_polls=1000000)
+        monitor.watch(core, recorder.wake_event)
+        assert monitor.is_watching(core)
+        monitor.unwatch(core)
+        assert not monitor.is_watching(core)
+        monitor.stop()
+        assert monitor.dispatch_notifications(core) is None
+        assert recorder.notifications == []
+
+    def test_polls_hold_lock(self, session, monitor):
+        lock = threading.Lock()
+        core = MockCore(running_polls=3)
+        wake_event = threading.Event()
+        with lock:
+            monitor.watch(core, wake_event, lock)
+            threading.Event().wait(0.05)
+            # The monitor can't read the state while the client holds the lock.
+            assert core.polls == 0
+        assert wake_event.wait(5)
+        assert core.polls == 4
+
+    def test_stop_while_lock_held(self, monitor):
+        lock = threading.Lock()
+        core = MockCore(running_polls=1000000)
+        with lock:
+            monitor.watch(core, threading.Event(), lock)
+            threading.Event().wait(0.02)
+            monitor.stop()
+        assert core.polls == 0
+
+    def test_backoff(self, session, monitor):
+        monitor.BACKOFF_FACTOR = 2
+        core = MockCore(running_polls=1000000)
+        monitor.watch(core, threading.Event())
+        info = monitor._watched[core]
+        threading.Event().wait(0.05)
+        # The interval grows from the minimum and is capped at the maximum.
+        assert info.interval == pytest.approx(0.004)
+        assert 5 < core.polls < 50
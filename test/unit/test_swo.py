@@ -0,0 +1,243 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import pytest
+
+from pyocd.trace import events
+from pyocd.trace.sink import (TraceEventFilter, TraceEventSink, TraceEventTee)
+from pyocd.trace.swo import SWOParser
+from pyocd.trace.swv import SWVEventSink
+
+from .swo_reference import ReferenceSWOParser
+
+class MockCore:
+    def exception_number_to_name(self, exc_num):
+        return "Exception%d" % exc_num
+
+class RecordingSink(TraceEventSink):
+    def __init__(self):
+        self.events = []
+        self.blocks = 0
+
+    def receive(self, event):
+        self.events.append(repr(event))
+
+class BatchSink(RecordingSink):
+    def __init__(self):
+        super().__init__()
+        self.batches = 0
+
+    def receive_batch(self, events):
+        self.batches += 1
+        super().receive_batch(events)
+
+class BlockSink(RecordingSink):
+    def receive_block(self, block):
+        self.blocks += 1
+        super().receive_block(block)
+
+SYNC = [0x00] * 5 + [0x80]
+
+def itm(port, data, size):
+    ss = {1: 1, 2: 2, 4: 3}[size]
+    return [(port << 3) | ss] + list(data.to_bytes(size, 'little'))
+
+def hw(a, payload, size=2):
+    ss = {1: 1, 2: 2, 4: 3}[size]
+    return [(a << 3) | 0x4 | ss] + list(payload.to_bytes(size, 'little'))
+
+def data_trace(type, cmpn, bit3, payload, size=4):
+    ss = {1: 1, 2: 2, 4: 3}[size]
+    return [(type << 6) | (cmpn << 4) | (bit3 << 3) | 0x4 | ss] + list(payload.to_bytes(size, 'little'))
+
+def short_ts(delta):
+    return [delta << 4]
+
+def long_ts(delta, tc=0):
+    result = [0xc0 | (tc << 4)]
+    groups = []
+    while True:
+        groups.insert(0, delta & 0x7f)
+        delta >>= 7
+        if not delta:
+            break
+    result += [b | 0x80 for b in groups[:-1]] + [groups[-1]]
+    return result
+
+def page(n):
+    return [0x08 | (n << 4)]
+
+def make_stream():
+    stream = []
+    stream += SYNC
+    stream += itm(0, ord('a'), 1) + itm(1, 0x1234, 2) + short_ts(3)
+    stream += page(2) + itm(5, 0xdeadbeef, 4) + long_ts(1000, tc=1)
+    stream += hw(2, 0x08001234, 4) + hw(2, 0, 1) + short_ts(1)
+    stream += hw(1, 0x1000 | 15) + hw(1, 0x3000 | 16) + hw(1, 0x0000 | 17) + long_ts(5)
+    stream += hw(0, 0x21, 1) + [0x70] # overflow
+    stream += data_trace(0b01, 1, 0, 0x08000100) + data_trace(0b10, 1, 0, 0x55, 1) + short_ts(2)
+    stream += data_trace(0b01, 2, 1, 0x2000, 2) + data_trace(0b10, 3, 1, 0x66, 2) + itm(0, 1, 1)
+    stream += data_trace(0b10, 0, 1, 0x77, 4) + [0x70]
+    stream += [0x94, 0x0c, 0x88 | 0x80, 0x01] # global timestamp, short and long extensions
+    stream += [0x00, 0x00, 0x01] + itm(3, 3, 1) # short, invalid sync resets page
+    stream += page(1) + SYNC + itm(4, 4, 1) + long_ts(1 << 20)
+    stream += hw(5, 0x1, 1) + data_trace(0b11, 0, 0, 0x1) + itm(6, 6, 1) + short_ts(7)
+    stream += itm(7, 7, 1) # left pending without a timestamp
+    return bytes(stream)
+
+def run(parser_class, chunks, sink=None, **kwargs):
+    if sink is None:
+        sink = RecordingSink()
+    parser = parser_class(MockCore(), sink, **kwargs)
+    for chunk in chunks:
+        parser.parse(chunk)
+    return parser, sink
+
+def split(data, rng):
+    chunks = []
+    i = 0
+    while i < len(data):
+        n = rng.randint(0, 9)
+        chunks.append(data[i:i + n])
+        i += n
+    return chunks
+
+class TestSWOParser:
+    def test_matches_reference(self):
+        data = make_stream()
+        _, expected = run(ReferenceSWOParser, [data])
+        parser, actual = run(SWOParser, [data])
+        assert len(expected.events) > 15
+        assert actual.events == expected.events
+        assert parser.bytes_parsed == len(data)
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_split_buffers(self, seed):
+        data = make_stream()
+        _, expected = run(ReferenceSWOParser, [data])
+        chunks = split(data, random.Random(seed))
+        parser, actual = run(SWOParser, chunks)
+        assert actual.events == expected.events
+        assert parser.bytes_parsed == len(data)
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_random_data(self, seed):
+        rng = random.Random(seed)
+        data = bytes(rng.getrandbits(8) for _ in range(4000))
+        _, expected = run(ReferenceSWOParser, [data])
+        _, actual = run(SWOParser, split(data, rng))
+        assert actual.events == expected.events
+
+    def test_timestamps_applied(self):
+        sink = RecordingSink()
+        parser = SWOParser(MockCore(), sink)
+        parser.parse(itm(0, 1, 1) + itm(0, 2, 1))
+        assert sink.events == []
+        parser.parse(short_ts(4))
+        assert sink.events == [repr(events.TraceITMEvent(0, 1, 1, 4)), repr(events.TraceITMEvent(0, 2, 1, 4))]
+
+    def test_reset(self):
+        sink = RecordingSink()
+        parser = SWOParser(MockCore(), sink)
+        parser.parse(page(1) + long_ts(100)[:2])
+        parser.reset()
+        assert parser.bytes_parsed == 0
+        parser.parse(itm(1, 1, 1) + short_ts(1))
+        assert sink.events == [repr(events.TraceITMEvent(1, 1, 1, 1))]
+
+    def test_data_trace_merge(self):
+        sink = RecordingSink()
+        parser = SWOParser(MockCore(), sink)
+        parser.parse(bytes(data_trace(0b01, 0, 0, 0x100) + data_trace(0b10, 0, 1, 0, 1) + short_ts(1)))
+        assert sink.events == [repr(events.TraceDataTraceEvent(cmpn=0, pc=0x100, value=0, rnw=False, sz=1, ts=1))]
+
+    def test_iterable_input(self):
+        _, expected = run(ReferenceSWOParser, [make_stream()])
+        _, actual = run(SWOParser, [list(make_stream())])
+        assert actual.events == expected.events
+
+class TestColumnar:
+    def test_matches_objects(self):
+        data = make_stream()
+        _, expected = run(ReferenceSWOParser, [data])
+        _, actual = run(SWOParser, split(data, random.Random(1)), sink=BlockSink(), columnar=True)
+        assert actual.events == expected.events
+        assert 0 < actual.blocks < len(actual.events)
+
+    def test_block_columns(self):
+        sink = BlockSink()
+        blocks = []
+        sink.receive_block = blocks.append
+        parser = SWOParser(MockCore(), sink, columnar=True)
+        parser.parse(bytes(page(1) + itm(1, 0x1234, 2) + hw(2, 0x100, 4) + hw(1, 0x2000 | 3) + short_ts(5)))
+        assert len(blocks) == 1
+        block = blocks[0]
+        assert len(block) == 3
+        assert list(block.kinds) == [block.ITM, block.PERIODIC_PC, block.EXCEPTION]
+        assert list(block.timestamps) == [5, 5, 5]
+        assert list(block.ports) == [33, 0, 3]
+        assert list(block.values) == [0x1234, 0x100, 0]
+        assert list(block.sizes) == [2, 0, 2]
+
+    def test_tee_forwards_blocks(self):
+        tee = TraceEventTee()
+        sinks = [BlockSink(), RecordingSink()]
+        tee.connect(sinks)
+        parser = SWOParser(MockCore(), tee, columnar=True)
+        parser.parse(bytes(itm(0, 1, 1) + [0x70]))
+        assert sinks[0].blocks == 1
+        assert sinks[0].events == sinks[1].events == [
+                repr(events.TraceITMEvent(0, 1, 1, 0)), repr(events.TraceOverflow(0))]
+
+class PortFilter(TraceEventFilter):
+    def filter(self, event):
+        if isinstance(event, events.TraceITMEvent):
+            if event.port == 0:
+                return None
+            elif event.port == 1:
+                return [event, event]
+        return event
+
+class TestBatches:
+    def test_one_batch_per_parse(self):
+        data = make_stream()
+        _, expected = run(ReferenceSWOParser, [data])
+        parser, actual = run(SWOParser, [data], sink=BatchSink())
+        assert actual.events == expected.events
+        assert actual.batches == 1
+        assert parser.events_parsed == len(expected.events)
+
+    def test_filter_batch(self):
+        sink = BatchSink()
+        parser = SWOParser(MockCore(), PortFilter(sink))
+        parser.parse(bytes(itm(0, 1, 1) + itm(1, 2, 1) + itm(2, 3, 1) + short_ts(1)))
+        assert sink.batches == 1
+        assert sink.events == [repr(events.TraceITMEvent(1, 2, 1, 1))] * 2 + [repr(events.TraceITMEvent(2, 3, 1, 1))]
+
+    def test_swv_sink_batch(self):
+        class Console:
+            def __init__(self):
+                self.writes = []
+
+            def write(self, data):
+                self.writes.append(data)
+
+        console = Console()
+        parser = SWOParser(MockCore(), SWVEventSink(console))
+        parser.parse(bytes(itm(0, ord('a'), 1) + itm(0, 0x6362, 2) + hw(2, 0x100, 4) + itm(0, 0x0a676665, 4)
+                + short_ts(1)))
+        assert console.writes == ["abcefg\n"]
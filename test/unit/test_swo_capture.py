@@ -0,0 +1,125 @@
+# pyOCD debugger
+# Copyright (c) 2023 Chris Reed
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import threading
+from unittest import mock
+import pytest
+
+from pyocd.core import exceptions
+from pyocd.trace.capture import (CaptureFormatError, SWOCaptureReader, SWOCaptureWriter)
+from pyocd.trace.sink import TraceEventTee
+from pyocd.trace.swo import SWOParser
+from pyocd.trace.swv import SWVReader
+
+from .test_swo import (MockCore, RecordingSink, make_stream)
+
+def record(data, compress=False, columnar=False, chunk_size=16, close=True):
+    f = io.BytesIO()
+    writer = SWOCaptureWriter(f, compress=compress, chunk_size=chunk_size)
+    live = RecordingSink()
+    tee = TraceEventTee()
+    tee.connect([live, writer])
+    parser = SWOParser(MockCore(), tee, columnar=columnar)
+    for offset in range(0, len(data), 7):
+        chunk = data[offset:offset + 7]
+        writer.write_raw(chunk)
+        parser.parse(chunk)
+    if close:
+        writer.close()
+    f.seek(0)
+    return f, live.events
+
+class TestSWOCapture:
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_replay(self, compress):
+        data = make_stream()
+        f, expected = record(data, compress=compress)
+        reader = SWOCaptureReader(f)
+        assert reader.is_compressed == compress
+        assert b''.join(chunk for _, chunk in reader.read_raw()) == data
+        assert [entry.stream_offset for entry in reader.index] == list(range(0, len(data), 21))
+
+        sink = RecordingSink()
+        assert reader.replay(SWOParser(MockCore(), sink)) == len(data)
+        assert sink.events == expected
+
+    @pytest.mark.parametrize("columnar", [False, True])
+    def test_recorded_events(self, columnar):
+        f, expected = record(make_stream(), columnar=columnar)
+        reader = SWOCaptureReader(f)
+        recorded = [repr(e) for e in reader.read_events(MockCore().exception_number_to_name)]
+        assert recorded == expected
+
+    def test_unclosed_capture(self):
+        data = make_stream()
+        f, _ = record(data, close=False)
+        # Simulate a capture cut off in the middle of a chunk.
+        truncated = io.BytesIO(f.getvalue()[:-3])
+        reader = SWOCaptureReader(truncated)
+        raw = b''.join(chunk for _, chunk in reader.read_raw())
+        assert data.startswith(raw)
+        # The last complete chunk was cut off.
+        assert len(reader.index) == len(data) // 21 - 1
+
+    def test_start_time(self):
+        f, _ = record(make_stream())
+        reader = SWOCaptureReader(f)
+        last = reader.index[-1]
+        chunks = list(reader.read_raw(start_time=last.host_time + 1))
+        assert len(chunks) == 1
+
+    def test_invalid_file(self):
+        with pytest.raises(CaptureFormatError):
+            SWOCaptureReader(io.BytesIO(b'not a capture file at all'))
+
+class BlockedParser:
+    """@brief Parser stand-in that does not consume data until released."""
+    def __init__(self):
+        self.events_parsed = 0
+        self.release = threading.Event()
+
+    def parse(self, data):
+        self.release.wait(5)
+
+class TestSWVReaderCapture:
+    def test_capture_includes_dropped_data(self):
+        data = make_stream()
+        chunks = [data[offset:offset + 16] for offset in range(0, len(data), 16)]
+
+        session = mock.MagicMock()
+        session.options = {'swv_buffer_size': 16}
+        reader = SWVReader(session)
+        reader.BACKPRESSURE_TIMEOUT = 0.001
+        reader._parser = BlockedParser()
+        f = io.BytesIO()
+        reader._capture = SWOCaptureWriter(f)
+
+        def swo_read():
+            if chunks:
+                return chunks.pop(0)
+            reader._shutdown_event.set()
+            reader._parser.release.set()
+            return b''
+        session.probe.swo_read.side_effect = swo_read
+        session.probe.swo_stop.side_effect = [exceptions.ProbeError, None]
+
+        reader.run()
+
+        probe_stats, _ = reader.statistics
+        assert probe_stats.drops > 0
+        f.seek(0)
+        assert b''.join(chunk for _, chunk in SWOCaptureReader(f).read_raw()) == data